@@ -8,28 +8,83 @@ Autor: GitHub Copilot
 Data: 2025
 """
 
+import argparse
 import pandas as pd
 import numpy as np
 import os
 from datetime import datetime
+import importlib.util
 import warnings
-import requests
-import io
+
+from cid10 import CidCodeSet
+from datas import add_date_columns
+from analise_temporal import SEXO_MAP, create_time_series_analysis, export_time_series_to_excel
+from taxas import ABAS_TAXAS, create_rate_analysis, load_population_index
+from regioes import ABAS_REGIOES, create_regional_rollups
+from tendencias import ABAS_TENDENCIA, create_trend_analysis
+from varredura_espacial import ABAS_VARREDURA, create_space_time_scan
+from intervalos_confianca import ABAS_IC, create_bootstrap_intervals
+from episodios import ABAS_EPISODIOS, consolidate_episodes
+from faixas_etarias import add_age_band
+from custos import ABAS_CUSTOS, add_real_values, create_cost_analysis
+from hospitais import ABAS_HOSPITAIS, create_hospital_load_analysis
+from exportacao import write_optional_sheets
+from telemetria import count, event
+from armazenamento import PYARROW_AVAILABLE, read_cohort
+from coorte_compartilhada import cohort_path, write_cohort
+from qualidade import ABAS_QUALIDADE, create_quality_analysis
+from retomada import (ABAS_RETOMADA, StageCheckpoints, data_fingerprint, download_units,
+                      ingest_units, missing_partitions_report)
 
 # Suprimir warnings desnecessários
 warnings.filterwarnings('ignore')
 
-# Tentar importar pydatasus, com fallback se não estiver disponível
-try:
-    from pydatasus import download
-    PYDATASUS_AVAILABLE = True
-    print("✅ Biblioteca pydatasus importada com sucesso")
-except ImportError as e:
-    print(f"AVISO: pydatasus nao esta disponivel ({e})")
+# Verificar se pydatasus está instalado (a importação só ocorre no download)
+PYDATASUS_AVAILABLE = importlib.util.find_spec('pydatasus') is not None
+if PYDATASUS_AVAILABLE:
+    print("✅ Biblioteca pydatasus disponível")
+else:
+    print("AVISO: pydatasus nao esta disponivel")
     print("   Usando metodo alternativo para demonstracao...")
-    PYDATASUS_AVAILABLE = False
 
-def download_datasus_sih_data(start_year=2020, end_year=2025, state='AM'):
+# Códigos CID-10 usados nos filtros (ver cid10.py para a sintaxe)
+CIDS_DIABETES = 'E10-E11'
+CIDS_OUTROS_ENDOCRINOS = 'E00-E07, E15-E16, E20-E35'
+
+# Colunas de diagnóstico secundário do SIH-RD
+DIAGNOSTICOS_SECUNDARIOS_SIH = ['DIAG_SECUN'] + [f'DIAGSEC{i}' for i in range(1, 10)]
+
+# Considerar diagnósticos secundários na coorte principal (ver filter_diabetes_children_sih);
+# padrão da opção --secundarios
+INCLUIR_DIAGNOSTICOS_SECUNDARIOS = False
+
+# Definições de coortes avaliadas em uma única passada sobre os dados brutos.
+# Cada coorte define a faixa de idade (em anos, inclusiva) e o conjunto CID-10
+# aceito no diagnóstico principal.
+COORTES_PADRAO = {
+    'Diabetes_Tipo1_0_14': {'idade': (0, 14), 'cid': 'E10'},
+    'Diabetes_Tipo2_0_14': {'idade': (0, 14), 'cid': 'E11'},
+    'Diabetes_0_4': {'idade': (0, 4), 'cid': CIDS_DIABETES},
+    'Diabetes_5_9': {'idade': (5, 9), 'cid': CIDS_DIABETES},
+    'Diabetes_10_14': {'idade': (10, 14), 'cid': CIDS_DIABETES},
+    'Diabetes_15_19': {'idade': (15, 19), 'cid': CIDS_DIABETES},
+    'Outros_Endocrinos_0_19': {'idade': (0, 19), 'cid': CIDS_OUTROS_ENDOCRINOS},
+}
+
+# Abas do Excel (chave em stats -> nome da aba)
+ABAS_COORTES = [
+    ('contagens_coortes', 'Contagens_Coortes'),
+]
+
+# Predicado usado para podar o armazenamento local: união das coortes padrão
+PREDICADO_ARMAZENAMENTO = {
+    'idade': (0, 19),
+    'cid': f'{CIDS_DIABETES}, {CIDS_OUTROS_ENDOCRINOS}',
+    'secundarios': INCLUIR_DIAGNOSTICOS_SECUNDARIOS,
+}
+
+def download_datasus_sih_data(start_year=2020, end_year=2025, state='AM',
+                              include_secondary=INCLUIR_DIAGNOSTICOS_SECUNDARIOS):
     """
     Baixa dados do SIH-SUS (Sistema de Informações Hospitalares) do DATASUS
     
@@ -37,6 +92,8 @@ def download_datasus_sih_data(start_year=2020, end_year=2025, state='AM'):
         start_year (int): Ano inicial
         end_year (int): Ano final
         state (str): Sigla do estado (AM = Amazonas)
+        include_secondary (bool): Manter no armazenamento local os registros com
+            diabetes apenas nos diagnósticos secundários
     
     Returns:
         pd.DataFrame: DataFrame concatenado com todos os anos
@@ -47,27 +104,24 @@ def download_datasus_sih_data(start_year=2020, end_year=2025, state='AM'):
         print("⚠️ pydatasus não disponível - criando dados de exemplo para demonstração")
         return create_sample_sih_data(start_year, end_year)
     
-    all_data = []
+    try:
+        from pydatasus import download
+    except ImportError as e:
+        print(f"⚠️ pydatasus não pôde ser importado ({e}) - criando dados de exemplo para demonstração")
+        return create_sample_sih_data(start_year, end_year)
     
-    for year in range(start_year, end_year + 1):
-        try:
-            print(f"   Baixando dados de internações de {year}...")
-            
-            # Download dos dados SIH para o ano específico
-            # SIH-RD contém dados de internações
-            data = download.SIH_RD(state, year, month=None)  # Todos os meses do ano
-            
-            if data is not None and not data.empty:
-                # Adicionar coluna do ano para controle
-                data['ANO'] = year
-                all_data.append(data)
-                print(f"   ✅ {year}: {len(data)} registros de internações baixados")
-            else:
-                print(f"   ⚠️ {year}: Nenhum dado de internação disponível")
-                
-        except Exception as e:
-            print(f"   ❌ Erro ao baixar dados de {year}: {str(e)}")
-            continue
+    # SIH-RD contém dados de internações: um arquivo por mês, gravado e registrado
+    # no livro de ingestão assim que baixado (meses já concluídos não são baixados)
+    all_data = ingest_units(
+        'SIH', state, download_units(start_year, end_year, monthly=True),
+        lambda ano, mes: download.SIH_RD(state, ano, month=mes),
+    )
+    
+    if PYARROW_AVAILABLE:
+        # Ler apenas partições/grupos de linhas que podem conter alguma coorte
+        predicado = {**PREDICADO_ARMAZENAMENTO, 'secundarios': include_secondary}
+        armazenados = read_cohort('SIH', state, range(start_year, end_year + 1), predicado)
+        all_data = [armazenados] if not armazenados.empty else []
     
     if all_data:
         # Concatenar todos os DataFrames
@@ -119,6 +173,7 @@ def create_sample_sih_data(start_year=2020, end_year=2025):
             day = np.random.randint(1, 29)
             dt_inter = f"{day:02d}{month:02d}{year}"
             dt_saida = f"{day:02d}{month:02d}{year}"  # Mesmo dia para simplificar
+            nasc = (pd.Timestamp(year, month, day) - pd.Timedelta(days=age_years * 365 + 180)).strftime('%Y%m%d')
             
             # Município fictício (códigos do AM)
             municipios_am = ['230440', '230020', '230030', '230100', '230200']
@@ -133,6 +188,7 @@ def create_sample_sih_data(start_year=2020, end_year=2025):
             sample_data.append({
                 'DT_INTER': dt_inter,
                 'DT_SAIDA': dt_saida,
+                'NASC': nasc,
                 'IDADE': age_years,
                 'SEXO': sex,
                 'DIAG_PRINC': diag_princ,  # Diagnóstico principal
@@ -143,17 +199,46 @@ def create_sample_sih_data(start_year=2020, end_year=2025):
             })
     
     df_sample = pd.DataFrame(sample_data)
+    
+    # Identificação da AIH e do hospital (CNES fictício por município)
+    cnes_municipio = {'230440': '2012677', '230020': '2013096', '230030': '2013150',
+                      '230100': '2013258', '230200': '2013339'}
+    df_sample['N_AIH'] = [f"13{ano}{i:07d}" for i, ano in enumerate(df_sample['ANO'])]
+    df_sample['IDENT'] = '1'
+    df_sample['CNES'] = df_sample['MUNRES'].map(cnes_municipio)
+    
+    # Uma a cada 25 internações continua em AIH de longa permanência (IDENT = 5)
+    # e uma a cada 40 AIHs é reapresentada - ver episodios.py
+    continuacoes = df_sample.iloc[::25].copy()
+    saida = pd.to_datetime(continuacoes['DT_SAIDA'], format='%d%m%Y')
+    continuacoes['DT_INTER'] = continuacoes['DT_SAIDA']
+    continuacoes['DT_SAIDA'] = (saida + pd.Timedelta(days=10)).dt.strftime('%d%m%Y')
+    continuacoes['DIAS_PERM'] = 10
+    continuacoes['VAL_TOT'] = continuacoes['VAL_TOT'] / 2
+    continuacoes['IDENT'] = '5'
+    continuacoes['N_AIH'] = continuacoes['N_AIH'].str[:6] + '9' + continuacoes['N_AIH'].str[7:]
+    reapresentadas = df_sample.iloc[::40]
+    df_sample = pd.concat([df_sample, continuacoes, reapresentadas], ignore_index=True)
+    
+    # Procedimento realizado (SIGTAP) e componentes do valor: serviços hospitalares e profissionais
+    df_sample['PROC_REA'] = np.where(df_sample.index % 6 == 0, '0303030020', '0303030038')
+    df_sample['VAL_SH'] = (df_sample['VAL_TOT'] * 0.82).round(2)
+    df_sample['VAL_SP'] = (df_sample['VAL_TOT'] - df_sample['VAL_SH']).round(2)
+    
     print(f"✅ Dados de exemplo de internações criados: {len(df_sample)} registros")
     print("📝 IMPORTANTE: Estes são dados fictícios para demonstração!")
     
     return df_sample
 
-def filter_diabetes_children_sih(df):
+def filter_diabetes_children_sih(df, include_secondary=False):
     """
     Filtra os dados de internação para casos de diabetes tipo 1 e 2 em crianças (0-14 anos)
     
     Args:
         df (pd.DataFrame): DataFrame com dados brutos do SIH-SUS
+        include_secondary (bool): Se True, considera também os diagnósticos
+            secundários (DIAG_SECUN, DIAGSEC1..9) e registra a posição do
+            diagnóstico de diabetes em POSICAO_DIAGNOSTICO
     
     Returns:
         pd.DataFrame: DataFrame filtrado
@@ -183,15 +268,37 @@ def filter_diabetes_children_sih(df):
         print("   ⚠️ Coluna IDADE não encontrada")
         df_filtered = df.copy()
     
-    # 2. Filtrar por diagnóstico principal: códigos E10 (Tipo 1) e E11 (Tipo 2)
+    # 2. Filtrar por diagnóstico: códigos E10 (Tipo 1) e E11 (Tipo 2)
     if 'DIAG_PRINC' in df_filtered.columns:
-        # Filtrar apenas diabetes tipo 1 (E10) e tipo 2 (E11)
-        diabetes_filter = df_filtered['DIAG_PRINC'].str.startswith(('E10', 'E11'), na=False)
+        colunas_diagnostico = ['DIAG_PRINC']
+        if include_secondary:
+            secundarias = [col for col in DIAGNOSTICOS_SECUNDARIOS_SIH if col in df_filtered.columns]
+            if not secundarias:
+                print("   ⚠️ Nenhuma coluna de diagnóstico secundário encontrada")
+            colunas_diagnostico += secundarias
+        
+        # Matriz (registros x posições de diagnóstico), avaliada coluna a coluna
+        matriz = CidCodeSet.parse(CIDS_DIABETES).match_columns(df_filtered, colunas_diagnostico)
+        diabetes_filter = matriz.any(axis=1)
+        
+        if include_secondary:
+            print(f"   Diabetes no diagnóstico principal: {int(matriz[:, 0].sum())}")
+            print(f"   Diabetes em qualquer posição: {int(diabetes_filter.sum())}")
+        
         df_filtered = df_filtered[diabetes_filter].copy()
         print(f"   Após filtro de diabetes tipo 1 e 2 (E10, E11): {len(df_filtered)}")
         
+        coluna_tipo = 'DIAG_PRINC'
+        if include_secondary:
+            # Primeira posição com diabetes em cada registro (0 = principal)
+            primeira = matriz[diabetes_filter].argmax(axis=1)
+            diagnosticos = df_filtered[colunas_diagnostico].to_numpy(dtype=object)
+            df_filtered['CID_DIABETES'] = np.take_along_axis(diagnosticos, primeira[:, None], axis=1)[:, 0]
+            df_filtered['POSICAO_DIAGNOSTICO'] = np.where(primeira == 0, 'Principal', 'Secundário')
+            coluna_tipo = 'CID_DIABETES'
+        
         # Classificar tipo de diabetes
-        df_filtered['TIPO_DIABETES'] = df_filtered['DIAG_PRINC'].str[:3].map({
+        df_filtered['TIPO_DIABETES'] = df_filtered[coluna_tipo].str[:3].map({
             'E10': 'Tipo 1',
             'E11': 'Tipo 2'
         })
@@ -200,17 +307,123 @@ def filter_diabetes_children_sih(df):
         print("   ⚠️ Coluna DIAG_PRINC não encontrada")
     
     # 3. Selecionar colunas relevantes
-    relevant_columns = ['DT_INTER', 'DT_SAIDA', 'IDADE', 'SEXO', 'DIAG_PRINC', 
-                       'TIPO_DIABETES', 'MUNRES', 'DIAS_PERM', 'VAL_TOT', 'ANO']
+    relevant_columns = ['DT_INTER', 'DT_SAIDA', 'NASC', 'IDADE', 'SEXO', 'DIAG_PRINC', 
+                       'CID_DIABETES', 'POSICAO_DIAGNOSTICO', 'TIPO_DIABETES',
+                       'MUNRES', 'DIAS_PERM', 'VAL_TOT', 'ANO', 'N_AIH', 'IDENT', 'CNES',
+                       'PROC_REA', 'VAL_SH', 'VAL_SP']
     available_columns = [col for col in relevant_columns if col in df_filtered.columns]
     
     if available_columns:
         df_filtered = df_filtered[available_columns].copy()
         print(f"   Colunas selecionadas: {available_columns}")
     
+    count('linhas_examinadas_total', len(df), sistema='SIH')
+    count('linhas_selecionadas_total', len(df_filtered), sistema='SIH')
+    event('filtro_coorte', sistema='SIH', entrada=len(df), saida=len(df_filtered))
     print(f"✅ Filtros aplicados! Registros finais: {len(df_filtered)}")
     return df_filtered
 
+def filter_cohorts_sih(df, cohorts=None):
+    """
+    Avalia várias definições de coorte em uma única passada sobre os dados brutos
+
+    A idade é convertida uma única vez e o diagnóstico principal é fatorado em
+    códigos inteiros; cada critério de CID é avaliado apenas sobre os códigos
+    distintos e cada faixa de idade distinta é calculada uma só vez.
+
+    Args:
+        df (pd.DataFrame): DataFrame com dados brutos do SIH-SUS
+        cohorts (dict): Coortes no formato de COORTES_PADRAO (padrão: COORTES_PADRAO);
+            'cid' aceita qualquer especificação de CidCodeSet.parse
+
+    Returns:
+        pd.DataFrame: Matriz booleana de pertencimento (linhas x coortes),
+            com o mesmo índice de df e uma coluna por coorte
+    """
+    cohorts = COORTES_PADRAO if cohorts is None else cohorts
+    print(f"🔍 Avaliando {len(cohorts)} coortes em uma única passada...")
+
+    n = len(df)
+    bitmap = np.zeros((n, len(cohorts)), dtype=bool)
+
+    if n == 0 or 'IDADE' not in df.columns or 'DIAG_PRINC' not in df.columns:
+        print("   ⚠️ Dados vazios ou colunas IDADE/DIAG_PRINC ausentes")
+        return pd.DataFrame(bitmap, index=df.index, columns=list(cohorts))
+
+    # Conversões feitas uma única vez para todas as coortes
+    idade = pd.to_numeric(df['IDADE'], errors='coerce').to_numpy(dtype=float)
+    codigos, diagnosticos = pd.factorize(df['DIAG_PRINC'])
+
+    mascaras_idade = {}
+    mascaras_cid = {}
+
+    for j, (nome, criterios) in enumerate(cohorts.items()):
+        faixa = tuple(criterios['idade'])
+        if faixa not in mascaras_idade:
+            mascaras_idade[faixa] = (idade >= faixa[0]) & (idade <= faixa[1])
+
+        cids = CidCodeSet.parse(criterios['cid'])
+        chave_cid = repr(cids)
+        if chave_cid not in mascaras_cid:
+            # Tabela de pertencimento por código distinto; -1 (nulo) cai na última posição
+            tabela = np.append(cids.lookup(diagnosticos), False)
+            mascaras_cid[chave_cid] = tabela[codigos]
+
+        bitmap[:, j] = mascaras_idade[faixa] & mascaras_cid[chave_cid]
+
+    membership = pd.DataFrame(bitmap, index=df.index, columns=list(cohorts))
+
+    for nome, total in membership.sum().items():
+        print(f"   {nome}: {total} registros")
+
+    return membership
+
+def cohort_row_indices(membership):
+    """
+    Converte a matriz de pertencimento em índices de linhas por coorte
+
+    Args:
+        membership (pd.DataFrame): Resultado de filter_cohorts_sih
+
+    Returns:
+        dict: Nome da coorte -> np.ndarray com as posições das linhas
+    """
+    matriz = membership.to_numpy()
+    return {nome: np.flatnonzero(matriz[:, j]) for j, nome in enumerate(membership.columns)}
+
+def create_cohort_counts(df, cohorts=None):
+    """
+    Conta os registros de AIH de cada coorte, no total e por ano
+
+    As coortes são avaliadas em uma única passada (filter_cohorts_sih) sobre
+    os dados brutos, antes da consolidação em episódios.
+
+    Args:
+        df (pd.DataFrame): DataFrame com dados brutos do SIH-SUS
+        cohorts (dict): Coortes no formato de COORTES_PADRAO (padrão: COORTES_PADRAO)
+
+    Returns:
+        dict: 'contagens_coortes' (pd.DataFrame com uma linha por coorte)
+    """
+    cohorts = COORTES_PADRAO if cohorts is None else cohorts
+    linhas = cohort_row_indices(filter_cohorts_sih(df, cohorts))
+    anos = (pd.to_numeric(df['ANO'], errors='coerce').to_numpy() if 'ANO' in df.columns
+            else np.full(len(df), np.nan))
+    todos_anos = sorted(int(a) for a in np.unique(anos[~np.isnan(anos)]))
+
+    contagens = []
+    for nome, posicoes in linhas.items():
+        idade_min, idade_max = cohorts[nome]['idade']
+        por_ano = pd.Series(anos[posicoes]).value_counts()
+        contagens.append({
+            'Coorte': nome,
+            'Faixa_Idade': f'{idade_min}-{idade_max} anos',
+            'CID10': cohorts[nome]['cid'],
+            'Registros_AIH': len(posicoes),
+            **{str(ano): int(por_ano.get(ano, 0)) for ano in todos_anos},
+        })
+    return {'contagens_coortes': pd.DataFrame(contagens)}
+
 def create_detailed_yearly_analysis(df):
     """
     Cria análise detalhada por ano com médias e estatísticas
@@ -230,7 +443,8 @@ def create_detailed_yearly_analysis(df):
             'casos_por_tipo': pd.DataFrame(),
             'casos_por_sexo_ano': pd.DataFrame(),
             'media_dias_internacao': pd.DataFrame(),
-            'media_valor_internacao': pd.DataFrame()
+            'media_valor_internacao': pd.DataFrame(),
+            'casos_por_posicao': pd.DataFrame()
         }
     
     # Análise geral por ano
@@ -263,8 +477,8 @@ def create_detailed_yearly_analysis(df):
     casos_por_tipo_pivot = casos_por_tipo_pivot.reset_index()
     
     # Casos por sexo e ano
-    df['SEXO_DESC'] = df['SEXO'].map({'1': 'Masculino', '2': 'Feminino'})
-    casos_por_sexo_ano = df.groupby(['ANO', 'SEXO_DESC']).size().reset_index(name='Numero_Casos')
+    sexo_desc = df['SEXO'].map(SEXO_MAP).rename('SEXO_DESC')
+    casos_por_sexo_ano = df.groupby([df['ANO'], sexo_desc]).size().reset_index(name='Numero_Casos')
     casos_por_sexo_pivot = casos_por_sexo_ano.pivot(index='ANO', columns='SEXO_DESC', values='Numero_Casos').fillna(0)
     casos_por_sexo_pivot = casos_por_sexo_pivot.reset_index()
     
@@ -276,6 +490,15 @@ def create_detailed_yearly_analysis(df):
     media_valor = df.groupby('ANO')['VAL_TOT'].agg(['mean', 'median', 'std']).round(2).reset_index()
     media_valor.columns = ['ANO', 'Media_Valor', 'Mediana_Valor', 'Desvio_Padrao_Valor']
     
+    # Casos por posição do diagnóstico (principal vs secundário) e ano
+    if 'POSICAO_DIAGNOSTICO' in df.columns:
+        casos_por_posicao = df.groupby(['ANO', 'POSICAO_DIAGNOSTICO']).size().unstack(fill_value=0)
+        casos_por_posicao = casos_por_posicao.reindex(columns=['Principal', 'Secundário'], fill_value=0)
+        casos_por_posicao['Qualquer_Posicao'] = casos_por_posicao.sum(axis=1)
+        casos_por_posicao = casos_por_posicao.rename_axis(columns=None).reset_index()
+    else:
+        casos_por_posicao = pd.DataFrame()
+    
     total_casos = len(df)
     
     stats = {
@@ -284,7 +507,8 @@ def create_detailed_yearly_analysis(df):
         'casos_por_tipo': casos_por_tipo_pivot,
         'casos_por_sexo_ano': casos_por_sexo_pivot,
         'media_dias_internacao': media_dias,
-        'media_valor_internacao': media_valor
+        'media_valor_internacao': media_valor,
+        'casos_por_posicao': casos_por_posicao
     }
     
     print(f"   Total de casos: {total_casos}")
@@ -314,6 +538,7 @@ def export_detailed_analysis_to_excel(df, stats, filename='diabetes_morbidade_cr
         # Aba 1: Dados brutos
         if not df.empty:
             df.to_excel(writer, sheet_name='Dados_Internacoes', index=False)
+            count('linhas_exportadas_total', len(df), aba='Dados_Internacoes')
             print(f"   ✅ Aba 'Dados_Internacoes' criada com {len(df)} registros")
         
         # Aba 2: Análise anual completa
@@ -341,13 +566,57 @@ def export_detailed_analysis_to_excel(df, stats, filename='diabetes_morbidade_cr
             stats['media_valor_internacao'].to_excel(writer, sheet_name='Media_Valor_Internacao', index=False)
             print(f"   ✅ Aba 'Media_Valor_Internacao' criada")
         
+        # Aba extra: Casos por posição do diagnóstico (modo com diagnósticos secundários)
+        if not stats['casos_por_posicao'].empty:
+            stats['casos_por_posicao'].to_excel(writer, sheet_name='Casos_Por_Posicao', index=False)
+            print(f"   ✅ Aba 'Casos_Por_Posicao' criada")
+        
+        # Abas de séries temporais: mensal, semanal e índices sazonais
+        export_time_series_to_excel(writer, stats, 'Internacoes')
+        
+        # Abas de taxas por 100 mil habitantes
+        write_optional_sheets(writer, stats, ABAS_TAXAS)
+        
+        # Aba de agregados por município, região de saúde, macrorregião e UF
+        write_optional_sheets(writer, stats, ABAS_REGIOES)
+        
+        # Abas de tendência (APC e joinpoint)
+        write_optional_sheets(writer, stats, ABAS_TENDENCIA)
+        
+        # Aba de conglomerados espaço-temporais (município x mês)
+        write_optional_sheets(writer, stats, ABAS_VARREDURA)
+        
+        # Aba de intervalos de confiança dos indicadores anuais
+        write_optional_sheets(writer, stats, ABAS_IC)
+        
+        # Aba de consolidação de AIHs em episódios
+        write_optional_sheets(writer, stats, ABAS_EPISODIOS)
+        
+        # Aba de registros por coorte (idade x CID-10) nos dados brutos
+        write_optional_sheets(writer, stats, ABAS_COORTES)
+        
+        # Abas de custos deflacionados pelo IPCA
+        write_optional_sheets(writer, stats, ABAS_CUSTOS)
+        
+        # Abas de carga hospitalar por estabelecimento (CNES)
+        write_optional_sheets(writer, stats, ABAS_HOSPITAIS)
+        
+        # Aba de partições do DATASUS ausentes no armazenamento local
+        write_optional_sheets(writer, stats, ABAS_RETOMADA)
+        
+        # Abas de qualidade dos dados brutos (nulos, códigos inválidos, datas...)
+        write_optional_sheets(writer, stats, ABAS_QUALIDADE)
+        
         # Aba 7: Resumo executivo
         startrow = 0
         
         # Informações gerais
+        consolidacao = stats.get('consolidacao_episodios', pd.DataFrame())
+        registros_aih = int(consolidacao['Registros'].iloc[-1]) if not consolidacao.empty else stats['total_casos']
         resumo_geral = pd.DataFrame({
             'Indicador': [
-                'Total de Internações',
+                'Total de Internações (episódios)',
+                'Registros de AIH',
                 'Período Analisado',
                 'Estado',
                 'Faixa Etária',
@@ -356,6 +625,7 @@ def export_detailed_analysis_to_excel(df, stats, filename='diabetes_morbidade_cr
             ],
             'Valor': [
                 stats['total_casos'],
+                registros_aih,
                 '2020-2025',
                 'Amazonas (AM)',
                 '0 a 14 anos',
@@ -369,9 +639,58 @@ def export_detailed_analysis_to_excel(df, stats, filename='diabetes_morbidade_cr
     
     print(f"✅ Arquivo {filename} criado com sucesso!")
 
-def main():
+def prepare_sih_cohort(df_raw, include_secondary=INCLUIR_DIAGNOSTICOS_SECUNDARIOS, keep_columns=()):
+    """
+    Filtra a coorte, deriva as colunas de data e consolida as AIHs em episódios
+    
+    Todas as colunas derivadas da coorte (valores deflacionados, sexo e faixa
+    etária) são criadas aqui, antes do checkpoint da etapa: as etapas seguintes
+    não alteram a coorte, e uma execução retomada grava a mesma coorte.
+    
+    Args:
+        df_raw (pd.DataFrame): Registros brutos do SIH-SUS
+        include_secondary (bool): Considerar também os diagnósticos secundários
+        keep_columns (iterable): Colunas de df_raw mantidas na coorte (cada
+            episódio fica com o valor do seu registro principal)
+    
+    Returns:
+        tuple: (coorte consolidada, tabela de consolidação de episódios)
+    """
+    df_filtered = filter_diabetes_children_sih(df_raw, include_secondary=include_secondary)
+    
+    if df_filtered.empty:
+        print("❌ Nenhum caso de diabetes tipo 1/2 infantil encontrado nos dados.")
+        # Criar estrutura vazia
+        df_filtered = pd.DataFrame(columns=[
+            'DT_INTER', 'DT_SAIDA', 'NASC', 'IDADE', 'SEXO', 'DIAG_PRINC', 
+            'TIPO_DIABETES', 'MUNRES', 'DIAS_PERM', 'VAL_TOT', 'ANO', 'N_AIH', 'IDENT', 'CNES',
+            'PROC_REA', 'VAL_SH', 'VAL_SP'
+        ])
+    
+    # O filtro preserva o índice dos registros brutos
+    for coluna in keep_columns:
+        if coluna in df_raw.columns:
+            df_filtered[coluna] = df_raw[coluna].reindex(df_filtered.index)
+    
+    # Converter datas e derivar mês, semana epidemiológica e permanência
+    df_filtered = add_date_columns(df_filtered, 'SIH')
+    
+    # Consolidar AIHs (continuações e reapresentações) em episódios de internação
+    df_filtered, consolidacao = consolidate_episodes(df_filtered)
+    
+    # Valores reais (IPCA), descrição do sexo e faixa etária dos episódios
+    df_filtered = add_real_values(df_filtered)
+    df_filtered = add_age_band(df_filtered.assign(SEXO_DESC=df_filtered['SEXO'].map(SEXO_MAP)))
+    return df_filtered, consolidacao
+
+def main(resume=False, include_secondary=INCLUIR_DIAGNOSTICOS_SECUNDARIOS):
     """
     Função principal que orquestra todo o processo de análise de morbidade
+    
+    Args:
+        resume (bool): Retoma a partir dos checkpoints da última execução
+        include_secondary (bool): Incluir internações com diabetes apenas nos
+            diagnósticos secundários (opção --secundarios)
     """
     print("🚀 Iniciando análise de MORBIDADE por diabetes - Crianças/Adolescentes Amazonas")
     print("📊 Foco: Diabetes Tipo 1 e 2 | Idade: 0-14 anos | Período: 2020-2025")
@@ -384,35 +703,75 @@ def main():
     
     try:
         # 1. Download dos dados SIH-SUS (internações)
-        df_raw = download_datasus_sih_data(start_year=2020, end_year=2025, state='AM')
+        df_raw = download_datasus_sih_data(start_year=2020, end_year=2025, state='AM',
+                                           include_secondary=include_secondary)
         
         if df_raw.empty:
             print("❌ Não foi possível obter dados de internação. Encerrando execução.")
             return
         
-        # 2. Aplicar filtros específicos
-        df_filtered = filter_diabetes_children_sih(df_raw)
+        # Partições do período ausentes no armazenamento (só com downloads reais)
+        particoes_ausentes = (missing_partitions_report('SIH', 'AM', download_units(2020, 2025, monthly=True))
+                              if PYDATASUS_AVAILABLE else pd.DataFrame())
+        
+        # Qualidade dos dados brutos: perfis gravados na ingestão de cada mês
+        # (downloads reais) ou calculados agora sobre os dados de exemplo
+        qualidade = create_quality_analysis(
+            'SIH', 'AM', df_raw, units=download_units(2020, 2025, monthly=True) if PYDATASUS_AVAILABLE else None
+        )
+        
+        # Checkpoints por etapa: com --retomar, etapas concluídas para os mesmos
+        # parâmetros e dados brutos são carregadas em vez de recalculadas
+        etapas = StageCheckpoints('morbidade_sih_am_2020_2025', {
+            'secundarios': include_secondary,
+            'dados': data_fingerprint(df_raw),
+        }, resume=resume)
+        
+        # 2-3. Filtros, datas (mês, semana epidemiológica, permanência) e
+        # consolidação de AIHs (continuações e reapresentações) em episódios
+        df_filtered, consolidacao = etapas.run('coorte', prepare_sih_cohort, df_raw, include_secondary)
+        
+        # Registros por coorte (idade x CID-10) avaliados em uma única passada
+        contagens_coortes = etapas.run('coortes', create_cohort_counts, df_raw)
+        del df_raw
+        
+        # Custos reais (IPCA) por ano, procedimento e componente
+        custos = etapas.run('custos', create_cost_analysis, df_filtered)
+        
+        # 4. Gerar análise detalhada por ano
+        stats = etapas.run('estatisticas', create_detailed_yearly_analysis, df_filtered)
+        stats['intervalos_confianca'] = etapas.run('intervalos_confianca', create_bootstrap_intervals, df_filtered)
+        stats['consolidacao_episodios'] = consolidacao
+        stats.update(contagens_coortes)
+        stats['particoes_ausentes'] = particoes_ausentes
+        stats.update(qualidade)
+        stats.update(custos)
+        
+        # Carga por hospital (CNES): internações, dias de leito, custo e ocupação
+        stats.update(etapas.run('hospitais', create_hospital_load_analysis, df_filtered))
         
-        if df_filtered.empty:
-            print("❌ Nenhum caso de diabetes tipo 1/2 infantil encontrado nos dados.")
-            # Criar estrutura vazia
-            df_filtered = pd.DataFrame(columns=[
-                'DT_INTER', 'DT_SAIDA', 'IDADE', 'SEXO', 'DIAG_PRINC', 
-                'TIPO_DIABETES', 'MUNRES', 'DIAS_PERM', 'VAL_TOT', 'ANO'
-            ])
+        # 5. Séries mensais/semanais, tendências e conglomerados espaço-temporais
+        stats.update(etapas.run('series', create_time_series_analysis, df_filtered, 'DATA_INTERNACAO', 'Internacoes'))
+        stats.update(etapas.run('tendencias', create_trend_analysis, df_filtered, 'DATA_INTERNACAO'))
+        stats.update(etapas.run('varredura', create_space_time_scan, df_filtered, 'DATA_INTERNACAO'))
         
-        # 3. Gerar análise detalhada por ano
-        stats = create_detailed_yearly_analysis(df_filtered)
+        # 6. Taxas por 100 mil habitantes (população IBGE) e agregados regionais
+        populacao = load_population_index(df_filtered) if not df_filtered.empty else None
+        stats.update(etapas.run('taxas', create_rate_analysis, df_filtered, indice=populacao))
+        stats.update(etapas.run('regioes', create_regional_rollups, df_filtered, populacao))
         
-        # 4. Exportar para Excel com múltiplas abas
+        # 7. Exportar para Excel com múltiplas abas e gravar a coorte compartilhada
         export_detailed_analysis_to_excel(df_filtered, stats)
+        write_cohort(df_filtered, cohort_path('sih_am'))
         
         print("=" * 80)
         print("✅ Análise de MORBIDADE concluída com sucesso!")
         print(f"📊 Resumo final:")
-        print(f"   - Total de internações: {stats['total_casos']}")
+        print(f"   - Total de internações: {stats['total_casos']} episódios")
+        if not consolidacao.empty:
+            print(f"   - Registros de AIH: {int(consolidacao['Registros'].iloc[-1])}")
         print(f"   - Arquivo gerado: diabetes_morbidade_criancas_am_2020_2025.xlsx")
-        print(f"   - Abas criadas: 7 (dados + 6 análises)")
+        print(f"   - Abas criadas: 7 (dados + 6 análises) + séries temporais, taxas e ICs")
         print(f"   - Data/Hora: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}")
         
         if not PYDATASUS_AVAILABLE:
@@ -427,6 +786,22 @@ def main():
         print("   5. Media_Dias_Internacao - Tempo médio de internação")
         print("   6. Media_Valor_Internacao - Custo médio das internações")
         print("   7. Resumo_Executivo - Informações gerais")
+        if not stats['casos_por_posicao'].empty:
+            print("   +  Casos_Por_Posicao - Diagnóstico principal vs secundário")
+        print("   +  Serie_Mensal / Serie_Semanal / Indices_Sazonais - Séries temporais e sazonalidade")
+        print("   +  Tendencias / Joinpoints - Variação percentual anual (Poisson) e pontos de quebra")
+        print("   +  Conglomerados_Espaco_Tempo - Picos incomuns por município e mês")
+        print("   +  Taxas_Brutas / Taxas_Idade - Taxas por 100 mil habitantes")
+        print("   +  Agregados_Regionais - Município, região de saúde, macrorregião e UF")
+        print("   +  IC_Bootstrap - Intervalos de confiança (95%) dos indicadores anuais")
+        print("   +  Consolidacao_Episodios - Registros de AIH vs episódios de internação")
+        print("   +  Contagens_Coortes - Registros de AIH por coorte (idade x CID-10) e ano")
+        print("   +  Custos_Deflacionados / Custos_Procedimento - Custos reais (IPCA) por ano e procedimento")
+        print("   +  Carga_Hospitalar / Carga_Hospitalar_Mensal - Internações, dias de leito e ocupação por CNES")
+        if not stats['particoes_ausentes'].empty:
+            print("   +  Particoes_Ausentes - Meses do DATASUS que faltam no armazenamento local")
+        if 'qualidade_dados' in stats:
+            print("   +  Qualidade_Dados / Qualidade_Particoes - Nulos, códigos inválidos e datas impossíveis nos dados brutos")
         
     except Exception as e:
         print(f"❌ Erro durante a execução: {str(e)}")
@@ -434,4 +809,10 @@ def main():
         print("pip install -r requirements.txt")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Análise de morbidade por diabetes (SIH-SUS)')
+    parser.add_argument('--retomar', action='store_true',
+                        help='Retoma a partir das etapas concluídas na última execução')
+    parser.add_argument('--secundarios', action='store_true', default=INCLUIR_DIAGNOSTICOS_SECUNDARIOS,
+                        help='Inclui internações com diabetes apenas nos diagnósticos secundários')
+    args = parser.parse_args()
+    main(resume=args.retomar, include_secondary=args.secundarios)
\ No newline at end of file
@@ -0,0 +1,323 @@
+"""
+Análise Temporal - Séries Mensais, Semanas Epidemiológicas e Sazonalidade
+
+Este módulo monta séries mensais e por semana epidemiológica de internações
+(SIH-SUS) ou óbitos (SIM-DO) por tipo de diabetes, sexo, faixa etária e
+município. Todas as séries são construídas de uma vez em uma matriz
+(séries x períodos) com uma única contagem (np.bincount); a decomposição
+sazonal e as variações anuais são calculadas sobre a matriz inteira.
+
+Autor: GitHub Copilot
+Data: 2025
+"""
+
+import numpy as np
+import pandas as pd
+
+from datas import epidemiological_week
+from faixas_etarias import add_age_band
+from exportacao import write_optional_sheets
+
+# Dimensões de estratificação das séries (além da série total)
+DIMENSOES_PADRAO = ['TIPO_DIABETES', 'SEXO', 'FAIXA_ETARIA', 'MUNRES']
+
+SEXO_MAP = {'1': 'Masculino', '2': 'Feminino'}
+
+# Abas do Excel geradas a partir das séries (chave em stats -> nome da aba)
+ABAS_SERIES = [
+    ('serie_mensal', 'Serie_Mensal'),
+    ('serie_semanal', 'Serie_Semanal'),
+    ('indices_sazonais', 'Indices_Sazonais'),
+]
+
+# Período sazonal (e defasagem anual) da série mensal
+PERIODO_MENSAL = 12
+
+
+def _stratum_values(df, dimension):
+    """Retorna os valores de estrato de uma dimensão (sexo com rótulos descritivos)"""
+    valores = df[dimension]
+    if dimension == 'SEXO':
+        valores = valores.astype(str)
+        valores = valores.map(SEXO_MAP).fillna(valores)
+    return valores
+
+
+def build_series_matrix(df, period_index, n_periods, dimensions):
+    """
+    Conta registros por estrato e período para todas as séries de uma vez
+
+    Cada linha contribui para a série total e para um estrato de cada
+    dimensão; os identificadores de série e período são combinados em um
+    único índice linear e contados com np.bincount.
+
+    Args:
+        df (pd.DataFrame): Registros (uma linha por internação ou óbito)
+        period_index (np.ndarray): Índice do período (0..n_periods-1) de cada linha
+        n_periods (int): Número de períodos
+        dimensions (list): Colunas de estratificação
+
+    Returns:
+        tuple: (pd.DataFrame com Dimensao/Estrato de cada série,
+                np.ndarray de contagens séries x períodos)
+    """
+    ids = [np.zeros(len(df), dtype=np.int64)]
+    periodos = [period_index]
+    chaves = [('Total', 'Total')]
+    deslocamento = 1
+
+    for dim in dimensions:
+        if dim not in df.columns:
+            continue
+        codigos, unicos = pd.factorize(_stratum_values(df, dim), sort=True)
+        validos = codigos >= 0
+        ids.append(codigos[validos].astype(np.int64) + deslocamento)
+        periodos.append(period_index[validos])
+        chaves.extend((dim, str(valor)) for valor in unicos)
+        deslocamento += len(unicos)
+
+    indice_linear = np.concatenate(ids) * n_periods + np.concatenate(periodos)
+    contagens = np.bincount(indice_linear, minlength=deslocamento * n_periods)
+
+    series = pd.DataFrame(chaves, columns=['Dimensao', 'Estrato'])
+    return series, contagens.reshape(deslocamento, n_periods)
+
+
+def centered_moving_average(matrix, period):
+    """
+    Média móvel centrada (2 x período, para período par) ao longo das colunas
+
+    Args:
+        matrix (np.ndarray): Séries x períodos
+        period (int): Período sazonal (par)
+
+    Returns:
+        np.ndarray: Tendência, com NaN nas bordas sem janela completa
+    """
+    series, n = matrix.shape
+    h = period // 2
+    tendencia = np.full((series, n), np.nan)
+    if n <= period:
+        return tendencia
+
+    acumulado = np.zeros((series, n + 1))
+    np.cumsum(matrix, axis=1, out=acumulado[:, 1:])
+
+    t = np.arange(h, n - h)
+    interno = acumulado[:, t + h] - acumulado[:, t - h + 1]
+    extremos = 0.5 * (matrix[:, t - h] + matrix[:, t + h])
+    tendencia[:, t] = (interno + extremos) / period
+    return tendencia
+
+
+def seasonal_decompose_matrix(matrix, season_position, period=PERIODO_MENSAL):
+    """
+    Decomposição sazonal aditiva clássica de todas as séries de uma vez
+
+    Args:
+        matrix (np.ndarray): Séries x períodos
+        season_position (np.ndarray): Posição sazonal de cada período (ex.: mês 0-11)
+        period (int): Período sazonal
+
+    Returns:
+        dict: 'tendencia', 'sazonal', 'residuo' (séries x períodos) e
+            'indices' (séries x período, centrados em zero)
+    """
+    matrix = matrix.astype(float)
+    tendencia = centered_moving_average(matrix, period)
+    sem_tendencia = matrix - tendencia
+
+    # Média do componente sem tendência por posição sazonal, via produto com
+    # uma matriz indicadora (períodos x posições) restrita aos períodos válidos
+    validos = ~np.isnan(tendencia[0])
+    indicadora = np.zeros((matrix.shape[1], period))
+    indicadora[np.flatnonzero(validos), season_position[validos]] = 1.0
+    somas = np.nan_to_num(sem_tendencia) @ indicadora
+    contagens = indicadora.sum(axis=0)
+
+    indices = np.full((matrix.shape[0], period), np.nan)
+    if contagens.all():
+        indices = somas / contagens
+        indices -= indices.mean(axis=1, keepdims=True)
+
+    sazonal = indices[:, season_position]
+    return {
+        'tendencia': tendencia,
+        'sazonal': sazonal,
+        'residuo': matrix - tendencia - sazonal,
+        'indices': indices,
+    }
+
+
+def previous_year_weeks(weeks, years):
+    """
+    Posição da mesma semana epidemiológica do ano anterior
+
+    A semana N é comparada com a semana N de ANO_EPI - 1 (e não com 52 semanas
+    antes, que erra o alinhamento após anos de 53 semanas, como 2020). A
+    semana 53 não tem correspondente e fica sem variação anual.
+
+    Args:
+        weeks (np.ndarray): Semana epidemiológica de cada período
+        years (np.ndarray): Ano epidemiológico de cada período
+
+    Returns:
+        np.ndarray: Posição do período do ano anterior (-1 se não houver)
+    """
+    weeks = np.asarray(weeks, dtype=np.int64)
+    years = np.asarray(years, dtype=np.int64)
+    anterior = pd.Index(years * 100 + weeks).get_indexer((years - 1) * 100 + weeks)
+    anterior[weeks == 53] = -1
+    return anterior
+
+
+def year_over_year(matrix, previous):
+    """
+    Variação absoluta e percentual em relação ao mesmo período do ano anterior
+
+    Args:
+        matrix (np.ndarray): Séries x períodos
+        previous (np.ndarray): Posição do período do ano anterior (-1 se não
+            houver), por exemplo np.arange(n) - 12 para meses ou
+            previous_year_weeks para semanas epidemiológicas
+
+    Returns:
+        tuple: (delta, variação percentual), com NaN onde não há ano anterior
+    """
+    matrix = matrix.astype(float)
+    delta = np.full(matrix.shape, np.nan)
+    percentual = np.full(matrix.shape, np.nan)
+    previous = np.asarray(previous)
+    com_anterior = np.flatnonzero(previous >= 0)
+    if len(com_anterior):
+        anterior = matrix[:, previous[com_anterior]]
+        delta[:, com_anterior] = matrix[:, com_anterior] - anterior
+        with np.errstate(invalid='ignore', divide='ignore'):
+            percentual[:, com_anterior] = np.where(anterior > 0, delta[:, com_anterior] / anterior * 100, np.nan)
+    return delta, percentual
+
+
+def _long_table(series, labels, columns):
+    """Converte matrizes séries x períodos em tabela longa (uma linha por série e período)"""
+    n_series, n_periods = len(series), len(labels)
+    tabela = pd.DataFrame({
+        'Dimensao': np.repeat(series['Dimensao'].to_numpy(), n_periods),
+        'Estrato': np.repeat(series['Estrato'].to_numpy(), n_periods),
+        'Periodo': np.tile(np.asarray(labels, dtype=object), n_series),
+    })
+    for nome, matriz in columns.items():
+        tabela[nome] = np.round(matriz.reshape(-1), 2)
+    return tabela
+
+
+def create_time_series_analysis(df, date_column, count_name='Internacoes', dimensions=None):
+    """
+    Cria séries mensais e semanais com decomposição sazonal e variação anual
+
+    Args:
+        df (pd.DataFrame): Registros com a coluna de data convertida (ver datas.py)
+        date_column (str): DATA_INTERNACAO (SIH) ou DATA_OBITO (SIM)
+        count_name (str): Nome da coluna de contagem ('Internacoes' ou 'Obitos')
+        dimensions (list): Dimensões de estratificação (padrão: DIMENSOES_PADRAO)
+
+    Returns:
+        dict: 'serie_mensal', 'serie_semanal' e 'indices_sazonais' (DataFrames)
+    """
+    print(f"📈 Gerando séries temporais ({count_name})...")
+
+    vazio = {
+        'serie_mensal': pd.DataFrame(),
+        'serie_semanal': pd.DataFrame(),
+        'indices_sazonais': pd.DataFrame()
+    }
+    if df.empty or date_column not in df.columns:
+        print(f"   ⚠️ Coluna {date_column} não encontrada - séries não geradas")
+        return vazio
+
+    dimensions = DIMENSOES_PADRAO if dimensions is None else dimensions
+    if 'FAIXA_ETARIA' in dimensions and 'FAIXA_ETARIA' not in df.columns:
+        df = add_age_band(df)
+
+    datas = df[date_column]
+    validas = datas.notna().to_numpy()
+    if not validas.any():
+        print("   ⚠️ Nenhuma data válida - séries não geradas")
+        return vazio
+    if not validas.all():
+        print(f"   ⚠️ {int((~validas).sum())} registros sem data válida ignorados")
+    df = df[validas]
+    dias = df[date_column].to_numpy(dtype='datetime64[D]')
+
+    # Séries mensais
+    meses_abs = dias.astype('datetime64[M]').astype(np.int64)
+    primeiro_mes = meses_abs.min()
+    n_meses = int(meses_abs.max() - primeiro_mes + 1)
+    series, mensal = build_series_matrix(df, meses_abs - primeiro_mes, n_meses, dimensions)
+
+    posicao_mes = (np.arange(n_meses) + primeiro_mes) % 12
+    rotulos_mes = np.datetime_as_string(
+        (np.arange(n_meses) + primeiro_mes).astype('datetime64[M]'), unit='M'
+    )
+    decomposicao = seasonal_decompose_matrix(mensal, posicao_mes, PERIODO_MENSAL)
+    delta_mes, variacao_mes = year_over_year(mensal, np.arange(n_meses) - PERIODO_MENSAL)
+
+    serie_mensal = _long_table(series, rotulos_mes, {
+        count_name: mensal,
+        'Tendencia': decomposicao['tendencia'],
+        'Sazonal': decomposicao['sazonal'],
+        'Residuo': decomposicao['residuo'],
+        'Delta_Anual': delta_mes,
+        'Variacao_Anual_%': variacao_mes,
+    })
+    serie_mensal[count_name] = serie_mensal[count_name].astype(np.int64)
+
+    indices_sazonais = pd.concat([
+        series,
+        pd.DataFrame(np.round(decomposicao['indices'], 2), columns=[f'M{m:02d}' for m in range(1, 13)])
+    ], axis=1)
+
+    # Séries por semana epidemiológica (semanas de domingo a sábado)
+    # 01/01/1970 foi uma quinta-feira: (dia + 4) // 7 muda de valor a cada domingo
+    semanas_abs = (dias.astype(np.int64) + 4) // 7
+    primeira_semana = semanas_abs.min()
+    n_semanas = int(semanas_abs.max() - primeira_semana + 1)
+    _, semanal = build_series_matrix(df, semanas_abs - primeira_semana, n_semanas, dimensions)
+
+    inicio_semanas = ((np.arange(n_semanas) + primeira_semana) * 7 - 4).astype('datetime64[D]')
+    numero_semana, ano_epi = epidemiological_week(inicio_semanas)
+    rotulos_semana = [f'{a}-SE{s:02d}' for a, s in zip(ano_epi, numero_semana)]
+    delta_semana, variacao_semana = year_over_year(semanal, previous_year_weeks(numero_semana, ano_epi))
+
+    serie_semanal = _long_table(series, rotulos_semana, {
+        count_name: semanal,
+        'Delta_Anual': delta_semana,
+        'Variacao_Anual_%': variacao_semana,
+    })
+    serie_semanal[count_name] = serie_semanal[count_name].astype(np.int64)
+
+    print(f"   {len(series)} séries x {n_meses} meses / {n_semanas} semanas epidemiológicas")
+    print(f"   ✅ Séries temporais geradas!")
+
+    return {
+        'serie_mensal': serie_mensal,
+        'serie_semanal': serie_semanal,
+        'indices_sazonais': indices_sazonais
+    }
+
+
+def export_time_series_to_excel(writer, stats, count_name='Internacoes'):
+    """
+    Escreve as abas de séries temporais em um arquivo Excel já aberto
+
+    A série semanal é gravada apenas com as semanas que têm registros.
+
+    Args:
+        writer (pd.ExcelWriter): Arquivo Excel aberto
+        stats (dict): Estatísticas contendo as chaves de ABAS_SERIES
+        count_name (str): Coluna de contagem usada em create_time_series_analysis
+    """
+    tabelas = dict(stats)
+    semanal = stats.get('serie_semanal')
+    if semanal is not None and not semanal.empty:
+        tabelas['serie_semanal'] = semanal[semanal[count_name] > 0]
+    write_optional_sheets(writer, tabelas, ABAS_SERIES)
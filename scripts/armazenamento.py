@@ -0,0 +1,333 @@
+"""
+Armazenamento Local Particionado (Parquet) dos Dados Brutos do DATASUS
+
+Os dados baixados do SIH-RD e do SIM-DO são gravados em um diretório local no
+layout de partições estilo Hive:
+
+    dados/brutos/sistema=SIH/uf=AM/ano=2021/mes=03/parte-0.parquet
+
+Cada partição é ordenada pelo diagnóstico principal e gravada em grupos de
+linhas (row groups). Um manifesto (_estatisticas.json) guarda, por partição, o
+número de linhas, os bytes, a idade mínima e máxima, as categorias CID-10 de 3
+caracteres presentes e, por grupo de linhas, o intervalo de diagnósticos.
+
+A leitura de uma coorte consulta apenas o manifesto para descartar partições
+(ano/mês fora do período, faixa de idade sem interseção, nenhuma categoria CID
+compatível) e grupos de linhas (intervalo de diagnósticos sem categoria
+compatível) antes de abrir qualquer arquivo. Só os grupos restantes são lidos.
+
+Requer pyarrow; sem ele, os scripts mantêm os dados apenas em memória.
+
+Autor: GitHub Copilot
+Data: 2025
+"""
+
+import importlib.util
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from cid10 import CidCodeSet, normalize_cid
+from datas import parse_datasus_dates
+from telemetria import count, event, timed
+
+# pyarrow é importado só quando o armazenamento é usado
+PYARROW_AVAILABLE = importlib.util.find_spec('pyarrow') is not None
+
+PASTA_ARMAZENAMENTO = os.path.normpath(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dados', 'brutos')
+)
+ARQUIVO_MANIFESTO = '_estatisticas.json'
+
+# Linhas por grupo de linhas do Parquet (unidade mínima de leitura)
+LINHAS_POR_GRUPO = 10_000
+
+# Colunas de cada sistema: diagnóstico principal (ordenação), diagnósticos
+# considerados nas estatísticas, data usada para o mês da partição
+SISTEMAS = {
+    'SIH': {
+        'diagnostico': 'DIAG_PRINC',
+        'diagnosticos': ['DIAG_PRINC', 'DIAG_SECUN'] + [f'DIAGSEC{i}' for i in range(1, 10)],
+        'data': 'DT_INTER',
+    },
+    'SIM': {
+        'diagnostico': 'CAUSABAS',
+        'diagnosticos': ['CAUSABAS'],
+        'data': 'DTOBITO',
+    },
+}
+
+
+def partition_path(system, uf, year, month):
+    """Caminho relativo da partição (sistema/uf/ano/mês)"""
+    return os.path.join(f'sistema={system}', f'uf={uf}', f'ano={int(year)}', f'mes={int(month):02d}')
+
+
+def load_manifest(root=PASTA_ARMAZENAMENTO):
+    """
+    Lê o manifesto de estatísticas das partições
+
+    Args:
+        root (str): Pasta do armazenamento
+
+    Returns:
+        dict: Caminho relativo da partição -> estatísticas (vazio se não houver)
+    """
+    caminho = os.path.join(root, ARQUIVO_MANIFESTO)
+    if not os.path.exists(caminho):
+        return {}
+    with open(caminho, encoding='utf-8') as arquivo:
+        return json.load(arquivo)
+
+
+def _save_manifest(manifesto, root):
+    """Grava o manifesto de forma atômica (arquivo temporário + substituição)"""
+    caminho = os.path.join(root, ARQUIVO_MANIFESTO)
+    temporario = caminho + '.tmp'
+    with open(temporario, 'w', encoding='utf-8') as arquivo:
+        json.dump(manifesto, arquivo, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(temporario, caminho)
+
+
+def partition_months(df, system):
+    """Mês de cada registro: MES_CMPT (SIH) se existir, senão o mês da data do evento (0 se ausente)"""
+    if system == 'SIH' and 'MES_CMPT' in df.columns:
+        meses = pd.to_numeric(df['MES_CMPT'], errors='coerce')
+    else:
+        coluna = SISTEMAS[system]['data']
+        if coluna not in df.columns:
+            return np.zeros(len(df), dtype=int)
+        meses = parse_datasus_dates(df[coluna], system).dt.month
+    return meses.fillna(0).astype(int).to_numpy()
+
+
+def _partition_statistics(parte, system, arquivo):
+    """Estatísticas da partição gravada: linhas, bytes, idade, categorias CID e grupos de linhas"""
+    import pyarrow.parquet as pq
+
+    config = SISTEMAS[system]
+    idade = pd.to_numeric(parte['IDADE'], errors='coerce') if 'IDADE' in parte.columns else pd.Series(dtype=float)
+
+    categorias = set()
+    for coluna in config['diagnosticos']:
+        if coluna in parte.columns:
+            unicos = parte[coluna].dropna().unique()
+            categorias.update(normalize_cid(pd.Series(unicos, dtype=object)).str[:3])
+    categorias.discard('')
+
+    metadados = pq.ParquetFile(arquivo).metadata
+    grupos = []
+    posicao_diagnostico = (metadados.schema.names.index(config['diagnostico'])
+                           if config['diagnostico'] in metadados.schema.names else None)
+    for i in range(metadados.num_row_groups):
+        grupo = metadados.row_group(i)
+        estatisticas = grupo.column(posicao_diagnostico).statistics if posicao_diagnostico is not None else None
+        tem_intervalo = estatisticas is not None and estatisticas.has_min_max
+        grupos.append({
+            'linhas': grupo.num_rows,
+            'bytes': sum(grupo.column(j).total_compressed_size for j in range(grupo.num_columns)),
+            'diagnostico_min': str(estatisticas.min) if tem_intervalo else None,
+            'diagnostico_max': str(estatisticas.max) if tem_intervalo else None,
+        })
+
+    return {
+        'arquivo': os.path.basename(arquivo),
+        'linhas': len(parte),
+        'bytes': sum(g['bytes'] for g in grupos),
+        'idade_min': float(idade.min()) if idade.notna().any() else None,
+        'idade_max': float(idade.max()) if idade.notna().any() else None,
+        'cid3': sorted(categorias),
+        'grupos': grupos,
+    }
+
+
+def write_partitions(df, system, uf, root=PASTA_ARMAZENAMENTO, month=None):
+    """
+    Grava os registros no armazenamento local, uma partição por (ano, mês)
+
+    Partições já existentes para os mesmos (ano, mês) são substituídas. Para
+    unidades de download mensais, month põe todos os registros na partição do
+    mês da unidade, para que uma unidade nunca substitua a partição de outra.
+
+    Args:
+        df (pd.DataFrame): Registros brutos com a coluna ANO
+        system (str): 'SIH' ou 'SIM'
+        uf (str): Sigla da UF
+        root (str): Pasta do armazenamento
+        month (int): Mês de todos os registros (padrão: partition_months)
+
+    Returns:
+        list: Caminhos relativos das partições gravadas
+    """
+    if not PYARROW_AVAILABLE or df.empty:
+        return []
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    config = SISTEMAS[system]
+    manifesto = load_manifest(root)
+    meses = partition_months(df, system) if month is None else np.full(len(df), int(month))
+    anos = pd.to_numeric(df['ANO'], errors='coerce').fillna(0).astype(int).to_numpy()
+
+    # Uma ordenação para todas as partições: (ano, mês, diagnóstico principal)
+    chaves = [anos, meses]
+    if config['diagnostico'] in df.columns:
+        chaves.insert(0, normalize_cid(df[config['diagnostico']].fillna('')).to_numpy())
+    ordem = np.lexsort(chaves)
+    df = df.iloc[ordem].reset_index(drop=True)
+    anos, meses = anos[ordem], meses[ordem]
+
+    inicio_particoes = np.flatnonzero(np.diff(anos * 100 + meses, prepend=-1))
+    fim_particoes = np.append(inicio_particoes[1:], len(df))
+
+    gravadas = []
+    for inicio, fim in zip(inicio_particoes, fim_particoes):
+        relativo = partition_path(system, uf, anos[inicio], meses[inicio])
+        pasta = os.path.join(root, relativo)
+        os.makedirs(pasta, exist_ok=True)
+        for antigo in os.listdir(pasta):
+            if antigo.endswith('.parquet'):
+                os.remove(os.path.join(pasta, antigo))
+
+        parte = df.iloc[inicio:fim]
+        arquivo = os.path.join(pasta, 'parte-0.parquet')
+        with timed('particao_gravacao_segundos', sistema=system) as campos:
+            tabela = pa.Table.from_pandas(parte, preserve_index=False)
+            pq.write_table(tabela, arquivo, row_group_size=LINHAS_POR_GRUPO, write_statistics=True)
+            manifesto[relativo] = _partition_statistics(parte, system, arquivo)
+            campos.update(particao=relativo, linhas=len(parte), bytes=manifesto[relativo]['bytes'])
+        count('linhas_gravadas_total', len(parte), sistema=system)
+        count('bytes_gravados_total', manifesto[relativo]['bytes'], sistema=system)
+        gravadas.append(relativo)
+
+    _save_manifest(manifesto, root)
+    print(f"   📦 {len(gravadas)} partições gravadas em {root} ({system}/{uf})")
+    return gravadas
+
+
+def stored_years(system, uf, root=PASTA_ARMAZENAMENTO):
+    """Anos com alguma partição de (sistema, UF) no armazenamento local"""
+    prefixo = os.path.join(f'sistema={system}', f'uf={uf}', '')
+    return sorted({int(caminho.split('ano=')[1].split(os.sep)[0])
+                   for caminho in load_manifest(root) if caminho.startswith(prefixo)})
+
+
+def _row_group_may_match(grupo, categorias, compativeis):
+    """Um grupo pode conter a coorte se alguma categoria compatível cai no seu intervalo de diagnósticos"""
+    if grupo['diagnostico_min'] is None:
+        return True
+    minimo, maximo = grupo['diagnostico_min'][:3], grupo['diagnostico_max'][:3]
+    return bool(np.any(compativeis & (categorias >= minimo) & (categorias <= maximo)))
+
+
+def plan_cohort_read(system, uf, years, predicate=None, root=PASTA_ARMAZENAMENTO, months=None):
+    """
+    Seleciona, só pelo manifesto, as partições e grupos de linhas que podem conter a coorte
+
+    Args:
+        system (str): 'SIH' ou 'SIM'
+        uf (str): Sigla da UF
+        years (iterable): Anos desejados
+        predicate (dict): 'idade' (mínimo, máximo) na unidade de IDADE do
+            sistema, 'cid' (especificação de CidCodeSet) e 'secundarios'
+            (bool: a coorte também aceita diagnósticos secundários)
+        root (str): Pasta do armazenamento
+        months (iterable): Pares (ano, mês) a ler (padrão: todos os meses dos anos)
+
+    Returns:
+        tuple: (lista de (caminho relativo, estatísticas, grupos selecionados),
+                dict com contagens de partições, grupos e bytes)
+    """
+    predicate = predicate or {}
+    anos = {int(a) for a in years}
+    meses = None if months is None else {(int(a), int(m)) for a, m in months}
+    faixa = predicate.get('idade')
+    cids = CidCodeSet.parse(predicate['cid']) if predicate.get('cid') else None
+    prefixo = os.path.join(f'sistema={system}', f'uf={uf}', '')
+
+    plano = []
+    resumo = {'particoes': 0, 'particoes_lidas': 0, 'grupos': 0, 'grupos_lidos': 0,
+              'bytes': 0, 'bytes_lidos': 0}
+    for relativo, estatisticas in sorted(load_manifest(root).items()):
+        if not relativo.startswith(prefixo):
+            continue
+        resumo['particoes'] += 1
+        resumo['grupos'] += len(estatisticas['grupos'])
+        resumo['bytes'] += estatisticas['bytes']
+
+        ano = int(relativo.split('ano=')[1].split(os.sep)[0])
+        if ano not in anos:
+            continue
+        if meses is not None and (ano, int(relativo.split('mes=')[1].split(os.sep)[0])) not in meses:
+            continue
+        if faixa and estatisticas['idade_min'] is not None and (
+                estatisticas['idade_max'] < faixa[0] or estatisticas['idade_min'] > faixa[1]):
+            continue
+
+        grupos = list(range(len(estatisticas['grupos'])))
+        if cids is not None:
+            categorias = np.array(estatisticas['cid3'], dtype=object)
+            compativeis = cids.may_match_categories(categorias) if len(categorias) else np.zeros(0, dtype=bool)
+            if not compativeis.any():
+                continue
+            # Grupos de linhas: só pelo diagnóstico principal (coluna de ordenação)
+            if not predicate.get('secundarios'):
+                grupos = [i for i in grupos
+                          if _row_group_may_match(estatisticas['grupos'][i], categorias, compativeis)]
+                if not grupos:
+                    continue
+
+        plano.append((relativo, estatisticas, grupos))
+        resumo['particoes_lidas'] += 1
+        resumo['grupos_lidos'] += len(grupos)
+        resumo['bytes_lidos'] += sum(estatisticas['grupos'][i]['bytes'] for i in grupos)
+
+    return plano, resumo
+
+
+def read_cohort(system, uf, years, predicate=None, columns=None, root=PASTA_ARMAZENAMENTO, months=None):
+    """
+    Lê do armazenamento local apenas as partições e grupos de linhas compatíveis com a coorte
+
+    O resultado ainda contém registros fora da coorte (os grupos são a menor
+    unidade de leitura); os filtros dos scripts continuam sendo aplicados.
+
+    Args:
+        system (str): 'SIH' ou 'SIM'
+        uf (str): Sigla da UF
+        years (iterable): Anos desejados
+        predicate (dict): Predicado da coorte (ver plan_cohort_read)
+        columns (list): Colunas a ler (padrão: todas)
+        root (str): Pasta do armazenamento
+        months (iterable): Pares (ano, mês) a ler (padrão: todos os meses dos anos)
+
+    Returns:
+        pd.DataFrame: Registros lidos (vazio se nada for compatível)
+    """
+    import pyarrow.parquet as pq
+
+    plano, resumo = plan_cohort_read(system, uf, years, predicate, root, months)
+    percentual = 100 * resumo['bytes_lidos'] / resumo['bytes'] if resumo['bytes'] else 0
+    print(f"   🔎 Armazenamento local {system}/{uf}: {resumo['particoes_lidas']}/{resumo['particoes']} partições, "
+          f"{resumo['grupos_lidos']}/{resumo['grupos']} grupos de linhas, "
+          f"{resumo['bytes_lidos'] / 1e6:.1f} de {resumo['bytes'] / 1e6:.1f} MB ({percentual:.1f}%)")
+
+    event('plano_leitura', sistema=system, uf=uf, **resumo)
+    count('particoes_podadas_total', resumo['particoes'] - resumo['particoes_lidas'], sistema=system)
+    count('grupos_podados_total', resumo['grupos'] - resumo['grupos_lidos'], sistema=system)
+
+    partes = []
+    for relativo, estatisticas, grupos in plano:
+        with timed('particao_leitura_segundos', sistema=system) as campos:
+            arquivo = pq.ParquetFile(os.path.join(root, relativo, estatisticas['arquivo']))
+            partes.append(arquivo.read_row_groups(grupos, columns=columns).to_pandas())
+            lidos = sum(estatisticas['grupos'][i]['bytes'] for i in grupos)
+            campos.update(particao=relativo, linhas=len(partes[-1]), bytes=lidos)
+        count('linhas_lidas_total', len(partes[-1]), sistema=system)
+        count('bytes_lidos_total', lidos, sistema=system)
+
+    if not partes:
+        return pd.DataFrame(columns=columns or [])
+    return pd.concat(partes, ignore_index=True)
@@ -0,0 +1,219 @@
+"""
+Conjuntos de Códigos CID-10 - Filtros de Diagnóstico
+
+Este módulo compila especificações de códigos CID-10 (prefixos, intervalos e
+exclusões) em tabelas de pertencimento sobre os códigos distintos de uma coluna
+de diagnóstico. O custo do filtro depende do número de códigos distintos, e não
+do número de registros.
+
+Exemplos de especificação:
+    'E10-E11'            -> Diabetes tipo 1 e tipo 2
+    'E10-E14, !E12'      -> E10 a E14, exceto E12
+    'O24'                -> Diabetes na gravidez
+    ['E10', 'E11.0']     -> Listas também são aceitas (o ponto é ignorado)
+
+Autor: GitHub Copilot
+Data: 2025
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def normalize_cid(codes):
+    """
+    Normaliza códigos CID-10 (maiúsculas, sem ponto e sem espaços)
+
+    Args:
+        codes (pd.Series): Códigos CID-10 em texto
+
+    Returns:
+        pd.Series: Códigos normalizados
+    """
+    return codes.astype(str).str.upper().str.replace('.', '', regex=False).str.strip()
+
+
+def _parse_item(item):
+    """Converte um item da especificação em ('prefixo', p) ou ('intervalo', ini, fim)"""
+    item = item.upper().replace('.', '').replace(' ', '')
+    if '-' in item:
+        inicio, fim = item.split('-', 1)
+        if len(inicio) != len(fim):
+            raise ValueError(f"Intervalo CID-10 inválido (tamanhos diferentes): {item}")
+        return ('intervalo', inicio, fim)
+    return ('prefixo', item)
+
+
+class CidCodeSet:
+    """
+    Conjunto compilado de códigos CID-10 com suporte a intervalos e exclusões
+    """
+
+    def __init__(self, include, exclude=()):
+        """
+        Args:
+            include (list): Itens incluídos (prefixos como 'O24' ou intervalos como 'E10-E14')
+            exclude (list): Itens excluídos, no mesmo formato
+        """
+        self.include = [_parse_item(item) for item in include]
+        self.exclude = [_parse_item(item) for item in exclude]
+
+        if not self.include:
+            raise ValueError("Conjunto CID-10 sem códigos incluídos")
+
+    @classmethod
+    def parse(cls, spec):
+        """
+        Cria um conjunto a partir de uma especificação em texto ou lista
+
+        Itens iniciados por '!' são exclusões.
+
+        Args:
+            spec (str | list | CidCodeSet): Ex.: 'E10-E14, !E12'
+
+        Returns:
+            CidCodeSet: Conjunto compilado
+        """
+        if isinstance(spec, cls):
+            return spec
+        if isinstance(spec, str):
+            spec = spec.split(',')
+
+        include, exclude = [], []
+        for item in spec:
+            item = item.strip()
+            if not item:
+                continue
+            if item.startswith('!'):
+                exclude.append(item[1:])
+            else:
+                include.append(item)
+
+        return cls(include, exclude)
+
+    @staticmethod
+    def _match_items(codes, items):
+        """Avalia uma lista de itens sobre códigos normalizados (uma posição por código)"""
+        resultado = np.zeros(len(codes), dtype=bool)
+        for item in items:
+            if item[0] == 'prefixo':
+                resultado |= codes.str.startswith(item[1]).to_numpy(dtype=bool)
+            else:
+                _, inicio, fim = item
+                trecho = codes.str[:len(inicio)]
+                resultado |= ((trecho >= inicio) & (trecho <= fim)).to_numpy(dtype=bool)
+        return resultado
+
+    def lookup(self, categories):
+        """
+        Calcula o pertencimento para cada código distinto
+
+        Args:
+            categories (array-like): Códigos distintos (ex.: categorias da coluna)
+
+        Returns:
+            np.ndarray: Máscara booleana, uma posição por código distinto
+        """
+        codes = normalize_cid(pd.Series(categories, dtype=object))
+        resultado = self._match_items(codes, self.include)
+        if self.exclude:
+            resultado &= ~self._match_items(codes, self.exclude)
+        return resultado
+
+    def may_match_categories(self, categories):
+        """
+        Indica se algum código de cada categoria de 3 caracteres pode pertencer ao conjunto
+
+        Avaliação conservadora usada para descartar partições de dados a partir
+        das categorias presentes: exclusões são ignoradas, então True significa
+        apenas "não é possível descartar".
+
+        Args:
+            categories (array-like): Categorias CID-10 de 3 caracteres (ex.: 'E10')
+
+        Returns:
+            np.ndarray: Máscara booleana, uma posição por categoria
+        """
+        categorias = normalize_cid(pd.Series(categories, dtype=object)).str[:3]
+        resultado = np.zeros(len(categorias), dtype=bool)
+        for item in self.include:
+            if item[0] == 'prefixo':
+                prefixo = item[1][:3]
+                resultado |= categorias.str.startswith(prefixo).to_numpy(dtype=bool) if len(prefixo) < 3 \
+                    else (categorias == prefixo).to_numpy(dtype=bool)
+            else:
+                _, inicio, fim = item
+                tamanho = min(len(inicio), 3)
+                trecho = categorias.str[:tamanho]
+                resultado |= ((trecho >= inicio[:tamanho]) & (trecho <= fim[:tamanho])).to_numpy(dtype=bool)
+        return resultado
+
+    def match(self, series):
+        """
+        Aplica o conjunto a uma coluna de diagnóstico
+
+        Colunas categóricas são usadas diretamente; as demais são fatoradas uma
+        vez. O pertencimento é calculado por código distinto e propagado às
+        linhas por indexação. Valores nulos nunca pertencem ao conjunto.
+
+        Args:
+            series (pd.Series): Coluna de diagnóstico (ex.: DIAG_PRINC, CAUSABAS)
+
+        Returns:
+            np.ndarray: Máscara booleana com uma posição por linha
+        """
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            codigos = series.cat.codes.to_numpy()
+            categorias = series.cat.categories
+        else:
+            codigos, categorias = pd.factorize(series)
+
+        # A posição extra recebe os nulos (código -1)
+        tabela = np.append(self.lookup(categorias), False)
+        return tabela[codigos]
+
+    def match_columns(self, df, columns):
+        """
+        Aplica o conjunto a várias colunas de diagnóstico no formato largo
+
+        Cada coluna é avaliada sobre seus próprios códigos distintos e os
+        resultados são empilhados em uma matriz, sem converter os dados para o
+        formato longo.
+
+        Args:
+            df (pd.DataFrame): DataFrame com as colunas de diagnóstico
+            columns (list): Colunas a avaliar (ex.: DIAG_PRINC, DIAGSEC1..9)
+
+        Returns:
+            np.ndarray: Matriz booleana (linhas x colunas)
+        """
+        matriz = np.zeros((len(df), len(columns)), dtype=bool)
+        for j, col in enumerate(columns):
+            matriz[:, j] = self.match(df[col])
+        return matriz
+
+    def __repr__(self):
+        def fmt(item):
+            return item[1] if item[0] == 'prefixo' else f'{item[1]}-{item[2]}'
+        itens = [fmt(i) for i in self.include] + [f'!{fmt(i)}' for i in self.exclude]
+        return f"CidCodeSet('{', '.join(itens)}')"
+
+
+def as_categorical_diagnosis(df, columns):
+    """
+    Converte colunas de diagnóstico para o tipo categórico
+
+    Após a conversão, filtros repetidos sobre as colunas reutilizam os códigos
+    categóricos sem nova fatoração.
+
+    Args:
+        df (pd.DataFrame): DataFrame com colunas de diagnóstico
+        columns (list): Nomes das colunas a converter
+
+    Returns:
+        pd.DataFrame: O mesmo DataFrame, com as colunas convertidas
+    """
+    for col in columns:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    return df
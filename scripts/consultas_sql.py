@@ -0,0 +1,221 @@
+"""
+Consultas SQL Ad Hoc sobre Dados Brutos, Coortes e Cubo de Agregados
+
+Expõe os dados locais como tabelas de um motor SQL analítico embutido
+(DuckDB: colunar, vetorizado e com várias threads, sem servidor externo):
+
+    brutos_sih, brutos_sim   Partições Parquet do armazenamento local
+                             (ver armazenamento.py), com as colunas de
+                             partição uf e mes; filtros nelas descartam
+                             arquivos inteiros e filtros nas demais colunas
+                             usam as estatísticas dos grupos de linhas
+    coorte_sih, coorte_sim   Coortes filtradas gravadas por
+                             analise_morbidade_diabetes.py e main.py (ver
+                             coorte_compartilhada.py), lidas sem cópia dos
+                             arrays mapeados em memória via Arrow
+    cubo_sih, cubo_sim       Contagens por ANO x MUNRES x SEXO x CID3 com
+                             todos os subtotais (GROUP BY CUBE); subtotais
+                             têm NULL na dimensão agregada
+
+Exemplo (internações por município com E10.1 em menores de 5 anos em 2023):
+
+    python scripts/consultas_sql.py "SELECT MUNRES, COUNT(*) AS internacoes
+        FROM coorte_sih WHERE DIAG_PRINC LIKE 'E101%' AND IDADE < 5 AND ANO = 2023
+        GROUP BY MUNRES ORDER BY internacoes DESC" --aba E101_Menores5
+
+Com --aba, o resultado é gravado como aba SQL_<nome> no Excel de morbidade
+(ou no arquivo de --excel) e entra no anexo do relatório PDF.
+
+Requer duckdb e pyarrow.
+
+Autor: GitHub Copilot
+Data: 2025
+"""
+
+import argparse
+import importlib.util
+import os
+from datetime import datetime
+
+import pandas as pd
+
+from armazenamento import PASTA_ARMAZENAMENTO, SISTEMAS
+from coorte_compartilhada import ARQUIVO_DESCRICAO, attach_cohort, cohort_path
+from exportacao import write_optional_sheets
+
+# duckdb e pyarrow são importados só ao abrir a conexão
+DUCKDB_AVAILABLE = all(importlib.util.find_spec(m) is not None for m in ('duckdb', 'pyarrow'))
+
+ARQUIVO_MORBIDADE = 'diabetes_morbidade_criancas_am_2020_2025.xlsx'
+
+# Prefixo das abas de consultas (lidas pelo relatório PDF)
+PREFIXO_ABA = 'SQL_'
+
+# Coortes compartilhadas: tabela SQL -> (nome da coorte, sistema)
+COORTES = {
+    'coorte_sih': ('sih_am', 'SIH'),
+    'coorte_sim': ('sim_am', 'SIM'),
+}
+
+# Dimensões do cubo de agregados
+DIMENSOES_CUBO = ['ANO', 'MUNRES', 'SEXO', 'CID3']
+
+
+def _arrow_table(cohort):
+    """Monta uma tabela Arrow sobre os arrays mapeados da coorte (colunas de texto como dicionário)"""
+    import pyarrow as pa
+
+    colunas = {}
+    for nome in cohort.columns:
+        valores = cohort.array(nome)
+        if cohort.column_type(nome) == 'categorico':
+            codigos = pa.array(valores, mask=valores < 0)
+            colunas[nome] = pa.DictionaryArray.from_arrays(codigos, pa.array(cohort.categories(nome)))
+        else:
+            colunas[nome] = pa.array(valores)
+    return pa.table(colunas)
+
+
+def _register_cube(con, table, system):
+    """Cria a visão do cubo de agregados de uma coorte (contagem e, no SIH, valor total)"""
+    disponiveis = {linha[0] for linha in con.execute(f'DESCRIBE {table}').fetchall()}
+    diagnostico = SISTEMAS[system]['diagnostico']
+    expressoes = {
+        'ANO': 'ANO',
+        'MUNRES': 'CAST(MUNRES AS VARCHAR)',
+        'SEXO': 'CAST(SEXO AS VARCHAR)',
+        'CID3': f"UPPER(SUBSTR(REPLACE(CAST({diagnostico} AS VARCHAR), '.', ''), 1, 3))",
+    }
+    origem = {'CID3': diagnostico}
+    dimensoes = [d for d in DIMENSOES_CUBO if origem.get(d, d) in disponiveis]
+    if not dimensoes:
+        return None
+
+    medidas = ['COUNT(*) AS casos']
+    if 'VAL_TOT' in disponiveis:
+        medidas.append('SUM(VAL_TOT) AS valor_total')
+    selecao = ', '.join(f'{expressoes[d]} AS {d}' for d in dimensoes)
+    nome = table.replace('coorte_', 'cubo_')
+    con.execute(f"CREATE OR REPLACE VIEW {nome} AS SELECT {selecao}, {', '.join(medidas)} "
+                f"FROM {table} GROUP BY CUBE ({', '.join(dimensoes)})")
+    return nome
+
+
+def connect(raw_root=PASTA_ARMAZENAMENTO, threads=None):
+    """
+    Abre uma conexão DuckDB em memória com as tabelas disponíveis registradas
+
+    Args:
+        raw_root (str): Pasta do armazenamento local de dados brutos
+        threads (int): Threads do motor (padrão: todas as CPUs)
+
+    Returns:
+        tuple: (conexão, lista de tabelas registradas)
+    """
+    if not DUCKDB_AVAILABLE:
+        raise ImportError("duckdb e pyarrow são necessários para as consultas SQL: pip install duckdb pyarrow")
+
+    import duckdb
+
+    con = duckdb.connect(':memory:')
+    con.execute(f'SET threads = {int(threads or os.cpu_count() or 1)}')
+    tabelas = []
+
+    for sistema in SISTEMAS:
+        pasta = os.path.join(raw_root, f'sistema={sistema}')
+        if not os.path.isdir(pasta):
+            continue
+        arquivos = os.path.join(pasta, '*', '*', '*', '*.parquet').replace("'", "''")
+        nome = f'brutos_{sistema.lower()}'
+        con.execute(f"CREATE OR REPLACE VIEW {nome} AS SELECT * FROM read_parquet('{arquivos}', "
+                    f"hive_partitioning = true, union_by_name = true)")
+        tabelas.append(nome)
+
+    for nome, (coorte, sistema) in COORTES.items():
+        caminho = cohort_path(coorte)
+        if not os.path.exists(os.path.join(caminho, ARQUIVO_DESCRICAO)):
+            continue
+        con.register(nome, _arrow_table(attach_cohort(caminho)))
+        tabelas.append(nome)
+        cubo = _register_cube(con, nome, sistema)
+        if cubo:
+            tabelas.append(cubo)
+
+    return con, tabelas
+
+
+def run_query(con, sql):
+    """
+    Executa uma consulta e materializa apenas o resultado
+
+    Args:
+        con (duckdb.DuckDBPyConnection): Conexão de connect()
+        sql (str): Consulta SQL
+
+    Returns:
+        pd.DataFrame: Resultado da consulta
+    """
+    return con.sql(sql).df()
+
+
+def export_query_results(results, filename=ARQUIVO_MORBIDADE):
+    """
+    Grava resultados de consultas como abas SQL_<nome> de um Excel existente (ou novo)
+
+    Args:
+        results (dict): Nome da consulta -> DataFrame
+        filename (str): Arquivo Excel de destino
+
+    Returns:
+        list: Nomes das abas gravadas
+    """
+    abas = [(nome, (PREFIXO_ABA + nome)[:31]) for nome in results]
+    opcoes = {'mode': 'a', 'if_sheet_exists': 'replace'} if os.path.exists(filename) else {}
+    with pd.ExcelWriter(filename, engine='openpyxl', **opcoes) as writer:
+        write_optional_sheets(writer, results, abas)
+    return [aba for _, aba in abas]
+
+
+def main():
+    """
+    Executa uma consulta SQL pela linha de comando
+    """
+    parser = argparse.ArgumentParser(description='Consultas SQL sobre dados brutos, coortes e cubo de agregados')
+    parser.add_argument('sql', nargs='?', help='Consulta SQL (sem ela, lista as tabelas disponíveis)')
+    parser.add_argument('--aba', help='Grava o resultado como aba SQL_<ABA> no Excel')
+    parser.add_argument('--excel', default=ARQUIVO_MORBIDADE, help='Arquivo Excel de destino')
+    parser.add_argument('--threads', type=int, help='Threads do motor SQL')
+    args = parser.parse_args()
+
+    print("🦆 Consultas SQL - diabetes infantil Amazonas")
+    print("=" * 70)
+
+    if not DUCKDB_AVAILABLE:
+        print("❌ duckdb não está disponível. Instale com: pip install duckdb pyarrow")
+        return
+
+    con, tabelas = connect(threads=args.threads)
+    if not tabelas:
+        print("⚠️ Nenhuma tabela disponível. Execute main.py e analise_morbidade_diabetes.py antes.")
+        return
+
+    if not args.sql:
+        print("📋 Tabelas disponíveis:")
+        for tabela in tabelas:
+            colunas = [linha[0] for linha in con.execute(f'DESCRIBE {tabela}').fetchall()]
+            print(f"   - {tabela}: {', '.join(colunas)}")
+        return
+
+    inicio = datetime.now()
+    resultado = run_query(con, args.sql)
+    segundos = (datetime.now() - inicio).total_seconds()
+    print(resultado.to_string(index=False, max_rows=50))
+    print(f"   ✅ {len(resultado)} linhas em {segundos:.2f} s")
+
+    if args.aba:
+        abas = export_query_results({args.aba: resultado}, args.excel)
+        print(f"   ✅ Aba '{abas[0]}' gravada em {args.excel}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""
+Coorte Compartilhada em Arrays Mapeados em Memória
+
+Grava as colunas da coorte filtrada como arquivos .npy de largura fixa, que
+outros processos abrem somente leitura com np.load(mmap_mode='r'): as páginas
+vêm do cache de arquivos do sistema operacional e são compartilhadas entre
+todos os processos, então a memória total fica próxima de uma cópia dos dados
+independentemente do número de processos.
+
+Colunas de texto (diagnósticos, municípios, sexo) são codificadas por
+dicionário: códigos inteiros (-1 para nulos) e uma tabela de categorias de
+largura fixa. Colunas numéricas e de data são gravadas no tipo original.
+
+Objetos SharedCohort são serializados apenas pelo caminho da pasta; ao passar
+a coorte para um pool de processos, cada processo anexa os mesmos arquivos em
+vez de receber uma cópia por pickle.
+
+Autor: GitHub Copilot
+Data: 2025
+"""
+
+import json
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+PASTA_COORTES = 'cache_coortes'
+ARQUIVO_DESCRICAO = 'coorte.json'
+
+# Coortes e arrays já anexados neste processo (caminho -> SharedCohort ou np.memmap)
+_ANEXADAS = {}
+
+
+def _column_arrays(series):
+    """Converte uma coluna em (tipo, {sufixo: array de largura fixa})"""
+    if pd.api.types.is_datetime64_any_dtype(series.dtype) and getattr(series.dtype, 'tz', None) is None:
+        return 'data', {'': series.to_numpy(dtype='datetime64[ns]')}
+    if pd.api.types.is_bool_dtype(series.dtype) and not series.hasnans:
+        return 'numerico', {'': series.to_numpy(dtype=bool)}
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        if pd.api.types.is_integer_dtype(series.dtype) and not series.hasnans:
+            return 'numerico', {'': series.to_numpy(dtype=np.int64)}
+        return 'numerico', {'': series.to_numpy(dtype=float, na_value=np.nan)}
+
+    categorica = series if isinstance(series.dtype, pd.CategoricalDtype) else series.astype('category')
+    categorias = categorica.cat.categories.astype(str).to_numpy(dtype=str)
+    return 'categorico', {'.codigos': categorica.cat.codes.to_numpy(), '.categorias': categorias}
+
+
+def write_cohort(df, path, columns=None):
+    """
+    Grava a coorte como arrays .npy para anexação compartilhada
+
+    A gravação é feita em uma pasta temporária e movida ao final, então
+    processos que anexam a coorte nunca veem uma gravação incompleta.
+
+    Args:
+        df (pd.DataFrame): Registros da coorte
+        path (str): Pasta de destino (substituída se existir)
+        columns (list): Colunas a gravar (padrão: todas)
+
+    Returns:
+        str: Caminho da pasta gravada
+    """
+    columns = list(df.columns) if columns is None else [c for c in columns if c in df.columns]
+    pai = os.path.dirname(os.path.abspath(path))
+    os.makedirs(pai, exist_ok=True)
+    temporaria = tempfile.mkdtemp(prefix='.coorte-', dir=pai)
+
+    descricao = {'linhas': len(df), 'colunas': []}
+    for j, coluna in enumerate(columns):
+        tipo, arrays = _column_arrays(df[coluna])
+        for sufixo, valores in arrays.items():
+            np.save(os.path.join(temporaria, f'c{j}{sufixo}.npy'), valores, allow_pickle=False)
+        descricao['colunas'].append({'nome': str(coluna), 'arquivo': f'c{j}', 'tipo': tipo})
+
+    with open(os.path.join(temporaria, ARQUIVO_DESCRICAO), 'w', encoding='utf-8') as arquivo:
+        json.dump(descricao, arquivo, ensure_ascii=False, indent=1)
+
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.replace(temporaria, path)
+    _ANEXADAS.pop(os.path.abspath(path), None)
+
+    tamanho = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+    print(f"   🧩 Coorte compartilhada gravada em {path} ({len(df)} registros, {tamanho / 1e6:.1f} MB)")
+    return path
+
+
+def attach_cohort(path):
+    """
+    Anexa uma coorte gravada (uma vez por processo)
+
+    Args:
+        path (str): Pasta gravada por write_cohort
+
+    Returns:
+        SharedCohort: Coorte somente leitura
+    """
+    chave = os.path.abspath(path)
+    if chave not in _ANEXADAS:
+        _ANEXADAS[chave] = SharedCohort(chave)
+    return _ANEXADAS[chave]
+
+
+class SharedCohort:
+    """
+    Coorte somente leitura sobre arrays mapeados em memória
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): Pasta gravada por write_cohort
+        """
+        self.path = path
+        with open(os.path.join(path, ARQUIVO_DESCRICAO), encoding='utf-8') as arquivo:
+            descricao = json.load(arquivo)
+        self.n_rows = descricao['linhas']
+        self._colunas = {c['nome']: c for c in descricao['colunas']}
+        self._arrays = {}
+
+    @property
+    def columns(self):
+        """Nomes das colunas gravadas"""
+        return list(self._colunas)
+
+    def __len__(self):
+        return self.n_rows
+
+    def __reduce__(self):
+        # Serializa apenas o caminho: o processo de destino anexa os arquivos
+        return attach_cohort, (self.path,)
+
+    def _load(self, nome):
+        if nome not in self._arrays:
+            self._arrays[nome] = np.load(os.path.join(self.path, f'{nome}.npy'), mmap_mode='r')
+        return self._arrays[nome]
+
+    def column_type(self, column):
+        """Tipo de gravação da coluna: 'numerico', 'data' ou 'categorico'"""
+        return self._colunas[column]['tipo']
+
+    def array(self, column):
+        """
+        Array mapeado da coluna (códigos, para colunas categóricas)
+
+        Args:
+            column (str): Nome da coluna
+
+        Returns:
+            np.memmap: Valores somente leitura, sem cópia
+        """
+        coluna = self._colunas[column]
+        sufixo = '.codigos' if coluna['tipo'] == 'categorico' else ''
+        return self._load(coluna['arquivo'] + sufixo)
+
+    def categories(self, column):
+        """Tabela de categorias de uma coluna codificada por dicionário"""
+        return self._load(self._colunas[column]['arquivo'] + '.categorias')
+
+    def column(self, column):
+        """
+        Coluna como pd.Series sobre o array mapeado (categórica para colunas de texto)
+
+        Args:
+            column (str): Nome da coluna
+
+        Returns:
+            pd.Series: Série somente leitura, sem cópia dos valores
+        """
+        valores = self.array(column)
+        if self.column_type(column) == 'categorico':
+            valores = pd.Categorical.from_codes(valores, categories=self.categories(column), validate=False)
+        return pd.Series(valores, name=column, copy=False)
+
+    def frame(self, columns=None):
+        """
+        DataFrame com as colunas pedidas, sem copiar os arrays
+
+        O DataFrame é somente leitura: novas colunas podem ser adicionadas, mas
+        as colunas gravadas não podem ser alteradas no lugar.
+
+        Args:
+            columns (list): Colunas (padrão: todas)
+
+        Returns:
+            pd.DataFrame: Coorte
+        """
+        columns = self.columns if columns is None else [c for c in columns if c in self._colunas]
+        return pd.DataFrame({c: self.column(c) for c in columns}, copy=False)
+
+
+def cohort_path(name, root=PASTA_COORTES):
+    """Pasta padrão de uma coorte nomeada (ex.: 'sih_am')"""
+    return os.path.join(root, name)
+
+
+def attach_array(path):
+    """
+    Anexa um array .npy mapeado em memória (uma vez por processo)
+
+    Args:
+        path (str): Arquivo .npy
+
+    Returns:
+        np.memmap: Array somente leitura
+    """
+    chave = os.path.abspath(path)
+    if chave not in _ANEXADAS:
+        _ANEXADAS[chave] = np.load(chave, mmap_mode='r')
+    return _ANEXADAS[chave]
+
+
+@contextmanager
+def shared_arrays(arrays):
+    """
+    Grava arrays numpy em arquivos temporários para repassar a um pool de processos
+
+    Os processos recebem apenas os caminhos e anexam os arrays com
+    attach_array; os arquivos são removidos ao sair do bloco.
+
+    Args:
+        arrays (dict): Nome -> np.ndarray
+
+    Yields:
+        dict: Nome -> caminho do arquivo .npy
+    """
+    pasta = tempfile.mkdtemp(prefix='arrays-compartilhados-')
+    try:
+        caminhos = {}
+        for nome, valores in arrays.items():
+            caminhos[nome] = os.path.join(pasta, f'{nome}.npy')
+            np.save(caminhos[nome], np.ascontiguousarray(valores), allow_pickle=False)
+        yield caminhos
+    finally:
+        for caminho in caminhos.values():
+            _ANEXADAS.pop(os.path.abspath(caminho), None)
+        shutil.rmtree(pasta, ignore_errors=True)
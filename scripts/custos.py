@@ -0,0 +1,263 @@
+"""
+Custos das Internações Deflacionados pelo IPCA
+
+VAL_TOT é um valor nominal: somar ou comparar valores de 2020 a 2025 mistura
+preços de anos diferentes. Este módulo deflaciona os valores das internações
+(VAL_TOT, VAL_SH - serviços hospitalares e VAL_SP - serviços profissionais)
+para o mês mais recente da tabela local do IPCA.
+
+O número-índice é compilado em um array denso por mês (meses desde 1970), e a
+junção com as internações é feita por aritmética de posição sobre o mês de
+internação, sem merge nem laço por registro. Os custos reais são resumidos por
+ano e por procedimento realizado (PROC_REA).
+
+Autor: GitHub Copilot
+Data: 2025
+"""
+
+import numpy as np
+import pandas as pd
+
+from referencias import load_reference_table
+
+ARQUIVO_IPCA = 'ipca_mensal.csv'
+
+# Abas do Excel (chave em stats -> nome da aba)
+ABAS_CUSTOS = [
+    ('custos_anuais', 'Custos_Deflacionados'),
+    ('custos_procedimento', 'Custos_Procedimento'),
+]
+
+# Componentes do valor da AIH: (coluna nominal, coluna deflacionada)
+COMPONENTES_VALOR = [
+    ('VAL_TOT', 'VAL_TOT_REAL'),
+    ('VAL_SH', 'VAL_SH_REAL'),
+    ('VAL_SP', 'VAL_SP_REAL'),
+]
+
+# Variação anual aproximada do IPCA (%) usada apenas no modo de demonstração
+IPCA_ANUAL_EXEMPLO = {2019: 4.31, 2020: 4.52, 2021: 10.06, 2022: 5.79, 2023: 4.62,
+                      2024: 4.83, 2025: 4.50}
+
+
+def _month_codes(dates):
+    """Meses desde jan/1970 de cada data (NaT -> menor int64)"""
+    return np.asarray(dates, dtype='datetime64[ns]').astype('datetime64[M]').astype(np.int64)
+
+
+def create_sample_price_index(df, date_column='DATA_INTERNACAO'):
+    """
+    Cria um IPCA mensal fictício cobrindo os meses do DataFrame
+
+    Args:
+        df (pd.DataFrame): Dados com a coluna de data
+        date_column (str): Coluna de data de internação
+
+    Returns:
+        pd.DataFrame: Tabela no formato de ipca_mensal.csv
+    """
+    print("🔄 Gerando IPCA de exemplo para demonstração...")
+
+    datas = df[date_column].dropna()
+    meses = pd.period_range(datas.min(), datas.max(), freq='M')
+    taxas = np.array([IPCA_ANUAL_EXEMPLO.get(m.year, 4.5) for m in meses])
+    # Variação mensal constante dentro do ano, acumulada a partir de 100
+    mensal = (1 + taxas / 100) ** (1 / 12)
+    indices = 100 * np.cumprod(mensal)
+
+    print("📝 IMPORTANTE: IPCA aproximado para demonstração!")
+    return pd.DataFrame({'COMPETENCIA': meses.strftime('%Y%m'), 'INDICE': indices.round(4)})
+
+
+def build_price_index(tabela):
+    """
+    Compila a tabela do IPCA em um array denso por mês
+
+    Args:
+        tabela (pd.DataFrame): Colunas COMPETENCIA (AAAAMM) e INDICE
+
+    Returns:
+        dict: 'inicio' (mês do primeiro elemento, em meses desde 1970),
+            'indices' (np.ndarray, NaN nos meses ausentes), 'referencia' (AAAAMM)
+            e 'indice_referencia' (número-índice do mês de referência)
+    """
+    competencias = pd.to_datetime(tabela['COMPETENCIA'].astype(str).str.strip(), format='%Y%m',
+                                  errors='coerce')
+    valores = pd.to_numeric(tabela['INDICE'], errors='coerce').to_numpy(dtype=float)
+    validos = competencias.notna().to_numpy() & (valores > 0)
+    meses = _month_codes(competencias[validos])
+    valores = valores[validos]
+
+    inicio = int(meses.min())
+    indices = np.full(int(meses.max()) - inicio + 1, np.nan)
+    indices[meses - inicio] = valores
+    referencia = competencias[validos].max().strftime('%Y%m')
+    return {'inicio': inicio, 'indices': indices, 'referencia': referencia,
+            'indice_referencia': indices[-1]}
+
+
+def load_price_index(df=None, filename=ARQUIVO_IPCA, date_column='DATA_INTERNACAO'):
+    """
+    Carrega a tabela local do IPCA e compila o índice mensal
+
+    Se a tabela não existir e df for informado, usa um IPCA de exemplo.
+
+    Args:
+        df (pd.DataFrame): Dados analisados (usados apenas no modo de demonstração)
+        filename (str): Tabela em dados/referencia/ ou caminho completo
+        date_column (str): Coluna de data de internação
+
+    Returns:
+        dict: Índice mensal (ver build_price_index) ou None
+    """
+    tabela = load_reference_table(filename, dtype={'COMPETENCIA': str})
+    if tabela is None:
+        if df is None or df.empty or date_column not in df.columns or df[date_column].isna().all():
+            return None
+        tabela = create_sample_price_index(df, date_column)
+    return build_price_index(tabela)
+
+
+def deflation_factors(dates, indice):
+    """
+    Fator que leva valores do mês de cada data para o mês de referência do índice
+
+    Args:
+        dates (pd.Series): Datas de internação
+        indice (dict): Índice mensal (ver build_price_index)
+
+    Returns:
+        np.ndarray: Fator de cada registro (NaN se o mês não estiver no índice)
+    """
+    indices = indice['indices']
+    posicoes = _month_codes(dates) - indice['inicio']
+    validos = (posicoes >= 0) & (posicoes < len(indices))
+    mes = np.where(validos, indices[np.where(validos, posicoes, 0)], np.nan)
+    return indice['indice_referencia'] / mes
+
+
+def _real_columns(df, fatores):
+    """Colunas deflacionadas (VAL_*_REAL) das colunas nominais presentes em df"""
+    return {real: (pd.to_numeric(df[nominal], errors='coerce').to_numpy(dtype=float) * fatores).round(2)
+            for nominal, real in COMPONENTES_VALOR if nominal in df.columns}
+
+
+def add_real_values(df, date_column='DATA_INTERNACAO', indice=None):
+    """
+    Adiciona as colunas VAL_TOT_REAL, VAL_SH_REAL e VAL_SP_REAL à coorte
+
+    Apenas as colunas com a coluna nominal correspondente são criadas; sem
+    VAL_TOT, coluna de data ou índice, a coorte é devolvida sem alteração.
+
+    Args:
+        df (pd.DataFrame): Internações com data de internação e VAL_TOT
+        date_column (str): Coluna de data de internação (de DT_INTER, ver datas.py)
+        indice (dict): Índice mensal (padrão: load_price_index)
+
+    Returns:
+        pd.DataFrame: Novo DataFrame com os valores deflacionados
+    """
+    if df.empty or 'VAL_TOT' not in df.columns or date_column not in df.columns:
+        return df
+
+    indice = indice if indice is not None else load_price_index(df, date_column=date_column)
+    if indice is None:
+        return df
+    return df.assign(**_real_columns(df, deflation_factors(df[date_column], indice)))
+
+
+def create_cost_analysis(df, date_column='DATA_INTERNACAO', indice=None):
+    """
+    Deflaciona os valores das internações e resume os custos reais
+
+    O DataFrame recebido não é alterado: as colunas deflacionadas da coorte
+    vêm de add_real_values.
+
+    Args:
+        df (pd.DataFrame): Internações com ANO, data de internação e VAL_TOT
+        date_column (str): Coluna de data de internação (de DT_INTER, ver datas.py)
+        indice (dict): Índice mensal (padrão: load_price_index)
+
+    Returns:
+        dict: 'custos_anuais' e 'custos_procedimento' (pd.DataFrame)
+    """
+    print("💰 Deflacionando custos das internações (IPCA)...")
+
+    vazio = {chave: pd.DataFrame() for chave, _ in ABAS_CUSTOS}
+    if df.empty or 'VAL_TOT' not in df.columns or date_column not in df.columns:
+        return vazio
+
+    indice = indice if indice is not None else load_price_index(df, date_column=date_column)
+    if indice is None:
+        return vazio
+
+    fatores = deflation_factors(df[date_column], indice)
+    df = df.assign(**_real_columns(df, fatores))
+
+    sem_indice = np.isnan(fatores)
+    referencia = f"{indice['referencia'][4:]}/{indice['referencia'][:4]}"
+    print(f"   Valores em R$ de {referencia} | {int(sem_indice.sum())} internações sem índice no mês")
+
+    resultado = {
+        'custos_anuais': _annual_costs(df, sem_indice, referencia),
+        'custos_procedimento': _procedure_costs(df),
+    }
+    print(f"   ✅ Custos deflacionados!")
+    return resultado
+
+
+def _annual_costs(df, sem_indice, referencia):
+    """Custos nominais e reais por ano e por componente (com linha Total)"""
+    def somar(coluna):
+        if coluna not in df.columns:
+            return pd.Series(np.nan, index=anos.size().index)
+        return pd.to_numeric(df[coluna], errors='coerce').groupby(df['ANO']).sum()
+
+    anos = df.groupby('ANO')
+    custos = pd.DataFrame({
+        'Internacoes': anos.size(),
+        'Valor_Nominal_Total': somar('VAL_TOT'),
+        'Valor_Real_Total': somar('VAL_TOT_REAL'),
+        'Valor_Real_SH': somar('VAL_SH_REAL'),
+        'Valor_Real_SP': somar('VAL_SP_REAL'),
+        'Sem_Indice': pd.Series(sem_indice).groupby(df['ANO'].to_numpy()).sum(),
+    })
+    custos.loc['Total'] = custos.sum(min_count=1)
+
+    custos['Valor_Nominal_Medio'] = custos['Valor_Nominal_Total'] / custos['Internacoes']
+    custos['Valor_Real_Medio'] = custos['Valor_Real_Total'] / (custos['Internacoes'] - custos['Sem_Indice'])
+    custos['Percentual_SH'] = 100 * custos['Valor_Real_SH'] / custos['Valor_Real_Total']
+    custos['Percentual_SP'] = 100 * custos['Valor_Real_SP'] / custos['Valor_Real_Total']
+    custos[['Internacoes', 'Sem_Indice']] = custos[['Internacoes', 'Sem_Indice']].astype(int)
+    custos['Mes_Referencia'] = referencia
+
+    colunas = ['Internacoes', 'Valor_Nominal_Total', 'Valor_Real_Total', 'Valor_Nominal_Medio',
+               'Valor_Real_Medio', 'Valor_Real_SH', 'Valor_Real_SP', 'Percentual_SH',
+               'Percentual_SP', 'Sem_Indice', 'Mes_Referencia']
+    return custos[colunas].round(2).rename_axis('ANO').reset_index()
+
+
+def _procedure_costs(df):
+    """Custos reais por procedimento realizado (PROC_REA), do maior para o menor total"""
+    if 'PROC_REA' not in df.columns:
+        print("   ⚠️ Coluna PROC_REA não encontrada - custos por procedimento não calculados")
+        return pd.DataFrame()
+
+    # Normalização (strip) feita uma vez por código distinto
+    codigos, unicos = pd.factorize(df['PROC_REA'])
+    normalizados, procedimentos = pd.factorize(pd.Index(unicos).astype(str).str.strip())
+    codigos = np.append(normalizados, -1)[codigos]
+    validos = codigos >= 0
+    n = len(procedimentos)
+    custos = pd.DataFrame({'PROC_REA': procedimentos,
+                           'Internacoes': np.bincount(codigos[validos], minlength=n)})
+    for real, nome in [('VAL_TOT_REAL', 'Valor_Real_Total'), ('VAL_SH_REAL', 'Valor_Real_SH'),
+                       ('VAL_SP_REAL', 'Valor_Real_SP')]:
+        if real in df.columns:
+            valores = df[real].to_numpy(dtype=float)
+            usados = validos & ~np.isnan(valores)
+            custos[nome] = np.bincount(codigos[usados], weights=valores[usados], minlength=n)
+
+    custos['Valor_Real_Medio'] = custos['Valor_Real_Total'] / custos['Internacoes']
+    custos['Percentual_Custo_Total'] = 100 * custos['Valor_Real_Total'] / custos['Valor_Real_Total'].sum()
+    return custos.sort_values('Valor_Real_Total', ascending=False, kind='stable').round(2).reset_index(drop=True)
@@ -0,0 +1,155 @@
+"""
+Conversão de Datas do DATASUS - SIH-SUS e SIM-DO
+
+Este módulo converte os campos de data em texto (DT_INTER, DT_SAIDA, DTOBITO)
+em colunas datetime e deriva mês, semana epidemiológica e tempo de permanência
+calculado. Como o número de datas distintas é pequeno, cada texto distinto é
+convertido uma única vez e o resultado é propagado às linhas por indexação.
+
+Formatos:
+    SIH-RD: AAAAMMDD (os dados de exemplo usam DDMMAAAA)
+    SIM-DO: DDMMAAAA
+
+Autor: GitHub Copilot
+Data: 2025
+"""
+
+import numpy as np
+import pandas as pd
+
+# Formato principal e alternativo de cada sistema
+FORMATOS_DATA = {
+    'SIH': ('%Y%m%d', '%d%m%Y'),
+    'SIM': ('%d%m%Y', '%Y%m%d'),
+}
+
+# Colunas de data de cada sistema -> nome da coluna convertida
+COLUNAS_DATA = {
+    'SIH': {'DT_INTER': 'DATA_INTERNACAO', 'DT_SAIDA': 'DATA_SAIDA'},
+    'SIM': {'DTOBITO': 'DATA_OBITO'},
+}
+
+# Coluna usada como referência para mês e semana epidemiológica
+DATA_REFERENCIA = {'SIH': 'DATA_INTERNACAO', 'SIM': 'DATA_OBITO'}
+
+
+def _parse_unique(valores, system):
+    """Converte um array de textos distintos para datetime64[ns], tentando os dois formatos"""
+    textos = pd.Series(valores, dtype=object).astype(str).str.strip()
+    principal, alternativo = FORMATOS_DATA[system]
+
+    datas = pd.to_datetime(textos, format=principal, errors='coerce')
+    faltantes = datas.isna()
+    if faltantes.any():
+        datas[faltantes] = pd.to_datetime(textos[faltantes], format=alternativo, errors='coerce')
+
+    return datas.to_numpy(dtype='datetime64[ns]')
+
+
+def parse_datasus_dates(series, system='SIH'):
+    """
+    Converte uma coluna de datas do DATASUS, processando cada texto distinto uma vez
+
+    Args:
+        series (pd.Series): Coluna com datas em texto (ou já em datetime)
+        system (str): 'SIH' ou 'SIM' (define a ordem dos formatos tentados)
+
+    Returns:
+        pd.Series: Coluna datetime64[ns] com NaT para valores inválidos
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+
+    codigos, unicos = pd.factorize(series)
+    # A posição extra recebe os nulos (código -1)
+    tabela = np.append(_parse_unique(unicos, system), np.datetime64('NaT', 'ns'))
+
+    return pd.Series(tabela[codigos], index=series.index, name=series.name)
+
+
+def epidemiological_week(dates):
+    """
+    Calcula a semana e o ano epidemiológicos (semanas de domingo a sábado)
+
+    A semana 1 é a primeira semana do ano com pelo menos quatro dias no ano,
+    ou seja, aquela cuja quarta-feira cai no próprio ano.
+
+    Args:
+        dates (np.ndarray): Datas em datetime64
+
+    Returns:
+        tuple: (semana, ano) como arrays de inteiros, com 0 para datas ausentes
+    """
+    dias = np.asarray(dates).astype('datetime64[D]')
+    validos = ~np.isnat(dias)
+    dias_int = np.where(validos, dias.astype(np.int64), 0)
+
+    # 01/01/1970 foi uma quinta-feira: (dia + 4) % 7 dá 0 para domingo
+    domingo = dias_int - (dias_int + 4) % 7
+    quarta = (domingo + 3).astype('datetime64[D]')
+
+    ano = quarta.astype('datetime64[Y]')
+    dia_do_ano = (quarta - ano.astype('datetime64[D]')).astype(np.int64)
+
+    semana = np.where(validos, dia_do_ano // 7 + 1, 0).astype(np.int8)
+    ano_epi = np.where(validos, ano.astype(np.int64) + 1970, 0).astype(np.int16)
+    return semana, ano_epi
+
+
+def add_date_columns(df, system='SIH'):
+    """
+    Adiciona colunas de data convertidas e colunas derivadas de tempo
+
+    Colunas criadas:
+        SIH: DATA_INTERNACAO, DATA_SAIDA, MES, SEMANA_EPI, ANO_EPI,
+             DIAS_PERM_CALC e DIAS_PERM_DIVERGENTE (comparação com DIAS_PERM)
+        SIM: DATA_OBITO, MES, SEMANA_EPI, ANO_EPI
+
+    Mês e semana são calculados sobre as datas distintas e propagados às
+    linhas. As colunas inteiras usam tipos compactos anuláveis (Int8/Int16).
+
+    Args:
+        df (pd.DataFrame): DataFrame filtrado do SIH-SUS ou SIM-DO
+        system (str): 'SIH' ou 'SIM'
+
+    Returns:
+        pd.DataFrame: DataFrame com as colunas de data adicionadas
+    """
+    print(f"📅 Convertendo datas ({system})...")
+
+    if df.empty:
+        return df
+
+    for origem, destino in COLUNAS_DATA[system].items():
+        if origem in df.columns:
+            df[destino] = parse_datasus_dates(df[origem], system)
+            invalidas = int(df[destino].isna().sum())
+            print(f"   {origem} -> {destino}: {invalidas} datas inválidas ou ausentes")
+
+    referencia = DATA_REFERENCIA[system]
+    if referencia in df.columns:
+        # Derivações calculadas uma vez por data distinta
+        codigos, unicas = pd.factorize(df[referencia])
+        unicas = np.asarray(unicas, dtype='datetime64[ns]')
+        semana, ano_epi = epidemiological_week(unicas)
+        mes = pd.DatetimeIndex(unicas).month.to_numpy()
+
+        # A posição extra recebe as datas ausentes (código -1)
+        ausente = codigos < 0
+        for coluna, valores, tipo in [('MES', mes, 'Int8'),
+                                      ('SEMANA_EPI', semana, 'Int8'),
+                                      ('ANO_EPI', ano_epi, 'Int16')]:
+            tabela = np.append(valores, 0)
+            df[coluna] = pd.arrays.IntegerArray(tabela[codigos].astype(tipo.lower()), ausente)
+
+    if system == 'SIH' and {'DATA_INTERNACAO', 'DATA_SAIDA'} <= set(df.columns):
+        permanencia = (df['DATA_SAIDA'] - df['DATA_INTERNACAO']).dt.days
+        df['DIAS_PERM_CALC'] = permanencia.astype('Int16')
+
+        if 'DIAS_PERM' in df.columns:
+            informado = pd.to_numeric(df['DIAS_PERM'], errors='coerce')
+            df['DIAS_PERM_DIVERGENTE'] = (df['DIAS_PERM_CALC'] != informado).fillna(False).astype(bool)
+            print(f"   DIAS_PERM divergente do calculado: {int(df['DIAS_PERM_DIVERGENTE'].sum())} registros")
+
+    print(f"   ✅ Datas convertidas!")
+    return df
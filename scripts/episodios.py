@@ -0,0 +1,243 @@
+"""
+Consolidação de Episódios de Internação - SIH-SUS (AIH)
+
+O SIH-RD registra AIHs, não internações: permanências longas geram AIHs de
+continuação (IDENT = 5) em meses seguintes, e uma mesma AIH pode reaparecer
+quando é reapresentada. Contar linhas como internações infla o total de
+casos e divide DIAS_PERM e VAL_TOT entre registros.
+
+Este módulo consolida os registros em episódios de internação:
+    1. Reapresentações idênticas (mesmos N_AIH, DT_INTER, DT_SAIDA e IDENT)
+       são reduzidas a um registro (o último);
+    2. Registros da mesma pessoa (NASC, SEXO, MUNRES) no mesmo hospital (CNES)
+       com a mesma data de internação formam um episódio;
+    3. Continuações (IDENT = 5) cuja data de internação coincide com a data de
+       saída de outro registro da mesma pessoa e hospital são encadeadas;
+    4. Registros com o mesmo N_AIH e períodos diferentes (AIH de longa
+       permanência apresentada de novo em competências seguintes) são partes
+       do mesmo episódio e têm permanência e valores somados.
+
+Os agrupamentos usam fatoração por hash das chaves e propagação de rótulos
+vetorizada (componentes conexos), com custo linear no número de registros.
+
+Autor: GitHub Copilot
+Data: 2025
+"""
+
+import numpy as np
+import pandas as pd
+
+# Abas do Excel (chave em stats -> nome da aba)
+ABAS_EPISODIOS = [('consolidacao_episodios', 'Consolidacao_Episodios')]
+
+# Identificação da pessoa e do hospital (usadas as que existirem)
+CHAVES_PESSOA = ['NASC', 'SEXO', 'MUNRES', 'CNES']
+
+# Chave de uma apresentação da AIH: registros iguais nessas colunas são repetições
+CHAVES_AIH_REPETIDA = ['N_AIH', 'DT_INTER', 'DT_SAIDA', 'IDENT']
+
+# Colunas somadas entre os registros do episódio
+COLUNAS_SOMADAS = ['DIAS_PERM', 'VAL_TOT', 'VAL_SH', 'VAL_SP']
+
+# IDENT do SIH-RD: 1 = AIH principal, 5 = AIH de longa permanência (continuação)
+IDENT_CONTINUACAO = '5'
+
+
+def _combine_codes(codes, other):
+    """Combina dois vetores de códigos em um só (-1 se algum for -1), recompactando por hash"""
+    validos = (codes >= 0) & (other >= 0)
+    combinados = np.full(len(codes), -1, dtype=np.int64)
+    if validos.any():
+        chave = codes[validos].astype(np.int64) * (other.max() + 1) + other[validos]
+        combinados[validos], _ = pd.factorize(chave)
+    return combinados
+
+
+def _group_codes(df, columns):
+    """
+    Código de grupo das colunas (-1 quando alguma é nula)
+
+    Cada coluna é fatorada separadamente (hash) e os códigos são combinados
+    dois a dois, sem montar tuplas ou textos por linha.
+    """
+    codigos = None
+    for coluna in columns:
+        atual, _ = pd.factorize(df[coluna])
+        codigos = atual.astype(np.int64) if codigos is None else _combine_codes(codigos, atual)
+    return codigos
+
+
+def _is_continuation(df):
+    """Marca as AIHs de continuação (IDENT = 5), avaliando cada valor distinto uma vez"""
+    if 'IDENT' not in df.columns:
+        return np.zeros(len(df), dtype=bool)
+    codigos, unicos = pd.factorize(df['IDENT'])
+    tabela = np.append(pd.Index(unicos).astype(str).str.strip() == IDENT_CONTINUACAO, False)
+    return tabela[codigos]
+
+
+def _propagate_min(labels, codes):
+    """Atribui a cada registro o menor rótulo do seu grupo (código -1 não agrupa)"""
+    validos = codes >= 0
+    if not validos.any():
+        return labels
+    minimos = np.full(codes.max() + 1, np.iinfo(np.int64).max)
+    np.minimum.at(minimos, codes[validos], labels[validos])
+    novos = labels.copy()
+    novos[validos] = minimos[codes[validos]]
+    return novos
+
+
+def episode_labels(df, date_in='DATA_INTERNACAO', date_out='DATA_SAIDA'):
+    """
+    Calcula o rótulo de episódio de cada registro (componentes conexos das regras 2 a 4)
+
+    Args:
+        df (pd.DataFrame): Registros sem AIHs repetidas
+        date_in (str): Coluna de data de internação
+        date_out (str): Coluna de data de saída
+
+    Returns:
+        np.ndarray: Rótulo do episódio de cada registro (menor posição do grupo)
+    """
+    n = len(df)
+    rotulos = np.arange(n, dtype=np.int64)
+    pessoa = [c for c in CHAVES_PESSOA if c in df.columns]
+    if not pessoa or date_in not in df.columns:
+        return rotulos
+
+    # Regra 2: mesma pessoa, hospital e data de internação
+    mesma_data = _group_codes(df, pessoa + [date_in])
+
+    # Regra 4: mesmo N_AIH em períodos diferentes (partes da mesma AIH)
+    mesma_aih = _group_codes(df, ['N_AIH']) if 'N_AIH' in df.columns else np.full(n, -1)
+
+    # Regra 3: continuação iniciada na data de saída de outro registro
+    origem, destino = np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+    if 'IDENT' in df.columns and date_out in df.columns:
+        codigo_pessoa = _group_codes(df, pessoa)
+        datas_saida, datas = pd.factorize(df[date_out])
+        datas_entrada = pd.Index(datas).get_indexer(df[date_in]) if len(datas) else np.full(n, -1)
+        saidas = np.where((codigo_pessoa >= 0) & (datas_saida >= 0),
+                          codigo_pessoa * (len(datas) + 1) + datas_saida, -1)
+        entradas = np.where((codigo_pessoa >= 0) & (datas_entrada >= 0),
+                            codigo_pessoa * (len(datas) + 1) + datas_entrada, -2)
+        continuacao = _is_continuation(df) & (entradas >= 0)
+
+        # Índice de hash (pessoa, data de saída) -> primeiro registro
+        primeiros = np.flatnonzero(~pd.Series(saidas).duplicated().to_numpy() & (saidas >= 0))
+        posicoes = pd.Index(saidas[primeiros]).get_indexer(entradas[continuacao])
+        encontrados = posicoes >= 0
+        origem = np.flatnonzero(continuacao)[encontrados]
+        destino = primeiros[posicoes[encontrados]]
+
+    while True:
+        novos = _propagate_min(_propagate_min(rotulos, mesma_data), mesma_aih)
+        if len(origem):
+            menores = np.minimum(novos[origem], novos[destino])
+            np.minimum.at(novos, origem, menores)
+            np.minimum.at(novos, destino, menores)
+        # Encurta cadeias de rótulos (rótulo do rótulo)
+        novos = novos[novos]
+        if np.array_equal(novos, rotulos):
+            return rotulos
+        rotulos = novos
+
+
+def consolidate_episodes(df, date_in='DATA_INTERNACAO', date_out='DATA_SAIDA'):
+    """
+    Consolida os registros de AIH em episódios de internação
+
+    Cada episódio recebe os campos do seu registro principal (primeira data de
+    internação, IDENT principal antes de continuações), a última data de saída,
+    a soma de COLUNAS_SOMADAS (permanência e valores) dos registros e as colunas N_REGISTROS e
+    N_CONTINUACOES.
+
+    Args:
+        df (pd.DataFrame): Internações filtradas, com datas convertidas (ver datas.py)
+        date_in (str): Coluna de data de internação
+        date_out (str): Coluna de data de saída
+
+    Returns:
+        tuple: (pd.DataFrame de episódios, pd.DataFrame com totais por ano de
+                registros e de episódios)
+    """
+    print("🧩 Consolidando AIHs em episódios de internação...")
+
+    if df.empty:
+        return df, pd.DataFrame()
+
+    registros = df.reset_index(drop=True)
+    n_registros = len(registros)
+
+    # Regra 1: reapresentações idênticas da AIH (mesmo N_AIH e período) - fica
+    # a última; o mesmo N_AIH com outro período é somado ao episódio (regra 4)
+    if 'N_AIH' in registros.columns:
+        chaves = [c for c in CHAVES_AIH_REPETIDA if c in registros.columns]
+        repetidas = (registros.duplicated(subset=chaves, keep='last') & registros['N_AIH'].notna()).to_numpy()
+    else:
+        print("   ⚠️ Coluna N_AIH não encontrada - AIHs repetidas não verificadas")
+        repetidas = np.zeros(n_registros, dtype=bool)
+    unicos = registros[~repetidas].reset_index(drop=True)
+
+    rotulos = episode_labels(unicos, date_in, date_out)
+
+    # Ordem dentro do episódio: data de internação, AIH principal antes de continuação
+    continuacao = _is_continuation(unicos)
+    chaves_ordem = [continuacao]
+    if date_in in unicos.columns:
+        chaves_ordem.append(unicos[date_in].to_numpy().astype('datetime64[ns]').astype(np.int64))
+    chaves_ordem.append(rotulos)
+    ordem = np.lexsort(chaves_ordem)
+    unicos, rotulos, continuacao = unicos.iloc[ordem], rotulos[ordem], continuacao[ordem]
+
+    grupos = unicos.groupby(rotulos, sort=False)
+    episodios = grupos.head(1).reset_index(drop=True)
+    episodios['N_REGISTROS'] = grupos.size().to_numpy()
+    episodios['N_CONTINUACOES'] = pd.Series(continuacao).groupby(rotulos, sort=False).sum().to_numpy()
+    for coluna in COLUNAS_SOMADAS:
+        if coluna in unicos.columns:
+            valores = pd.to_numeric(unicos[coluna], errors='coerce')
+            episodios[coluna] = valores.groupby(rotulos, sort=False).sum().to_numpy()
+    if date_out in unicos.columns:
+        episodios[date_out] = unicos[date_out].groupby(rotulos, sort=False).max().to_numpy()
+        if 'DIAS_PERM_CALC' in episodios.columns and date_in in episodios.columns:
+            episodios['DIAS_PERM_CALC'] = (episodios[date_out] - episodios[date_in]).dt.days.astype('Int16')
+            # Divergência refeita com os valores do episódio (DIAS_PERM somado)
+            if 'DIAS_PERM_DIVERGENTE' in episodios.columns and 'DIAS_PERM' in episodios.columns:
+                informado = pd.to_numeric(episodios['DIAS_PERM'], errors='coerce')
+                episodios['DIAS_PERM_DIVERGENTE'] = (
+                    (episodios['DIAS_PERM_CALC'] != informado).fillna(False).astype(bool)
+                )
+
+    resumo = _consolidation_summary(registros, repetidas, unicos, continuacao, episodios)
+
+    print(f"   Registros: {n_registros} | AIHs repetidas: {int(repetidas.sum())} | "
+          f"continuações: {int(continuacao.sum())} | episódios: {len(episodios)}")
+    print(f"   ✅ Episódios consolidados!")
+    return episodios, resumo
+
+
+def _consolidation_summary(registros, repetidas, unicos, continuacao, episodios):
+    """Totais por ano em nível de registro e de episódio (com linha Total)"""
+    def somar(tabela, coluna):
+        if coluna not in tabela.columns:
+            return pd.Series(dtype=float)
+        return pd.to_numeric(tabela[coluna], errors='coerce').groupby(tabela['ANO']).sum()
+
+    resumo = pd.DataFrame({
+        'Registros': registros.groupby('ANO').size(),
+        'AIH_Repetidas': pd.Series(repetidas).groupby(registros['ANO'].to_numpy()).sum(),
+        'Registros_Continuacao': pd.Series(continuacao).groupby(unicos['ANO'].to_numpy()).sum(),
+        'Episodios': episodios.groupby('ANO').size(),
+        'Dias_Registros': somar(registros, 'DIAS_PERM'),
+        'Dias_Episodios': somar(episodios, 'DIAS_PERM'),
+        'Valor_Registros': somar(registros, 'VAL_TOT'),
+        'Valor_Episodios': somar(episodios, 'VAL_TOT'),
+    }).fillna(0)
+    resumo.loc['Total'] = resumo.sum()
+
+    inteiras = ['Registros', 'AIH_Repetidas', 'Registros_Continuacao', 'Episodios']
+    resumo[inteiras] = resumo[inteiras].astype(int)
+    resumo['Registros_Por_Episodio'] = (resumo['Registros'] / resumo['Episodios'].where(resumo['Episodios'] > 0)).round(3)
+    return resumo.round(2).rename_axis('ANO').reset_index()
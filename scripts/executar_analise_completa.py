@@ -10,18 +10,19 @@ Autor: GitHub Copilot
 Data: 2025
 """
 
+import argparse
 import subprocess
 import sys
 import os
 from datetime import datetime
 
-def run_script(script_name, description):
-    """Executa um script Python e retorna o resultado"""
+def run_script(script_name, description, args=()):
+    """Executa um script Python (com argumentos opcionais) e retorna o resultado"""
     print(f"🔄 {description}...")
     try:
         result = subprocess.run([
             "C:/Users/Usuario/AppData/Local/Microsoft/WindowsApps/python3.13.exe", 
-            script_name
+            script_name, *args
         ], capture_output=True, text=True, cwd=os.getcwd())
         
         if result.returncode == 0:
@@ -40,6 +41,7 @@ def check_files():
     files_to_check = [
         ('diabetes_criancas_am.xlsx', 'Arquivo de mortalidade'),
         ('diabetes_morbidade_criancas_am_2020_2025.xlsx', 'Arquivo de morbidade'),
+        ('pareamento_sim_sih_am.xlsx', 'Arquivo de pareamento'),
         ('relatorio_diabetes_infantil_amazonas.pdf', 'Relatório PDF')
     ]
     
@@ -58,27 +60,46 @@ def check_files():
 
 def main():
     """Função principal que executa toda a pipeline"""
+    parser = argparse.ArgumentParser(description='Pipeline completa de análise de diabetes infantil')
+    parser.add_argument('--retomar', action='store_true',
+                        help='Retoma mortalidade e morbidade a partir dos checkpoints da última execução')
+    parser.add_argument('--secundarios', action='store_true',
+                        help='Inclui na morbidade as internações com diabetes apenas nos diagnósticos secundários')
+    args = parser.parse_args()
+    retomar = ['--retomar'] if args.retomar else []
+    secundarios = ['--secundarios'] if args.secundarios else []
+    
     print("🚀 PIPELINE COMPLETA - ANÁLISE DE DIABETES INFANTIL AMAZONAS")
     print("=" * 70)
     print(f"Data/Hora: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}")
+    if retomar:
+        print("♻️ Modo de retomada: etapas já concluídas serão carregadas dos checkpoints")
+    if secundarios:
+        print("🔎 Morbidade com diagnósticos secundários (DIAG_SECUN, DIAGSEC1..9)")
     print("=" * 70)
     
     success_count = 0
-    total_steps = 3
+    total_steps = 4
     
     # Passo 1: Gerar dados de mortalidade
-    if run_script("main.py", "Gerando análise de mortalidade"):
+    if run_script("main.py", "Gerando análise de mortalidade", retomar):
         success_count += 1
     
     print("-" * 50)
     
     # Passo 2: Gerar dados de morbidade
-    if run_script("analise_morbidade_diabetes.py", "Gerando análise de morbidade"):
+    if run_script("analise_morbidade_diabetes.py", "Gerando análise de morbidade", retomar + secundarios):
+        success_count += 1
+    
+    print("-" * 50)
+    
+    # Passo 3: Parear óbitos e internações
+    if run_script("pareamento_sim_sih.py", "Pareando óbitos (SIM) e internações (SIH)"):
         success_count += 1
     
     print("-" * 50)
     
-    # Passo 3: Gerar relatório PDF
+    # Passo 4: Gerar relatório PDF
     if run_script("gerar_relatorio_pdf.py", "Gerando relatório PDF"):
         success_count += 1
     
@@ -97,6 +118,7 @@ def main():
         print("\n📁 Arquivos disponíveis:")
         print("   • diabetes_criancas_am.xlsx - Dados de mortalidade")
         print("   • diabetes_morbidade_criancas_am_2020_2025.xlsx - Dados de morbidade")
+        print("   • pareamento_sim_sih_am.xlsx - Óbitos vinculados a internações")
         print("   • relatorio_diabetes_infantil_amazonas.pdf - Relatório completo")
         
         print("\n📋 O relatório PDF contém:")
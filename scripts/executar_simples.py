@@ -3,25 +3,32 @@ Executar Analise Completa - Versao Simplificada
 Executa todos os scripts de analise sem problemas de codificacao
 """
 
+import argparse
 import os
 import subprocess
 
 def main():
+    parser = argparse.ArgumentParser(description='Analise completa de diabetes infantil (versao simplificada)')
+    parser.add_argument('--secundarios', action='store_true',
+                        help='Inclui na morbidade os diagnosticos secundarios')
+    secundarios = ['--secundarios'] if parser.parse_args().secundarios else []
+    
     print("=== ANALISE COMPLETA DE DIABETES INFANTIL AMAZONAS ===")
     print()
     
     scripts = [
-        ("main.py", "Analise de Mortalidade"),
-        ("analise_morbidade_diabetes.py", "Analise de Morbidade"), 
-        ("gerar_relatorio_pdf.py", "Gerar Relatorio PDF")
+        ("main.py", "Analise de Mortalidade", []),
+        ("analise_morbidade_diabetes.py", "Analise de Morbidade", secundarios), 
+        ("pareamento_sim_sih.py", "Pareamento SIM x SIH", []),
+        ("gerar_relatorio_pdf.py", "Gerar Relatorio PDF", [])
     ]
     
     python_cmd = "C:/Users/Usuario/AppData/Local/Microsoft/WindowsApps/python3.13.exe"
     
-    for script, desc in scripts:
+    for script, desc, args in scripts:
         print(f"Executando: {desc}")
         try:
-            result = subprocess.run([python_cmd, script], 
+            result = subprocess.run([python_cmd, script, *args], 
                                   capture_output=True, text=True, 
                                   encoding='utf-8', errors='ignore')
             if result.returncode == 0:
@@ -38,6 +45,7 @@ def main():
     files = [
         "diabetes_criancas_am.xlsx",
         "diabetes_morbidade_criancas_am_2020_2025.xlsx", 
+        "pareamento_sim_sih_am.xlsx",
         "relatorio_diabetes_infantil_amazonas.pdf"
     ]
     
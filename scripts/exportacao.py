@@ -0,0 +1,41 @@
+"""
+Exportação para Excel - Abas Opcionais de Análise
+
+Funções auxiliares para gravar tabelas de análise (séries, taxas, etc.) como
+abas adicionais dos arquivos Excel de mortalidade e morbidade.
+
+Autor: GitHub Copilot
+Data: 2025
+"""
+
+from telemetria import count, timed
+
+# Limite de linhas de dados de uma planilha do Excel (descontando o cabeçalho)
+LIMITE_LINHAS_EXCEL = 1_048_575
+
+
+def write_optional_sheets(writer, stats, sheets):
+    """
+    Grava as tabelas de stats listadas em sheets, ignorando as ausentes ou vazias
+
+    Tabelas acima do limite de linhas do Excel são truncadas com aviso.
+
+    Args:
+        writer (pd.ExcelWriter): Arquivo Excel aberto
+        stats (dict): Estatísticas (chave -> DataFrame)
+        sheets (list): Pares (chave em stats, nome da aba)
+    """
+    for chave, aba in sheets:
+        tabela = stats.get(chave)
+        if tabela is None or tabela.empty:
+            continue
+
+        if len(tabela) > LIMITE_LINHAS_EXCEL:
+            print(f"   ⚠️ Aba '{aba}' truncada em {LIMITE_LINHAS_EXCEL} linhas (total: {len(tabela)})")
+            tabela = tabela.iloc[:LIMITE_LINHAS_EXCEL]
+
+        with timed('aba_exportacao_segundos', aba=aba) as campos:
+            tabela.to_excel(writer, sheet_name=aba, index=False)
+            campos['linhas'] = len(tabela)
+        count('linhas_exportadas_total', len(tabela), aba=aba)
+        print(f"   ✅ Aba '{aba}' criada")
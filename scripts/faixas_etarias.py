@@ -0,0 +1,38 @@
+"""
+Faixas Etárias - Definições Compartilhadas
+
+Faixas etárias usadas nas estatísticas de mortalidade e morbidade
+(0-4, 5-9 e 10-14 anos).
+
+Autor: GitHub Copilot
+Data: 2025
+"""
+
+import pandas as pd
+
+FAIXAS_ETARIAS_BINS = [-1, 4, 9, 14]
+FAIXAS_ETARIAS_LABELS = ['0-4 anos', '5-9 anos', '10-14 anos']
+
+
+def add_age_band(df, age_column=None):
+    """
+    Adiciona a coluna FAIXA_ETARIA a partir da idade em anos
+
+    Args:
+        df (pd.DataFrame): DataFrame com idade em anos
+        age_column (str): Coluna de idade (padrão: IDADE_ANOS, se existir, senão IDADE)
+
+    Returns:
+        pd.DataFrame: Novo DataFrame com a coluna FAIXA_ETARIA (o original não
+        é alterado)
+    """
+    if age_column is None:
+        age_column = 'IDADE_ANOS' if 'IDADE_ANOS' in df.columns else 'IDADE'
+
+    if age_column not in df.columns:
+        return df
+    return df.assign(FAIXA_ETARIA=pd.cut(
+        pd.to_numeric(df[age_column], errors='coerce'),
+        bins=FAIXAS_ETARIAS_BINS,
+        labels=FAIXAS_ETARIAS_LABELS
+    ))
@@ -10,49 +10,91 @@ Data: 2025
 
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-import plotly.graph_objects as go
-import plotly.express as px
-from plotly.subplots import make_subplots
-import plotly.io as pio
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image, PageBreak
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.lib import colors
-from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_JUSTIFY
 import os
-import io
-import base64
 from datetime import datetime
+from functools import lru_cache
 import warnings
 
+from regioes import load_region_index, municipality_values
+from mapas import cached_choropleth
+from consultas_sql import PREFIXO_ABA
+from painel_html import ARQUIVO_PAINEL, export_dashboard
+from telemetria import count, event, timed
+
 # Configurações
 warnings.filterwarnings('ignore')
-plt.style.use('seaborn-v0_8')
-sns.set_palette("husl")
 
-# Configurar matplotlib para português
-plt.rcParams['figure.figsize'] = (12, 8)
-plt.rcParams['font.size'] = 10
+
+@lru_cache(maxsize=1)
+def _pyplot():
+    """
+    Importa o matplotlib.pyplot e aplica o estilo dos gráficos do relatório
+
+    O matplotlib só é carregado quando um gráfico é desenhado (como em
+    mapas.render_choropleth), e não na importação do módulo.
+
+    Returns:
+        module: matplotlib.pyplot
+    """
+    import matplotlib.pyplot as plt
+
+    plt.style.use('seaborn-v0_8')
+    # Paleta 'husl' de 6 cores (a mesma do seaborn, sem importá-lo)
+    plt.rcParams['axes.prop_cycle'] = plt.cycler(color=['#f77189', '#bb9832', '#50b131', '#36ada4', '#3ba3ec', '#e866f4'])
+
+    # Configurar matplotlib para português
+    plt.rcParams['figure.figsize'] = (12, 8)
+    plt.rcParams['font.size'] = 10
+    return plt
+
 
 class DiabetesReportGenerator:
     def __init__(self):
         self.mortalidade_file = 'diabetes_criancas_am.xlsx'
         self.morbidade_file = 'diabetes_morbidade_criancas_am_2020_2025.xlsx'
+        self.pareamento_file = 'pareamento_sim_sih_am.xlsx'
         self.output_pdf = 'relatorio_diabetes_infantil_amazonas.pdf'
         
         # Dados carregados
         self.dados_mortalidade = None
         self.dados_morbidade = None
         
+        # Tabelas de análise carregadas das abas do Excel (quando existirem)
+        self.serie_mensal_morbidade = None
+        self.serie_mensal_mortalidade = None
+        self.indices_sazonais = None
+        self.taxas_mortalidade = None
+        self.taxas_morbidade = None
+        self.intervalos_morbidade = None
+        self.intervalos_mortalidade = None
+        self.tendencias_morbidade = None
+        self.tendencias_mortalidade = None
+        self.joinpoints_morbidade = None
+        self.joinpoints_mortalidade = None
+        self.conglomerados = None
+        self.consolidacao_episodios = None
+        self.custos_anuais = None
+        self.custos_procedimento = None
+        self.carga_hospitalar = None
+        self.carga_hospitalar_mensal = None
+        self.regionais_morbidade = None
+        self.regionais_mortalidade = None
+        self.indicadores_vinculacao = None
+        self.qualidade_morbidade = None
+        self.qualidade_mortalidade = None
+        self.consultas_sql = {}
+        
         # Estilos para PDF
-        self.styles = getSampleStyleSheet()
         self.setup_styles()
         
     def setup_styles(self):
         """Configura estilos personalizados para o PDF"""
+        from reportlab.lib import colors
+        from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY, TA_LEFT
+        from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+        
+        self.styles = getSampleStyleSheet()
+        
         # Título principal
         self.title_style = ParagraphStyle(
             'CustomTitle',
@@ -101,11 +143,59 @@ class DiabetesReportGenerator:
             else:
                 print(f"   ⚠️ Arquivo {self.morbidade_file} não encontrado")
                 
+            # Carregar abas de análise
+            self.serie_mensal_morbidade = self.read_optional_sheet(self.morbidade_file, 'Serie_Mensal')
+            self.serie_mensal_mortalidade = self.read_optional_sheet(self.mortalidade_file, 'Serie_Mensal')
+            self.indices_sazonais = self.read_optional_sheet(self.morbidade_file, 'Indices_Sazonais')
+            self.taxas_mortalidade = self.read_optional_sheet(self.mortalidade_file, 'Taxas_Padronizadas')
+            self.taxas_morbidade = self.read_optional_sheet(self.morbidade_file, 'Taxas_Padronizadas')
+            self.intervalos_morbidade = self.read_optional_sheet(self.morbidade_file, 'IC_Bootstrap')
+            self.intervalos_mortalidade = self.read_optional_sheet(self.mortalidade_file, 'IC_Bootstrap')
+            self.tendencias_morbidade = self.read_optional_sheet(self.morbidade_file, 'Tendencias')
+            self.tendencias_mortalidade = self.read_optional_sheet(self.mortalidade_file, 'Tendencias')
+            self.joinpoints_morbidade = self.read_optional_sheet(self.morbidade_file, 'Joinpoints')
+            self.joinpoints_mortalidade = self.read_optional_sheet(self.mortalidade_file, 'Joinpoints')
+            self.conglomerados = self.read_optional_sheet(self.morbidade_file, 'Conglomerados_Espaco_Tempo')
+            self.consolidacao_episodios = self.read_optional_sheet(self.morbidade_file, 'Consolidacao_Episodios')
+            self.custos_anuais = self.read_optional_sheet(self.morbidade_file, 'Custos_Deflacionados')
+            self.custos_procedimento = self.read_optional_sheet(self.morbidade_file, 'Custos_Procedimento')
+            self.carga_hospitalar = self.read_optional_sheet(self.morbidade_file, 'Carga_Hospitalar')
+            self.carga_hospitalar_mensal = self.read_optional_sheet(self.morbidade_file, 'Carga_Hospitalar_Mensal')
+            self.regionais_morbidade = self.read_optional_sheet(self.morbidade_file, 'Agregados_Regionais')
+            self.regionais_mortalidade = self.read_optional_sheet(self.mortalidade_file, 'Agregados_Regionais')
+            self.indicadores_vinculacao = self.read_optional_sheet(self.pareamento_file, 'Indicadores_Vinculacao')
+            self.qualidade_morbidade = self.read_optional_sheet(self.morbidade_file, 'Qualidade_Dados')
+            self.qualidade_mortalidade = self.read_optional_sheet(self.mortalidade_file, 'Qualidade_Dados')
+            self.consultas_sql = self.read_query_sheets()
+                
         except Exception as e:
             print(f"   ❌ Erro ao carregar dados: {e}")
+    
+    def read_optional_sheet(self, filename, sheet_name):
+        """Lê uma aba opcional do Excel, retornando None se o arquivo ou a aba não existirem"""
+        if not os.path.exists(filename):
+            return None
+        try:
+            tabela = pd.read_excel(filename, sheet_name=sheet_name)
+            print(f"   ✅ {sheet_name}: {len(tabela)} linhas")
+            return tabela
+        except ValueError:
+            return None
+            
+    def read_query_sheets(self):
+        """Lê as abas de consultas SQL (prefixo SQL_) gravadas por consultas_sql.py"""
+        consultas = {}
+        for arquivo in (self.morbidade_file, self.mortalidade_file):
+            if not os.path.exists(arquivo):
+                continue
+            for aba in pd.ExcelFile(arquivo).sheet_names:
+                if aba.startswith(PREFIXO_ABA) and aba not in consultas:
+                    consultas[aba] = self.read_optional_sheet(arquivo, aba)
+        return consultas
             
     def create_mortality_charts(self):
         """Cria gráficos para dados de mortalidade"""
+        plt = _pyplot()
         if self.dados_mortalidade is None or self.dados_mortalidade.empty:
             return []
             
@@ -148,6 +238,7 @@ class DiabetesReportGenerator:
     
     def create_morbidity_charts(self):
         """Cria gráficos para dados de morbidade"""
+        plt = _pyplot()
         if self.dados_morbidade is None or self.dados_morbidade.empty:
             return []
             
@@ -227,8 +318,88 @@ class DiabetesReportGenerator:
             
         return charts
     
+    def create_seasonality_charts(self):
+        """Cria gráficos da série mensal de internações e dos índices sazonais"""
+        plt = _pyplot()
+        if self.serie_mensal_morbidade is None or self.serie_mensal_morbidade.empty:
+            return []
+            
+        charts = []
+        
+        # Gráfico 1: Série mensal total com tendência
+        total = self.serie_mensal_morbidade[self.serie_mensal_morbidade['Dimensao'] == 'Total']
+        fig, ax = plt.subplots(figsize=(12, 6))
+        ax.plot(total['Periodo'], total['Internacoes'], marker='o', markersize=3,
+                linewidth=1.5, color='steelblue', label='Internações')
+        ax.plot(total['Periodo'], total['Tendencia'], linewidth=3, color='darkorange', label='Tendência')
+        if self.serie_mensal_mortalidade is not None and not self.serie_mensal_mortalidade.empty:
+            obitos = self.serie_mensal_mortalidade[self.serie_mensal_mortalidade['Dimensao'] == 'Total']
+            obitos = obitos[obitos['Periodo'].isin(total['Periodo'])]
+            if not obitos.empty:
+                ax.bar(obitos['Periodo'], obitos['Obitos'], color='darkred', alpha=0.6, label='Óbitos')
+        ax.set_title('Internações por Diabetes Infantil - Série Mensal', fontsize=14, pad=20)
+        ax.set_xlabel('Mês')
+        ax.set_ylabel('Número de Casos')
+        ax.set_xticks(total['Periodo'].iloc[::6])
+        ax.tick_params(axis='x', rotation=45)
+        ax.legend()
+        ax.grid(True, alpha=0.3)
+        
+        chart_path = 'temp_seasonality_series.png'
+        plt.tight_layout()
+        plt.savefig(chart_path, dpi=300, bbox_inches='tight')
+        charts.append(chart_path)
+        plt.close()
+        
+        # Gráfico 2: Índices sazonais por mês (série total e por tipo)
+        if self.indices_sazonais is not None and not self.indices_sazonais.empty:
+            colunas_mes = [f'M{m:02d}' for m in range(1, 13)]
+            indices = self.indices_sazonais[self.indices_sazonais['Dimensao'].isin(['Total', 'TIPO_DIABETES'])]
+            if indices[colunas_mes].notna().any().any():
+                fig, ax = plt.subplots(figsize=(12, 6))
+                meses = ['Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun', 'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez']
+                x = np.arange(12)
+                width = 0.8 / len(indices)
+                for i, (_, linha) in enumerate(indices.iterrows()):
+                    ax.bar(x + i * width, linha[colunas_mes].astype(float), width, label=linha['Estrato'], alpha=0.8)
+                ax.axhline(0, color='black', linewidth=0.8)
+                ax.set_title('Índices Sazonais de Internação (desvio da tendência)', fontsize=14, pad=20)
+                ax.set_xlabel('Mês')
+                ax.set_ylabel('Internações acima/abaixo da tendência')
+                ax.set_xticks(x + width * (len(indices) - 1) / 2)
+                ax.set_xticklabels(meses)
+                ax.legend()
+                ax.grid(True, alpha=0.3)
+                
+                chart_path = 'temp_seasonality_index.png'
+                plt.tight_layout()
+                plt.savefig(chart_path, dpi=300, bbox_inches='tight')
+                charts.append(chart_path)
+                plt.close()
+            
+        return charts
+    
+    def describe_seasonality(self):
+        """Resume em texto os meses de maior e menor índice sazonal da série total"""
+        if self.indices_sazonais is None or self.indices_sazonais.empty:
+            return None
+        
+        colunas_mes = [f'M{m:02d}' for m in range(1, 13)]
+        total = self.indices_sazonais[self.indices_sazonais['Dimensao'] == 'Total']
+        if total.empty or total[colunas_mes].isna().all(axis=1).iloc[0]:
+            return None
+        
+        meses = ['janeiro', 'fevereiro', 'março', 'abril', 'maio', 'junho', 'julho',
+                 'agosto', 'setembro', 'outubro', 'novembro', 'dezembro']
+        indices = total[colunas_mes].iloc[0].astype(float).to_numpy()
+        pico, vale = int(np.nanargmax(indices)), int(np.nanargmin(indices))
+        return (f"Pela decomposição sazonal aditiva da série mensal, o mês com mais internações "
+                f"em relação à tendência é <b>{meses[pico]}</b> ({indices[pico]:+.1f} internações/mês) "
+                f"e o mês com menos é <b>{meses[vale]}</b> ({indices[vale]:+.1f} internações/mês).")
+    
     def create_comparison_chart(self):
         """Cria gráfico comparativo entre mortalidade e morbidade"""
+        plt = _pyplot()
         if (self.dados_mortalidade is None or self.dados_mortalidade.empty or 
             self.dados_morbidade is None or self.dados_morbidade.empty):
             return None
@@ -309,8 +480,311 @@ class DiabetesReportGenerator:
             
         return pd.DataFrame(summary_data)
     
+    def build_table(self, df, font_size=10):
+        """Converte um DataFrame em tabela do ReportLab com o estilo padrão do relatório"""
+        from reportlab.lib import colors
+        from reportlab.platypus import Table, TableStyle
+        
+        table_data = [df.columns.tolist()] + df.values.tolist()
+        table = Table(table_data)
+        table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), font_size),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black)
+        ]))
+        return table
+    
+    def create_rates_table(self):
+        """Cria tabela de taxas estaduais por 100 mil habitantes (brutas e padronizadas por idade)"""
+        def formatar(valor):
+            return f'{valor:.2f}' if pd.notna(valor) else '-'
+        
+        colunas = []
+        for nome, tabela in [('Mortalidade', self.taxas_mortalidade), ('Morbidade', self.taxas_morbidade)]:
+            if tabela is None or tabela.empty:
+                continue
+            total = tabela[tabela['MUNRES'].astype(str) == 'Total'].set_index('ANO')
+            colunas.append(total['Taxa_Bruta'].map(formatar).rename(f'{nome} Bruta'))
+            # Intervalo só quando a taxa e os dois limites existem
+            padronizada = [
+                f'{formatar(taxa)} ({formatar(inferior)}-{formatar(superior)})'
+                if pd.notna(taxa) and pd.notna(inferior) and pd.notna(superior) else formatar(taxa)
+                for taxa, inferior, superior in zip(total['Taxa_Padronizada'], total['IC95_Inferior'],
+                                                    total['IC95_Superior'])
+            ]
+            colunas.append(pd.Series(padronizada, index=total.index, name=f'{nome} Padronizada (IC95%)'))
+        
+        if not colunas:
+            return pd.DataFrame()
+        
+        taxas = pd.concat(colunas, axis=1).sort_index().fillna('-').reset_index()
+        return taxas.rename(columns={'ANO': 'Ano'})
+    
+    def create_confidence_table(self, intervalos, indicators):
+        """
+        Cria tabela anual de indicadores no formato 'estimativa (inferior-superior)'
+        
+        Args:
+            intervalos (pd.DataFrame): Aba IC_Bootstrap (ANO, Indicador, Estimativa, IC95_*)
+            indicators (dict): Indicador -> título da coluna
+        """
+        if intervalos is None or intervalos.empty:
+            return pd.DataFrame()
+        
+        selecionados = intervalos[intervalos['Indicador'].isin(indicators)]
+        formatado = (selecionados['Estimativa'].map('{:.1f}'.format) + ' (' +
+                     selecionados['IC95_Inferior'].map('{:.1f}'.format) + '-' +
+                     selecionados['IC95_Superior'].map('{:.1f}'.format) + ')')
+        tabela = pd.DataFrame({
+            'Ano': selecionados['ANO'], 'Indicador': selecionados['Indicador'], 'Valor': formatado
+        }).pivot(index='Ano', columns='Indicador', values='Valor')
+        
+        colunas = [c for c in indicators if c in tabela.columns]
+        tabela = tabela[colunas].rename(columns=indicators).fillna('-')
+        return tabela.reset_index()
+    
+    def create_trends_table(self):
+        """Cria tabela das tendências anuais (APC) estaduais e por estrato, exceto municípios"""
+        linhas = []
+        for nome, tendencias, joinpoints in [
+            ('Óbitos', self.tendencias_mortalidade, self.joinpoints_mortalidade),
+            ('Internações', self.tendencias_morbidade, self.joinpoints_morbidade)
+        ]:
+            if tendencias is None or tendencias.empty:
+                continue
+            anual = tendencias[(tendencias['Granularidade'] == 'Anual') & (tendencias['Dimensao'] != 'MUNRES')]
+            quebras = None
+            if joinpoints is not None and not joinpoints.empty:
+                quebras = joinpoints.set_index(['Granularidade', 'Dimensao', 'Estrato'])
+            
+            for _, linha in anual.iterrows():
+                joinpoint = '-'
+                chave = (linha['Granularidade'], linha['Dimensao'], linha['Estrato'])
+                if quebras is not None and chave in quebras.index:
+                    quebra = quebras.loc[chave]
+                    if quebra['Modelo_Selecionado'] == '1 joinpoint':
+                        joinpoint = (f"{quebra['Joinpoint']} ({quebra['APC_Segmento1_%']:.1f}% / "
+                                     f"{quebra['APC_Segmento2_%']:.1f}%)")
+                linhas.append({
+                    'Série': nome,
+                    'Estrato': 'Total' if linha['Dimensao'] == 'Total' else str(linha['Estrato']),
+                    'Casos': int(linha['Total']),
+                    'APC % (IC95%)': (f"{linha['APC_%']:.1f} ({linha['IC95_Inferior']:.1f} a "
+                                      f"{linha['IC95_Superior']:.1f})"),
+                    'p': f"{linha['p_valor']:.3f}",
+                    'Joinpoint (APC1/APC2)': joinpoint
+                })
+        
+        return pd.DataFrame(linhas)
+    
+    def describe_trends(self):
+        """Resume a tendência anual total de cada série para as conclusões"""
+        frases = []
+        for nome, tendencias in [('óbitos', self.tendencias_mortalidade),
+                                 ('internações', self.tendencias_morbidade)]:
+            if tendencias is None or tendencias.empty:
+                continue
+            total = tendencias[(tendencias['Granularidade'] == 'Anual') & (tendencias['Dimensao'] == 'Total')]
+            if total.empty:
+                continue
+            linha = total.iloc[0]
+            direcao = 'crescente' if linha['APC_%'] > 0 else 'decrescente'
+            if linha['p_valor'] >= 0.05:
+                direcao = 'estável (sem tendência significativa)'
+            frases.append(
+                f"• Tendência anual de {nome} {direcao}: APC {linha['APC_%']:.1f}% "
+                f"(IC95% {linha['IC95_Inferior']:.1f} a {linha['IC95_Superior']:.1f})<br/>"
+            )
+        return ''.join(frases)
+    
+    def describe_episodes(self):
+        """Texto com a redução de registros de AIH para episódios de internação"""
+        if self.consolidacao_episodios is None or self.consolidacao_episodios.empty:
+            return ""
+        total = self.consolidacao_episodios.iloc[-1]
+        return f"""
+        As internações são contadas por episódio: {int(total['Registros'])} registros de AIH
+        ({int(total['AIH_Repetidas'])} reapresentações e {int(total['Registros_Continuacao'])} AIHs de
+        continuação) foram consolidados em {int(total['Episodios'])} episódios, com dias de permanência
+        e valores somados por episódio (aba Consolidacao_Episodios).
+        """
+    
+    def create_costs_table(self):
+        """Cria tabela anual de custos nominais e reais (IPCA) das internações"""
+        if self.custos_anuais is None or self.custos_anuais.empty:
+            return pd.DataFrame()
+        
+        tabela = self.custos_anuais
+        return pd.DataFrame({
+            'Ano': tabela['ANO'].astype(str),
+            'Internações': tabela['Internacoes'],
+            'Total Nominal (R$)': tabela['Valor_Nominal_Total'].map('{:,.0f}'.format),
+            'Total Real (R$)': tabela['Valor_Real_Total'].map('{:,.0f}'.format),
+            'Médio Nominal (R$)': tabela['Valor_Nominal_Medio'].map('{:,.2f}'.format),
+            'Médio Real (R$)': tabela['Valor_Real_Medio'].map('{:,.2f}'.format),
+            'SH (%)': tabela['Percentual_SH'].map('{:.1f}'.format).replace('nan', '-'),
+            'SP (%)': tabela['Percentual_SP'].map('{:.1f}'.format).replace('nan', '-')
+        })
+    
+    def create_procedure_costs_table(self, max_rows=5):
+        """Cria tabela dos procedimentos (PROC_REA) de maior custo real"""
+        if self.custos_procedimento is None or self.custos_procedimento.empty:
+            return pd.DataFrame()
+        
+        tabela = self.custos_procedimento.head(max_rows)
+        return pd.DataFrame({
+            'Procedimento': tabela['PROC_REA'].astype(str).str.zfill(10),
+            'Internações': tabela['Internacoes'],
+            'Total Real (R$)': tabela['Valor_Real_Total'].map('{:,.0f}'.format),
+            'Médio Real (R$)': tabela['Valor_Real_Medio'].map('{:,.2f}'.format),
+            '% do Custo': tabela['Percentual_Custo_Total'].map('{:.1f}'.format)
+        })
+    
+    def create_hospitals_table(self, max_rows=5):
+        """Cria tabela dos estabelecimentos (CNES) com mais internações"""
+        if self.carga_hospitalar is None or self.carga_hospitalar.empty:
+            return pd.DataFrame()
+        
+        tabela = self.carga_hospitalar.head(max_rows)
+        return pd.DataFrame({
+            'Estabelecimento': tabela['Estabelecimento'].astype(str).str[:30],
+            'Internações': tabela['Internacoes'],
+            '% do Total': tabela['Percentual_Internacoes'].map('{:.1f}'.format),
+            'Dias de Leito': tabela['Dias_Leito'],
+            'Custo (R$)': tabela['Custo_Total'].map('{:,.0f}'.format),
+            'Censo Máx.': tabela['Censo_Maximo'],
+            'Ocupação Média (%)': tabela['Ocupacao_Media_%'].map('{:.1f}'.format).replace('nan', '-')
+        })
+    
+    def create_hospital_load_chart(self, n_establishments=3):
+        """Cria gráfico da curva de carga mensal dos estabelecimentos com mais internações"""
+        plt = _pyplot()
+        if self.carga_hospitalar_mensal is None or self.carga_hospitalar_mensal.empty:
+            return None
+        
+        mensal = self.carga_hospitalar_mensal
+        principais = self.carga_hospitalar['CNES'].astype(str).head(n_establishments)
+        meses = np.sort(mensal['Mes'].astype(str).unique())
+        # Ocupação quando há leitos cadastrados; senão, censo médio
+        coluna = 'Ocupacao_%' if mensal['Ocupacao_%'].notna().any() else 'Censo_Medio'
+        
+        fig, ax = plt.subplots(figsize=(12, 6))
+        for cnes in principais:
+            dados = mensal[mensal['CNES'].astype(str) == cnes]
+            serie = dados.set_index(dados['Mes'].astype(str))[coluna].reindex(meses, fill_value=0)
+            ax.plot(meses, serie.to_numpy(), linewidth=1.5, label=dados['Estabelecimento'].iloc[0])
+        ax.set_title('Carga Mensal dos Estabelecimentos com Mais Internações', fontsize=14, pad=20)
+        ax.set_xlabel('Mês')
+        ax.set_ylabel('Ocupação dos leitos pediátricos (%)' if coluna == 'Ocupacao_%' else 'Pacientes internados por dia')
+        ax.set_xticks(meses[::6])
+        ax.tick_params(axis='x', rotation=45)
+        ax.legend()
+        ax.grid(True, alpha=0.3)
+        
+        chart_path = 'temp_hospital_load.png'
+        plt.tight_layout()
+        plt.savefig(chart_path, dpi=300, bbox_inches='tight')
+        plt.close()
+        return chart_path
+    
+    def create_regional_table(self, level='Regiao_Saude'):
+        """Cria tabela do período completo por unidade de um nível (internações e óbitos)"""
+        colunas = []
+        for nome, tabela in [('Internações', self.regionais_morbidade), ('Óbitos', self.regionais_mortalidade)]:
+            if tabela is None or tabela.empty:
+                continue
+            total = tabela[(tabela['Nivel'] == level) & (tabela['ANO'].astype(str) == 'Total')]
+            total = total.set_index(total['Nome'].astype(str))
+            colunas.append(total['Casos'].rename(nome))
+            colunas.append(total['Taxa_100mil'].map('{:.2f}'.format).replace('nan', '-').rename(f'{nome} por 100 mil'))
+        
+        if not colunas:
+            return pd.DataFrame()
+        tabela = pd.concat(colunas, axis=1)
+        return tabela.fillna('-').rename_axis('Unidade').reset_index()
+    
+    def create_regional_maps(self):
+        """Mapas de taxa de internação por nível (reaproveitados do cache se os dados não mudaram)"""
+        if self.regionais_morbidade is None or self.regionais_morbidade.empty:
+            return []
+        
+        agregados = self.regionais_morbidade
+        municipios = agregados.loc[agregados['Nivel'] == 'Municipio', 'Codigo'].astype(str).unique()
+        indice = load_region_index(municipios)
+        if indice is None:
+            return []
+        
+        titulos = {'Municipio': 'Município', 'Regiao_Saude': 'Região de Saúde', 'Macrorregiao': 'Macrorregião'}
+        mapas = []
+        for nivel, titulo in titulos.items():
+            unidades = agregados[(agregados['Nivel'] == nivel) & (agregados['ANO'].astype(str) == 'Total')]
+            if len(unidades) < 2 or unidades['Taxa_100mil'].isna().all():
+                continue
+            valores = municipality_values(indice, agregados, nivel)
+            mapas.append(cached_choropleth(
+                valores, f'Internações por 100 mil habitantes - {titulo} (período completo)', nivel
+            ))
+        return mapas
+    
+    def create_clusters_table(self, max_rows=5):
+        """Cria tabela dos conglomerados espaço-temporais mais prováveis"""
+        if self.conglomerados is None or self.conglomerados.empty:
+            return pd.DataFrame()
+        
+        tabela = self.conglomerados.head(max_rows)
+        return pd.DataFrame({
+            'Centro': tabela['Centro'].astype(str),
+            'Municípios': tabela['N_Municipios'],
+            'Período': tabela['Inicio'].astype(str) + ' a ' + tabela['Fim'].astype(str),
+            'Obs.': tabela['Observado'],
+            'Esp.': tabela['Esperado'].map('{:.1f}'.format),
+            'O/E': tabela['Razao_O_E'].map('{:.2f}'.format),
+            'p': tabela['p_valor'].map('{:.3f}'.format)
+        })
+    
+    def create_quality_table(self, max_rows=12):
+        """Cria tabela das verificações de qualidade com mais ocorrências nos dados brutos"""
+        tabelas = [t for t in (self.qualidade_mortalidade, self.qualidade_morbidade) if t is not None and not t.empty]
+        if not tabelas:
+            return pd.DataFrame()
+        
+        tabela = pd.concat(tabelas, ignore_index=True)
+        tabela = tabela[(tabela['Coluna'] != '(registro)') & (tabela['Ocorrencias'] > 0)]
+        tabela = tabela.sort_values('Ocorrencias', ascending=False).head(max_rows)
+        return pd.DataFrame({
+            'Sistema': tabela['Sistema'],
+            'Coluna': tabela['Coluna'],
+            'Problema': tabela['Descricao'].astype(str).str[:45],
+            'Registros': tabela['Ocorrencias'],
+            '% dos Registros': tabela['Percentual'].map('{:.2f}'.format),
+            'Partições': tabela['Particoes_Afetadas']
+        })
+    
+    def describe_quality(self):
+        """Texto com a proporção de registros brutos com algum problema de qualidade, por sistema"""
+        frases = []
+        for tabela in (self.qualidade_mortalidade, self.qualidade_morbidade):
+            if tabela is None or tabela.empty:
+                continue
+            geral = tabela[tabela['Coluna'] == '(registro)']
+            if geral.empty:
+                continue
+            linha = geral.iloc[0]
+            frases.append(f"{linha['Sistema']}: {int(linha['Ocorrencias'])} de {int(linha['Registros'])} "
+                          f"registros ({linha['Percentual']:.1f}%) com pelo menos um problema")
+        return '; '.join(frases)
+    
     def generate_pdf_report(self):
         """Gera o relatório PDF completo"""
+        from reportlab.lib.pagesizes import A4
+        from reportlab.lib.units import inch
+        from reportlab.platypus import Image, PageBreak, Paragraph, SimpleDocTemplate, Spacer
+        
         print("📄 Gerando relatório PDF...")
         
         # Criar documento
@@ -339,21 +813,25 @@ class DiabetesReportGenerator:
         summary_df = self.create_summary_statistics()
         if not summary_df.empty:
             # Converter DataFrame para tabela
-            table_data = [summary_df.columns.tolist()] + summary_df.values.tolist()
-            table = Table(table_data)
-            table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black)
-            ]))
+            table = self.build_table(summary_df)
             story.append(table)
             story.append(Spacer(1, 20))
         
+        # Taxas por 100 mil habitantes
+        rates_df = self.create_rates_table()
+        if not rates_df.empty:
+            story.append(Paragraph("Taxas por 100 mil Habitantes (0 a 14 anos)", self.subtitle_style))
+            rates_text = """
+            Taxas calculadas com as estimativas populacionais do IBGE por município, sexo e faixa etária
+            (tabela local em dados/referencia/). As taxas padronizadas usam o método direto com a
+            População Mundial Padrão da OMS nas faixas 0-4, 5-9 e 10-14 anos, com intervalo de confiança
+            gama (Fay-Feuer). Os valores por município e por faixa etária estão nas abas Taxas_Brutas,
+            Taxas_Idade e Taxas_Padronizadas dos arquivos Excel.
+            """
+            story.append(Paragraph(rates_text, self.normal_style))
+            story.append(self.build_table(rates_df, font_size=8))
+            story.append(Spacer(1, 20))
+        
         # Análise de Mortalidade
         story.append(PageBreak())
         story.append(Paragraph("2. ANÁLISE DE MORTALIDADE", self.subtitle_style))
@@ -383,7 +861,7 @@ class DiabetesReportGenerator:
         Hospitalares (SIH-SUS), focando em internações de crianças de 0 a 14 anos por diabetes 
         tipo 1 (E10) e tipo 2 (E11) no período de 2020 a 2025.
         """
-        story.append(Paragraph(morbidade_text, self.normal_style))
+        story.append(Paragraph(morbidade_text + self.describe_episodes(), self.normal_style))
         story.append(Spacer(1, 10))
         
         # Adicionar gráficos de morbidade
@@ -394,6 +872,120 @@ class DiabetesReportGenerator:
                 story.append(img)
                 story.append(Spacer(1, 10))
         
+        # Padrões sazonais
+        seasonality_charts = self.create_seasonality_charts()
+        if seasonality_charts:
+            story.append(Paragraph("3.1 Séries Mensais e Padrões Sazonais", self.subtitle_style))
+            seasonality_text = self.describe_seasonality() or """
+            A série mensal ainda não cobre dois anos completos, necessários para estimar os índices sazonais.
+            """
+            story.append(Paragraph(seasonality_text, self.normal_style))
+            story.append(Spacer(1, 10))
+            for chart in seasonality_charts:
+                if os.path.exists(chart):
+                    img = Image(chart, width=6*inch, height=3*inch)
+                    story.append(img)
+                    story.append(Spacer(1, 10))
+        
+        # Intervalos de confiança dos indicadores anuais
+        ic_morbidade = self.create_confidence_table(self.intervalos_morbidade, {
+            'Total_Casos': 'Internações',
+            'Idade_Media': 'Idade Média',
+            'Dias_Internacao_Media': 'Dias Internação',
+            'Valor_Medio_Internacao': 'Valor Médio (R$)'
+        })
+        ic_mortalidade = self.create_confidence_table(self.intervalos_mortalidade, {
+            'Total_Casos': 'Óbitos',
+            'Idade_Media': 'Idade Média (óbitos)'
+        })
+        if not ic_morbidade.empty or not ic_mortalidade.empty:
+            story.append(Paragraph("3.2 Incerteza dos Indicadores Anuais", self.subtitle_style))
+            ic_text = """
+            Estimativas anuais com intervalo de confiança de 95%. Contagens usam o intervalo exato de
+            Poisson; médias, medianas e totais usam bootstrap percentil com semente fixa (resultados
+            reprodutíveis). Todos os indicadores estão na aba IC_Bootstrap dos arquivos Excel.
+            """
+            story.append(Paragraph(ic_text, self.normal_style))
+            story.append(Spacer(1, 10))
+            for tabela in (ic_morbidade, ic_mortalidade):
+                if not tabela.empty:
+                    story.append(self.build_table(tabela, font_size=8))
+                    story.append(Spacer(1, 10))
+        
+        # Conglomerados espaço-temporais de internações
+        clusters_df = self.create_clusters_table()
+        if not clusters_df.empty:
+            story.append(Paragraph("3.3 Conglomerados Espaço-Temporais", self.subtitle_style))
+            significativos = int(self.conglomerados['Significativo'].sum())
+            clusters_text = f"""
+            Varredura espaço-temporal de permutação sobre as internações por município de residência e
+            mês (zonas formadas pelo município central e seus vizinhos mais próximos, janelas de até três
+            meses, significância por Monte Carlo). Foram encontrados {significativos} conglomerado(s)
+            com p &lt; 0,05. A lista completa está na aba Conglomerados_Espaco_Tempo.
+            """
+            story.append(Paragraph(clusters_text, self.normal_style))
+            story.append(Spacer(1, 10))
+            story.append(self.build_table(clusters_df, font_size=8))
+            story.append(Spacer(1, 10))
+        
+        # Custos reais das internações (deflacionados pelo IPCA)
+        costs_df = self.create_costs_table()
+        if not costs_df.empty:
+            story.append(Paragraph("3.4 Custos Reais das Internações", self.subtitle_style))
+            referencia = self.custos_anuais['Mes_Referencia'].iloc[0]
+            costs_text = f"""
+            Os valores das AIHs são nominais; para comparar anos, cada internação foi deflacionada pelo
+            IPCA do mês de internação e expressa em reais de {referencia}. SH e SP são as parcelas de
+            serviços hospitalares e profissionais. As tabelas completas estão nas abas
+            Custos_Deflacionados e Custos_Procedimento.
+            """
+            story.append(Paragraph(costs_text, self.normal_style))
+            story.append(Spacer(1, 10))
+            story.append(self.build_table(costs_df, font_size=8))
+            story.append(Spacer(1, 10))
+            procedures_df = self.create_procedure_costs_table()
+            if not procedures_df.empty:
+                story.append(self.build_table(procedures_df, font_size=8))
+                story.append(Spacer(1, 10))
+        
+        # Carga hospitalar por estabelecimento (CNES)
+        hospitals_df = self.create_hospitals_table()
+        if not hospitals_df.empty:
+            story.append(Paragraph("3.5 Carga Hospitalar por Estabelecimento", self.subtitle_style))
+            concentracao = self.carga_hospitalar['Percentual_Internacoes'].head(3).sum()
+            hospitals_text = f"""
+            Internações, dias de leito e custo por estabelecimento (CNES). Os três estabelecimentos com
+            mais internações concentram {concentracao:.1f}% do total. A ocupação é o censo diário de
+            pacientes internados por diabetes dividido pelos leitos pediátricos cadastrados; a curva
+            mensal completa está na aba Carga_Hospitalar_Mensal.
+            """
+            story.append(Paragraph(hospitals_text, self.normal_style))
+            story.append(Spacer(1, 10))
+            story.append(self.build_table(hospitals_df, font_size=8))
+            story.append(Spacer(1, 10))
+            load_chart = self.create_hospital_load_chart()
+            if load_chart and os.path.exists(load_chart):
+                story.append(Image(load_chart, width=6*inch, height=3*inch))
+                story.append(Spacer(1, 10))
+        
+        # Distribuição por região de saúde (tabela e mapas por nível)
+        regional_df = self.create_regional_table()
+        if not regional_df.empty:
+            story.append(Paragraph("3.6 Distribuição por Região de Saúde", self.subtitle_style))
+            regional_text = """
+            Casos e taxas do período completo (casos por 100 mil pessoas-ano) por região de saúde. Os
+            agregados por município, região de saúde, macrorregião e UF, ano a ano, estão na aba
+            Agregados_Regionais; os mapas colorem cada município pela taxa da sua unidade.
+            """
+            story.append(Paragraph(regional_text, self.normal_style))
+            story.append(Spacer(1, 10))
+            story.append(self.build_table(regional_df, font_size=8))
+            story.append(Spacer(1, 10))
+            for mapa in self.create_regional_maps():
+                if os.path.exists(mapa):
+                    story.append(Image(mapa, width=5*inch, height=4*inch))
+                    story.append(Spacer(1, 10))
+        
         # Análise Comparativa
         story.append(PageBreak())
         story.append(Paragraph("4. ANÁLISE COMPARATIVA", self.subtitle_style))
@@ -413,14 +1005,54 @@ class DiabetesReportGenerator:
             story.append(img)
             story.append(Spacer(1, 10))
         
+        # Óbitos precedidos de internação (pareamento SIM x SIH)
+        if self.indicadores_vinculacao is not None and not self.indicadores_vinculacao.empty:
+            story.append(Paragraph("Óbitos Precedidos de Internação", self.subtitle_style))
+            total = self.indicadores_vinculacao.iloc[-1]
+            linkage_text = f"""
+            Pareamento probabilístico dos óbitos (SIM-DO) com as internações (SIH-SUS), com blocagem por
+            município de residência, sexo e ano de nascimento e pesos de Fellegi-Sunter. No total,
+            {int(total['Obitos_Com_Internacao'])} de {int(total['Obitos'])} óbitos
+            ({total['Percentual_Com_Internacao']:.1f}%) foram vinculados a ao menos uma internação por diabetes.
+            Os pares e seus escores estão no arquivo {self.pareamento_file}.
+            """
+            story.append(Paragraph(linkage_text, self.normal_style))
+            vinculacao = self.indicadores_vinculacao.rename(columns={
+                'ANO': 'Ano',
+                'Obitos': 'Óbitos',
+                'Obitos_Com_Internacao': 'Com Internação',
+                'Percentual_Com_Internacao': '%',
+                'Obitos_Na_Internacao': 'Durante Internação',
+                'Media_Internacoes_Previas': 'Internações/Óbito',
+                'Mediana_Dias_Ultima_Internacao': 'Dias (mediana)'
+            }).fillna('-')
+            story.append(self.build_table(vinculacao, font_size=7))
+            story.append(Spacer(1, 10))
+        
+        # Tendências anuais (Poisson log-linear e joinpoint)
+        trends_df = self.create_trends_table()
+        if not trends_df.empty:
+            story.append(Paragraph("Tendências Anuais", self.subtitle_style))
+            trends_text = """
+            Variação percentual anual (APC) estimada por regressão de Poisson log-linear, com erro
+            padrão corrigido para sobredispersão. A coluna Joinpoint mostra o ano de mudança de
+            tendência quando o modelo segmentado é preferido pelo BIC. Tendências mensais e por
+            município estão nas abas Tendencias e Joinpoints dos arquivos Excel.
+            """
+            story.append(Paragraph(trends_text, self.normal_style))
+            story.append(self.build_table(trends_df, font_size=7))
+            story.append(Spacer(1, 10))
+        
         # Conclusões
         story.append(PageBreak())
         story.append(Paragraph("5. CONCLUSÕES E RECOMENDAÇÕES", self.subtitle_style))
         
-        conclusions_text = """
+        tendencias_text = self.describe_trends() or \
+            "• A análise temporal permite identificar tendências e padrões sazonais<br/>"
+        conclusions_text = f"""
         <b>Principais Achados:</b><br/>
         • Os dados demonstram a importância do monitoramento contínuo do diabetes infantil no Amazonas<br/>
-        • A análise temporal permite identificar tendências e padrões sazonais<br/>
+        {tendencias_text}
         • A comparação entre mortalidade e morbidade oferece insights sobre a eficácia dos tratamentos<br/><br/>
         
         <b>Recomendações:</b><br/>
@@ -431,6 +1063,41 @@ class DiabetesReportGenerator:
         """
         story.append(Paragraph(conclusions_text, self.normal_style))
         
+        # Anexo: qualidade dos dados brutos (perfil por partição na ingestão)
+        quality_df = self.create_quality_table()
+        quality_summary = self.describe_quality()
+        if quality_summary:
+            story.append(PageBreak())
+            story.append(Paragraph("ANEXO - QUALIDADE DOS DADOS BRUTOS", self.subtitle_style))
+            quality_text = f"""
+            Contagens de valores nulos, códigos inválidos, idades fora da faixa, datas impossíveis,
+            permanências impossíveis e municípios desconhecidos em todos os registros baixados do DATASUS,
+            antes dos filtros das coortes ({quality_summary}). Registros com valores inválidos podem ser
+            descartados pelos filtros sem aviso; o detalhamento por partição está nas abas Qualidade_Dados
+            e Qualidade_Particoes.
+            """
+            story.append(Paragraph(quality_text, self.normal_style))
+            story.append(Spacer(1, 10))
+            if not quality_df.empty:
+                story.append(self.build_table(quality_df, font_size=7))
+                story.append(Spacer(1, 10))
+        
+        # Anexo: consultas SQL ad hoc gravadas nos arquivos Excel
+        if self.consultas_sql:
+            story.append(PageBreak())
+            story.append(Paragraph("ANEXO - CONSULTAS SQL", self.subtitle_style))
+            anexo_text = """
+            Resultados de consultas ad hoc executadas com scripts/consultas_sql.py sobre os dados
+            brutos, as coortes filtradas e o cubo de agregados (primeiras 15 linhas de cada consulta).
+            """
+            story.append(Paragraph(anexo_text, self.normal_style))
+            for aba, tabela in self.consultas_sql.items():
+                if tabela is None or tabela.empty:
+                    continue
+                story.append(Paragraph(aba[len(PREFIXO_ABA):].replace('_', ' '), self.subtitle_style))
+                story.append(self.build_table(tabela.head(15).round(2).fillna('-'), font_size=7))
+                story.append(Spacer(1, 10))
+        
         # Rodapé
         story.append(Spacer(1, 30))
         footer_text = """
@@ -445,7 +1112,9 @@ class DiabetesReportGenerator:
         # Limpar arquivos temporários
         temp_files = ['temp_mortality_year.png', 'temp_mortality_age.png', 
                      'temp_morbidity_year.png', 'temp_morbidity_type.png', 
-                     'temp_morbidity_days.png', 'temp_comparison.png']
+                     'temp_morbidity_days.png', 'temp_comparison.png',
+                     'temp_seasonality_series.png', 'temp_seasonality_index.png',
+                     'temp_hospital_load.png']
         
         for temp_file in temp_files:
             if os.path.exists(temp_file):
@@ -453,6 +1122,18 @@ class DiabetesReportGenerator:
         
         print(f"✅ Relatório PDF gerado: {self.output_pdf}")
     
+    def export_dashboard(self):
+        """Gera o painel HTML a partir das abas de agregados já carregadas para o PDF"""
+        tabelas = {
+            'serie_mensal_morbidade': self.serie_mensal_morbidade,
+            'serie_mensal_mortalidade': self.serie_mensal_mortalidade,
+            'regionais_morbidade': self.regionais_morbidade,
+            'regionais_mortalidade': self.regionais_mortalidade,
+            'custos_anuais': self.custos_anuais,
+        }
+        export_dashboard({chave: tabela for chave, tabela in tabelas.items() if tabela is not None},
+                         ARQUIVO_PAINEL)
+    
     def generate_report(self):
         """Método principal para gerar o relatório completo"""
         print("Iniciando geracao do relatorio PDF...")
@@ -460,10 +1141,17 @@ class DiabetesReportGenerator:
         
         try:
             # Carregar dados
-            self.load_data()
+            with timed('relatorio_etapa_segundos', 'INFO', etapa='dados'):
+                self.load_data()
             
             # Gerar PDF
-            self.generate_pdf_report()
+            with timed('relatorio_etapa_segundos', 'INFO', etapa='pdf') as campos:
+                self.generate_pdf_report()
+                campos['bytes'] = os.path.getsize(self.output_pdf)
+            
+            # Painel HTML interativo com os mesmos agregados
+            with timed('relatorio_etapa_segundos', 'INFO', etapa='painel'):
+                self.export_dashboard()
             
             print("=" * 60)
             print("✅ Relatório gerado com sucesso!")
@@ -475,6 +1163,8 @@ class DiabetesReportGenerator:
                 print(f"📊 Tamanho: {size_kb:.1f} KB")
             
         except Exception as e:
+            count('erros_total', etapa='relatorio')
+            event('erro_relatorio', 'ERROR', erro=str(e))
             print(f"❌ Erro na geração do relatório: {e}")
 
 def main():
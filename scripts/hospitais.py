@@ -0,0 +1,260 @@
+"""
+Carga Hospitalar por Estabelecimento (CNES) - SIH-SUS
+
+Este módulo mostra quais hospitais concentram as internações por diabetes
+infantil: internações, dias de leito e custo por estabelecimento (CNES) e mês,
+e uma curva de carga no estilo taxa de ocupação (censo diário de pacientes
+internados dividido pelos leitos pediátricos do estabelecimento).
+
+A tabela local do CNES é compilada em um índice (código -> posição) resolvido
+uma vez por código distinto. O censo diário de todos os estabelecimentos sai
+de uma única matriz de diferenças (estabelecimento x dia): +1 na internação,
+-1 na saída, soma acumulada ao longo dos dias.
+
+Autor: GitHub Copilot
+Data: 2025
+"""
+
+import numpy as np
+import pandas as pd
+
+from referencias import load_reference_table
+
+ARQUIVO_CNES = 'estabelecimentos_cnes.csv'
+
+# Abas do Excel (chave em stats -> nome da aba)
+ABAS_HOSPITAIS = [
+    ('carga_hospitalar', 'Carga_Hospitalar'),
+    ('carga_hospitalar_mensal', 'Carga_Hospitalar_Mensal'),
+]
+
+# Rótulo dos estabelecimentos ausentes da tabela do CNES
+SEM_CADASTRO = 'Não cadastrado'
+
+
+def normalize_cnes(codes):
+    """Normaliza códigos CNES para 7 dígitos, em texto, tratando cada valor distinto uma vez"""
+    codigos, unicos = pd.factorize(codes)
+    normalizados = pd.Index(unicos).astype(str).str.strip().str.zfill(7)
+    return pd.Series(np.append(normalizados, pd.NA)[codigos], index=codes.index, dtype='string')
+
+
+def create_sample_establishments(df):
+    """
+    Cria um cadastro fictício para os estabelecimentos (CNES) do DataFrame
+
+    Args:
+        df (pd.DataFrame): Internações com a coluna CNES
+
+    Returns:
+        pd.DataFrame: Tabela no formato de estabelecimentos_cnes.csv
+    """
+    print("🔄 Gerando cadastro de estabelecimentos de exemplo para demonstração...")
+    rng = np.random.default_rng(42)
+
+    codigos = np.sort(normalize_cnes(df['CNES']).dropna().unique())
+    tabela = pd.DataFrame({
+        'CNES': codigos,
+        'NOME_FANTASIA': [f'Hospital Exemplo {i + 1}' for i in range(len(codigos))],
+        'LEITOS_PEDIATRICOS': rng.integers(5, 40, len(codigos)),
+    })
+
+    print("📝 IMPORTANTE: Cadastro de estabelecimentos fictício para demonstração!")
+    return tabela
+
+
+def build_establishment_index(tabela):
+    """
+    Compila o cadastro do CNES em um índice por código
+
+    Args:
+        tabela (pd.DataFrame): Colunas CNES, NOME_FANTASIA e LEITOS_PEDIATRICOS
+
+    Returns:
+        dict: 'codigos' (pd.Index), 'nomes' e 'leitos' (np.ndarray alinhados ao índice)
+    """
+    tabela = tabela.assign(CNES=normalize_cnes(tabela['CNES'])).dropna(subset=['CNES'])
+    tabela = tabela.drop_duplicates('CNES', keep='last')
+    leitos = np.full(len(tabela), np.nan)
+    if 'LEITOS_PEDIATRICOS' in tabela.columns:
+        leitos = pd.to_numeric(tabela['LEITOS_PEDIATRICOS'], errors='coerce').to_numpy(dtype=float)
+    return {
+        'codigos': pd.Index(tabela['CNES'].to_numpy()),
+        'nomes': tabela.get('NOME_FANTASIA', tabela['CNES']).astype(str).to_numpy(),
+        # Sem leitos informados (ou zero) a ocupação fica indefinida
+        'leitos': np.where(leitos > 0, leitos, np.nan),
+    }
+
+
+def load_establishment_index(df=None, filename=ARQUIVO_CNES):
+    """
+    Carrega o cadastro local do CNES e compila o índice
+
+    Se a tabela não existir e df for informado, usa um cadastro de exemplo.
+
+    Args:
+        df (pd.DataFrame): Dados analisados (usados apenas no modo de demonstração)
+        filename (str): Tabela em dados/referencia/ ou caminho completo
+
+    Returns:
+        dict: Índice de estabelecimentos (ver build_establishment_index) ou None
+    """
+    tabela = load_reference_table(filename, dtype={'CNES': str})
+    if tabela is None:
+        if df is None or df.empty or df['CNES'].isna().all():
+            return None
+        tabela = create_sample_establishments(df)
+    return build_establishment_index(tabela)
+
+
+def establishment_positions(codes, indice):
+    """
+    Posição de cada internação no índice de estabelecimentos
+
+    Códigos ausentes do cadastro recebem a posição extra len(indice['codigos']).
+
+    Args:
+        codes (pd.Series): CNES das internações
+        indice (dict): Índice de estabelecimentos
+
+    Returns:
+        np.ndarray: Posição de cada internação
+    """
+    codigos, unicos = pd.factorize(normalize_cnes(codes))
+    tabela = indice['codigos'].get_indexer(unicos)
+    tabela = np.append(np.where(tabela >= 0, tabela, len(indice['codigos'])), len(indice['codigos']))
+    return tabela[codigos]
+
+
+def daily_census(posicoes, entradas, saidas, n_establishments, first_day, n_days):
+    """
+    Censo diário de pacientes internados por estabelecimento
+
+    O paciente ocupa o leito do dia da internação até a véspera da saída
+    (no mínimo um dia).
+
+    Args:
+        posicoes (np.ndarray): Posição do estabelecimento de cada internação
+        entradas (np.ndarray): Dia da internação (dias desde 1970)
+        saidas (np.ndarray): Dia da saída (dias desde 1970)
+        n_establishments (int): Número de estabelecimentos (linhas da matriz)
+        first_day (int): Primeiro dia da matriz
+        n_days (int): Número de dias da matriz
+
+    Returns:
+        np.ndarray: Matriz (estabelecimento x dia) de pacientes internados
+    """
+    inicio = np.clip(entradas - first_day, 0, n_days)
+    fim = np.clip(np.maximum(saidas, entradas + 1) - first_day, 0, n_days)
+    largura = n_days + 1
+    diferencas = (np.bincount(posicoes * largura + inicio, minlength=n_establishments * largura)
+                  - np.bincount(posicoes * largura + fim, minlength=n_establishments * largura))
+    return diferencas.reshape(n_establishments, largura).cumsum(axis=1)[:, :n_days]
+
+
+def create_hospital_load_analysis(df, date_in='DATA_INTERNACAO', date_out='DATA_SAIDA', indice=None):
+    """
+    Calcula a carga hospitalar por estabelecimento e por estabelecimento x mês
+
+    Args:
+        df (pd.DataFrame): Internações com CNES e datas convertidas (ver datas.py)
+        date_in (str): Coluna de data de internação
+        date_out (str): Coluna de data de saída
+        indice (dict): Índice de estabelecimentos (padrão: load_establishment_index)
+
+    Returns:
+        dict: 'carga_hospitalar' e 'carga_hospitalar_mensal' (pd.DataFrame)
+    """
+    print("🏥 Calculando carga hospitalar por estabelecimento (CNES)...")
+
+    vazio = {chave: pd.DataFrame() for chave, _ in ABAS_HOSPITAIS}
+    if df.empty or 'CNES' not in df.columns or date_in not in df.columns:
+        print("   ⚠️ Coluna CNES ou data de internação não encontrada")
+        return vazio
+
+    dados = df[df[date_in].notna()]
+    indice = indice if indice is not None else load_establishment_index(dados)
+    if indice is None or dados.empty:
+        return vazio
+
+    n_estab = len(indice['codigos']) + 1
+    posicoes = establishment_positions(dados['CNES'], indice)
+
+    # Dias desde 1970; saída ausente -> internação + DIAS_PERM
+    entradas = dados[date_in].to_numpy(dtype='datetime64[D]').astype(np.int64)
+    permanencia = pd.to_numeric(dados.get('DIAS_PERM', pd.Series(0, index=dados.index)), errors='coerce')
+    estimadas = entradas + permanencia.fillna(0).clip(lower=0).to_numpy(dtype=np.int64)
+    if date_out in dados.columns:
+        saidas = dados[date_out].to_numpy(dtype='datetime64[D]')
+        saidas = np.where(np.isnat(saidas), estimadas, saidas.astype(np.int64))
+    else:
+        saidas = estimadas
+
+    # Grade mensal (estabelecimento x mês) e censo diário
+    primeiro_mes = np.datetime64(dados[date_in].min(), 'M')
+    ultimo_mes = np.datetime64(pd.Timestamp(saidas.max(), unit='D'), 'M')
+    meses = np.arange(primeiro_mes, ultimo_mes + 1)
+    primeiro_dia = int(meses[0].astype('datetime64[D]').astype(np.int64))
+    dias = np.arange(primeiro_dia, int((meses[-1] + 1).astype('datetime64[D]').astype(np.int64)))
+    mes_do_dia = (dias.astype('datetime64[D]').astype('datetime64[M]') - meses[0]).astype(np.int64)
+
+    censo = daily_census(posicoes, entradas, saidas, n_estab, primeiro_dia, len(dias))
+
+    n_meses = len(meses)
+    mes_internacao = (dados[date_in].to_numpy(dtype='datetime64[M]') - meses[0]).astype(np.int64)
+    celulas = posicoes * n_meses + mes_internacao
+    internacoes = np.bincount(celulas, minlength=n_estab * n_meses).reshape(n_estab, n_meses)
+    coluna_custo = 'VAL_TOT_REAL' if 'VAL_TOT_REAL' in dados.columns else 'VAL_TOT'
+    custo = np.zeros((n_estab, n_meses))
+    if coluna_custo in dados.columns:
+        valores = pd.to_numeric(dados[coluna_custo], errors='coerce').fillna(0).to_numpy(dtype=float)
+        custo = np.bincount(celulas, weights=valores, minlength=n_estab * n_meses).reshape(n_estab, n_meses)
+
+    # Dias de leito, censo médio e máximo por mês a partir do censo diário
+    dias_mes = np.bincount(mes_do_dia, minlength=n_meses)
+    inicio_mes = np.concatenate([[0], np.cumsum(dias_mes)[:-1]])
+    dias_leito = np.add.reduceat(censo, inicio_mes, axis=1)
+    censo_maximo = np.maximum.reduceat(censo, inicio_mes, axis=1)
+    leitos = np.append(indice['leitos'], np.nan)
+    ocupacao = 100 * dias_leito / (leitos[:, None] * dias_mes[None, :])
+
+    codigos = np.append(indice['codigos'].to_numpy(dtype=object), SEM_CADASTRO)
+    nomes = np.append(indice['nomes'], SEM_CADASTRO)
+
+    # Tabela mensal: apenas estabelecimentos x meses com alguma carga
+    linhas, colunas = np.nonzero((internacoes > 0) | (dias_leito > 0))
+    mensal = pd.DataFrame({
+        'CNES': codigos[linhas],
+        'Estabelecimento': nomes[linhas],
+        'Mes': pd.PeriodIndex(meses[colunas], freq='M').astype(str),
+        'Internacoes': internacoes[linhas, colunas],
+        'Dias_Leito': dias_leito[linhas, colunas],
+        'Custo': custo[linhas, colunas].round(2),
+        'Censo_Medio': (dias_leito[linhas, colunas] / dias_mes[colunas]).round(2),
+        'Censo_Maximo': censo_maximo[linhas, colunas],
+        'Leitos_Pediatricos': leitos[linhas],
+        'Ocupacao_%': ocupacao[linhas, colunas].round(2),
+    })
+
+    # Resumo por estabelecimento, do maior para o menor número de internações
+    total_internacoes = internacoes.sum(axis=1)
+    total_dias_leito = dias_leito.sum(axis=1)
+    usados = np.flatnonzero((total_internacoes > 0) | (total_dias_leito > 0))
+    resumo = pd.DataFrame({
+        'CNES': codigos[usados],
+        'Estabelecimento': nomes[usados],
+        'Internacoes': total_internacoes[usados],
+        'Percentual_Internacoes': (100 * total_internacoes[usados] / max(total_internacoes.sum(), 1)).round(2),
+        'Dias_Leito': total_dias_leito[usados],
+        'Custo_Total': custo.sum(axis=1)[usados].round(2),
+        'Censo_Medio': (total_dias_leito[usados] / len(dias)).round(2),
+        'Censo_Maximo': censo.max(axis=1)[usados],
+        'Leitos_Pediatricos': leitos[usados],
+        'Ocupacao_Media_%': (100 * total_dias_leito[usados] / (leitos[usados] * len(dias))).round(2),
+        'Ocupacao_Maxima_Mensal_%': ocupacao[usados].max(axis=1).round(2),
+    }).sort_values(['Internacoes', 'Dias_Leito'], ascending=False, kind='stable').reset_index(drop=True)
+
+    sem_cadastro = int(total_internacoes[-1])
+    print(f"   {len(resumo)} estabelecimentos x {n_meses} meses | {sem_cadastro} internações sem cadastro no CNES")
+    print(f"   ✅ Carga hospitalar calculada!")
+    return {'carga_hospitalar': resumo, 'carga_hospitalar_mensal': mensal}
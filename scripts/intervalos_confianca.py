@@ -0,0 +1,236 @@
+"""
+Intervalos de Confiança Bootstrap para Indicadores Anuais
+
+Este módulo calcula intervalos de confiança para os indicadores anuais de
+create_detailed_yearly_analysis (médias, medianas e totais) por bootstrap em
+lotes: cada lote sorteia de uma vez todas as suas réplicas (matriz de índices
+ou, para variáveis discretas, contagens multinomiais por valor) e calcula as
+estatísticas ao longo do eixo das réplicas. Grupos grandes têm os
+lotes distribuídos em um pool de processos, que anexam os valores de arquivos
+mapeados em memória em vez de recebê-los por pickle. As sementes de cada lote derivam
+de (semente, grupo, lote), então o resultado não depende do número de
+processos. Contagens anuais usam o intervalo exato de Poisson.
+
+Autor: GitHub Copilot
+Data: 2025
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from coorte_compartilhada import attach_array, shared_arrays
+
+# Indicadores: (coluna, estatística, nome do indicador)
+METRICAS_MORBIDADE = [
+    ('IDADE', 'mean', 'Idade_Media'),
+    ('IDADE', 'median', 'Idade_Mediana'),
+    ('DIAS_PERM', 'mean', 'Dias_Internacao_Media'),
+    ('DIAS_PERM', 'median', 'Dias_Internacao_Mediana'),
+    ('DIAS_PERM', 'sum', 'Total_Dias_Internacao'),
+    ('VAL_TOT', 'mean', 'Valor_Medio_Internacao'),
+    ('VAL_TOT', 'median', 'Valor_Mediano_Internacao'),
+    ('VAL_TOT', 'sum', 'Valor_Total_Internacoes'),
+    ('VAL_TOT_REAL', 'mean', 'Valor_Real_Medio_Internacao'),
+    ('VAL_TOT_REAL', 'sum', 'Valor_Real_Total_Internacoes'),
+]
+
+METRICAS_MORTALIDADE = [
+    ('IDADE_ANOS', 'mean', 'Idade_Media'),
+    ('IDADE_ANOS', 'median', 'Idade_Mediana'),
+]
+
+REPLICAS_PADRAO = 10_000
+SEMENTE_PADRAO = 42
+NIVEL_CONFIANCA = 0.95
+
+# Elementos sorteados por lote (réplicas x n) e limite para usar o pool de processos
+ELEMENTOS_POR_LOTE = 2_000_000
+LIMIAR_PARALELO = 50_000_000
+
+# Abas do Excel (chave em stats -> nome da aba)
+ABAS_IC = [('intervalos_confianca', 'IC_Bootstrap')]
+
+
+def _bootstrap_batch(values, n_replicates, seed, group, batch):
+    """
+    Sorteia um lote de réplicas e retorna médias e medianas de cada réplica
+
+    Variáveis com poucos valores distintos (idade, dias de permanência) são
+    reamostradas pelas contagens de cada valor (sorteio multinomial), com custo
+    proporcional ao número de valores distintos; as demais sorteiam uma matriz
+    (réplicas x n) de índices.
+
+    Args:
+        values (np.ndarray): Valores do grupo (sem nulos)
+        n_replicates (int): Réplicas neste lote
+        seed (int): Semente base
+        group (int): Índice do grupo (parte da chave da semente)
+        batch (int): Índice do lote (parte da chave da semente)
+
+    Returns:
+        tuple: (médias, medianas) das réplicas
+    """
+    rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(group, batch)))
+    n = len(values)
+    distintos, frequencias = np.unique(values, return_counts=True)
+
+    if len(distintos) * 4 <= n:
+        contagens = rng.multinomial(n, frequencias / n, size=n_replicates)
+        medias = contagens @ distintos / n
+        # Mediana: valores nas posições centrais da amostra ordenada
+        acumulado = contagens.cumsum(axis=1)
+        posicao_inf = (acumulado <= (n - 1) // 2).sum(axis=1)
+        posicao_sup = (acumulado <= n // 2).sum(axis=1)
+        medianas = (distintos[posicao_inf] + distintos[posicao_sup]) / 2
+        return medias, medianas
+
+    indices = rng.integers(0, n, size=(n_replicates, n), dtype=np.int32)
+    amostras = values[indices]
+    return amostras.mean(axis=1), np.median(amostras, axis=1)
+
+
+def _bootstrap_shared(path, n_replicates, seed, group, batch):
+    """Executa _bootstrap_batch sobre os valores do grupo anexados de um arquivo mapeado"""
+    return _bootstrap_batch(attach_array(path), n_replicates, seed, group, batch)
+
+
+def _batches(n, replicates):
+    """Divide as réplicas em lotes de tamanho fixo (depende apenas de n, não dos processos)"""
+    tamanho = max(1, ELEMENTOS_POR_LOTE // max(n, 1))
+    return [min(tamanho, replicates - inicio) for inicio in range(0, replicates, tamanho)]
+
+
+def bootstrap_groups(groups, replicates=REPLICAS_PADRAO, seed=SEMENTE_PADRAO, max_workers=None):
+    """
+    Executa o bootstrap de vários grupos, usando processos para os grupos grandes
+
+    Args:
+        groups (list): Arrays de valores, um por grupo
+        replicates (int): Número de réplicas por grupo
+        seed (int): Semente para reprodutibilidade
+        max_workers (int): Processos do pool (padrão: número de CPUs)
+
+    Returns:
+        list: (médias, medianas) das réplicas de cada grupo
+    """
+    resultados = [None] * len(groups)
+    tarefas = []
+
+    for g, valores in enumerate(groups):
+        lotes = _batches(len(valores), replicates)
+        if len(valores) * replicates >= LIMIAR_PARALELO:
+            tarefas.append((g, lotes))
+        else:
+            partes = [_bootstrap_batch(valores, r, seed, g, b) for b, r in enumerate(lotes)]
+            resultados[g] = tuple(np.concatenate(p) for p in zip(*partes))
+
+    if tarefas:
+        max_workers = max_workers or os.cpu_count() or 1
+        print(f"   Bootstrap paralelo: {len(tarefas)} grupos em {max_workers} processos")
+        # Uma cópia dos valores em disco, compartilhada por todos os processos
+        with shared_arrays({f'g{g}': groups[g] for g, _ in tarefas}) as caminhos, \
+                ProcessPoolExecutor(max_workers=max_workers) as pool:
+            futuros = {
+                g: [pool.submit(_bootstrap_shared, caminhos[f'g{g}'], r, seed, g, b) for b, r in enumerate(lotes)]
+                for g, lotes in tarefas
+            }
+            for g, lista in futuros.items():
+                partes = [f.result() for f in lista]
+                resultados[g] = tuple(np.concatenate(p) for p in zip(*partes))
+
+    return resultados
+
+
+def poisson_interval(counts, confidence=NIVEL_CONFIANCA):
+    """
+    Intervalo exato de Poisson para contagens
+
+    Args:
+        counts (np.ndarray): Contagens observadas
+        confidence (float): Nível de confiança
+
+    Returns:
+        tuple: (limite inferior, limite superior)
+    """
+    from scipy.stats import chi2
+
+    counts = np.asarray(counts, dtype=float)
+    alfa = 1 - confidence
+    inferior = np.where(counts > 0, chi2.ppf(alfa / 2, 2 * counts) / 2, 0.0)
+    superior = chi2.ppf(1 - alfa / 2, 2 * counts + 2) / 2
+    return inferior, superior
+
+
+def create_bootstrap_intervals(df, metrics=None, replicates=REPLICAS_PADRAO, seed=SEMENTE_PADRAO,
+                               max_workers=None):
+    """
+    Calcula intervalos de confiança de todos os indicadores anuais
+
+    Args:
+        df (pd.DataFrame): Registros com a coluna ANO e as colunas das métricas
+        metrics (list): Indicadores (coluna, estatística, nome) (padrão: METRICAS_MORBIDADE)
+        replicates (int): Número de réplicas bootstrap
+        seed (int): Semente para reprodutibilidade
+        max_workers (int): Processos do pool para grupos grandes
+
+    Returns:
+        pd.DataFrame: ANO, Indicador, Estimativa, IC95_Inferior, IC95_Superior, Metodo
+    """
+    print(f"🎯 Calculando intervalos de confiança ({replicates} réplicas bootstrap)...")
+
+    if df.empty or 'ANO' not in df.columns:
+        return pd.DataFrame()
+
+    metrics = METRICAS_MORBIDADE if metrics is None else metrics
+    metrics = [m for m in metrics if m[0] in df.columns]
+    rotulo = f'IC{int(NIVEL_CONFIANCA * 100)}'
+    alfa = 1 - NIVEL_CONFIANCA
+
+    # Contagens anuais: intervalo exato de Poisson
+    casos = df.groupby('ANO').size()
+    inf, sup = poisson_interval(casos.to_numpy())
+    linhas = [pd.DataFrame({
+        'ANO': casos.index, 'Indicador': 'Total_Casos', 'Estimativa': casos.to_numpy(),
+        f'{rotulo}_Inferior': inf, f'{rotulo}_Superior': sup, 'Metodo': 'Poisson exato'
+    })]
+
+    # Um grupo por (ano, coluna); cada grupo serve a média, a mediana e o total
+    colunas = list(dict.fromkeys(m[0] for m in metrics))
+    chaves, grupos = [], []
+    for ano, dados_ano in df.groupby('ANO'):
+        for coluna in colunas:
+            valores = pd.to_numeric(dados_ano[coluna], errors='coerce').dropna().to_numpy(dtype=float)
+            if len(valores):
+                chaves.append((ano, coluna))
+                grupos.append(valores)
+
+    replicas = bootstrap_groups(grupos, replicates, seed, max_workers)
+
+    registros = []
+    for (ano, coluna), valores, (medias, medianas) in zip(chaves, grupos, replicas):
+        distribuicoes = {
+            'mean': (valores.mean(), medias),
+            'median': (np.median(valores), medianas),
+            'sum': (valores.sum(), medias * len(valores)),
+        }
+        for col, estatistica, nome in metrics:
+            if col != coluna:
+                continue
+            estimativa, distribuicao = distribuicoes[estatistica]
+            limites = np.quantile(distribuicao, [alfa / 2, 1 - alfa / 2])
+            registros.append((ano, nome, estimativa, limites[0], limites[1], 'Bootstrap percentil'))
+
+    linhas.append(pd.DataFrame(registros, columns=[
+        'ANO', 'Indicador', 'Estimativa', f'{rotulo}_Inferior', f'{rotulo}_Superior', 'Metodo'
+    ]))
+
+    resultado = pd.concat(linhas, ignore_index=True).sort_values(['ANO', 'Indicador'], kind='stable')
+    resultado[['Estimativa', f'{rotulo}_Inferior', f'{rotulo}_Superior']] = \
+        resultado[['Estimativa', f'{rotulo}_Inferior', f'{rotulo}_Superior']].astype(float).round(2)
+
+    print(f"   {len(grupos)} grupos (ano x variável), {len(metrics)} indicadores")
+    print(f"   ✅ Intervalos de confiança calculados!")
+    return resultado.reset_index(drop=True)
@@ -8,26 +8,43 @@ Autor: GitHub Copilot
 Data: 2025
 """
 
+import argparse
 import pandas as pd
 import numpy as np
 import os
 from datetime import datetime
+import importlib.util
 import warnings
-import requests
-import io
+
+from cid10 import CidCodeSet
+from datas import add_date_columns
+from faixas_etarias import add_age_band
+from analise_temporal import create_time_series_analysis, export_time_series_to_excel
+from taxas import ABAS_TAXAS, create_rate_analysis, load_population_index
+from regioes import ABAS_REGIOES, create_regional_rollups
+from tendencias import ABAS_TENDENCIA, create_trend_analysis
+from intervalos_confianca import ABAS_IC, METRICAS_MORTALIDADE, create_bootstrap_intervals
+from exportacao import write_optional_sheets
+from telemetria import count, event
+from armazenamento import PYARROW_AVAILABLE, read_cohort
+from coorte_compartilhada import cohort_path, write_cohort
+from qualidade import ABAS_QUALIDADE, create_quality_analysis
+from retomada import (ABAS_RETOMADA, StageCheckpoints, data_fingerprint, download_units,
+                      ingest_units, missing_partitions_report)
 
 # Suprimir warnings desnecessários
 warnings.filterwarnings('ignore')
 
-# Tentar importar pydatasus, com fallback se não estiver disponível
-try:
-    from pydatasus import download
-    PYDATASUS_AVAILABLE = True
-    print("✅ Biblioteca pydatasus importada com sucesso")
-except ImportError as e:
-    print(f"AVISO: pydatasus nao esta disponivel ({e})")
+# Verificar se pydatasus está instalado (a importação só ocorre no download)
+PYDATASUS_AVAILABLE = importlib.util.find_spec('pydatasus') is not None
+if PYDATASUS_AVAILABLE:
+    print("✅ Biblioteca pydatasus disponível")
+else:
+    print("AVISO: pydatasus nao esta disponivel")
     print("   Usando metodo alternativo para demonstracao...")
-    PYDATASUS_AVAILABLE = False
+
+# Predicado usado para podar o armazenamento local (IDADE do SIM-DO em dias)
+PREDICADO_ARMAZENAMENTO = {'idade': (0, 5110), 'cid': 'E10-E14'}
 
 def download_datasus_data(start_year=2010, end_year=2023, state='AM'):
     """
@@ -47,26 +64,23 @@ def download_datasus_data(start_year=2010, end_year=2023, state='AM'):
         print("⚠️ pydatasus não disponível - criando dados de exemplo para demonstração")
         return create_sample_data(start_year, end_year)
     
-    all_data = []
+    try:
+        from pydatasus import download
+    except ImportError as e:
+        print(f"⚠️ pydatasus não pôde ser importado ({e}) - criando dados de exemplo para demonstração")
+        return create_sample_data(start_year, end_year)
+    
+    # SIM-DO: um arquivo por ano, gravado e registrado no livro de ingestão assim
+    # que baixado (anos já concluídos não são baixados de novo)
+    all_data = ingest_units(
+        'SIM', state, download_units(start_year, end_year),
+        lambda ano, mes: download.SIM_DO(state, ano),
+    )
     
-    for year in range(start_year, end_year + 1):
-        try:
-            print(f"   Baixando dados de {year}...")
-            
-            # Download dos dados SIM para o ano específico
-            data = download.SIM_DO(state, year)
-            
-            if data is not None and not data.empty:
-                # Adicionar coluna do ano para controle
-                data['ANO'] = year
-                all_data.append(data)
-                print(f"   ✅ {year}: {len(data)} registros baixados")
-            else:
-                print(f"   ⚠️ {year}: Nenhum dado disponível")
-                
-        except Exception as e:
-            print(f"   ❌ Erro ao baixar dados de {year}: {str(e)}")
-            continue
+    if PYARROW_AVAILABLE:
+        # Ler apenas partições/grupos de linhas compatíveis com a coorte
+        armazenados = read_cohort('SIM', state, range(start_year, end_year + 1), PREDICADO_ARMAZENAMENTO)
+        all_data = [armazenados] if not armazenados.empty else []
     
     if all_data:
         # Concatenar todos os DataFrames
@@ -113,6 +127,7 @@ def create_sample_data(start_year=2010, end_year=2023):
             month = np.random.randint(1, 13)
             day = np.random.randint(1, 29)
             dt_obito = f"{day:02d}{month:02d}{year}"
+            dt_nasc = (pd.Timestamp(year, month, day) - pd.Timedelta(days=age_days)).strftime('%d%m%Y')
             
             # Município fictício (códigos do AM)
             municipios_am = ['230440', '230020', '230030', '230100', '230200']  # Alguns códigos de municípios do AM
@@ -120,6 +135,7 @@ def create_sample_data(start_year=2010, end_year=2023):
             
             sample_data.append({
                 'DTOBITO': dt_obito,
+                'DTNASC': dt_nasc,
                 'IDADE': age_days,
                 'SEXO': sex,
                 'CAUSABAS': cause,
@@ -174,20 +190,23 @@ def filter_diabetes_children(df):
     # 2. Filtrar por causa básica de óbito: códigos E10 a E14 (Diabetes mellitus)
     if 'CAUSABAS' in df_filtered.columns:
         # Filtrar códigos CID-10 E10 a E14 (Diabetes)
-        diabetes_codes = df_filtered['CAUSABAS'].str.startswith(('E10', 'E11', 'E12', 'E13', 'E14'), na=False)
+        diabetes_codes = CidCodeSet.parse('E10-E14').match(df_filtered['CAUSABAS'])
         df_filtered = df_filtered[diabetes_codes].copy()
         print(f"   Após filtro de diabetes (E10-E14): {len(df_filtered)}")
     else:
         print("   ⚠️ Coluna CAUSABAS não encontrada")
     
     # 3. Selecionar colunas relevantes
-    relevant_columns = ['DTOBITO', 'IDADE', 'SEXO', 'CAUSABAS', 'MUNRES', 'ANO']
+    relevant_columns = ['DTOBITO', 'DTNASC', 'IDADE', 'SEXO', 'CAUSABAS', 'MUNRES', 'ANO']
     available_columns = [col for col in relevant_columns if col in df_filtered.columns]
     
     if available_columns:
         df_filtered = df_filtered[available_columns].copy()
         print(f"   Colunas selecionadas: {available_columns}")
     
+    count('linhas_examinadas_total', len(df), sistema='SIM')
+    count('linhas_selecionadas_total', len(df_filtered), sistema='SIM')
+    event('filtro_coorte', sistema='SIM', entrada=len(df), saida=len(df_filtered))
     print(f"✅ Filtros aplicados! Registros finais: {len(df_filtered)}")
     return df_filtered
 
@@ -261,11 +280,7 @@ def create_summary_statistics(df):
     # Casos por faixa etária
     if 'IDADE_ANOS' in df.columns:
         # Criar faixas etárias
-        df['FAIXA_ETARIA'] = pd.cut(
-            df['IDADE_ANOS'], 
-            bins=[-1, 4, 9, 14], 
-            labels=['0-4 anos', '5-9 anos', '10-14 anos']
-        )
+        df = add_age_band(df, 'IDADE_ANOS')
         casos_por_faixa = df['FAIXA_ETARIA'].value_counts().reset_index()
         casos_por_faixa.columns = ['Faixa Etária', 'Número de Casos']
     else:
@@ -298,6 +313,7 @@ def export_to_excel(df, stats, filename='diabetes_criancas_am.xlsx'):
         # Aba principal com os dados
         if not df.empty:
             df.to_excel(writer, sheet_name='Dados', index=False)
+            count('linhas_exportadas_total', len(df), aba='Dados')
             print(f"   ✅ Aba 'Dados' criada com {len(df)} registros")
         
         # Aba de resumo
@@ -344,12 +360,66 @@ def export_to_excel(df, stats, filename='diabetes_criancas_am.xlsx'):
             stats['casos_por_faixa_etaria'].to_excel(writer, sheet_name='Resumo', startrow=startrow, index=False)
         
         print(f"   ✅ Aba 'Resumo' criada com estatísticas")
+        
+        # Abas de séries temporais: mensal, semanal e índices sazonais
+        export_time_series_to_excel(writer, stats, 'Obitos')
+        
+        # Abas de taxas por 100 mil habitantes
+        write_optional_sheets(writer, stats, ABAS_TAXAS)
+        
+        # Aba de agregados por município, região de saúde, macrorregião e UF
+        write_optional_sheets(writer, stats, ABAS_REGIOES)
+        
+        # Abas de tendência (APC e joinpoint)
+        write_optional_sheets(writer, stats, ABAS_TENDENCIA)
+        
+        # Aba de intervalos de confiança (óbitos por ano e idade)
+        write_optional_sheets(writer, stats, ABAS_IC)
+        
+        # Aba de partições do DATASUS ausentes no armazenamento local
+        write_optional_sheets(writer, stats, ABAS_RETOMADA)
+        
+        # Abas de qualidade dos dados brutos (nulos, códigos inválidos, datas...)
+        write_optional_sheets(writer, stats, ABAS_QUALIDADE)
     
     print(f"✅ Arquivo {filename} criado com sucesso!")
 
-def main():
+def prepare_sim_cohort(df_raw):
+    """
+    Filtra a coorte, converte a idade para anos e deriva as colunas de data
+    
+    A faixa etária também é criada aqui, antes do checkpoint da etapa: as
+    etapas seguintes não alteram a coorte, e uma execução retomada grava a
+    mesma coorte.
+    
+    Args:
+        df_raw (pd.DataFrame): Registros brutos do SIM-DO
+    
+    Returns:
+        pd.DataFrame: Coorte processada
+    """
+    df_filtered = filter_diabetes_children(df_raw)
+    
+    if df_filtered.empty:
+        print("❌ Nenhum caso de diabetes infantil encontrado nos dados.")
+        # Mesmo assim, criar arquivo Excel vazio com estrutura
+        df_filtered = pd.DataFrame(columns=['DTOBITO', 'DTNASC', 'IDADE', 'SEXO', 'CAUSABAS', 'MUNRES', 'ANO'])
+    
+    # Converter idade para anos
+    df_processed = convert_age_to_years(df_filtered)
+    
+    # Converter datas e derivar mês e semana epidemiológica
+    df_processed = add_date_columns(df_processed, 'SIM')
+    
+    # Faixa etária (0-4, 5-9 e 10-14 anos)
+    return add_age_band(df_processed, 'IDADE_ANOS')
+
+def main(resume=False):
     """
     Função principal que orquestra todo o processo
+    
+    Args:
+        resume (bool): Retoma a partir dos checkpoints da última execução
     """
     print("🚀 Iniciando análise de mortalidade infantil por diabetes - Amazonas")
     print("=" * 70)
@@ -367,22 +437,43 @@ def main():
             print("❌ Não foi possível obter dados. Encerrando execução.")
             return
         
-        # 2. Aplicar filtros
-        df_filtered = filter_diabetes_children(df_raw)
+        # Partições do período ausentes no armazenamento (só com downloads reais)
+        particoes_ausentes = (missing_partitions_report('SIM', 'AM', download_units(2010, 2023))
+                              if PYDATASUS_AVAILABLE else pd.DataFrame())
+        
+        # Qualidade dos dados brutos: perfis gravados na ingestão de cada ano
+        # (downloads reais) ou calculados agora sobre os dados de exemplo
+        qualidade = create_quality_analysis('SIM', 'AM', df_raw,
+                                            units=download_units(2010, 2023) if PYDATASUS_AVAILABLE else None)
+        
+        # Checkpoints por etapa: com --retomar, etapas concluídas para os mesmos
+        # dados brutos são carregadas em vez de recalculadas
+        etapas = StageCheckpoints('mortalidade_sim_am_2010_2023', {'dados': data_fingerprint(df_raw)},
+                                  resume=resume)
+        
+        # 2-4. Filtros, idade em anos e colunas de data (mês e semana epidemiológica)
+        df_processed = etapas.run('coorte', prepare_sim_cohort, df_raw)
+        del df_raw
         
-        if df_filtered.empty:
-            print("❌ Nenhum caso de diabetes infantil encontrado nos dados.")
-            # Mesmo assim, criar arquivo Excel vazio com estrutura
-            df_filtered = pd.DataFrame(columns=['DTOBITO', 'IDADE', 'SEXO', 'CAUSABAS', 'MUNRES', 'ANO'])
+        # 5. Gerar estatísticas
+        stats = etapas.run('estatisticas', create_summary_statistics, df_processed)
+        stats['intervalos_confianca'] = etapas.run('intervalos_confianca', create_bootstrap_intervals,
+                                                   df_processed, METRICAS_MORTALIDADE)
+        stats['particoes_ausentes'] = particoes_ausentes
+        stats.update(qualidade)
         
-        # 3. Converter idade para anos
-        df_processed = convert_age_to_years(df_filtered)
+        # 6. Séries mensais/semanais de óbitos com decomposição sazonal e tendências
+        stats.update(etapas.run('series', create_time_series_analysis, df_processed, 'DATA_OBITO', 'Obitos'))
+        stats.update(etapas.run('tendencias', create_trend_analysis, df_processed, 'DATA_OBITO'))
         
-        # 4. Gerar estatísticas
-        stats = create_summary_statistics(df_processed)
+        # 7. Taxas de mortalidade por 100 mil habitantes (população IBGE) e agregados regionais
+        populacao = load_population_index(df_processed) if not df_processed.empty else None
+        stats.update(etapas.run('taxas', create_rate_analysis, df_processed, indice=populacao))
+        stats.update(etapas.run('regioes', create_regional_rollups, df_processed, populacao))
         
-        # 5. Exportar para Excel
+        # 8. Exportar para Excel e gravar a coorte compartilhada (pareamento e relatórios)
         export_to_excel(df_processed, stats)
+        write_cohort(df_processed, cohort_path('sim_am'))
         
         print("=" * 70)
         print("✅ Análise concluída com sucesso!")
@@ -400,4 +491,7 @@ def main():
         print("pip install -r requirements.txt")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Análise de mortalidade por diabetes (SIM-DO)')
+    parser.add_argument('--retomar', action='store_true',
+                        help='Retoma a partir das etapas concluídas na última execução')
+    main(resume=parser.parse_args().retomar)
\ No newline at end of file
@@ -0,0 +1,159 @@
+"""
+Mapas Coropléticos por Nível de Agregação
+
+Desenha um mapa por nível (município, região de saúde, macrorregião) colorindo
+cada município pelo valor da sua unidade. Os polígonos vêm de um GeoJSON local
+dos municípios; sem ele, as sedes municipais (tabela de coordenadas) são
+desenhadas como pontos coloridos.
+
+As imagens ficam em cache: o nome do arquivo inclui um hash dos valores do
+mapa e da geometria, então cada nível é renderizado uma vez e reaproveitado
+pelos relatórios seguintes enquanto os dados não mudarem.
+
+Autor: GitHub Copilot
+Data: 2025
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from referencias import normalize_municipality, reference_path
+from varredura_espacial import ARQUIVO_COORDENADAS, load_coordinates
+
+ARQUIVO_GEOMETRIA = 'municipios_geometria.geojson'
+PASTA_CACHE = 'cache_mapas'
+
+# Propriedades do GeoJSON aceitas como código do município
+PROPRIEDADES_CODIGO = ['MUNRES', 'CD_MUN', 'CD_GEOCMU', 'codigo_ibge']
+
+
+def load_municipality_shapes(filename=ARQUIVO_GEOMETRIA):
+    """
+    Lê os contornos dos municípios de um GeoJSON local
+
+    Args:
+        filename (str): Arquivo em dados/referencia/ ou caminho completo
+
+    Returns:
+        dict: Código do município (6 dígitos) -> lista de anéis (np.ndarray n x 2),
+            ou None se o arquivo não existir
+    """
+    path = filename if os.path.isabs(filename) or os.path.exists(filename) else reference_path(filename)
+    if not os.path.exists(path):
+        return None
+
+    with open(path, encoding='utf-8') as arquivo:
+        geojson = json.load(arquivo)
+
+    contornos = {}
+    for feature in geojson.get('features', []):
+        propriedades = feature.get('properties') or {}
+        codigo = next((propriedades[p] for p in PROPRIEDADES_CODIGO if p in propriedades), None)
+        geometria = feature.get('geometry') or {}
+        if codigo is None or geometria.get('type') not in ('Polygon', 'MultiPolygon'):
+            continue
+        poligonos = geometria['coordinates']
+        if geometria['type'] == 'Polygon':
+            poligonos = [poligonos]
+        # Apenas o anel externo de cada polígono
+        codigo = str(codigo).strip()[:6]
+        contornos.setdefault(codigo, []).extend(np.asarray(p[0], dtype=float) for p in poligonos)
+    return contornos
+
+
+def render_choropleth(values, title, path, label='Taxa por 100 mil', shapes=None):
+    """
+    Desenha o mapa coroplético e salva em PNG
+
+    Args:
+        values (pd.Series): Valor por código de município (6 dígitos)
+        title (str): Título do mapa
+        path (str): Arquivo PNG de saída
+        label (str): Rótulo da escala de cores
+        shapes (dict): Contornos (ver load_municipality_shapes); sem eles, pontos
+
+    Returns:
+        str: Caminho do arquivo gerado
+    """
+    # matplotlib só é carregado quando um mapa precisa ser desenhado (cache vazio)
+    import matplotlib.pyplot as plt
+    from matplotlib.collections import PolyCollection
+
+    valores = values.dropna()
+    fig, ax = plt.subplots(figsize=(10, 8))
+    normalizacao = plt.Normalize(valores.min(), valores.max()) if len(valores) else None
+
+    if shapes:
+        aneis, cores = [], []
+        for codigo, valor in valores.items():
+            for anel in shapes.get(codigo, []):
+                aneis.append(anel)
+                cores.append(valor)
+        colecao = PolyCollection(aneis, array=np.asarray(cores), cmap='YlOrRd', norm=normalizacao,
+                                 edgecolor='gray', linewidth=0.3)
+        ax.add_collection(colecao)
+        ax.autoscale_view()
+        escala = colecao
+    else:
+        coordenadas = load_coordinates(valores.index.to_numpy()).set_index('MUNRES')
+        coordenadas = coordenadas.join(valores.rename('VALOR'), how='inner')
+        escala = ax.scatter(coordenadas['LONGITUDE'], coordenadas['LATITUDE'], c=coordenadas['VALOR'],
+                            cmap='YlOrRd', norm=normalizacao, s=120, edgecolor='gray')
+
+    fig.colorbar(escala, ax=ax, label=label, shrink=0.8)
+    ax.set_title(title, fontsize=14, pad=20)
+    ax.set_xlabel('Longitude')
+    ax.set_ylabel('Latitude')
+    ax.set_aspect('equal')
+    plt.tight_layout()
+    plt.savefig(path, dpi=200, bbox_inches='tight')
+    plt.close()
+    return path
+
+
+def cached_choropleth(values, title, level, cache_dir=PASTA_CACHE, label='Taxa por 100 mil',
+                      geometry=ARQUIVO_GEOMETRIA):
+    """
+    Retorna o mapa do nível, renderizando apenas se valores ou geometria mudaram
+
+    Args:
+        values (pd.Series): Valor por código de município
+        title (str): Título do mapa
+        level (str): Nível de agregação (parte do nome do arquivo)
+        cache_dir (str): Pasta do cache de imagens
+        label (str): Rótulo da escala de cores
+        geometry (str): GeoJSON dos municípios
+
+    Returns:
+        str: Caminho do PNG em cache
+    """
+    values = pd.Series(values.to_numpy(dtype=float), index=normalize_municipality(values.index.to_series()))
+    # Versão da geometria: GeoJSON ou, sem ele, a tabela de coordenadas das sedes
+    # (sem tabela, coordenadas de exemplo)
+    path_geometria = reference_path(geometry)
+    path_coordenadas = reference_path(ARQUIVO_COORDENADAS)
+    if os.path.exists(path_geometria):
+        versao_geometria = os.path.getmtime(path_geometria)
+    elif os.path.exists(path_coordenadas):
+        versao_geometria = f'pontos:{os.path.getmtime(path_coordenadas)}'
+    else:
+        versao_geometria = 'pontos:exemplo'
+
+    chave = hashlib.sha1()
+    chave.update(f'{title}|{label}|{versao_geometria}'.encode())
+    chave.update(values.index.to_numpy(dtype=str).astype('U6').tobytes())
+    chave.update(np.nan_to_num(values.to_numpy(), nan=-1.0).tobytes())
+    path = os.path.join(cache_dir, f'mapa_{level}_{chave.hexdigest()[:12]}.png')
+
+    if os.path.exists(path):
+        print(f"   ♻️ Mapa {level} reaproveitado do cache")
+        return path
+
+    os.makedirs(cache_dir, exist_ok=True)
+    render_choropleth(values, title, path, label, load_municipality_shapes(geometry))
+    print(f"   🗺️ Mapa {level} renderizado")
+    return path
@@ -0,0 +1,130 @@
+"""
+Medição do Tempo de Importação dos Scripts
+
+Importa cada módulo de scripts/ em um processo Python novo com
+'python -X importtime' e informa o tempo total de importação e as
+dependências diretas mais caras. Cada módulo é medido algumas vezes e o menor
+tempo é mantido, para reduzir o ruído do cache de disco.
+
+Uso:
+    python scripts/medir_importacao.py                   # todos os módulos
+    python scripts/medir_importacao.py main servico_consultas --orcamento 800
+
+Com --orcamento (ms), módulos acima do limite são marcados e o script termina
+com código 1 (útil para acompanhar regressões de tempo de inicialização).
+
+Não importa pandas nem outras bibliotecas pesadas.
+
+Autor: GitHub Copilot
+Data: 2025
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+PASTA_SCRIPTS = os.path.dirname(os.path.abspath(__file__))
+
+# Scripts executáveis e serviços (pontos de entrada da linha de comando)
+MODULOS_PADRAO = [
+    'main',
+    'analise_morbidade_diabetes',
+    'pareamento_sim_sih',
+    'gerar_relatorio_pdf',
+    'consultas_sql',
+    'servico_consultas',
+    'painel_html',
+]
+
+REPETICOES = 3
+MAIORES_DEPENDENCIAS = 3
+
+
+def parse_importtime(stderr, module):
+    """
+    Interpreta a saída de -X importtime
+
+    Args:
+        stderr (str): Saída de erro do processo
+        module (str): Módulo medido
+
+    Returns:
+        tuple: (tempo total em ms, lista de (dependência direta, ms) em ordem decrescente)
+    """
+    # As dependências aparecem antes do módulo que as importou; as de
+    # profundidade 1 desde a última linha de profundidade 0 são as diretas
+    total, diretas, pendentes = None, [], []
+    for linha in stderr.splitlines():
+        if not linha.startswith('import time:') or 'cumulative' in linha:
+            continue
+        _, acumulado, nome = linha.split('|')
+        profundidade = (len(nome) - len(nome.lstrip()) - 1) // 2
+        acumulado_ms = int(acumulado) / 1000
+        if profundidade == 1:
+            pendentes.append((nome.strip(), acumulado_ms))
+        elif profundidade == 0:
+            if nome.strip() == module:
+                total, diretas = acumulado_ms, pendentes
+            pendentes = []
+    return total, sorted(diretas, key=lambda item: -item[1])
+
+
+def measure_module(module, repeats=REPETICOES):
+    """
+    Mede o tempo de importação de um módulo em processos novos
+
+    Args:
+        module (str): Nome do módulo em scripts/
+        repeats (int): Número de medições (mantém a menor)
+
+    Returns:
+        dict: 'total_ms', 'dependencias' e 'erro' (None se importou)
+    """
+    ambiente = dict(os.environ, PYTHONPATH=os.pathsep.join(
+        [PASTA_SCRIPTS] + [p for p in os.environ.get('PYTHONPATH', '').split(os.pathsep) if p]))
+    melhor = None
+    for _ in range(repeats):
+        processo = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                                  capture_output=True, text=True, env=ambiente, cwd=PASTA_SCRIPTS)
+        if processo.returncode != 0:
+            ultima = processo.stderr.strip().splitlines()[-1] if processo.stderr.strip() else '?'
+            return {'total_ms': None, 'dependencias': [], 'erro': ultima}
+        total, dependencias = parse_importtime(processo.stderr, module)
+        if total is not None and (melhor is None or total < melhor['total_ms']):
+            melhor = {'total_ms': total, 'dependencias': dependencias, 'erro': None}
+    return melhor
+
+
+def main():
+    """
+    Mede os módulos pedidos e imprime o relatório
+    """
+    parser = argparse.ArgumentParser(description='Tempo de importação dos scripts')
+    parser.add_argument('modulos', nargs='*', default=MODULOS_PADRAO, help='Módulos a medir')
+    parser.add_argument('--orcamento', type=float, help='Tempo máximo de importação por módulo (ms)')
+    parser.add_argument('--repeticoes', type=int, default=REPETICOES)
+    args = parser.parse_args()
+
+    print(f"⏱️ Tempo de importação ({args.repeticoes} medições por módulo, menor valor)")
+    print("=" * 70)
+    acima = []
+    for modulo in args.modulos:
+        medida = measure_module(modulo, args.repeticoes)
+        if medida['erro']:
+            print(f"   ❌ {modulo}: {medida['erro']}")
+            acima.append(modulo)
+            continue
+        marca = ''
+        if args.orcamento and medida['total_ms'] > args.orcamento:
+            marca = f'  ⚠️ acima do orçamento ({args.orcamento:.0f} ms)'
+            acima.append(modulo)
+        maiores = ', '.join(f'{nome} {ms:.0f}' for nome, ms in medida['dependencias'][:MAIORES_DEPENDENCIAS])
+        print(f"   {modulo:<28} {medida['total_ms']:8.0f} ms   ({maiores}){marca}")
+
+    if acima:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,375 @@
+"""
+Painel HTML Interativo a partir dos Agregados
+
+Gera uma página HTML única com gráficos interativos (plotly.js, desenhados no
+navegador) a partir das mesmas abas de agregados usadas pelo relatório PDF:
+séries mensais, agregados regionais por ano e custos deflacionados.
+
+A página embute apenas JSON pré-agregado e compacto (colunas como listas,
+séries como matrizes estrato x mês, valores arredondados); nenhum registro
+individual é incluído. O tamanho depende do número de meses, estratos e
+regiões, e não do número de registros, então continua pequeno para coortes
+nacionais de vários anos. Séries e agregados por município ficam de fora
+(estão nos arquivos Excel e nos mapas do PDF).
+
+Autor: GitHub Copilot
+Data: 2025
+"""
+
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# Versão do plotly.js usada quando o pacote plotly não está instalado
+PLOTLY_JS_VERSAO = '2.35.2'
+
+ARQUIVO_PAINEL = 'painel_diabetes_infantil_amazonas.html'
+ARQUIVO_MORTALIDADE = 'diabetes_criancas_am.xlsx'
+ARQUIVO_MORBIDADE = 'diabetes_morbidade_criancas_am_2020_2025.xlsx'
+
+# Estratos das séries mensais incluídos no painel (MUNRES fica de fora)
+DIMENSOES_SERIE = ['Total', 'SEXO', 'FAIXA_ETARIA', 'TIPO_DIABETES']
+
+# Níveis regionais incluídos no painel
+NIVEIS_PAINEL = ['Regiao_Saude', 'Macrorregiao', 'UF']
+
+# Tabelas usadas (chave -> (arquivo, aba))
+TABELAS_PAINEL = {
+    'serie_mensal_morbidade': (ARQUIVO_MORBIDADE, 'Serie_Mensal'),
+    'serie_mensal_mortalidade': (ARQUIVO_MORTALIDADE, 'Serie_Mensal'),
+    'regionais_morbidade': (ARQUIVO_MORBIDADE, 'Agregados_Regionais'),
+    'regionais_mortalidade': (ARQUIVO_MORTALIDADE, 'Agregados_Regionais'),
+    'custos_anuais': (ARQUIVO_MORBIDADE, 'Custos_Deflacionados'),
+}
+
+
+def _values(series, decimals=2):
+    """Lista JSON de uma coluna numérica (NaN -> null), arredondada"""
+    valores = pd.to_numeric(series, errors='coerce').round(decimals).astype(object)
+    return valores.where(valores.notna(), None).tolist()
+
+
+def _monthly_payload(serie):
+    """Série mensal em matriz estrato x mês (contagens) + tendência do total"""
+    if serie is None or serie.empty:
+        return None
+    medida = [c for c in serie.columns if c not in ('Dimensao', 'Estrato', 'Periodo', 'Tendencia', 'Sazonal',
+                                                    'Residuo', 'Delta_Anual', 'Variacao_Anual_%')][0]
+    serie = serie[serie['Dimensao'].isin(DIMENSOES_SERIE)]
+    matriz = serie.pivot_table(index=['Dimensao', 'Estrato'], columns='Periodo', values=medida,
+                               aggfunc='sum', sort=True)
+    # Estratificações na ordem de DIMENSOES_SERIE (Total primeiro)
+    matriz = matriz.iloc[np.argsort([DIMENSOES_SERIE.index(d) for d in matriz.index.get_level_values(0)],
+                                    kind='stable')]
+    total = serie[serie['Dimensao'] == 'Total'].set_index('Periodo').reindex(matriz.columns)
+    return {
+        'medida': medida,
+        'periodos': [str(p) for p in matriz.columns],
+        'dimensoes': matriz.index.get_level_values(0).astype(str).tolist(),
+        'estratos': matriz.index.get_level_values(1).astype(str).tolist(),
+        'valores': [_values(linha, 0) for _, linha in matriz.iterrows()],
+        'tendencia': _values(total['Tendencia']) if 'Tendencia' in total.columns else None,
+    }
+
+
+def _regional_payload(agregados):
+    """Casos e taxas por unidade e ano de cada nível regional, mais a série anual somada"""
+    if agregados is None or agregados.empty:
+        return None
+    anuais = agregados[agregados['ANO'].astype(str) != 'Total']
+    anos = sorted(anuais['ANO'].astype(int).unique().tolist())
+    anuais = anuais.assign(ANO=anuais['ANO'].astype(int))
+
+    niveis = {}
+    for nivel in NIVEIS_PAINEL:
+        dados = anuais[anuais['Nivel'] == nivel]
+        if dados.empty:
+            continue
+        casos = dados.pivot_table(index=['Codigo', 'Nome'], columns='ANO', values='Casos', aggfunc='sum')
+        casos = casos.reindex(columns=anos)
+        niveis[nivel] = {
+            'nomes': casos.index.get_level_values(1).astype(str).tolist(),
+            'casos': [_values(linha, 0) for _, linha in casos.iterrows()],
+        }
+        if 'Taxa_100mil' in dados.columns:
+            taxas = dados.pivot_table(index=['Codigo', 'Nome'], columns='ANO', values='Taxa_100mil',
+                                      aggfunc='sum').reindex(index=casos.index, columns=anos)
+            niveis[nivel]['taxa'] = [_values(linha) for _, linha in taxas.iterrows()]
+
+    # Série anual: soma das UFs (casos e população) -> taxa
+    uf = anuais[anuais['Nivel'] == 'UF'].groupby('ANO')[
+        [c for c in ('Casos', 'Populacao') if c in anuais.columns]].sum().reindex(anos)
+    anual = {'casos': _values(uf['Casos'], 0)}
+    if 'Populacao' in uf.columns:
+        anual['taxa'] = _values(uf['Casos'] / uf['Populacao'].replace(0, np.nan) * 100_000)
+    return {'anos': anos, 'anual': anual, 'niveis': niveis}
+
+
+def _costs_payload(custos):
+    """Custos nominais e reais por ano (sem a linha Total)"""
+    if custos is None or custos.empty:
+        return None
+    custos = custos[custos['ANO'].astype(str) != 'Total']
+    return {
+        'anos': custos['ANO'].astype(str).tolist(),
+        'nominal': _values(custos['Valor_Nominal_Total']),
+        'real': _values(custos['Valor_Real_Total']),
+        'referencia': str(custos['Mes_Referencia'].iloc[0]) if 'Mes_Referencia' in custos.columns else '',
+    }
+
+
+def build_dashboard_data(tables):
+    """
+    Monta o JSON pré-agregado do painel
+
+    Args:
+        tables (dict): Tabelas de agregados (chaves de TABELAS_PAINEL; ausentes são ignoradas)
+
+    Returns:
+        dict: Dados do painel (apenas agregados)
+    """
+    dados = {'gerado_em': datetime.now().strftime('%d/%m/%Y %H:%M'), 'mensal': {}, 'regional': {}}
+    for sistema, rotulo in (('morbidade', 'Internações'), ('mortalidade', 'Óbitos')):
+        mensal = _monthly_payload(tables.get(f'serie_mensal_{sistema}'))
+        if mensal:
+            dados['mensal'][rotulo] = mensal
+        regional = _regional_payload(tables.get(f'regionais_{sistema}'))
+        if regional:
+            dados['regional'][rotulo] = regional
+    dados['custos'] = _costs_payload(tables.get('custos_anuais'))
+    return dados
+
+
+def load_dashboard_tables(mortalidade_file=ARQUIVO_MORTALIDADE, morbidade_file=ARQUIVO_MORBIDADE):
+    """
+    Lê as abas de agregados usadas pelo painel
+
+    Args:
+        mortalidade_file (str): Excel de mortalidade
+        morbidade_file (str): Excel de morbidade
+
+    Returns:
+        dict: Chave de TABELAS_PAINEL -> DataFrame (apenas as abas encontradas)
+    """
+    arquivos = {ARQUIVO_MORTALIDADE: mortalidade_file, ARQUIVO_MORBIDADE: morbidade_file}
+    tabelas = {}
+    for chave, (arquivo, aba) in TABELAS_PAINEL.items():
+        caminho = arquivos[arquivo]
+        if not os.path.exists(caminho):
+            continue
+        try:
+            tabelas[chave] = pd.read_excel(caminho, sheet_name=aba)
+        except ValueError:
+            continue
+    return tabelas
+
+
+def export_dashboard(tables, filename=ARQUIVO_PAINEL, offline=False):
+    """
+    Grava o painel HTML
+
+    Args:
+        tables (dict): Tabelas de agregados (ver TABELAS_PAINEL)
+        filename (str): Arquivo HTML de saída
+        offline (bool): Embute o plotly.js na página (funciona sem internet,
+            mas acrescenta alguns MB); por padrão usa o CDN
+
+    Returns:
+        str: Caminho do arquivo gerado
+    """
+    dados = build_dashboard_data(tables)
+    try:
+        from plotly.offline import get_plotlyjs, get_plotlyjs_version
+        versao = get_plotlyjs_version()
+    except ImportError:
+        get_plotlyjs, versao = None, PLOTLY_JS_VERSAO
+
+    if offline and get_plotlyjs is not None:
+        script = f'<script>{get_plotlyjs()}</script>'
+    else:
+        script = f'<script src="https://cdn.plot.ly/plotly-{versao}.min.js" charset="utf-8"></script>'
+
+    json_dados = json.dumps(dados, ensure_ascii=False, separators=(',', ':')).replace('</', '<\\/')
+    html = MODELO_HTML.replace('%PLOTLY%', script).replace('%DADOS%', json_dados)
+    with open(filename, 'w', encoding='utf-8') as arquivo:
+        arquivo.write(html)
+
+    print(f"✅ Painel HTML gerado: {filename} ({os.path.getsize(filename) / 1024:.1f} KB, "
+          f"dados: {len(json_dados) / 1024:.1f} KB)")
+    return filename
+
+
+MODELO_HTML = """<!DOCTYPE html>
+<html lang="pt-BR">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>Diabetes Infantil - Amazonas</title>
+%PLOTLY%
+<style>
+body { font-family: Helvetica, Arial, sans-serif; margin: 0 auto; max-width: 1100px; padding: 16px; color: #222; }
+h1 { color: #1f4e79; font-size: 22px; }
+h2 { color: #1f4e79; font-size: 17px; margin-top: 28px; }
+.controles { margin: 6px 0; }
+.controles select { margin-right: 12px; }
+.grafico { height: 420px; }
+.nota { color: #666; font-size: 12px; }
+</style>
+</head>
+<body>
+<h1>Diabetes Infantil - Amazonas</h1>
+<p class="nota">Painel gerado em <span id="gerado"></span> a partir dos agregados dos arquivos Excel
+(sem dados individuais).</p>
+
+<h2>Casos e taxa por ano</h2>
+<div id="anual" class="grafico"></div>
+
+<h2>Série mensal</h2>
+<div class="controles">
+  Sistema <select id="mensal-sistema"></select>
+  Estratificação <select id="mensal-dimensao"></select>
+</div>
+<div id="mensal" class="grafico"></div>
+
+<h2>Distribuição regional</h2>
+<div class="controles">
+  Sistema <select id="regional-sistema"></select>
+  Nível <select id="regional-nivel"></select>
+  Ano <select id="regional-ano"></select>
+  Medida <select id="regional-medida"></select>
+</div>
+<div id="regional" class="grafico"></div>
+
+<h2>Custos das internações</h2>
+<div id="custos" class="grafico"></div>
+
+<script>
+const DADOS = %DADOS%;
+const CORES = ['#1f77b4', '#d62728', '#2ca02c', '#ff7f0e', '#9467bd', '#8c564b'];
+
+function opcoes(select, valores, rotulos) {
+  select.innerHTML = '';
+  valores.forEach((v, i) => {
+    const o = document.createElement('option');
+    o.value = v; o.textContent = rotulos ? rotulos[i] : v;
+    select.appendChild(o);
+  });
+}
+
+function semDados(id) {
+  document.getElementById(id).innerHTML = '<p class="nota">Dados indisponíveis.</p>';
+}
+
+function desenharAnual() {
+  const sistemas = Object.keys(DADOS.regional);
+  if (!sistemas.length) return semDados('anual');
+  const traces = [];
+  sistemas.forEach((s, i) => {
+    const r = DADOS.regional[s];
+    traces.push({x: r.anos, y: r.anual.casos, name: s + ' (casos)', type: 'bar', marker: {color: CORES[i]}});
+    if (r.anual.taxa) traces.push({x: r.anos, y: r.anual.taxa, name: s + ' (por 100 mil)', yaxis: 'y2',
+                                   mode: 'lines+markers', line: {color: CORES[i], dash: 'dot'}});
+  });
+  Plotly.newPlot('anual', traces, {barmode: 'group', xaxis: {dtick: 1}, yaxis: {title: 'Casos'},
+    yaxis2: {title: 'Taxa por 100 mil', overlaying: 'y', side: 'right'}, legend: {orientation: 'h'}},
+    {responsive: true});
+}
+
+function desenharMensal() {
+  const m = DADOS.mensal[document.getElementById('mensal-sistema').value];
+  const dimensao = document.getElementById('mensal-dimensao').value;
+  const traces = [];
+  m.dimensoes.forEach((d, i) => {
+    if (d === dimensao) traces.push({x: m.periodos, y: m.valores[i], name: m.estratos[i], mode: 'lines'});
+  });
+  if (dimensao === 'Total' && m.tendencia)
+    traces.push({x: m.periodos, y: m.tendencia, name: 'Tendência', mode: 'lines', line: {dash: 'dash'}});
+  Plotly.react('mensal', traces, {yaxis: {title: m.medida}, legend: {orientation: 'h'}}, {responsive: true});
+}
+
+function iniciarMensal() {
+  const sistemas = Object.keys(DADOS.mensal);
+  if (!sistemas.length) return semDados('mensal');
+  const sel = document.getElementById('mensal-sistema'), dim = document.getElementById('mensal-dimensao');
+  opcoes(sel, sistemas);
+  const atualizarDimensoes = () => { opcoes(dim, [...new Set(DADOS.mensal[sel.value].dimensoes)]); desenharMensal(); };
+  sel.onchange = atualizarDimensoes;
+  dim.onchange = desenharMensal;
+  atualizarDimensoes();
+}
+
+function desenharRegional() {
+  const r = DADOS.regional[document.getElementById('regional-sistema').value];
+  const n = r.niveis[document.getElementById('regional-nivel').value];
+  const j = r.anos.indexOf(Number(document.getElementById('regional-ano').value));
+  const medida = document.getElementById('regional-medida').value;
+  const valores = n[medida].map(linha => linha[j]);
+  const ordem = valores.map((v, i) => i).sort((a, b) => (valores[b] ?? -1) - (valores[a] ?? -1));
+  Plotly.react('regional', [{x: ordem.map(i => n.nomes[i]), y: ordem.map(i => valores[i]), type: 'bar',
+    marker: {color: '#1f4e79'}}], {yaxis: {title: medida === 'taxa' ? 'Taxa por 100 mil' : 'Casos'},
+    xaxis: {automargin: true}}, {responsive: true});
+}
+
+function iniciarRegional() {
+  const sistemas = Object.keys(DADOS.regional);
+  if (!sistemas.length) return semDados('regional');
+  const sel = document.getElementById('regional-sistema'), niv = document.getElementById('regional-nivel');
+  const ano = document.getElementById('regional-ano'), med = document.getElementById('regional-medida');
+  opcoes(sel, sistemas);
+  // Medidas do nível (nem todo nível tem taxa); mantém a medida escolhida se existir
+  const atualizarMedidas = () => {
+    const atual = med.value;
+    const medidas = DADOS.regional[sel.value].niveis[niv.value].taxa ? ['taxa', 'casos'] : ['casos'];
+    opcoes(med, medidas, medidas.map(m => m === 'taxa' ? 'Taxa por 100 mil' : 'Casos'));
+    if (medidas.includes(atual)) med.value = atual;
+    desenharRegional();
+  };
+  const atualizar = () => {
+    const r = DADOS.regional[sel.value];
+    opcoes(niv, Object.keys(r.niveis), Object.keys(r.niveis).map(n => n.replace('_', ' ')));
+    opcoes(ano, r.anos.slice().reverse());
+    atualizarMedidas();
+  };
+  sel.onchange = atualizar;
+  niv.onchange = atualizarMedidas;
+  [ano, med].forEach(s => s.onchange = desenharRegional);
+  atualizar();
+}
+
+function desenharCustos() {
+  const c = DADOS.custos;
+  if (!c) return semDados('custos');
+  Plotly.newPlot('custos', [
+    {x: c.anos, y: c.nominal, name: 'Nominal', type: 'bar', marker: {color: '#9ecae1'}},
+    {x: c.anos, y: c.real, name: 'Real (IPCA ' + c.referencia + ')', type: 'bar', marker: {color: '#1f4e79'}}
+  ], {barmode: 'group', yaxis: {title: 'R$'}, legend: {orientation: 'h'}}, {responsive: true});
+}
+
+document.getElementById('gerado').textContent = DADOS.gerado_em;
+desenharAnual();
+iniciarMensal();
+iniciarRegional();
+desenharCustos();
+</script>
+</body>
+</html>
+"""
+
+
+def main():
+    """
+    Gera o painel a partir dos arquivos Excel de mortalidade e morbidade
+    """
+    print("📊 Gerando painel HTML interativo...")
+    tabelas = load_dashboard_tables()
+    if not tabelas:
+        print("❌ Nenhuma aba de agregados encontrada. Execute main.py e analise_morbidade_diabetes.py antes.")
+        return
+    export_dashboard(tabelas)
+
+
+if __name__ == "__main__":
+    main()
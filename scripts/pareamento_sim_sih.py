@@ -0,0 +1,442 @@
+"""
+Pareamento Probabilístico SIM-DO x SIH-SUS
+
+Este script vincula os óbitos por diabetes (SIM-DO) às internações (SIH-SUS)
+da mesma pessoa para estimar quantos óbitos foram precedidos de internação.
+
+O pareamento usa blocagem por município de residência, sexo e ano de
+nascimento: as chaves das internações são guardadas em um índice de hash
+(fatoração das chaves + posições de início e fim de cada bloco) e os pares
+candidatos de cada bloco são gerados e comparados de forma vetorizada, em
+lotes. O trabalho cresce com a soma dos produtos dos tamanhos dos blocos, e
+não com o produto dos tamanhos das bases.
+
+Os pesos de concordância seguem o modelo de Fellegi-Sunter, com as
+probabilidades m e u estimadas por EM sobre a tabela de padrões de
+concordância dos pares candidatos (no máximo 3^campos padrões distintos).
+
+Autor: GitHub Copilot
+Data: 2025
+"""
+
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from coorte_compartilhada import ARQUIVO_DESCRICAO, attach_cohort, cohort_path
+from datas import parse_datasus_dates
+from referencias import normalize_municipality
+
+ARQUIVO_MORTALIDADE = 'diabetes_criancas_am.xlsx'
+ARQUIVO_MORBIDADE = 'diabetes_morbidade_criancas_am_2020_2025.xlsx'
+ARQUIVO_SAIDA = 'pareamento_sim_sih_am.xlsx'
+
+# Coortes compartilhadas gravadas por main.py e analise_morbidade_diabetes.py
+COORTE_MORTALIDADE = 'sim_am'
+COORTE_MORBIDADE = 'sih_am'
+
+CHAVES_BLOQUEIO = ['MUNRES', 'SEXO', 'ANO_NASC']
+
+# Códigos de SEXO de cada sistema -> valor comum da blocagem. O SIH-RD codifica
+# o sexo feminino como 3 (2 em arquivos antigos) e o SIM-DO como 2; códigos
+# ignorados (0, 9) ficam sem bloco.
+CODIGOS_SEXO = {
+    'SIM': {'1': 'M', '2': 'F'},
+    'SIH': {'1': 'M', '2': 'F', '3': 'F'},
+}
+
+# Probabilidade inicial (EM) de concordância entre registros da mesma pessoa (m)
+PROBABILIDADES_M = {
+    'NASCIMENTO': 0.95,            # Data de nascimento completa
+    'IDADE': 0.97,                 # Idade no óbito compatível com idade na internação
+    'CID': 0.80,                   # Mesma categoria CID-10 (3 caracteres)
+    'OBITO_NA_INTERNACAO': 0.30,   # Óbito até 1 dia após a saída da internação
+}
+
+# Limiares do escore (soma dos pesos em log2)
+LIMIAR_VINCULO = 8.0
+LIMIAR_REVISAO = 4.0
+
+# Pares candidatos comparados por lote
+PARES_POR_LOTE = 5_000_000
+
+# Iterações do EM
+MAX_ITERACOES_EM = 200
+
+
+def prepare_linkage_fields(df, system):
+    """
+    Extrai e padroniza os campos de pareamento de uma base
+
+    Args:
+        df (pd.DataFrame): Óbitos (SIM) ou internações (SIH) filtrados
+        system (str): 'SIM' ou 'SIH'
+
+    Returns:
+        pd.DataFrame: MUNRES, SEXO (M/F nas duas bases), DATA_NASC, ANO_NASC,
+            IDADE_ANOS, CID3, DATA_EVENTO (óbito ou internação) e DATA_SAIDA (SIH)
+    """
+    colunas = {
+        'SIM': {'nascimento': 'DTNASC', 'evento': 'DATA_OBITO', 'evento_texto': 'DTOBITO',
+                'idade': 'IDADE_ANOS', 'cid': 'CAUSABAS'},
+        'SIH': {'nascimento': 'NASC', 'evento': 'DATA_INTERNACAO', 'evento_texto': 'DT_INTER',
+                'idade': 'IDADE', 'cid': 'DIAG_PRINC'},
+    }[system]
+    vazio = pd.Series(np.nan, index=df.index)
+
+    campos = pd.DataFrame(index=df.index)
+    campos['MUNRES'] = normalize_municipality(df['MUNRES']) if 'MUNRES' in df.columns else vazio
+    campos['SEXO'] = df['SEXO'].astype('string').str.strip().map(CODIGOS_SEXO[system]) \
+        if 'SEXO' in df.columns else vazio
+
+    if colunas['evento'] in df.columns:
+        campos['DATA_EVENTO'] = pd.to_datetime(df[colunas['evento']], errors='coerce')
+    elif colunas['evento_texto'] in df.columns:
+        campos['DATA_EVENTO'] = parse_datasus_dates(df[colunas['evento_texto']].astype(str), system)
+    else:
+        campos['DATA_EVENTO'] = pd.NaT
+
+    campos['DATA_SAIDA'] = pd.to_datetime(df['DATA_SAIDA'], errors='coerce') \
+        if 'DATA_SAIDA' in df.columns else pd.NaT
+    campos['IDADE_ANOS'] = pd.to_numeric(df[colunas['idade']], errors='coerce') \
+        if colunas['idade'] in df.columns else vazio
+    campos['CID3'] = df[colunas['cid']].astype('string').str.strip().str.upper().str[:3].fillna('') \
+        if colunas['cid'] in df.columns else ''
+
+    if colunas['nascimento'] in df.columns:
+        textos = df[colunas['nascimento']].astype(str).str.replace(r'\.0$', '', regex=True).str.zfill(8)
+        campos['DATA_NASC'] = parse_datasus_dates(textos, system)
+    else:
+        campos['DATA_NASC'] = pd.NaT
+
+    # Sem data de nascimento, o ano é estimado pela data do evento e a idade
+    ano_nasc = campos['DATA_NASC'].dt.year
+    estimado = campos['DATA_EVENTO'].dt.year - campos['IDADE_ANOS']
+    campos['ANO_NASC'] = ano_nasc.fillna(estimado).astype('Int16')
+
+    return campos.reset_index(drop=True)
+
+
+def build_block_index(block_codes, n_blocks):
+    """
+    Monta o índice de blocos: registros ordenados por bloco e posições de cada bloco
+
+    Args:
+        block_codes (np.ndarray): Código do bloco de cada registro (-1 = sem bloco)
+        n_blocks (int): Número de blocos
+
+    Returns:
+        dict: 'ordem' (registros agrupados por bloco), 'inicio' e 'fim' de cada bloco
+    """
+    validos = np.flatnonzero(block_codes >= 0)
+    ordem = validos[np.argsort(block_codes[validos], kind='stable')]
+    blocos_ordenados = block_codes[ordem]
+    blocos = np.arange(n_blocks)
+    return {
+        'ordem': ordem,
+        'inicio': np.searchsorted(blocos_ordenados, blocos, side='left'),
+        'fim': np.searchsorted(blocos_ordenados, blocos, side='right'),
+    }
+
+
+def candidate_pairs(block_codes, index, chunk_size=PARES_POR_LOTE):
+    """
+    Gera, em lotes, todos os pares (registro A, registro B) do mesmo bloco
+
+    Args:
+        block_codes (np.ndarray): Código do bloco de cada registro da base A
+        index (dict): Índice de blocos da base B (ver build_block_index)
+        chunk_size (int): Máximo aproximado de pares por lote
+
+    Yields:
+        tuple: (índices na base A, índices na base B)
+    """
+    registros = np.flatnonzero(block_codes >= 0)
+    inicio = index['inicio'][block_codes[registros]]
+    tamanhos = index['fim'][block_codes[registros]] - inicio
+    registros, inicio, tamanhos = registros[tamanhos > 0], inicio[tamanhos > 0], tamanhos[tamanhos > 0]
+
+    acumulado = np.cumsum(tamanhos)
+    limites = np.searchsorted(acumulado, np.arange(chunk_size, acumulado[-1] if len(acumulado) else 0,
+                                                   chunk_size), side='right')
+    for bloco in np.split(np.arange(len(registros)), limites):
+        if len(bloco) == 0:
+            continue
+        n_pares = tamanhos[bloco]
+        a = np.repeat(registros[bloco], n_pares)
+        # Posição de cada par dentro do seu bloco: 0..tamanho-1
+        deslocamento = np.arange(n_pares.sum()) - np.repeat(np.cumsum(n_pares) - n_pares, n_pares)
+        b = index['ordem'][np.repeat(inicio[bloco], n_pares) + deslocamento]
+        yield a, b
+
+
+def compare_pairs(deaths, admissions, a, b):
+    """
+    Compara os campos dos pares candidatos
+
+    Args:
+        deaths (pd.DataFrame): Campos de pareamento do SIM (prepare_linkage_fields)
+        admissions (pd.DataFrame): Campos de pareamento do SIH
+        a (np.ndarray): Índices dos óbitos
+        b (np.ndarray): Índices das internações
+
+    Returns:
+        tuple: (matriz pares x campos com 1 = concorda, 0 = discorda, -1 = ausente,
+                máscara dos pares possíveis: internação até a data do óbito)
+    """
+    dia = np.timedelta64(1, 'D')
+    nasc_a, nasc_b = deaths['DATA_NASC'].to_numpy()[a], admissions['DATA_NASC'].to_numpy()[b]
+    obito = deaths['DATA_EVENTO'].to_numpy()[a]
+    internacao = admissions['DATA_EVENTO'].to_numpy()[b]
+    saida = admissions['DATA_SAIDA'].to_numpy()[b]
+    idade_a = deaths['IDADE_ANOS'].to_numpy(dtype=float)[a]
+    idade_b = admissions['IDADE_ANOS'].to_numpy(dtype=float)[b]
+    cid_a = deaths['CID3'].to_numpy(dtype=object)[a]
+    cid_b = admissions['CID3'].to_numpy(dtype=object)[b]
+
+    def codificar(concorda, ausente):
+        return np.where(ausente, -1, concorda.astype(np.int8)).astype(np.int8)
+
+    anos_decorridos = (obito - internacao) / dia / 365.25
+    comparacoes = np.column_stack([
+        codificar(nasc_a == nasc_b, np.isnat(nasc_a) | np.isnat(nasc_b)),
+        codificar(np.abs(idade_b + anos_decorridos - idade_a) <= 1.0,
+                  np.isnan(idade_a) | np.isnan(idade_b) | np.isnan(anos_decorridos)),
+        codificar(cid_a == cid_b, (cid_a == '') | (cid_b == '')),
+        codificar(np.abs((obito - saida) / dia) <= 1, np.isnat(obito) | np.isnat(saida)),
+    ])
+
+    possiveis = np.isnat(obito) | np.isnat(internacao) | (internacao <= obito + dia)
+    return comparacoes, possiveis
+
+
+def estimate_weights(comparisons, m_initial, max_iter=MAX_ITERACOES_EM):
+    """
+    Estima as probabilidades m e u por EM sobre os padrões de concordância
+
+    Os pares são reduzidos à contagem de cada padrão (1/0/-1 por campo); o EM
+    opera sobre essa tabela, com custo independente do número de pares.
+    Campos ausentes não contribuem para a verossimilhança.
+
+    Args:
+        comparisons (np.ndarray): Pares x campos (1 = concorda, 0 = discorda, -1 = ausente)
+        m_initial (np.ndarray): Valores iniciais de m
+        max_iter (int): Máximo de iterações
+
+    Returns:
+        tuple: (m, u, proporção estimada de pares verdadeiros)
+    """
+    n_campos = comparisons.shape[1]
+    potencias = 3 ** np.arange(n_campos)
+    contagens = np.bincount((comparisons.astype(np.int64) + 1) @ potencias, minlength=3 ** n_campos)
+    padroes = (np.arange(3 ** n_campos)[:, None] // potencias) % 3 - 1
+    presentes = contagens > 0
+    contagens, padroes = contagens[presentes].astype(float), padroes[presentes]
+    concorda, discorda = padroes == 1, padroes == 0
+
+    m = np.asarray(m_initial, dtype=float).copy()
+    frequencia = (concorda * contagens[:, None]).sum(axis=0) / np.maximum(
+        ((concorda | discorda) * contagens[:, None]).sum(axis=0), 1)
+    u = np.clip(frequencia, 1e-4, m - 1e-3)
+    proporcao = 0.1
+
+    for _ in range(max_iter):
+        log_m = (concorda * np.log(m) + discorda * np.log(1 - m)).sum(axis=1)
+        log_u = (concorda * np.log(u) + discorda * np.log(1 - u)).sum(axis=1)
+        g = 1 / (1 + (1 - proporcao) / proporcao * np.exp(log_u - log_m))
+
+        peso_m, peso_u = contagens * g, contagens * (1 - g)
+        novo_m = (concorda * peso_m[:, None]).sum(axis=0) / np.maximum(
+            ((concorda | discorda) * peso_m[:, None]).sum(axis=0), 1e-12)
+        novo_u = (concorda * peso_u[:, None]).sum(axis=0) / np.maximum(
+            ((concorda | discorda) * peso_u[:, None]).sum(axis=0), 1e-12)
+        novo_m, novo_u = np.clip(novo_m, 1e-3, 1 - 1e-3), np.clip(novo_u, 1e-4, 1 - 1e-3)
+        nova_proporcao = float(np.clip(peso_m.sum() / contagens.sum(), 1e-6, 1 - 1e-6))
+
+        convergiu = max(np.abs(novo_m - m).max(), np.abs(novo_u - u).max()) < 1e-6
+        m, u, proporcao = novo_m, novo_u, nova_proporcao
+        if convergiu:
+            break
+
+    # Campos em que o EM não separou os grupos (m <= u) não pesam no escore
+    u = np.where(m > u, u, m)
+    return m, u, proporcao
+
+
+def link_records(df_sim, df_sih, chunk_size=PARES_POR_LOTE):
+    """
+    Vincula óbitos do SIM-DO a internações do SIH-SUS
+
+    Args:
+        df_sim (pd.DataFrame): Óbitos filtrados (com DTNASC, DTOBITO/DATA_OBITO, IDADE_ANOS)
+        df_sih (pd.DataFrame): Internações filtradas (com NASC, DT_INTER/DATA_INTERNACAO, IDADE)
+        chunk_size (int): Pares candidatos comparados por lote
+
+    Returns:
+        pd.DataFrame: Pares com escore >= LIMIAR_REVISAO (uma internação vincula-se
+            a no máximo um óbito), com as concordâncias de cada campo e a classe
+    """
+    print("🔗 Pareando óbitos (SIM) e internações (SIH)...")
+
+    obitos = prepare_linkage_fields(df_sim, 'SIM')
+    internacoes = prepare_linkage_fields(df_sih, 'SIH')
+
+    # Índice de hash das chaves de bloqueio (fatoração conjunta das duas bases)
+    chaves = pd.concat([obitos[CHAVES_BLOQUEIO], internacoes[CHAVES_BLOQUEIO]], ignore_index=True)
+    completas = chaves.notna().all(axis=1).to_numpy()
+    codigos = np.full(len(chaves), -1, dtype=np.int64)
+    codigos[completas], unicos = pd.factorize(pd.MultiIndex.from_frame(chaves[completas].astype(str)))
+    codigos_obito, codigos_internacao = codigos[:len(obitos)], codigos[len(obitos):]
+    indice = build_block_index(codigos_internacao, len(unicos))
+
+    campos = list(PROBABILIDADES_M)
+    lotes_a, lotes_b, lotes_comp = [], [], []
+    for a, b in candidate_pairs(codigos_obito, indice, chunk_size):
+        comparacoes, possiveis = compare_pairs(obitos, internacoes, a, b)
+        lotes_a.append(a[possiveis])
+        lotes_b.append(b[possiveis])
+        lotes_comp.append(comparacoes[possiveis])
+
+    n_pares = sum(len(a) for a in lotes_a)
+    print(f"   {len(obitos)} óbitos x {len(internacoes)} internações em {len(unicos)} blocos: "
+          f"{n_pares} pares candidatos (sem blocagem: {len(obitos) * len(internacoes)})")
+
+    colunas = ['IDX_SIM', 'IDX_SIH'] + campos + ['Escore', 'Classe']
+    if n_pares == 0:
+        print("   ⚠️ Nenhum par candidato")
+        return pd.DataFrame(columns=colunas)
+
+    a, b = np.concatenate(lotes_a), np.concatenate(lotes_b)
+    comparacoes = np.concatenate(lotes_comp)
+
+    # Pesos de Fellegi-Sunter com m e u estimados por EM
+    m, u, proporcao = estimate_weights(comparacoes, [PROBABILIDADES_M[c] for c in campos])
+    peso_concorda = np.log2(m / u)
+    peso_discorda = np.log2((1 - m) / (1 - u))
+    escore = np.where(comparacoes == 1, peso_concorda, np.where(comparacoes == 0, peso_discorda, 0.0)).sum(axis=1)
+
+    pares = pd.DataFrame(comparacoes, columns=campos)
+    pares.insert(0, 'IDX_SIM', a)
+    pares.insert(1, 'IDX_SIH', b)
+    pares['Escore'] = escore.round(3)
+    pares = pares[pares['Escore'] >= LIMIAR_REVISAO]
+
+    # Cada internação pertence a uma só pessoa: fica o óbito de maior escore
+    pares = pares.sort_values('Escore', ascending=False, kind='stable').drop_duplicates('IDX_SIH')
+    pares['Classe'] = np.where(pares['Escore'] >= LIMIAR_VINCULO, 'Vinculado', 'Revisão manual')
+
+    pares['DATA_OBITO'] = obitos['DATA_EVENTO'].to_numpy()[pares['IDX_SIM']]
+    pares['DATA_INTERNACAO'] = internacoes['DATA_EVENTO'].to_numpy()[pares['IDX_SIH']]
+    pares['Dias_Internacao_Obito'] = (pares['DATA_OBITO'] - pares['DATA_INTERNACAO']).dt.days
+
+    print(f"   Proporção estimada de pares verdadeiros: {proporcao:.3f}")
+    for campo, mc, uc, pc, pd_ in zip(campos, m, u, peso_concorda, peso_discorda):
+        print(f"   {campo}: m = {mc:.3f}, u = {uc:.4f}, pesos +{pc:.2f} / {pd_:.2f}")
+    print(f"   Pares vinculados: {int((pares['Classe'] == 'Vinculado').sum())} | "
+          f"revisão manual: {int((pares['Classe'] == 'Revisão manual').sum())}")
+    print(f"   ✅ Pareamento concluído!")
+    return pares.sort_values(['IDX_SIM', 'DATA_INTERNACAO']).reset_index(drop=True)
+
+
+def create_linked_indicators(df_sim, pairs):
+    """
+    Indicadores da coorte vinculada por ano do óbito
+
+    Args:
+        df_sim (pd.DataFrame): Óbitos filtrados (mesma ordem usada no pareamento)
+        pairs (pd.DataFrame): Resultado de link_records
+
+    Returns:
+        pd.DataFrame: ANO, Obitos, Obitos_Com_Internacao, Percentual_Com_Internacao,
+            Obitos_Na_Internacao, Media_Internacoes_Previas, Mediana_Dias_Ultima_Internacao
+    """
+    anos = pd.to_numeric(df_sim['ANO'], errors='coerce').reset_index(drop=True) \
+        if 'ANO' in df_sim.columns else pd.Series(np.nan, index=range(len(df_sim)))
+
+    vinculados = pairs[pairs['Classe'] == 'Vinculado']
+    por_obito = pd.DataFrame({
+        'internacoes': vinculados.groupby('IDX_SIM').size(),
+        'na_internacao': (vinculados['OBITO_NA_INTERNACAO'] == 1).groupby(vinculados['IDX_SIM']).any(),
+        'dias_ultima': vinculados.groupby('IDX_SIM')['Dias_Internacao_Obito'].min(),
+    }).reindex(range(len(df_sim)))
+    por_obito['vinculado'] = por_obito['internacoes'].notna()
+    por_obito['na_internacao'] = por_obito['na_internacao'].fillna(False).astype(bool)
+
+    def resumir(grupos):
+        tabela = grupos.agg(
+            Obitos=('vinculado', 'size'),
+            Obitos_Com_Internacao=('vinculado', 'sum'),
+            Obitos_Na_Internacao=('na_internacao', 'sum'),
+            Media_Internacoes_Previas=('internacoes', 'mean'),
+            Mediana_Dias_Ultima_Internacao=('dias_ultima', 'median'),
+        )
+        tabela.insert(2, 'Percentual_Com_Internacao',
+                      (tabela['Obitos_Com_Internacao'] / tabela['Obitos'] * 100).round(1))
+        tabela['Media_Internacoes_Previas'] = tabela['Media_Internacoes_Previas'].round(2)
+        return tabela
+
+    indicadores = resumir(por_obito.groupby(anos.to_numpy())).rename_axis('ANO').reset_index()
+    total = resumir(por_obito.groupby(np.zeros(len(por_obito), dtype=int))).reset_index(drop=True)
+    total.insert(0, 'ANO', 'Total')
+    return pd.concat([indicadores, total], ignore_index=True)
+
+
+def load_cohorts():
+    """
+    Carrega as coortes de mortalidade e morbidade
+
+    Usa as coortes compartilhadas (arrays mapeados em memória, sem cópia) quando
+    existirem; caso contrário, lê as abas de dados dos arquivos Excel.
+
+    Returns:
+        tuple: (df_sim, df_sih), ou None se os dados não estiverem disponíveis
+    """
+    caminhos = [cohort_path(COORTE_MORTALIDADE), cohort_path(COORTE_MORBIDADE)]
+    if all(os.path.exists(os.path.join(c, ARQUIVO_DESCRICAO)) for c in caminhos):
+        print("   🧩 Usando as coortes compartilhadas (arrays mapeados em memória)")
+        return tuple(attach_cohort(c).frame() for c in caminhos)
+
+    for arquivo in (ARQUIVO_MORTALIDADE, ARQUIVO_MORBIDADE):
+        if not os.path.exists(arquivo):
+            print(f"❌ Arquivo {arquivo} não encontrado. Execute main.py e analise_morbidade_diabetes.py antes.")
+            return None
+
+    tipos = {'MUNRES': str, 'SEXO': str, 'DTNASC': str, 'NASC': str, 'DTOBITO': str, 'DT_INTER': str}
+    df_sim = pd.read_excel(ARQUIVO_MORTALIDADE, sheet_name='Dados', dtype=tipos)
+    df_sih = pd.read_excel(ARQUIVO_MORBIDADE, sheet_name='Dados_Internacoes', dtype=tipos)
+    return df_sim, df_sih
+
+
+def main():
+    """
+    Executa o pareamento a partir das coortes de mortalidade e morbidade
+    """
+    print("🚀 Pareamento probabilístico SIM-DO x SIH-SUS - Diabetes infantil Amazonas")
+    print("=" * 70)
+
+    coortes = load_cohorts()
+    if coortes is None:
+        return
+    df_sim, df_sih = coortes
+
+    pares = link_records(df_sim, df_sih)
+    indicadores = create_linked_indicators(df_sim, pares)
+
+    with pd.ExcelWriter(ARQUIVO_SAIDA, engine='openpyxl') as writer:
+        pares.to_excel(writer, sheet_name='Pares_Vinculados', index=False)
+        print(f"   ✅ Aba 'Pares_Vinculados' criada com {len(pares)} pares")
+        indicadores.to_excel(writer, sheet_name='Indicadores_Vinculacao', index=False)
+        print(f"   ✅ Aba 'Indicadores_Vinculacao' criada")
+
+    total = indicadores.iloc[-1]
+    print("=" * 70)
+    print("✅ Pareamento concluído!")
+    print(f"   - Óbitos com internação prévia: {int(total['Obitos_Com_Internacao'])} de {int(total['Obitos'])}")
+    print(f"   - Arquivo gerado: {ARQUIVO_SAIDA}")
+    print(f"   - Data/Hora: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}")
+
+
+if __name__ == "__main__":
+    main()
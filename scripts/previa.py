@@ -0,0 +1,393 @@
+"""
+Prévia Aproximada por Amostragem Estratificada (SIH-SUS)
+
+Antes de uma execução completa (por exemplo, todas as UFs e anos), produz
+estimativas dos indicadores anuais de create_detailed_yearly_analysis a
+partir de uma amostra de partições mensais:
+
+- Estratos: (ano, UF). Unidades amostrais: os meses (partições ano/mês) do
+  estrato. Em cada estrato são sorteados alguns meses, um por bloco de meses
+  consecutivos, para cobrir as estações do ano.
+- Apenas os meses sorteados são baixados (e gravados no armazenamento local,
+  onde a execução completa os reaproveita) ou lidos do armazenamento.
+- Totais: estimador expandido por estrato (N_h / n_h x soma da amostra).
+  Médias por internação: estimador de razão (total da variável / total de
+  casos). Erros padrão pela variância entre meses dentro do estrato, com
+  correção de população finita, e intervalos de 95% pela distribuição t com
+  graus de liberdade = soma de (meses sorteados - 1) nos estratos do ano (a
+  seleção por blocos é tratada como amostra aleatória simples, o que em
+  geral superestima levemente a variância). Com poucos meses e uma só UF os
+  intervalos são largos; com muitas UFs ficam próximos da aproximação normal.
+
+A unidade estimada é a mesma da execução completa: os registros dos meses
+sorteados passam por prepare_sih_cohort, então as internações são episódios
+(AIHs consolidadas, ver episodios.py), com dias e valores somados no episódio
+e valores reais deflacionados pelo IPCA (ver custos.py).
+
+Com um mês sorteado por estrato o erro padrão não é estimável (fica vazio);
+use --meses 2 ou mais. Medianas e as demais análises (séries, varredura)
+ficam para a execução completa.
+
+Todas as saídas são marcadas como PRÉVIA/aproximadas: arquivo Excel próprio
+com aba de aviso, coluna Aproximado em todas as tabelas e gráfico com título
+de prévia.
+
+Uso:
+    python scripts/previa.py                          # AM, 2020-2025, 3 meses por ano
+    python scripts/previa.py --ufs AM PA RR --meses 4 --semente 7
+
+Autor: GitHub Copilot
+Data: 2025
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from analise_morbidade_diabetes import (PREDICADO_ARMAZENAMENTO, PYDATASUS_AVAILABLE, create_sample_sih_data,
+                                        prepare_sih_cohort)
+from armazenamento import PYARROW_AVAILABLE, partition_months, read_cohort
+from exportacao import write_optional_sheets
+from retomada import download_units, ingest_units
+from telemetria import event, timed
+
+ARQUIVO_PREVIA = 'previa_diabetes_morbidade.xlsx'
+GRAFICO_PREVIA = 'previa_casos_por_ano.png'
+
+# Meses sorteados por estrato (ano, UF) e semente do sorteio
+MESES_POR_ESTRATO = 3
+SEMENTE_PADRAO = 42
+
+AVISO_PREVIA = ('PRÉVIA APROXIMADA - estimativas de episódios de internação (AIHs consolidadas, como na '
+                'execução completa) a partir de uma amostra estratificada de meses; '
+                'não substitui a execução completa')
+
+# Totais por mês sorteado: coluna -> indicador
+VARIAVEIS_TOTAIS = {
+    'casos': 'Internações (episódios)',
+    'idade': 'Soma das idades',
+    'dias': 'Total de dias de internação',
+    'valor': 'Valor total das internações (R$)',
+    'valor_real': 'Valor real total das internações (R$, IPCA)',
+    'tipo_1': 'Internações - Tipo 1',
+    'tipo_2': 'Internações - Tipo 2',
+    'masculino': 'Internações - Masculino',
+    'feminino': 'Internações - Feminino',
+}
+
+# Médias por internação (estimadores de razão): nome -> numerador
+RAZOES = {
+    'Idade média': 'idade',
+    'Dias de internação (média)': 'dias',
+    'Valor médio da internação (R$)': 'valor',
+    'Valor real médio da internação (R$, IPCA)': 'valor_real',
+}
+
+# Abas da prévia no Excel
+ABAS_PREVIA = [
+    ('previa_anual', 'PREVIA_Anual'),
+    ('previa_amostra', 'PREVIA_Amostra'),
+]
+
+
+def sample_months(ufs, start_year, end_year, months_per_stratum=MESES_POR_ESTRATO, seed=SEMENTE_PADRAO):
+    """
+    Sorteia os meses de cada estrato (ano, UF), um por bloco de meses consecutivos
+
+    Args:
+        ufs (list): Siglas das UFs
+        start_year (int): Ano inicial
+        end_year (int): Ano final
+        months_per_stratum (int): Meses sorteados por estrato
+        seed (int): Semente do sorteio
+
+    Returns:
+        pd.DataFrame: UF, ANO, MES e N_MESES (meses do estrato na população), um
+            registro por mês sorteado
+    """
+    gerador = np.random.default_rng(seed)
+    populacao = pd.DataFrame(download_units(start_year, end_year, monthly=True), columns=['ANO', 'MES'])
+    linhas = []
+    for uf in ufs:
+        for ano, meses in populacao.groupby('ANO')['MES']:
+            meses = meses.to_numpy()
+            for bloco in np.array_split(meses, min(months_per_stratum, len(meses))):
+                linhas.append((uf, ano, int(gerador.choice(bloco)), len(meses)))
+    return pd.DataFrame(linhas, columns=['UF', 'ANO', 'MES', 'N_MESES'])
+
+
+def load_sampled_records(sample, start_year, end_year):
+    """
+    Obtém os registros brutos dos meses sorteados
+
+    Com pydatasus, baixa só os meses sorteados que ainda não estão no
+    armazenamento local (ver retomada.ingest_units) e lê apenas essas
+    partições. Sem pydatasus, usa os dados de exemplo.
+
+    Args:
+        sample (pd.DataFrame): Resultado de sample_months
+        start_year (int): Ano inicial
+        end_year (int): Ano final
+
+    Returns:
+        pd.DataFrame: Registros com as colunas UF e MES_AMOSTRA (mês da partição)
+    """
+    partes = []
+    if PYDATASUS_AVAILABLE:
+        from pydatasus import download
+
+        for uf, unidades in sample.groupby('UF'):
+            meses = list(zip(unidades['ANO'], unidades['MES']))
+            em_memoria = ingest_units('SIH', uf, meses,
+                                      lambda ano, mes, uf=uf: download.SIH_RD(uf, ano, month=mes))
+            if PYARROW_AVAILABLE:
+                dados = read_cohort('SIH', uf, range(start_year, end_year + 1), PREDICADO_ARMAZENAMENTO,
+                                    months=meses)
+            else:
+                dados = pd.concat(em_memoria, ignore_index=True) if em_memoria else pd.DataFrame()
+            partes.append(dados.assign(UF=uf))
+    else:
+        print("⚠️ pydatasus não disponível - prévia sobre os dados de exemplo (demonstração)")
+        exemplo = create_sample_sih_data(start_year, end_year)
+        partes = [exemplo.assign(UF=uf) for uf in sample['UF'].unique()]
+
+    dados = pd.concat([p for p in partes if not p.empty], ignore_index=True) if partes else pd.DataFrame()
+    if dados.empty:
+        return dados
+    dados['ANO'] = pd.to_numeric(dados['ANO'], errors='coerce').fillna(0).astype(int)
+    dados['MES_AMOSTRA'] = partition_months(dados, 'SIH')
+
+    # Sem armazenamento (ou com os dados de exemplo), descartar os meses não sorteados
+    sorteados = pd.MultiIndex.from_frame(sample[['UF', 'ANO', 'MES']])
+    chaves = pd.MultiIndex.from_arrays([dados['UF'], dados['ANO'], dados['MES_AMOSTRA']])
+    return dados[chaves.isin(sorteados)].reset_index(drop=True)
+
+
+def _unit_totals(cohort, sample):
+    """Totais das variáveis por mês sorteado (meses sem casos entram com zero)"""
+    unidade = cohort[['UF', 'ANO', 'MES_AMOSTRA']].rename(columns={'MES_AMOSTRA': 'MES'})
+
+    def coluna(nome):
+        return cohort[nome] if nome in cohort.columns else pd.Series(np.nan, index=cohort.index)
+
+    valores = pd.DataFrame({
+        'casos': 1.0,
+        'idade': pd.to_numeric(coluna('IDADE'), errors='coerce'),
+        'dias': pd.to_numeric(coluna('DIAS_PERM'), errors='coerce'),
+        'valor': pd.to_numeric(coluna('VAL_TOT'), errors='coerce'),
+        'valor_real': pd.to_numeric(coluna('VAL_TOT_REAL'), errors='coerce'),
+        'tipo_1': (coluna('TIPO_DIABETES') == 'Tipo 1').astype(float),
+        'tipo_2': (coluna('TIPO_DIABETES') == 'Tipo 2').astype(float),
+        'masculino': (coluna('SEXO').astype(str) == '1').astype(float),
+        'feminino': (coluna('SEXO').astype(str) == '2').astype(float),
+    }, index=cohort.index).fillna(0.0)
+    totais = pd.concat([unidade, valores], axis=1).groupby(['UF', 'ANO', 'MES'])[list(VARIAVEIS_TOTAIS)].sum()
+    return sample.join(totais, on=['UF', 'ANO', 'MES']).fillna({v: 0.0 for v in VARIAVEIS_TOTAIS})
+
+
+def _stratum_components(unidades, variaveis):
+    """Total expandido e variância por estrato (ano, UF) para cada variável"""
+    grupos = unidades.groupby(['ANO', 'UF'])
+    n = grupos.size()
+    N = grupos['N_MESES'].first()
+    fpc = (1 - n / N)
+    expansao = N / n
+    totais = grupos[variaveis].sum().mul(expansao, axis=0)
+    variancias = grupos[variaveis].var(ddof=1).mul(N ** 2 * fpc / n, axis=0)
+    # Estratos com todos os meses na amostra não têm variância amostral
+    variancias.loc[fpc == 0] = 0.0
+    return totais, variancias
+
+
+def estimate_yearly_indicators(unidades):
+    """
+    Estimativas anuais (totais e médias por internação) com erro padrão e IC 95%
+
+    Args:
+        unidades (pd.DataFrame): Totais por mês sorteado (UF, ANO, MES, N_MESES e variáveis)
+
+    Returns:
+        pd.DataFrame: ANO, Indicador, Estimativa, Erro_Padrao, IC95_Inferior,
+            IC95_Superior, CV_Percentual, Graus_Liberdade e Aproximado
+    """
+    variaveis = list(VARIAVEIS_TOTAIS)
+    totais, variancias = _stratum_components(unidades, variaveis)
+    total_ano = totais.groupby(level='ANO').sum()
+    # Soma sem ignorar NaN: um estrato sem variância estimável deixa o ano sem erro padrão
+    variancia_ano = variancias.groupby(level='ANO').agg(lambda x: x.to_numpy().sum())
+
+    linhas = []
+    for variavel, descricao in VARIAVEIS_TOTAIS.items():
+        if variavel == 'idade':
+            continue
+        for ano in total_ano.index:
+            linhas.append((ano, descricao, total_ano.at[ano, variavel], np.sqrt(variancia_ano.at[ano, variavel])))
+
+    # Razões: resíduos linearizados e = y - R x por mês, com R do próprio ano
+    for descricao, numerador in RAZOES.items():
+        razao = total_ano[numerador] / total_ano['casos'].replace(0, np.nan)
+        residuos = unidades[['ANO', 'UF', 'N_MESES']].assign(
+            e=unidades[numerador] - unidades['ANO'].map(razao).fillna(0) * unidades['casos'])
+        _, variancia_e = _stratum_components(residuos, ['e'])
+        variancia_razao = (variancia_e['e'].groupby(level='ANO').agg(lambda x: x.to_numpy().sum())
+                           / total_ano['casos'] ** 2)
+        for ano in total_ano.index:
+            linhas.append((ano, descricao, razao.get(ano), np.sqrt(variancia_razao.get(ano, np.nan))))
+
+    from scipy.stats import t
+
+    # Graus de liberdade do ano: soma de (meses sorteados - 1) nos estratos
+    graus = unidades.groupby(['ANO', 'UF']).size().sub(1).groupby(level='ANO').sum()
+    tabela = pd.DataFrame(linhas, columns=['ANO', 'Indicador', 'Estimativa', 'Erro_Padrao'])
+    quantil = t.ppf(0.975, tabela['ANO'].map(graus).where(lambda g: g > 0))
+    # Todos os indicadores são não negativos: o limite inferior é truncado em zero
+    tabela['IC95_Inferior'] = (tabela['Estimativa'] - quantil * tabela['Erro_Padrao']).clip(lower=0)
+    tabela['IC95_Superior'] = tabela['Estimativa'] + quantil * tabela['Erro_Padrao']
+    tabela['Graus_Liberdade'] = tabela['ANO'].map(graus)
+    tabela['CV_Percentual'] = 100 * tabela['Erro_Padrao'] / tabela['Estimativa'].replace(0, np.nan)
+    tabela['Aproximado'] = 'SIM'
+    colunas = ['Estimativa', 'Erro_Padrao', 'IC95_Inferior', 'IC95_Superior', 'CV_Percentual']
+    tabela[colunas] = tabela[colunas].round(2)
+    return tabela.sort_values(['ANO', 'Indicador'], kind='stable').reset_index(drop=True)
+
+
+def summarize_sample(unidades, raw):
+    """Desenho amostral por ano: UFs, meses sorteados, registros lidos e episódios na amostra"""
+    lidos = raw.groupby('ANO').size()
+    resumo = unidades.groupby('ANO').agg(
+        UFs=('UF', 'nunique'),
+        Meses_Amostrados=('MES', 'size'),
+        Episodios_Amostra=('casos', 'sum'),
+    )
+    resumo['Meses_Populacao'] = unidades.groupby(['ANO', 'UF'])['N_MESES'].first().groupby(level='ANO').sum()
+    resumo['Fracao_Amostral'] = (resumo['Meses_Amostrados'] / resumo['Meses_Populacao']).round(3)
+    resumo['Registros_Lidos'] = lidos.reindex(resumo.index).fillna(0).astype(int)
+    resumo['Aproximado'] = 'SIM'
+    return resumo.reset_index()
+
+
+def plot_preview(anual, filename=GRAFICO_PREVIA):
+    """Gráfico de internações estimadas por ano com IC 95%, marcado como prévia"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    casos = anual[anual['Indicador'] == VARIAVEIS_TOTAIS['casos']]
+    if casos.empty:
+        return None
+    fig, ax = plt.subplots(figsize=(8, 4.5))
+    erro = [casos['Estimativa'] - casos['IC95_Inferior'], casos['IC95_Superior'] - casos['Estimativa']]
+    ax.bar(casos['ANO'].astype(str), casos['Estimativa'], color='#bbbbbb', edgecolor='#555555',
+           hatch='//', yerr=np.nan_to_num(erro), capsize=4)
+    ax.set_title('PRÉVIA APROXIMADA - Internações estimadas por ano (IC 95%)')
+    ax.set_ylabel('Internações (estimativa)')
+    fig.text(0.99, 0.01, 'Amostra estratificada de meses - não usar como resultado final',
+             ha='right', va='bottom', fontsize=8, color='#aa0000')
+    fig.tight_layout()
+    fig.savefig(filename, dpi=120)
+    plt.close(fig)
+    return filename
+
+
+def export_preview(stats, filename=ARQUIVO_PREVIA):
+    """
+    Grava a prévia em um Excel próprio, com a aba de aviso em primeiro lugar
+
+    Args:
+        stats (dict): 'previa_anual' e 'previa_amostra'
+        filename (str): Arquivo de destino
+    """
+    with pd.ExcelWriter(filename, engine='openpyxl') as writer:
+        pd.DataFrame({'Aviso': [AVISO_PREVIA, stats['desenho']]}).to_excel(writer, sheet_name='LEIA_PRIMEIRO',
+                                                                         index=False)
+        write_optional_sheets(writer, stats, ABAS_PREVIA)
+    print(f"✅ Arquivo {filename} criado (PRÉVIA - valores aproximados)")
+
+
+def run_preview(ufs=('AM',), start_year=2020, end_year=2025, months_per_stratum=MESES_POR_ESTRATO,
+                seed=SEMENTE_PADRAO, filename=ARQUIVO_PREVIA):
+    """
+    Executa a prévia: sorteio, leitura dos meses sorteados, filtro e estimativas
+
+    Args:
+        ufs (iterable): Siglas das UFs
+        start_year (int): Ano inicial
+        end_year (int): Ano final
+        months_per_stratum (int): Meses sorteados por estrato (ano, UF)
+        seed (int): Semente do sorteio
+        filename (str): Excel de saída
+
+    Returns:
+        dict: 'previa_anual', 'previa_amostra' e 'desenho'
+    """
+    inicio = time.perf_counter()
+    print("⚠️ " + AVISO_PREVIA)
+    print("=" * 80)
+
+    amostra = sample_months(list(ufs), start_year, end_year, months_per_stratum, seed)
+    print(f"🎲 {len(amostra)} meses sorteados em {amostra.groupby(['ANO', 'UF']).ngroups} estratos (ano x UF), "
+          f"semente {seed}")
+
+    with timed('previa_leitura_segundos', 'INFO') as campos:
+        brutos = load_sampled_records(amostra, start_year, end_year)
+        campos['linhas'] = len(brutos)
+    if brutos.empty:
+        print("❌ Nenhum registro nos meses sorteados.")
+        return {}
+
+    # Mesma coorte da execução completa (episódios consolidados e valores reais);
+    # cada episódio fica na UF e no mês sorteado do seu registro principal
+    coorte, _ = prepare_sih_cohort(brutos, keep_columns=['UF', 'MES_AMOSTRA'])
+    coorte['ANO'] = pd.to_numeric(coorte['ANO'], errors='coerce').fillna(0).astype(int)
+    unidades = _unit_totals(coorte, amostra)
+
+    desenho = (f"Unidade estimada: episódios de internação (AIHs consolidadas), com dias e valores somados "
+               f"no episódio e valores reais pelo IPCA. Estratos ano x UF ({', '.join(sorted(set(ufs)))}), "
+               f"{months_per_stratum} meses por estrato (um por bloco de meses consecutivos), semente {seed}; "
+               f"totais expandidos e médias por razão, IC 95% pela distribuição t")
+    stats = {
+        'previa_anual': estimate_yearly_indicators(unidades),
+        'previa_amostra': summarize_sample(unidades, brutos),
+        'desenho': desenho,
+    }
+    export_preview(stats, filename)
+    grafico = plot_preview(stats['previa_anual'])
+
+    segundos = time.perf_counter() - inicio
+    casos = stats['previa_anual'][stats['previa_anual']['Indicador'] == VARIAVEIS_TOTAIS['casos']]
+    print("=" * 80)
+    print("📈 PRÉVIA - internações estimadas por ano (IC 95%):")
+    for _, linha in casos.iterrows():
+        print(f"   {int(linha['ANO'])}: ~{linha['Estimativa']:.0f} "
+              f"({linha['IC95_Inferior']:.0f} a {linha['IC95_Superior']:.0f})")
+    fracao = stats['previa_amostra']['Meses_Amostrados'].sum() / stats['previa_amostra']['Meses_Populacao'].sum()
+    print(f"   ⏱️ {segundos:.1f} s, {100 * fracao:.0f}% dos meses lidos")
+    if grafico:
+        print(f"   🖼️ Gráfico: {grafico}")
+    print("⚠️ Valores aproximados - confirme com a execução completa (analise_morbidade_diabetes.py)")
+    event('previa_concluida', 'INFO', ufs=list(ufs), meses=len(amostra), fracao_meses=round(fracao, 3),
+          segundos=round(segundos, 3))
+    return stats
+
+
+def main():
+    """
+    Executa a prévia pela linha de comando
+    """
+    parser = argparse.ArgumentParser(description='Prévia aproximada por amostragem estratificada de meses (SIH-SUS)')
+    parser.add_argument('--ufs', nargs='+', default=['AM'], help='UFs (estratos junto com o ano)')
+    parser.add_argument('--inicio', type=int, default=2020, help='Ano inicial')
+    parser.add_argument('--fim', type=int, default=2025, help='Ano final')
+    parser.add_argument('--meses', type=int, default=MESES_POR_ESTRATO, help='Meses sorteados por ano e UF')
+    parser.add_argument('--semente', type=int, default=SEMENTE_PADRAO, help='Semente do sorteio')
+    parser.add_argument('--excel', default=ARQUIVO_PREVIA, help='Arquivo Excel da prévia')
+    args = parser.parse_args()
+
+    print("🚀 Prévia de MORBIDADE por diabetes - Crianças/Adolescentes")
+    run_preview([uf.upper() for uf in args.ufs], args.inicio, args.fim, args.meses, args.semente, args.excel)
+
+
+if __name__ == "__main__":
+    main()
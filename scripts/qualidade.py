@@ -0,0 +1,357 @@
+"""
+Perfil de Qualidade dos Dados Brutos - SIH-SUS e SIM-DO
+
+Os filtros descartam valores inválidos sem aviso: IDADE não numérica vira NaN
+em to_numeric, CIDs nulos ou malformados nunca casam com o conjunto CID-10 e
+códigos de SEXO sem descrição viram NaN em SEXO_DESC. Este módulo conta, em
+uma única passada por partição, quantos registros de cada coluna têm:
+
+- valor nulo ou vazio
+- código inválido (SEXO fora do mapeamento, CID-10 fora do formato)
+- idade ou valor não numérico ou fora da faixa
+- data inválida, impossível (futura ou anterior a 1900) ou fora de ordem
+  (saída antes da internação, nascimento depois do evento)
+- permanência impossível (negativa, acima do máximo) ou divergente das datas
+- município de residência desconhecido (código malformado, UF inexistente ou
+  ausente das tabelas de referência, quando existem)
+
+Cada verificação é avaliada sobre os valores distintos da coluna (como em
+cid10.py e datas.py) e propagada aos registros por indexação, então o custo é
+pequeno frente ao download e à gravação da partição. Na ingestão, o perfil de
+cada partição fica registrado no livro de ingestão (retomada.py) e as
+execuções seguintes montam as abas Qualidade_Dados e Qualidade_Particoes sem
+reler os dados.
+
+Autor: GitHub Copilot
+Data: 2025
+"""
+
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from armazenamento import PASTA_ARMAZENAMENTO, partition_months
+from cid10 import normalize_cid
+from datas import parse_datasus_dates
+from referencias import load_reference_table, normalize_municipality, reference_path
+from regioes import ARQUIVO_REGIOES, UF_IBGE
+from telemetria import count, timed
+from varredura_espacial import ARQUIVO_COORDENADAS
+
+# Abas do Excel (chave em stats -> nome da aba)
+ABAS_QUALIDADE = [
+    ('qualidade_dados', 'Qualidade_Dados'),
+    ('qualidade_particoes', 'Qualidade_Particoes'),
+]
+
+# Colunas verificadas em cada sistema -> tipo de verificação
+COLUNAS_QUALIDADE = {
+    'SIH': {
+        'IDADE': 'numero', 'SEXO': 'sexo', 'DIAG_PRINC': 'cid', 'DT_INTER': 'data', 'DT_SAIDA': 'data',
+        'NASC': 'data', 'DIAS_PERM': 'numero', 'VAL_TOT': 'numero', 'MUNRES': 'municipio',
+    },
+    'SIM': {
+        'IDADE': 'numero', 'SEXO': 'sexo', 'CAUSABAS': 'cid', 'DTOBITO': 'data', 'DTNASC': 'data',
+        'MUNRES': 'municipio',
+    },
+}
+
+# Faixas plausíveis das colunas numéricas: (mínimo, máximo, nome da verificação).
+# IDADE segue a unidade usada nos filtros (SIH em anos, SIM em dias).
+FAIXAS = {
+    'SIH': {
+        'IDADE': (0, 130, 'fora_faixa'),
+        'DIAS_PERM': (0, 365, 'permanencia_impossivel'),
+        'VAL_TOT': (0, np.inf, 'negativo'),
+    },
+    'SIM': {
+        'IDADE': (0, 130 * 366, 'fora_faixa'),
+    },
+}
+
+# Datas que não podem estar invertidas: coluna verificada -> (anterior, posterior)
+ORDEM_DATAS = {
+    'SIH': {'NASC': ('NASC', 'DT_INTER'), 'DT_SAIDA': ('DT_INTER', 'DT_SAIDA')},
+    'SIM': {'DTNASC': ('DTNASC', 'DTOBITO')},
+}
+
+# Códigos de SEXO com descrição nas análises (os demais viram NaN em SEXO_DESC)
+CODIGOS_SEXO = ('1', '2')
+
+# CID-10 normalizado: letra, duas posições numéricas e até duas de subcategoria
+PADRAO_CID = r'^[A-Z][0-9]{2}[0-9A-Z]{0,2}$'
+
+DATA_MINIMA = np.datetime64('1900-01-01', 'ns')
+
+# Linha de resumo: registros com pelo menos um problema em qualquer coluna
+REGISTRO = '(registro)'
+
+DESCRICOES = {
+    'nulo': 'Valor nulo ou vazio',
+    'nao_numerico': 'Valor não numérico (vira NaN)',
+    'fora_faixa': 'Fora da faixa plausível',
+    'negativo': 'Valor negativo',
+    'permanencia_impossivel': 'Permanência negativa ou acima de 365 dias',
+    'divergente_datas': 'Permanência diferente da calculada pelas datas',
+    'codigo_invalido': 'Código fora do mapeamento ou do formato',
+    'data_invalida': 'Data em formato não reconhecido',
+    'data_impossivel': 'Data futura ou anterior a 1900',
+    'fora_de_ordem': 'Data incompatível com a data do evento',
+    'municipio_desconhecido': 'Município malformado ou fora das tabelas de referência',
+    'algum_problema': 'Registros com pelo menos um problema',
+}
+
+# Verificações listadas no terminal
+MAXIMO_LISTADAS = 5
+
+
+def _distinct(series):
+    """Código por registro (-1 = nulo ou vazio) e valores distintos em texto, sem espaços"""
+    codigos, unicos = pd.factorize(series)
+    textos = pd.Series(unicos, dtype=object).astype(str).str.strip()
+    vazios = (textos == '').to_numpy()
+    if vazios.any():
+        codigos = np.where((codigos >= 0) & np.append(vazios, False)[codigos], -1, codigos)
+    return codigos, textos
+
+
+def _rows(codigos, tabela):
+    """Propaga uma verificação dos valores distintos aos registros (nulos ficam False)"""
+    return np.append(np.asarray(tabela, dtype=bool), False)[codigos]
+
+
+@lru_cache(maxsize=1)
+def known_municipalities():
+    """
+    Municípios das tabelas de referência (regiões de saúde e coordenadas)
+
+    Returns:
+        frozenset: Códigos de 6 dígitos, ou None se nenhuma tabela existir
+    """
+    conhecidos = set()
+    for arquivo in (ARQUIVO_REGIOES, ARQUIVO_COORDENADAS):
+        if os.path.exists(reference_path(arquivo)):
+            tabela = load_reference_table(arquivo, dtype={'MUNRES': str})
+            conhecidos.update(normalize_municipality(tabela['MUNRES'].dropna()))
+    return frozenset(conhecidos) or None
+
+
+def _valid_municipalities(textos):
+    """Códigos distintos bem formados, de UF existente e presentes nas referências (se houver)"""
+    codigos = normalize_municipality(textos)
+    validos = codigos.str.fullmatch(r'[0-9]{6}') & codigos.str[:2].isin(UF_IBGE)
+    conhecidos = known_municipalities()
+    if conhecidos is not None:
+        validos &= codigos.isin(conhecidos)
+    return validos.to_numpy(dtype=bool, na_value=False)
+
+
+def profile_partition(df, system):
+    """
+    Conta os problemas de qualidade de uma partição em uma única passada
+
+    Args:
+        df (pd.DataFrame): Registros brutos de uma partição (ou de qualquer recorte)
+        system (str): 'SIH' ou 'SIM'
+
+    Returns:
+        dict: 'registros' e 'ocorrencias' ('COLUNA/verificacao' -> registros
+            afetados; inclui '(registro)/algum_problema')
+    """
+    n = len(df)
+    ocorrencias = {}
+    if n == 0:
+        return {'registros': 0, 'ocorrencias': ocorrencias}
+
+    algum = np.zeros(n, dtype=bool)
+    datas = {}
+    numeros = {}
+
+    def registrar(coluna, verificacao, mascara):
+        ocorrencias[f'{coluna}/{verificacao}'] = int(mascara.sum())
+        np.logical_or(algum, mascara, out=algum)
+
+    with timed('qualidade_perfil_segundos', sistema=system) as campos:
+        hoje = np.datetime64(pd.Timestamp.today().normalize().to_datetime64(), 'ns')
+        for coluna, tipo in COLUNAS_QUALIDADE[system].items():
+            if coluna not in df.columns:
+                continue
+            codigos, textos = _distinct(df[coluna])
+            registrar(coluna, 'nulo', codigos < 0)
+
+            if tipo == 'numero':
+                valores = pd.to_numeric(textos, errors='coerce').to_numpy(dtype=float)
+                registrar(coluna, 'nao_numerico', _rows(codigos, np.isnan(valores)))
+                minimo, maximo, verificacao = FAIXAS[system][coluna]
+                registrar(coluna, verificacao, _rows(codigos, (valores < minimo) | (valores > maximo)))
+                numeros[coluna] = np.append(valores, np.nan)[codigos]
+            elif tipo == 'sexo':
+                registrar(coluna, 'codigo_invalido', _rows(codigos, ~textos.isin(CODIGOS_SEXO)))
+            elif tipo == 'cid':
+                registrar(coluna, 'codigo_invalido',
+                          _rows(codigos, ~normalize_cid(textos).str.match(PADRAO_CID)))
+            elif tipo == 'municipio':
+                registrar(coluna, 'municipio_desconhecido', _rows(codigos, ~_valid_municipalities(textos)))
+            elif tipo == 'data':
+                valores = parse_datasus_dates(textos, system).to_numpy(dtype='datetime64[ns]')
+                invalidas = np.isnat(valores)
+                registrar(coluna, 'data_invalida', _rows(codigos, invalidas))
+                registrar(coluna, 'data_impossivel',
+                          _rows(codigos, ~invalidas & ((valores < DATA_MINIMA) | (valores > hoje))))
+                datas[coluna] = np.append(valores, np.datetime64('NaT', 'ns'))[codigos]
+
+        # Comparações com NaT são falsas: só pares de datas válidas contam
+        for coluna, (anterior, posterior) in ORDEM_DATAS[system].items():
+            if anterior in datas and posterior in datas:
+                registrar(coluna, 'fora_de_ordem', datas[posterior] < datas[anterior])
+
+        if system == 'SIH' and 'DIAS_PERM' in numeros and {'DT_INTER', 'DT_SAIDA'} <= set(datas):
+            calculada = (datas['DT_SAIDA'] - datas['DT_INTER']) / np.timedelta64(1, 'D')
+            informada = numeros['DIAS_PERM']
+            registrar('DIAS_PERM', 'divergente_datas',
+                      ~np.isnan(calculada) & ~np.isnan(informada) & (calculada != informada))
+
+        ocorrencias[f'{REGISTRO}/algum_problema'] = int(algum.sum())
+        campos['linhas'] = n
+
+    for chave, total in ocorrencias.items():
+        if total:
+            coluna, verificacao = chave.split('/')
+            count('problemas_qualidade_total', total, sistema=system, coluna=coluna, verificacao=verificacao)
+    return {'registros': n, 'ocorrencias': ocorrencias}
+
+
+def profile_dataframe(df, system, uf):
+    """
+    Perfis por partição (ano e mês da partição no SIH) de registros em memória
+
+    Usado quando os dados não passaram pela ingestão (modo de demonstração).
+
+    Args:
+        df (pd.DataFrame): Registros brutos com ANO
+        system (str): 'SIH' ou 'SIM'
+        uf (str): Sigla da UF
+
+    Returns:
+        list: Tuplas (uf, ano, mês ou None, perfil)
+    """
+    if df.empty:
+        return []
+    anos = pd.to_numeric(df['ANO'], errors='coerce').fillna(0).astype(int)
+    if system == 'SIM':
+        return [(uf, int(ano), None, profile_partition(parte, system)) for ano, parte in df.groupby(anos)]
+    meses = partition_months(df, system)
+    return [(uf, int(ano), int(mes), profile_partition(parte, system))
+            for (ano, mes), parte in df.groupby([anos, meses])]
+
+
+def ledger_profiles(system, uf, units, root=PASTA_ARMAZENAMENTO):
+    """
+    Perfis das unidades registrados no livro de ingestão
+
+    Args:
+        system (str): 'SIH' ou 'SIM'
+        uf (str): Sigla da UF
+        units (list): Pares (ano, mês ou None) de download_units
+        root (str): Pasta do armazenamento
+
+    Returns:
+        list: Tuplas (uf, ano, mês ou None, perfil)
+    """
+    # retomada.py importa este módulo na ingestão
+    from retomada import _unit_key, load_ingestion_log
+
+    livro = load_ingestion_log(root)
+    perfis = []
+    sem_perfil = 0
+    for ano, mes in units:
+        registro = livro.get(_unit_key(system, uf, ano, mes))
+        if registro is None or registro['situacao'] != 'concluida':
+            continue
+        if 'qualidade' in registro:
+            perfis.append((uf, ano, mes, registro['qualidade']))
+        else:
+            sem_perfil += 1
+    if sem_perfil:
+        print(f"   ⚠️ {sem_perfil} partições ingeridas antes do perfil de qualidade (sem contagens)")
+    return perfis
+
+
+def quality_tables(system, perfis):
+    """
+    Monta as tabelas de qualidade a partir dos perfis das partições
+
+    Args:
+        system (str): 'SIH' ou 'SIM'
+        perfis (list): Tuplas (uf, ano, mês ou None, perfil)
+
+    Returns:
+        dict: 'qualidade_dados' (totais por coluna e verificação) e
+            'qualidade_particoes' (partições com ocorrências)
+    """
+    linhas = [(uf, ano, mes, *chave.split('/'), perfil['registros'], total)
+              for uf, ano, mes, perfil in perfis for chave, total in perfil['ocorrencias'].items()]
+    if not linhas:
+        return {}
+
+    detalhe = pd.DataFrame(linhas, columns=['UF', 'Ano', 'Mes', 'Coluna', 'Verificacao', 'Registros', 'Ocorrencias'])
+    detalhe.insert(0, 'Sistema', system)
+    detalhe['Mes'] = detalhe['Mes'].astype('Int8')
+    detalhe['Percentual'] = (100 * detalhe['Ocorrencias'] / detalhe['Registros']).round(3)
+
+    resumo = detalhe.groupby(['Sistema', 'Coluna', 'Verificacao'], sort=False).agg(
+        Registros=('Registros', 'sum'),
+        Ocorrencias=('Ocorrencias', 'sum'),
+        Particoes_Afetadas=('Ocorrencias', lambda x: int((x > 0).sum())),
+    ).reset_index()
+    resumo['Percentual'] = (100 * resumo['Ocorrencias'] / resumo['Registros']).round(3)
+    resumo['Descricao'] = resumo['Verificacao'].map(DESCRICOES)
+    # Linha de resumo primeiro, depois na ordem das colunas verificadas
+    ordem = {coluna: i for i, coluna in enumerate([REGISTRO, *COLUNAS_QUALIDADE[system]])}
+    resumo = resumo.sort_values('Coluna', key=lambda c: c.map(ordem), kind='stable').reset_index(drop=True)
+
+    return {
+        'qualidade_dados': resumo,
+        'qualidade_particoes': detalhe[detalhe['Ocorrencias'] > 0].reset_index(drop=True),
+    }
+
+
+def create_quality_analysis(system, uf, df_raw=None, units=None):
+    """
+    Tabelas de qualidade dos dados brutos de uma execução
+
+    Com units, usa os perfis gravados na ingestão de cada partição (que
+    cobrem todos os registros baixados, e não só os lidos para a coorte);
+    sem units, perfila df_raw por partição.
+
+    Args:
+        system (str): 'SIH' ou 'SIM'
+        uf (str): Sigla da UF
+        df_raw (pd.DataFrame): Registros brutos (usado sem units)
+        units (list): Pares (ano, mês ou None) de download_units
+
+    Returns:
+        dict: 'qualidade_dados' e 'qualidade_particoes' (vazio sem perfis)
+    """
+    print(f"🧪 Perfil de qualidade dos dados brutos ({system})...")
+    if units is not None:
+        perfis = ledger_profiles(system, uf, units)
+    else:
+        perfis = profile_dataframe(df_raw if df_raw is not None else pd.DataFrame(), system, uf)
+
+    tabelas = quality_tables(system, perfis)
+    if not tabelas:
+        print("   ⚠️ Nenhuma partição com perfil de qualidade")
+        return tabelas
+
+    resumo = tabelas['qualidade_dados']
+    geral = resumo[resumo['Coluna'] == REGISTRO].iloc[0]
+    print(f"   {len(perfis)} partições, {int(geral['Registros'])} registros: "
+          f"{int(geral['Ocorrencias'])} ({geral['Percentual']:.1f}%) com algum problema")
+    problemas = resumo[(resumo['Coluna'] != REGISTRO) & (resumo['Ocorrencias'] > 0)]
+    for _, linha in problemas.nlargest(MAXIMO_LISTADAS, 'Ocorrencias').iterrows():
+        print(f"   - {linha['Coluna']} {linha['Verificacao']}: {int(linha['Ocorrencias'])} "
+              f"({linha['Percentual']:.1f}%)")
+    return tabelas
@@ -0,0 +1,68 @@
+"""
+Tabelas de Referência Locais
+
+Localização e leitura das tabelas de referência mantidas em dados/referencia/
+(população IBGE, índices de preços, estabelecimentos, regiões de saúde, etc.).
+O formato esperado de cada tabela está descrito em dados/referencia/README.md.
+
+Autor: GitHub Copilot
+Data: 2025
+"""
+
+import os
+
+import pandas as pd
+
+PASTA_REFERENCIA = os.path.normpath(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dados', 'referencia')
+)
+
+
+def reference_path(filename):
+    """
+    Retorna o caminho de uma tabela de referência
+
+    Args:
+        filename (str): Nome do arquivo (ex.: 'populacao_ibge.csv')
+
+    Returns:
+        str: Caminho completo do arquivo
+    """
+    return os.path.join(PASTA_REFERENCIA, filename)
+
+
+def load_reference_table(filename, dtype=None):
+    """
+    Lê uma tabela de referência em CSV, se existir
+
+    Args:
+        filename (str): Nome do arquivo em dados/referencia/ ou caminho completo
+        dtype (dict): Tipos das colunas (códigos devem ser lidos como texto)
+
+    Returns:
+        pd.DataFrame: Tabela lida, ou None se o arquivo não existir
+    """
+    path = filename if os.path.isabs(filename) or os.path.exists(filename) else reference_path(filename)
+    if not os.path.exists(path):
+        print(f"   ⚠️ Tabela de referência não encontrada: {path}")
+        return None
+
+    tabela = pd.read_csv(path, dtype=dtype)
+    print(f"   ✅ Tabela de referência {os.path.basename(path)}: {len(tabela)} linhas")
+    return tabela
+
+
+def normalize_municipality(codes):
+    """
+    Normaliza códigos de município IBGE para 6 dígitos (sem dígito verificador)
+
+    O SIH-SUS e o SIM-DO usam 6 dígitos; tabelas do IBGE costumam usar 7.
+    Códigos nulos ou vazios continuam nulos (pd.NA), e não o texto 'nan'.
+
+    Args:
+        codes (pd.Series): Códigos de município
+
+    Returns:
+        pd.Series: Códigos com 6 dígitos, em texto (dtype string), com pd.NA nos ausentes
+    """
+    return codes.astype('string').str.strip().str[:6].replace('', pd.NA)
@@ -0,0 +1,260 @@
+"""
+Agregação Espacial - Município, Região de Saúde, Macrorregião e UF
+
+Este módulo compila a tabela local de regionalização em arrays densos de
+consulta: cada município (posição no índice de municípios) aponta diretamente
+para a posição da sua região de saúde, macrorregião e UF. Cada agregação é
+então uma única consulta vetorizada (gather) seguida de np.bincount sobre a
+grade (ano x unidade) - para casos, somas de permanência/valor e população.
+
+Autor: GitHub Copilot
+Data: 2025
+"""
+
+import numpy as np
+import pandas as pd
+
+from referencias import load_reference_table, normalize_municipality
+
+ARQUIVO_REGIOES = 'regioes_saude.csv'
+
+# Abas do Excel (chave em stats -> nome da aba)
+ABAS_REGIOES = [('agregados_regionais', 'Agregados_Regionais')]
+
+# Níveis de agregação, do mais fino ao mais amplo
+NIVEIS = ['Municipio', 'Regiao_Saude', 'Macrorregiao', 'UF']
+
+# UFs pelos dois primeiros dígitos do código IBGE do município
+UF_IBGE = {
+    '11': 'RO', '12': 'AC', '13': 'AM', '14': 'RR', '15': 'PA', '16': 'AP', '17': 'TO',
+    '21': 'MA', '22': 'PI', '23': 'CE', '24': 'RN', '25': 'PB', '26': 'PE', '27': 'AL',
+    '28': 'SE', '29': 'BA', '31': 'MG', '32': 'ES', '33': 'RJ', '35': 'SP', '41': 'PR',
+    '42': 'SC', '43': 'RS', '50': 'MS', '51': 'MT', '52': 'GO', '53': 'DF',
+}
+
+# Colunas somadas além da contagem de casos (as que existirem)
+COLUNAS_SOMADAS = {'DIAS_PERM': 'Dias_Permanencia', 'VAL_TOT_REAL': 'Valor_Real'}
+
+# Unidade extra de cada nível para municípios fora da tabela
+NAO_MAPEADO = 'Não mapeado'
+POR_100_MIL = 100_000
+
+
+def create_sample_regions(codes):
+    """
+    Cria uma regionalização fictícia para os municípios informados
+
+    Municípios em ordem de código formam regiões de três municípios, e cada
+    duas regiões formam uma macrorregião.
+
+    Args:
+        codes (array-like): Códigos de município (6 dígitos)
+
+    Returns:
+        pd.DataFrame: Tabela no formato de regioes_saude.csv
+    """
+    print("🔄 Gerando regiões de saúde de exemplo para demonstração...")
+    codigos = np.sort(np.unique(np.asarray(codes, dtype=str)))
+    regiao = np.arange(len(codigos)) // 3
+    macro = regiao // 2
+    tabela = pd.DataFrame({
+        'MUNRES': codigos,
+        'COD_REGIAO': [f'R{r + 1:02d}' for r in regiao],
+        'NOME_REGIAO': [f'Região de Saúde Exemplo {r + 1}' for r in regiao],
+        'COD_MACRO': [f'M{m + 1:02d}' for m in macro],
+        'NOME_MACRO': [f'Macrorregião Exemplo {m + 1}' for m in macro],
+    })
+    print("📝 IMPORTANTE: Regiões de saúde fictícias para demonstração!")
+    return tabela
+
+
+def build_region_index(tabela):
+    """
+    Compila a regionalização em arrays densos município -> unidade de cada nível
+
+    Args:
+        tabela (pd.DataFrame): Colunas MUNRES, COD_REGIAO, NOME_REGIAO, COD_MACRO
+            e NOME_MACRO (a UF vem do código do município)
+
+    Returns:
+        dict: 'municipios' (pd.Index) e, por nível, 'codigos' e 'nomes' das
+            unidades e 'consulta' (np.ndarray: posição do município -> posição
+            da unidade; a última posição recebe os municípios não mapeados)
+    """
+    tabela = tabela.assign(MUNRES=normalize_municipality(tabela['MUNRES'])).dropna(subset=['MUNRES'])
+    tabela = tabela.drop_duplicates('MUNRES', keep='last').sort_values('MUNRES').reset_index(drop=True)
+    tabela['UF'] = tabela['MUNRES'].str[:2].map(UF_IBGE).fillna(tabela['MUNRES'].str[:2])
+
+    colunas = {
+        'Municipio': ('MUNRES', 'MUNRES'),
+        'Regiao_Saude': ('COD_REGIAO', 'NOME_REGIAO'),
+        'Macrorregiao': ('COD_MACRO', 'NOME_MACRO'),
+        'UF': ('UF', 'UF'),
+    }
+    indice = {'municipios': pd.Index(tabela['MUNRES'])}
+    for nivel, (coluna_codigo, coluna_nome) in colunas.items():
+        posicoes, codigos = pd.factorize(tabela[coluna_codigo].astype(str))
+        nomes = tabela.groupby(posicoes, sort=True)[coluna_nome].first().astype(str).to_numpy()
+        # Municípios sem mapeamento (posição -1 no índice) vão para a unidade extra
+        indice[nivel] = {
+            'codigos': np.append(codigos.to_numpy(dtype=object), NAO_MAPEADO),
+            'nomes': np.append(nomes, NAO_MAPEADO),
+            'consulta': np.append(posicoes, len(codigos)),
+        }
+    return indice
+
+
+def load_region_index(codes=None, filename=ARQUIVO_REGIOES):
+    """
+    Carrega a regionalização local e compila os arrays de consulta
+
+    Se a tabela não existir e codes for informado, usa regiões de exemplo.
+
+    Args:
+        codes (array-like): Municípios analisados (usados apenas no modo de demonstração)
+        filename (str): Tabela em dados/referencia/ ou caminho completo
+
+    Returns:
+        dict: Índice regional (ver build_region_index) ou None
+    """
+    tabela = load_reference_table(filename, dtype={'MUNRES': str, 'COD_REGIAO': str, 'COD_MACRO': str})
+    if tabela is None:
+        if codes is None or len(codes) == 0:
+            return None
+        tabela = create_sample_regions(codes)
+    return build_region_index(tabela)
+
+
+def municipality_positions(codes, indice):
+    """Posição de cada município no índice (-1 se ausente), resolvida uma vez por código distinto"""
+    codigos, unicos = pd.factorize(pd.Series(codes))
+    tabela = np.append(indice['municipios'].get_indexer(normalize_municipality(pd.Series(unicos))), -1)
+    return tabela[codigos]
+
+
+def roll_up(year_positions, municipality_positions, n_years, consulta, weights=None):
+    """
+    Soma valores na grade (ano x unidade) de um nível: uma consulta e um bincount
+
+    Args:
+        year_positions (np.ndarray): Posição do ano de cada elemento
+        municipality_positions (np.ndarray): Posição do município (-1 = não mapeado)
+        n_years (int): Número de anos
+        consulta (np.ndarray): Array de consulta município -> unidade do nível
+        weights (np.ndarray): Pesos (padrão: contagem)
+
+    Returns:
+        np.ndarray: Matriz (ano x unidade)
+    """
+    n_unidades = consulta.max() + 1
+    unidades = consulta[municipality_positions]
+    return np.bincount(year_positions * n_unidades + unidades, weights=weights,
+                       minlength=n_years * n_unidades).reshape(n_years, n_unidades)
+
+
+def create_regional_rollups(df, population=None, indice=None, filename=ARQUIVO_REGIOES):
+    """
+    Agrega casos, somas e população por município, região de saúde, macrorregião e UF
+
+    Args:
+        df (pd.DataFrame): Registros com ANO e MUNRES
+        population (dict): Índice populacional de taxas.py (opcional; sem ele
+            as colunas Populacao e Taxa_100mil ficam vazias)
+        indice (dict): Índice regional (padrão: load_region_index)
+        filename (str): Tabela de regionalização em dados/referencia/
+
+    Returns:
+        dict: 'agregados_regionais' (pd.DataFrame com Nivel, Codigo, Nome, ANO,
+            Casos, somas, Populacao e Taxa_100mil; ANO = 'Total' soma o período)
+    """
+    print("🗺️ Agregando por região de saúde, macrorregião e UF...")
+
+    if df.empty or not {'ANO', 'MUNRES'} <= set(df.columns):
+        return {'agregados_regionais': pd.DataFrame()}
+
+    municipios_dados = normalize_municipality(pd.Series(df['MUNRES'].unique())).dropna().unique()
+    indice = indice if indice is not None else load_region_index(municipios_dados, filename)
+    if indice is None:
+        return {'agregados_regionais': pd.DataFrame()}
+
+    anos = np.sort(df['ANO'].dropna().astype(int).unique())
+    dados = df[df['ANO'].notna()]
+    pos_ano = np.searchsorted(anos, dados['ANO'].astype(int).to_numpy())
+    pos_mun = municipality_positions(dados['MUNRES'], indice)
+    nao_mapeados = int((pos_mun < 0).sum())
+    if nao_mapeados:
+        print(f"   ⚠️ {nao_mapeados} registros de municípios fora da regionalização")
+
+    # População (ano x município do índice populacional), se houver
+    pop_ano = pop_mun = pop_valores = None
+    if population is not None:
+        populacao = population['populacao'].sum(axis=(2, 3))
+        pos_ano_pop = pd.Index(anos).get_indexer(population['anos'])
+        anos_validos = pos_ano_pop >= 0
+        pop_mun_pos = municipality_positions(population['municipios'].to_numpy(), indice)
+        grade_ano, grade_mun = np.meshgrid(pos_ano_pop[anos_validos], pop_mun_pos, indexing='ij')
+        pop_ano, pop_mun = grade_ano.ravel(), grade_mun.ravel()
+        pop_valores = populacao[anos_validos].ravel()
+
+    somadas = {nome: pd.to_numeric(dados[coluna], errors='coerce').fillna(0).to_numpy(dtype=float)
+               for coluna, nome in COLUNAS_SOMADAS.items() if coluna in dados.columns}
+
+    tabelas = []
+    for nivel in NIVEIS:
+        consulta = indice[nivel]['consulta']
+        metricas = {'Casos': roll_up(pos_ano, pos_mun, len(anos), consulta)}
+        for nome, valores in somadas.items():
+            metricas[nome] = roll_up(pos_ano, pos_mun, len(anos), consulta, valores)
+        if pop_valores is not None:
+            metricas['Populacao'] = roll_up(pop_ano, pop_mun, len(anos), consulta, pop_valores)
+        else:
+            metricas['Populacao'] = np.full_like(metricas['Casos'], np.nan, dtype=float)
+
+        # Período completo: soma dos anos (população em pessoas-ano)
+        metricas = {nome: np.vstack([m, m.sum(axis=0, keepdims=True)]) for nome, m in metricas.items()}
+        rotulos_ano = np.append(anos.astype(object), 'Total')
+        n_linhas, n_unidades = metricas['Casos'].shape
+
+        tabela = pd.DataFrame({
+            'Nivel': nivel,
+            'Codigo': np.tile(indice[nivel]['codigos'], n_linhas),
+            'Nome': np.tile(indice[nivel]['nomes'], n_linhas),
+            'ANO': np.repeat(rotulos_ano, n_unidades),
+        })
+        for nome, matriz in metricas.items():
+            tabela[nome] = matriz.ravel()
+        populacao_nivel = tabela['Populacao'].where(tabela['Populacao'] > 0)
+        tabela['Taxa_100mil'] = (POR_100_MIL * tabela['Casos'] / populacao_nivel).round(2)
+
+        # Apenas unidades com casos ou população
+        tabela = tabela[(tabela['Casos'] > 0) | (tabela['Populacao'].fillna(0) > 0)]
+        tabelas.append(tabela)
+        print(f"   {nivel}: {n_unidades - 1} unidades")
+
+    agregados = pd.concat(tabelas, ignore_index=True)
+    for nome in list(somadas) + ['Populacao']:
+        agregados[nome] = agregados[nome].round(2)
+    agregados['Casos'] = agregados['Casos'].astype(np.int64)
+
+    print(f"   ✅ Agregados regionais calculados!")
+    return {'agregados_regionais': agregados}
+
+
+def municipality_values(indice, agregados, nivel, ano='Total', coluna='Taxa_100mil'):
+    """
+    Valor da unidade de um nível atribuído a cada município (para mapas)
+
+    Args:
+        indice (dict): Índice regional
+        agregados (pd.DataFrame): Tabela de create_regional_rollups
+        nivel (str): Nível de agregação (um de NIVEIS)
+        ano: Ano ou 'Total'
+        coluna (str): Coluna com o valor
+
+    Returns:
+        pd.Series: Valor por código de município (6 dígitos)
+    """
+    selecionados = agregados[(agregados['Nivel'] == nivel) & (agregados['ANO'].astype(str) == str(ano))]
+    valores = selecionados.set_index(selecionados['Codigo'].astype(str))[coluna]
+    por_unidade = valores.reindex(indice[nivel]['codigos'].astype(str)).to_numpy(dtype=float)
+    return pd.Series(por_unidade[indice[nivel]['consulta'][:-1]], index=indice['municipios'])
@@ -0,0 +1,362 @@
+"""
+Checkpoints e Retomada de Execuções Longas
+
+Dois níveis de checkpoint duráveis, ambos gravados de forma atômica (arquivo
+temporário + substituição), para que uma execução interrompida (queda de
+rede, falta de memória) não repita trabalho já concluído:
+
+1. Ingestão: cada unidade de download (SIH: ano/mês; SIM: ano) é registrada
+   no livro de ingestão (dados/brutos/_ingestao.json) logo após ser gravada
+   no armazenamento local. Unidades concluídas não são baixadas de novo;
+   falhas e downloads vazios ficam registrados com o erro e o número de
+   tentativas e são tentados outra vez na próxima execução. O registro
+   também guarda o perfil de qualidade da unidade (ver qualidade.py).
+
+2. Etapas do pipeline: o resultado de cada etapa (coorte, estatísticas,
+   séries, varredura...) é gravado em cache_execucoes/<execução>/ ao final
+   da etapa. Com resume=True (opção --retomar dos scripts), as etapas já
+   concluídas são carregadas em ordem e a execução continua a partir da
+   primeira etapa sem checkpoint. Os checkpoints valem apenas para os mesmos
+   parâmetros e os mesmos dados brutos (impressão digital dos registros).
+
+Partições ausentes (falhas, meses sem dados na fonte, meses nunca baixados)
+são listadas explicitamente e exportadas na aba Particoes_Ausentes.
+
+Autor: GitHub Copilot
+Data: 2025
+"""
+
+import json
+import os
+import shutil
+import time
+import zlib
+from datetime import date, datetime
+
+import pandas as pd
+
+from armazenamento import PASTA_ARMAZENAMENTO, PYARROW_AVAILABLE, load_manifest, partition_path, write_partitions
+from qualidade import profile_partition
+from telemetria import count, event, observe, timed
+
+PASTA_EXECUCOES = 'cache_execucoes'
+ARQUIVO_INGESTAO = '_ingestao.json'
+ARQUIVO_ETAPAS = 'etapas.json'
+
+# Tentativas por unidade de download e espera inicial (dobra a cada tentativa)
+TENTATIVAS_DOWNLOAD = 3
+ESPERA_INICIAL = 5
+
+# Partições ausentes listadas no terminal (as demais só no Excel)
+MAXIMO_LISTADAS = 10
+
+# Abas de retomada no Excel
+ABAS_RETOMADA = [
+    ('particoes_ausentes', 'Particoes_Ausentes'),
+]
+
+
+def _save_json(dados, caminho):
+    """Grava JSON de forma atômica (arquivo temporário + substituição)"""
+    temporario = caminho + '.tmp'
+    with open(temporario, 'w', encoding='utf-8') as arquivo:
+        json.dump(dados, arquivo, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(temporario, caminho)
+
+
+def _unit_key(system, uf, year, month=None):
+    """Chave da unidade de download no livro de ingestão (ex.: 'SIH/AM/2021/03')"""
+    chave = f'{system}/{uf}/{int(year)}'
+    return chave if month is None else f'{chave}/{int(month):02d}'
+
+
+def download_units(start_year, end_year, monthly=False):
+    """
+    Unidades de download de um período, sem meses futuros
+
+    Args:
+        start_year (int): Ano inicial
+        end_year (int): Ano final
+        monthly (bool): Uma unidade por mês (SIH) em vez de por ano (SIM)
+
+    Returns:
+        list: Pares (ano, mês ou None)
+    """
+    hoje = date.today()
+    if not monthly:
+        return [(ano, None) for ano in range(start_year, min(end_year, hoje.year) + 1)]
+    return [(ano, mes) for ano in range(start_year, end_year + 1) for mes in range(1, 13)
+            if (ano, mes) <= (hoje.year, hoje.month)]
+
+
+def load_ingestion_log(root=PASTA_ARMAZENAMENTO):
+    """
+    Lê o livro de ingestão
+
+    Args:
+        root (str): Pasta do armazenamento
+
+    Returns:
+        dict: Chave da unidade -> registro (situação, linhas, partições, erro, tentativas)
+    """
+    caminho = os.path.join(root, ARQUIVO_INGESTAO)
+    if not os.path.exists(caminho):
+        return {}
+    with open(caminho, encoding='utf-8') as arquivo:
+        return json.load(arquivo)
+
+
+def _unit_done(registro, manifesto, system, uf, year, month):
+    """Unidade concluída: registrada com todas as partições presentes (ou gravada antes do livro existir)"""
+    if not PYARROW_AVAILABLE:
+        return False
+    if registro is not None:
+        return registro['situacao'] == 'concluida' and all(p in manifesto for p in registro['particoes'])
+    if month is not None:
+        return partition_path(system, uf, year, month) in manifesto
+    prefixo = os.path.join(f'sistema={system}', f'uf={uf}', f'ano={int(year)}', '')
+    return any(caminho.startswith(prefixo) for caminho in manifesto)
+
+
+def ingest_units(system, uf, units, fetch, root=PASTA_ARMAZENAMENTO,
+                 retries=TENTATIVAS_DOWNLOAD, wait=ESPERA_INICIAL):
+    """
+    Baixa e grava as unidades pendentes, registrando cada uma no livro de ingestão
+
+    Cada unidade é gravada no armazenamento local e registrada assim que é
+    baixada, então uma interrupção perde no máximo a unidade em andamento.
+    Erros de download são tentados de novo com espera crescente; se todas as
+    tentativas falharem, a falha é registrada e a execução segue.
+
+    Args:
+        system (str): 'SIH' ou 'SIM'
+        uf (str): Sigla da UF
+        units (list): Pares (ano, mês ou None) de download_units
+        fetch (callable): fetch(ano, mês) -> pd.DataFrame ou None
+        root (str): Pasta do armazenamento
+        retries (int): Tentativas por unidade
+        wait (float): Espera antes da segunda tentativa (segundos)
+
+    Returns:
+        list: DataFrames baixados que ficaram só em memória (sem pyarrow)
+    """
+    os.makedirs(root, exist_ok=True)
+    caminho = os.path.join(root, ARQUIVO_INGESTAO)
+    livro = load_ingestion_log(root)
+    manifesto = load_manifest(root)
+    em_memoria = []
+    concluidas = 0
+
+    for ano, mes in units:
+        chave = _unit_key(system, uf, ano, mes)
+        rotulo = f'{ano}' if mes is None else f'{ano}/{mes:02d}'
+        anterior = livro.get(chave)
+        if _unit_done(anterior, manifesto, system, uf, ano, mes):
+            concluidas += 1
+            continue
+
+        registro = {'situacao': 'falhou', 'linhas': 0, 'particoes': [], 'erro': None,
+                    'tentativas': (anterior or {}).get('tentativas', 0)}
+        dados = None
+        for tentativa in range(1, retries + 1):
+            registro['tentativas'] += 1
+            try:
+                print(f"   Baixando {system} {uf} {rotulo}...")
+                with timed('download_segundos', sistema=system) as campos:
+                    dados = fetch(ano, mes)
+                    campos.update(unidade=chave, linhas=0 if dados is None else len(dados))
+                registro['erro'] = None
+                break
+            except Exception as e:
+                registro['erro'] = str(e)
+                count('falhas_download_total', sistema=system)
+                event('tentativa_falhou', 'WARNING', unidade=chave, tentativa=tentativa, erro=str(e))
+                print(f"   ⚠️ {rotulo}: tentativa {tentativa}/{retries} falhou ({e})")
+                if tentativa < retries:
+                    time.sleep(wait * 2 ** (tentativa - 1))
+
+        if registro['erro'] is None:
+            if dados is None or dados.empty:
+                registro['situacao'] = 'vazia'
+                print(f"   ⚠️ {rotulo}: nenhum dado disponível na fonte")
+            else:
+                dados['ANO'] = ano
+                if mes is not None and 'MES_CMPT' not in dados.columns:
+                    # Competência = mês da unidade (partition_months a usa na leitura)
+                    dados['MES_CMPT'] = mes
+                # Perfil de qualidade da partição completa, antes da poda da leitura
+                registro['qualidade'] = profile_partition(dados, system)
+                try:
+                    if PYARROW_AVAILABLE:
+                        registro['particoes'] = write_partitions(dados, system, uf, root, month=mes)
+                        manifesto = load_manifest(root)
+                    else:
+                        em_memoria.append(dados)
+                    registro.update(situacao='concluida', linhas=len(dados))
+                    print(f"   ✅ {rotulo}: {len(dados)} registros")
+                except Exception as e:
+                    registro['erro'] = f'gravação: {e}'
+        if registro['situacao'] == 'falhou':
+            print(f"   ❌ {rotulo}: {registro['erro']}")
+
+        registro['atualizado_em'] = datetime.now().isoformat(timespec='seconds')
+        livro[chave] = registro
+        _save_json(livro, caminho)
+        count('unidades_ingeridas_total', sistema=system, situacao=registro['situacao'])
+        count('linhas_baixadas_total', registro['linhas'], sistema=system)
+        event('unidade_ingerida', 'ERROR' if registro['situacao'] == 'falhou' else 'INFO',
+              unidade=chave, **{k: v for k, v in registro.items() if k != 'atualizado_em'})
+
+    if concluidas:
+        print(f"   📦 {concluidas}/{len(units)} unidades já disponíveis no armazenamento local")
+    return em_memoria
+
+
+def missing_partitions_report(system, uf, units, root=PASTA_ARMAZENAMENTO):
+    """
+    Lista as partições (ano/mês) do período que não estão no armazenamento local
+
+    Situações: 'falha no download' (com o último erro), 'sem dados na fonte'
+    (download vazio), 'não baixado' (unidade nunca concluída, ex.: execução
+    interrompida) e 'sem registros no mês' (download concluído, mas nenhum
+    registro com aquele mês).
+
+    Args:
+        system (str): 'SIH' ou 'SIM'
+        uf (str): Sigla da UF
+        units (list): Pares (ano, mês ou None) de download_units
+        root (str): Pasta do armazenamento
+
+    Returns:
+        pd.DataFrame: Sistema, UF, Ano, Mes, Situacao, Tentativas, Detalhe
+    """
+    livro = load_ingestion_log(root)
+    manifesto = load_manifest(root) if PYARROW_AVAILABLE else {}
+    hoje = date.today()
+    situacoes = {'falhou': 'falha no download', 'vazia': 'sem dados na fonte'}
+
+    linhas = []
+    for ano, mes in units:
+        registro = livro.get(_unit_key(system, uf, ano, mes))
+        linha = {'Sistema': system, 'UF': uf, 'Ano': ano,
+                 'Tentativas': registro['tentativas'] if registro else 0}
+        if registro is not None and registro['situacao'] in situacoes:
+            linhas.append({**linha, 'Mes': mes, 'Situacao': situacoes[registro['situacao']],
+                           'Detalhe': registro['erro'] or ''})
+            continue
+        if not PYARROW_AVAILABLE:
+            continue
+        for m in ([mes] if mes is not None else range(1, 13)):
+            if (ano, m) > (hoje.year, hoje.month) or partition_path(system, uf, ano, m) in manifesto:
+                continue
+            concluida = registro is not None or _unit_done(None, manifesto, system, uf, ano, mes)
+            linhas.append({**linha, 'Mes': m,
+                           'Situacao': 'sem registros no mês' if concluida else 'não baixado',
+                           'Detalhe': ''})
+
+    tabela = pd.DataFrame(linhas, columns=['Sistema', 'UF', 'Ano', 'Mes', 'Situacao', 'Tentativas', 'Detalhe'])
+    if tabela.empty:
+        print(f"   ✅ Nenhuma partição ausente ({system}/{uf})")
+        return tabela
+
+    contagens = tabela['Situacao'].value_counts()
+    periodos = [f'{ano}' if pd.isna(mes) else f'{ano}/{int(mes):02d}' for ano, mes in zip(tabela['Ano'], tabela['Mes'])]
+    event('particoes_ausentes', 'WARNING', sistema=system, uf=uf, total=len(tabela),
+          situacoes=contagens.to_dict(), periodos=periodos)
+    print(f"   ⚠️ {len(tabela)} partições ausentes ({system}/{uf}): "
+          + ', '.join(f'{n} {situacao}' for situacao, n in contagens.items()))
+    for periodo, situacao, detalhe in list(zip(periodos, tabela['Situacao'], tabela['Detalhe']))[:MAXIMO_LISTADAS]:
+        print(f"      • {periodo}: {situacao}{f' - {detalhe}' if detalhe else ''}")
+    if len(tabela) > MAXIMO_LISTADAS:
+        print(f"      ... e mais {len(tabela) - MAXIMO_LISTADAS} (aba Particoes_Ausentes)")
+    return tabela
+
+
+def data_fingerprint(df):
+    """Impressão digital dos registros brutos (invalida checkpoints quando os dados mudam)"""
+    if df.empty:
+        return '0'
+    # Coluna a coluna, para não converter o DataFrame inteiro para texto de uma vez
+    soma = 0
+    for coluna in sorted(df.columns):
+        valores = df[coluna].astype(str)
+        soma += int(pd.util.hash_pandas_object(valores, index=False).sum()) * (zlib.crc32(coluna.encode()) | 1)
+    return f'{len(df)}:{soma & 0xFFFFFFFFFFFF:x}'
+
+
+class StageCheckpoints:
+    """
+    Checkpoints das etapas de um pipeline, gravados ao final de cada etapa
+    """
+
+    def __init__(self, name, parameters=None, resume=False, root=PASTA_EXECUCOES):
+        """
+        Args:
+            name (str): Nome da execução (pasta dos checkpoints)
+            parameters (dict): Parâmetros e impressão digital dos dados (JSON);
+                checkpoints de parâmetros diferentes são descartados
+            resume (bool): Carrega as etapas já concluídas em vez de recalcular
+            root (str): Pasta dos checkpoints
+        """
+        self.path = os.path.join(root, name)
+        self.parameters = json.loads(json.dumps(parameters or {}, default=str))
+        self._proxima = 0
+
+        descricao = None
+        caminho = os.path.join(self.path, ARQUIVO_ETAPAS)
+        if resume and os.path.exists(caminho):
+            with open(caminho, encoding='utf-8') as arquivo:
+                descricao = json.load(arquivo)
+            if descricao.get('parametros') != self.parameters:
+                print("   ⚠️ Parâmetros ou dados brutos mudaram desde o último checkpoint - recalculando tudo")
+                descricao = None
+            elif descricao['etapas']:
+                print(f"   ♻️ Retomando '{name}': {len(descricao['etapas'])} etapas concluídas")
+        elif resume:
+            print(f"   ⚠️ Nenhum checkpoint de '{name}' - executando do início")
+
+        if descricao is None:
+            shutil.rmtree(self.path, ignore_errors=True)
+            descricao = {'parametros': self.parameters, 'etapas': []}
+        self._descricao = descricao
+
+    def run(self, stage, func, *args, **kwargs):
+        """
+        Executa uma etapa ou carrega o seu checkpoint
+
+        As etapas são retomadas em ordem: a partir da primeira etapa recalculada,
+        todas as seguintes também são recalculadas.
+
+        Args:
+            stage (str): Nome da etapa
+            func (callable): Função da etapa
+            *args, **kwargs: Argumentos de func
+
+        Returns:
+            object: Resultado da etapa
+        """
+        etapas = self._descricao['etapas']
+        arquivo = os.path.join(self.path, f'{stage}.pkl')
+        if (self._proxima < len(etapas) and etapas[self._proxima]['nome'] == stage
+                and os.path.exists(arquivo)):
+            self._proxima += 1
+            event('etapa_retomada', etapa=stage, execucao=os.path.basename(self.path))
+            print(f"   ♻️ Etapa '{stage}' carregada do checkpoint")
+            return pd.read_pickle(arquivo)
+
+        del etapas[self._proxima:]
+        inicio = time.perf_counter()
+        resultado = func(*args, **kwargs)
+        segundos = time.perf_counter() - inicio
+
+        os.makedirs(self.path, exist_ok=True)
+        pd.to_pickle(resultado, arquivo + '.tmp')
+        os.replace(arquivo + '.tmp', arquivo)
+        etapas.append({'nome': stage, 'segundos': round(segundos, 3),
+                       'gravada_em': datetime.now().isoformat(timespec='seconds')})
+        _save_json(self._descricao, os.path.join(self.path, ARQUIVO_ETAPAS))
+        self._proxima = len(etapas)
+        observe('etapa_segundos', segundos, etapa=stage)
+        event('etapa_concluida', etapa=stage, execucao=os.path.basename(self.path), segundos=round(segundos, 3))
+        print(f"   💾 Checkpoint da etapa '{stage}' gravado ({segundos:.1f} s)")
+        return resultado
@@ -0,0 +1,424 @@
+"""
+Serviço HTTP Local de Agregados (Consultas Quentes)
+
+Processo de longa duração que mantém as coortes de mortalidade e morbidade
+carregadas em memória (anexadas das coortes compartilhadas, ver
+coorte_compartilhada.py) e responde a consultas de recorte e agregação sem
+reiniciar o Python, reimportar bibliotecas ou reler os arquivos Excel.
+
+Na carga, cada dimensão é fatorada uma única vez em códigos inteiros (ano,
+mês, município, região de saúde, macrorregião, UF, sexo, categoria CID-10 e
+faixa etária). Uma consulta filtra os códigos por tabelas de consulta e agrega
+as medidas com um único bincount sobre o índice combinado das dimensões.
+
+Rotas (JSON):
+    GET  /consulta?sistema=sih&por=ANO,Regiao_Saude&CID3=E10&ANO=2023
+         Recorte (filtros DIMENSAO=v1,v2) e agregação pelas dimensões de 'por'
+    GET  /dimensoes?sistema=sih      Dimensões, medidas e valores disponíveis
+    GET  /saude                      Estado do serviço e do cache
+    POST /recarregar                 Recarrega as coortes após uma atualização
+
+As respostas ficam em cache (LRU com prazo de validade); consultas iguais
+simultâneas compartilham o mesmo cálculo, feito fora do laço de eventos.
+
+Autor: GitHub Copilot
+Data: 2025
+"""
+
+import argparse
+import asyncio
+import inspect
+import json
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+from urllib.parse import parse_qsl, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from analise_temporal import SEXO_MAP
+from coorte_compartilhada import ARQUIVO_DESCRICAO, SharedCohort, cohort_path
+from referencias import normalize_municipality
+from regioes import NIVEIS, load_region_index, municipality_positions
+
+HOST_PADRAO = '127.0.0.1'
+PORTA_PADRAO = 8765
+
+# Cache de respostas: número máximo de entradas e validade (segundos)
+CACHE_MAX_ENTRADAS = 512
+CACHE_VALIDADE_SEGUNDOS = 600
+
+# Sistemas servidos: nome na URL -> (coorte compartilhada, coluna de diagnóstico, coluna de data)
+SISTEMAS_SERVICO = {
+    'sih': ('sih_am', 'DIAG_PRINC', 'DATA_INTERNACAO'),
+    'sim': ('sim_am', 'CAUSABAS', 'DATA_OBITO'),
+}
+
+# Colunas somadas como medidas, quando presentes
+MEDIDAS = ['DIAS_PERM', 'VAL_TOT', 'VAL_TOT_REAL']
+
+MOTIVOS_HTTP = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+
+class ResponseCache:
+    """
+    Cache de respostas com prazo de validade e descarte do item menos usado
+    """
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRADAS, ttl=CACHE_VALIDADE_SEGUNDOS):
+        """
+        Args:
+            max_entries (int): Número máximo de respostas guardadas
+            ttl (float): Validade de cada resposta em segundos
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._itens = OrderedDict()
+        self.acertos = 0
+        self.faltas = 0
+
+    def get(self, key):
+        """Resposta guardada ou None (itens vencidos são descartados)"""
+        item = self._itens.get(key)
+        if item is None or time.monotonic() - item[0] > self.ttl:
+            self._itens.pop(key, None)
+            self.faltas += 1
+            return None
+        self._itens.move_to_end(key)
+        self.acertos += 1
+        return item[1]
+
+    def put(self, key, value):
+        """Guarda uma resposta, descartando a menos usada se o cache estiver cheio"""
+        self._itens[key] = (time.monotonic(), value)
+        self._itens.move_to_end(key)
+        while len(self._itens) > self.max_entries:
+            self._itens.popitem(last=False)
+
+    def clear(self):
+        self._itens.clear()
+
+    def __len__(self):
+        return len(self._itens)
+
+
+def _factorize_dimension(values, normalize=None):
+    """Fatora uma coluna em (códigos, rótulos ordenados), normalizando só os valores distintos"""
+    codigos, unicos = pd.factorize(pd.Series(values), sort=True)
+    rotulos = pd.Series(unicos)
+    if normalize is not None:
+        # Valores distintos que viram o mesmo rótulo após a normalização são unidos
+        novos, rotulos = pd.factorize(normalize(rotulos), sort=True)
+        codigos = np.append(novos, -1)[codigos]
+        rotulos = pd.Series(rotulos)
+    return codigos, rotulos.astype(str).to_numpy(dtype=object)
+
+
+def _sex_labels(codes):
+    """Rótulo de cada código de SEXO distinto (SEXO_MAP), mantendo o código quando não mapeado"""
+    codigos = codes.astype('string').str.strip()
+    return codigos.map(SEXO_MAP).fillna(codigos)
+
+
+def build_cube(df, diagnosis_column, date_column, indice=None):
+    """
+    Prepara as dimensões fatoradas e as medidas de uma coorte
+
+    Args:
+        df (pd.DataFrame): Coorte
+        diagnosis_column (str): Coluna de diagnóstico (CID3 = 3 primeiros caracteres)
+        date_column (str): Coluna de data convertida (mês do evento)
+        indice (dict): Índice regional (ver regioes.build_region_index)
+
+    Returns:
+        dict: 'dimensoes' (nome -> (códigos, rótulos); código -1 = ausente),
+            'medidas' (nome -> np.ndarray) e 'linhas'
+    """
+    dimensoes = {}
+    if 'ANO' in df.columns:
+        dimensoes['ANO'] = _factorize_dimension(pd.to_numeric(df['ANO'], errors='coerce').astype('Int64'))
+    if date_column in df.columns:
+        meses = pd.to_datetime(df[date_column], errors='coerce').dt.month.astype('Int64')
+        dimensoes['MES'] = _factorize_dimension(meses)
+    if 'MUNRES' in df.columns:
+        dimensoes['MUNRES'] = _factorize_dimension(df['MUNRES'], normalize_municipality)
+        if indice is not None:
+            posicoes = np.append(municipality_positions(dimensoes['MUNRES'][1], indice), -1)
+            municipio = posicoes[dimensoes['MUNRES'][0]]
+            for nivel in NIVEIS[1:]:
+                consulta = indice[nivel]['consulta']
+                dimensoes[nivel] = (consulta[municipio], indice[nivel]['codigos'].astype(str))
+    if 'SEXO' in df.columns:
+        # Mesmos rótulos nos dois sistemas; códigos sem descrição mantêm o código
+        dimensoes['SEXO'] = _factorize_dimension(df['SEXO'], _sex_labels)
+    if diagnosis_column in df.columns:
+        dimensoes['CID3'] = _factorize_dimension(
+            df[diagnosis_column], lambda s: s.str.upper().str.replace('.', '', regex=False).str.strip().str[:3])
+    if 'FAIXA_ETARIA' in df.columns:
+        dimensoes['FAIXA_ETARIA'] = _factorize_dimension(df['FAIXA_ETARIA'])
+
+    medidas = {coluna: pd.to_numeric(df[coluna], errors='coerce').fillna(0).to_numpy(dtype=float)
+               for coluna in MEDIDAS if coluna in df.columns}
+    return {'dimensoes': dimensoes, 'medidas': medidas, 'linhas': len(df)}
+
+
+def slice_and_roll_up(cube, group_by=(), filters=None):
+    """
+    Filtra a coorte pelas dimensões e agrega casos e medidas pelos grupos pedidos
+
+    Args:
+        cube (dict): Resultado de build_cube
+        group_by (list): Dimensões de agrupamento (vazio = total)
+        filters (dict): Dimensão -> lista de rótulos aceitos
+
+    Returns:
+        pd.DataFrame: Uma linha por combinação presente, com 'casos' e as medidas
+    """
+    dimensoes = cube['dimensoes']
+    desconhecidas = [d for d in list(group_by) + list(filters or {}) if d not in dimensoes]
+    if desconhecidas:
+        raise KeyError(f"Dimensões inexistentes: {', '.join(desconhecidas)}")
+
+    mascara = np.ones(cube['linhas'], dtype=bool)
+    for dimensao, aceitos in (filters or {}).items():
+        codigos, rotulos = dimensoes[dimensao]
+        # Tabela de consulta por rótulo; a posição extra recebe os ausentes (-1)
+        tabela = np.append(np.isin(rotulos, [str(a) for a in aceitos]), False)
+        mascara &= tabela[codigos]
+
+    # Índice combinado dos grupos (a posição extra de cada dimensão recebe os ausentes)
+    tamanhos = [len(dimensoes[d][1]) + 1 for d in group_by]
+    combinado = np.zeros(int(mascara.sum()), dtype=np.int64)
+    for dimensao, tamanho in zip(group_by, tamanhos):
+        codigos = dimensoes[dimensao][0][mascara]
+        combinado = combinado * tamanho + np.where(codigos < 0, tamanho - 1, codigos)
+
+    grupos, posicao = np.unique(combinado, return_inverse=True)
+    resultado = pd.DataFrame()
+    for dimensao, codigos in zip(group_by, np.unravel_index(grupos, tamanhos) if group_by else []):
+        resultado[dimensao] = np.append(dimensoes[dimensao][1], None)[codigos]
+    resultado['casos'] = np.bincount(posicao, minlength=len(grupos))
+    for medida, valores in cube['medidas'].items():
+        resultado[medida] = np.bincount(posicao, weights=valores[mascara], minlength=len(grupos)).round(2)
+    return resultado
+
+
+class AggregateService:
+    """
+    Estado quente do serviço: cubos das coortes, cache e controle de versões
+    """
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRADAS, ttl=CACHE_VALIDADE_SEGUNDOS):
+        self.cache = ResponseCache(max_entries, ttl)
+        self.cubos = {}
+        self.versao = 0
+        self.carregado_em = None
+        self._em_andamento = {}
+
+    def load(self):
+        """
+        (Re)carrega as coortes compartilhadas e monta os cubos
+
+        As coortes são abertas novamente (sem o cache de anexação do processo),
+        então arquivos regravados por uma atualização incremental são lidos.
+
+        Returns:
+            dict: Sistema -> número de registros carregados
+        """
+        cubos = {}
+        for sistema, (coorte, diagnostico, data) in SISTEMAS_SERVICO.items():
+            caminho = cohort_path(coorte)
+            if not os.path.exists(os.path.join(caminho, ARQUIVO_DESCRICAO)):
+                print(f"   ⚠️ Coorte {coorte} não encontrada em {caminho}")
+                continue
+            df = SharedCohort(os.path.abspath(caminho)).frame()
+            indice = load_region_index(df['MUNRES'].dropna().unique()) if 'MUNRES' in df.columns else None
+            cubos[sistema] = build_cube(df, diagnostico, data, indice)
+            print(f"   ✅ {sistema.upper()}: {len(df)} registros, {len(cubos[sistema]['dimensoes'])} dimensões")
+
+        self.cubos = cubos
+        self.versao += 1
+        self.carregado_em = datetime.now().isoformat(timespec='seconds')
+        self.cache.clear()
+        return {sistema: cubo['linhas'] for sistema, cubo in cubos.items()}
+
+    def _cube(self, params):
+        sistema = params.get('sistema', 'sih').lower()
+        if sistema not in self.cubos:
+            raise KeyError(f"Sistema indisponível: {sistema}")
+        return sistema, self.cubos[sistema]
+
+    def query(self, params):
+        """
+        Executa uma consulta de recorte e agregação (sem cache)
+
+        Args:
+            params (dict): 'sistema', 'por' (dimensões separadas por vírgula) e
+                filtros DIMENSAO=v1,v2
+
+        Returns:
+            dict: Resposta JSON
+        """
+        sistema, cubo = self._cube(params)
+        por = [d for d in params.get('por', '').split(',') if d]
+        filtros = {chave: valor.split(',') for chave, valor in params.items() if chave not in ('sistema', 'por')}
+        tabela = slice_and_roll_up(cubo, por, filtros)
+        return {
+            'sistema': sistema,
+            'por': por,
+            'filtros': filtros,
+            'versao': self.versao,
+            'linhas': json.loads(tabela.to_json(orient='records')),
+        }
+
+    def dimensions(self, params):
+        """Dimensões (com seus rótulos) e medidas de um sistema"""
+        sistema, cubo = self._cube(params)
+        return {
+            'sistema': sistema,
+            'dimensoes': {nome: rotulos.tolist() for nome, (_, rotulos) in cubo['dimensoes'].items()},
+            'medidas': ['casos'] + list(cubo['medidas']),
+        }
+
+    def health(self):
+        """Estado do serviço e do cache"""
+        return {
+            'versao': self.versao,
+            'carregado_em': self.carregado_em,
+            'sistemas': {sistema: cubo['linhas'] for sistema, cubo in self.cubos.items()},
+            'cache': {'entradas': len(self.cache), 'acertos': self.cache.acertos, 'faltas': self.cache.faltas,
+                      'validade_segundos': self.cache.ttl, 'max_entradas': self.cache.max_entries},
+        }
+
+    async def cached_query(self, params):
+        """
+        Responde pelo cache; em falta, calcula fora do laço de eventos
+
+        Consultas iguais que chegam durante o cálculo aguardam o mesmo resultado.
+        """
+        chave = (self.versao, tuple(sorted(params.items())))
+        resposta = self.cache.get(chave)
+        if resposta is not None:
+            return resposta
+
+        if chave not in self._em_andamento:
+            laco = asyncio.get_running_loop()
+            self._em_andamento[chave] = laco.run_in_executor(None, self.query, params)
+        try:
+            resposta = await self._em_andamento[chave]
+        finally:
+            self._em_andamento.pop(chave, None)
+        self.cache.put(chave, resposta)
+        return resposta
+
+    async def reload(self):
+        """Recarrega as coortes fora do laço de eventos"""
+        carregados = await asyncio.get_running_loop().run_in_executor(None, self.load)
+        return {'versao': self.versao, 'sistemas': carregados}
+
+
+async def _send_json(writer, status, body):
+    dados = json.dumps(body, ensure_ascii=False).encode('utf-8')
+    cabecalho = (f"HTTP/1.1 {status} {MOTIVOS_HTTP.get(status, '')}\r\n"
+                 f"Content-Type: application/json; charset=utf-8\r\n"
+                 f"Content-Length: {len(dados)}\r\n"
+                 f"Connection: keep-alive\r\n\r\n")
+    writer.write(cabecalho.encode('ascii') + dados)
+    await writer.drain()
+
+
+async def _dispatch(service, method, target):
+    """Encaminha a requisição para a rota e retorna (status, corpo)"""
+    url = urlsplit(target)
+    params = dict(parse_qsl(url.query))
+    rotas = {
+        ('GET', '/consulta'): lambda: service.cached_query(params),
+        ('GET', '/dimensoes'): lambda: service.dimensions(params),
+        ('GET', '/saude'): service.health,
+        ('POST', '/recarregar'): service.reload,
+    }
+    if not any(rota == url.path for _, rota in rotas):
+        return 404, {'erro': f'Rota inexistente: {url.path}'}
+    if (method, url.path) not in rotas:
+        return 405, {'erro': f'Método {method} não aceito em {url.path}'}
+
+    inicio = time.perf_counter()
+    try:
+        corpo = rotas[(method, url.path)]()
+        if inspect.isawaitable(corpo):
+            corpo = await corpo
+    except KeyError as e:
+        return 400, {'erro': str(e.args[0])}
+    return 200, dict(corpo, tempo_ms=round((time.perf_counter() - inicio) * 1000, 3))
+
+
+async def handle_connection(service, reader, writer):
+    """Atende as requisições HTTP/1.1 de uma conexão (mantida aberta entre requisições)"""
+    try:
+        while True:
+            linha = await reader.readline()
+            if not linha.strip():
+                break
+            method, target, _ = linha.decode('latin-1').split(' ', 2)
+            cabecalhos = {}
+            while (cabecalho := await reader.readline()) not in (b'\r\n', b'\n', b''):
+                nome, _, valor = cabecalho.decode('latin-1').partition(':')
+                cabecalhos[nome.strip().lower()] = valor.strip()
+            if int(cabecalhos.get('content-length', 0)):
+                await reader.readexactly(int(cabecalhos['content-length']))
+
+            try:
+                status, corpo = await _dispatch(service, method.upper(), target)
+            except Exception as e:
+                status, corpo = 500, {'erro': str(e)}
+            await _send_json(writer, status, corpo)
+            if cabecalhos.get('connection', '').lower() == 'close':
+                break
+    except (ConnectionError, ValueError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host=HOST_PADRAO, port=PORTA_PADRAO, ttl=CACHE_VALIDADE_SEGUNDOS, max_entries=CACHE_MAX_ENTRADAS):
+    """
+    Carrega as coortes e atende requisições até ser interrompido
+
+    Args:
+        host (str): Endereço de escuta
+        port (int): Porta
+        ttl (float): Validade das respostas em cache (segundos)
+        max_entries (int): Respostas guardadas no cache
+    """
+    service = AggregateService(max_entries, ttl)
+    service.load()
+    servidor = await asyncio.start_server(lambda r, w: handle_connection(service, r, w), host, port)
+    print(f"🌐 Serviço de agregados em http://{host}:{port} (Ctrl+C para encerrar)")
+    async with servidor:
+        await servidor.serve_forever()
+
+
+def main():
+    """
+    Inicia o serviço pela linha de comando
+    """
+    parser = argparse.ArgumentParser(description='Serviço HTTP local de agregados das coortes')
+    parser.add_argument('--host', default=HOST_PADRAO)
+    parser.add_argument('--porta', type=int, default=PORTA_PADRAO)
+    parser.add_argument('--ttl', type=float, default=CACHE_VALIDADE_SEGUNDOS, help='Validade do cache (s)')
+    parser.add_argument('--cache', type=int, default=CACHE_MAX_ENTRADAS, help='Máximo de respostas em cache')
+    args = parser.parse_args()
+
+    print("🚀 Serviço de consultas - diabetes infantil Amazonas")
+    print("=" * 70)
+    try:
+        asyncio.run(serve(args.host, args.porta, args.ttl, args.cache))
+    except KeyboardInterrupt:
+        print("\n✅ Serviço encerrado")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+"""
+Taxas por 100 Mil Habitantes - Denominadores Populacionais do IBGE
+
+Este módulo carrega as estimativas populacionais do IBGE por município, ano,
+sexo e faixa etária em um array denso indexado por (ano, município, sexo,
+faixa). Os casos são contados na mesma grade com uma única np.bincount e as
+taxas brutas, específicas por idade e padronizadas por idade (método direto)
+de todas as células (ano, MUNRES) são calculadas em operações vetorizadas.
+
+Autor: GitHub Copilot
+Data: 2025
+"""
+
+import numpy as np
+import pandas as pd
+
+from faixas_etarias import FAIXAS_ETARIAS_LABELS, add_age_band
+from referencias import load_reference_table, normalize_municipality
+
+ARQUIVO_POPULACAO = 'populacao_ibge.csv'
+
+# Abas do Excel geradas a partir das taxas (chave em stats -> nome da aba)
+ABAS_TAXAS = [
+    ('taxas_brutas', 'Taxas_Brutas'),
+    ('taxas_especificas_idade', 'Taxas_Idade'),
+    ('taxas_padronizadas', 'Taxas_Padronizadas'),
+]
+
+SEXOS = ['1', '2']
+POR_100_MIL = 100_000
+
+# População padrão para a padronização direta: População Mundial Padrão da OMS
+# (2000-2025), por 100 mil habitantes, nas faixas de FAIXAS_ETARIAS_LABELS
+POPULACAO_PADRAO_OMS = {'0-4 anos': 8860, '5-9 anos': 8690, '10-14 anos': 8600}
+NIVEL_CONFIANCA = 0.95
+
+
+def build_population_index(populacao):
+    """
+    Compila a tabela de população em um array denso (ano x município x sexo x faixa)
+
+    Args:
+        populacao (pd.DataFrame): Colunas ANO, MUNRES, SEXO, FAIXA_ETARIA, POPULACAO
+
+    Returns:
+        dict: 'anos', 'municipios', 'sexos', 'faixas' (pd.Index de cada eixo)
+            e 'populacao' (np.ndarray 4D)
+    """
+    municipios = normalize_municipality(populacao['MUNRES'])
+    indice = {
+        'anos': pd.Index(np.sort(populacao['ANO'].astype(int).unique())),
+        'municipios': pd.Index(np.sort(municipios.dropna().unique())),
+        'sexos': pd.Index(SEXOS),
+        'faixas': pd.Index(FAIXAS_ETARIAS_LABELS),
+    }
+
+    posicoes, validos = _grid_positions(indice, populacao['ANO'].astype(int), municipios,
+                                        populacao['SEXO'].astype(str), populacao['FAIXA_ETARIA'])
+    forma = _grid_shape(indice)
+    valores = pd.to_numeric(populacao['POPULACAO'], errors='coerce').fillna(0).to_numpy(dtype=float)
+    indice['populacao'] = np.bincount(
+        posicoes[validos], weights=valores[validos], minlength=int(np.prod(forma))
+    ).reshape(forma)
+    return indice
+
+
+def _grid_shape(indice):
+    return (len(indice['anos']), len(indice['municipios']), len(indice['sexos']), len(indice['faixas']))
+
+
+def _positions(axis, values):
+    """Posição de cada valor no eixo, resolvida uma vez por valor distinto (-1 se ausente)"""
+    codigos, unicos = pd.factorize(values)
+    tabela = np.append(axis.get_indexer(unicos), -1)
+    return tabela[codigos]
+
+
+def _grid_positions(indice, anos, municipios, sexos, faixas):
+    """Índice linear de cada registro na grade (ano, município, sexo, faixa)"""
+    forma = _grid_shape(indice)
+    eixos = [
+        _positions(indice['anos'], anos),
+        _positions(indice['municipios'], municipios),
+        _positions(indice['sexos'], sexos),
+        _positions(indice['faixas'], faixas),
+    ]
+    validos = np.logical_and.reduce([eixo >= 0 for eixo in eixos])
+    posicoes = np.ravel_multi_index([np.where(validos, eixo, 0) for eixo in eixos], forma)
+    return posicoes, validos
+
+
+def create_sample_population(df):
+    """
+    Cria estimativas populacionais fictícias para os municípios e anos do DataFrame
+
+    Args:
+        df (pd.DataFrame): Dados com colunas ANO e MUNRES
+
+    Returns:
+        pd.DataFrame: Tabela no formato de populacao_ibge.csv
+    """
+    print("🔄 Gerando população de exemplo para demonstração...")
+    rng = np.random.default_rng(42)
+
+    municipios = np.sort(normalize_municipality(df['MUNRES']).dropna().unique())
+    anos = np.sort(df['ANO'].astype(int).unique())
+    grade = pd.MultiIndex.from_product(
+        [anos, municipios, SEXOS, FAIXAS_ETARIAS_LABELS],
+        names=['ANO', 'MUNRES', 'SEXO', 'FAIXA_ETARIA']
+    ).to_frame(index=False)
+
+    # Um tamanho base por município, com pequena variação entre anos
+    base = dict(zip(municipios, rng.integers(2_000, 60_000, len(municipios))))
+    grade['POPULACAO'] = (grade['MUNRES'].map(base) * rng.uniform(0.95, 1.05, len(grade))).round().astype(int)
+
+    print("📝 IMPORTANTE: População fictícia para demonstração!")
+    return grade
+
+
+def load_population_index(df=None, filename=ARQUIVO_POPULACAO):
+    """
+    Carrega a tabela de população local e compila o índice
+
+    Se a tabela não existir e df for informado, usa população de exemplo.
+
+    Args:
+        df (pd.DataFrame): Dados analisados (usados apenas no modo de demonstração)
+        filename (str): Tabela em dados/referencia/ ou caminho completo
+
+    Returns:
+        dict: Índice populacional (ver build_population_index) ou None
+    """
+    populacao = load_reference_table(filename, dtype={'MUNRES': str, 'SEXO': str})
+    if populacao is None:
+        if df is None or df.empty:
+            return None
+        populacao = create_sample_population(df)
+    return build_population_index(populacao)
+
+
+def count_cases_on_grid(df, indice):
+    """
+    Conta os casos na grade (ano x município x sexo x faixa) do índice populacional
+
+    Args:
+        df (pd.DataFrame): Registros com ANO, MUNRES, SEXO e idade em anos
+        indice (dict): Índice populacional
+
+    Returns:
+        tuple: (np.ndarray 4D de casos, número de registros fora da grade)
+    """
+    if 'FAIXA_ETARIA' not in df.columns:
+        df = add_age_band(df)
+
+    posicoes, validos = _grid_positions(
+        indice, pd.to_numeric(df['ANO'], errors='coerce'), normalize_municipality(df['MUNRES']),
+        df['SEXO'].astype(str), df['FAIXA_ETARIA']
+    )
+    forma = _grid_shape(indice)
+    casos = np.bincount(posicoes[validos], minlength=int(np.prod(forma))).reshape(forma)
+    return casos, int((~validos).sum())
+
+
+def _rate(casos, populacao):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(populacao > 0, casos / populacao * POR_100_MIL, np.nan)
+
+
+def direct_standardized_rates(casos, populacao, pesos, confidence=NIVEL_CONFIANCA):
+    """
+    Taxas padronizadas por idade (método direto) para todas as áreas de uma vez
+
+    Os arrays têm a faixa etária no último eixo (ex.: ano x área x faixa); a
+    taxa padronizada é a média das taxas específicas ponderada pela população
+    padrão. O intervalo de confiança usa o método gama de Fay e Feuer (1997).
+
+    Args:
+        casos (np.ndarray): Casos (... x faixa)
+        populacao (np.ndarray): População (... x faixa)
+        pesos (np.ndarray): População padrão por faixa (qualquer escala)
+        confidence (float): Nível de confiança do intervalo
+
+    Returns:
+        tuple: (taxa, limite inferior, limite superior) por 100 mil habitantes,
+            com NaN onde alguma faixa não tem população
+    """
+    from scipy.stats import chi2
+
+    pesos = np.asarray(pesos, dtype=float)
+    pesos = pesos / pesos.sum()
+    casos = casos.astype(float)
+
+    valida = (populacao > 0).all(axis=-1)
+    pop = np.where(populacao > 0, populacao, 1.0)
+
+    # Peso de cada caso em cada faixa: w_f / n_f
+    peso_caso = pesos / pop
+    taxa = np.einsum('...f,...f->...', casos, peso_caso)
+    variancia = np.einsum('...f,...f->...', casos, peso_caso ** 2)
+    peso_max = peso_caso.max(axis=-1)
+
+    alfa = 1 - confidence
+    with np.errstate(invalid='ignore', divide='ignore'):
+        inferior = np.where(
+            taxa > 0,
+            variancia / (2 * taxa) * chi2.ppf(alfa / 2, 2 * taxa ** 2 / np.where(variancia > 0, variancia, 1)),
+            0.0
+        )
+        var_sup = variancia + peso_max ** 2
+        superior = var_sup / (2 * (taxa + peso_max)) * chi2.ppf(1 - alfa / 2, 2 * (taxa + peso_max) ** 2 / var_sup)
+
+    return tuple(np.where(valida, valor * POR_100_MIL, np.nan) for valor in (taxa, inferior, superior))
+
+
+def compute_rates(df, indice, standard=None):
+    """
+    Calcula taxas brutas e específicas por faixa etária por 100 mil habitantes
+
+    As taxas de todas as células (ano, MUNRES) e do estado (MUNRES = 'Total')
+    são obtidas por somas sobre os eixos dos arrays de casos e população.
+
+    Args:
+        df (pd.DataFrame): Registros com ANO, MUNRES, SEXO e idade em anos
+        indice (dict): Índice populacional (ver build_population_index)
+        standard (dict): População padrão por faixa etária (padrão: POPULACAO_PADRAO_OMS)
+
+    Returns:
+        dict: 'taxas_brutas', 'taxas_especificas_idade' e 'taxas_padronizadas' (DataFrames)
+    """
+    print("📐 Calculando taxas por 100 mil habitantes...")
+
+    casos, fora_da_grade = count_cases_on_grid(df, indice)
+    if fora_da_grade:
+        print(f"   ⚠️ {fora_da_grade} registros sem denominador (ano, município, sexo ou idade fora da tabela)")
+
+    populacao = indice['populacao']
+    anos = indice['anos'].to_numpy()
+    municipios = np.append(indice['municipios'].to_numpy(dtype=object), 'Total')
+    faixas = indice['faixas'].to_numpy(dtype=object)
+
+    # Somar sexos; acrescentar o total estadual como um "município" adicional
+    casos_af = casos.sum(axis=2)
+    pop_af = populacao.sum(axis=2)
+    casos_af = np.concatenate([casos_af, casos_af.sum(axis=1, keepdims=True)], axis=1)
+    pop_af = np.concatenate([pop_af, pop_af.sum(axis=1, keepdims=True)], axis=1)
+
+    # Taxas brutas (ano x município)
+    casos_brutos = casos_af.sum(axis=2)
+    pop_bruta = pop_af.sum(axis=2)
+    n_anos, n_mun = casos_brutos.shape
+    taxas_brutas = pd.DataFrame({
+        'ANO': np.repeat(anos, n_mun),
+        'MUNRES': np.tile(municipios, n_anos),
+        'Casos': casos_brutos.reshape(-1),
+        'Populacao': pop_bruta.reshape(-1).round().astype(np.int64),
+        'Taxa_100mil': np.round(_rate(casos_brutos, pop_bruta).reshape(-1), 2),
+    })
+
+    # Taxas específicas por faixa etária (ano x município x faixa)
+    n_faixas = len(faixas)
+    taxas_idade = pd.DataFrame({
+        'ANO': np.repeat(anos, n_mun * n_faixas),
+        'MUNRES': np.tile(np.repeat(municipios, n_faixas), n_anos),
+        'FAIXA_ETARIA': np.tile(faixas, n_anos * n_mun),
+        'Casos': casos_af.reshape(-1),
+        'Populacao': pop_af.reshape(-1).round().astype(np.int64),
+        'Taxa_100mil': np.round(_rate(casos_af, pop_af).reshape(-1), 2),
+    })
+
+    # Taxas padronizadas por idade (ano x município), calculadas sobre o array inteiro
+    standard = POPULACAO_PADRAO_OMS if standard is None else standard
+    pesos = np.array([standard[faixa] for faixa in faixas], dtype=float)
+    padronizada, ic_inf, ic_sup = direct_standardized_rates(casos_af, pop_af, pesos)
+    rotulo_ic = f'IC{int(NIVEL_CONFIANCA * 100)}'
+    taxas_padronizadas = taxas_brutas.rename(columns={'Taxa_100mil': 'Taxa_Bruta'})
+    taxas_padronizadas['Taxa_Padronizada'] = np.round(padronizada.reshape(-1), 2)
+    taxas_padronizadas[f'{rotulo_ic}_Inferior'] = np.round(ic_inf.reshape(-1), 2)
+    taxas_padronizadas[f'{rotulo_ic}_Superior'] = np.round(ic_sup.reshape(-1), 2)
+
+    print(f"   {n_anos} anos x {n_mun - 1} municípios")
+    print(f"   ✅ Taxas calculadas!")
+
+    return {
+        'taxas_brutas': taxas_brutas,
+        'taxas_especificas_idade': taxas_idade,
+        'taxas_padronizadas': taxas_padronizadas
+    }
+
+
+def create_rate_analysis(df, filename=ARQUIVO_POPULACAO, standard=None, indice=None):
+    """
+    Carrega a população e calcula as taxas dos registros analisados
+
+    Args:
+        df (pd.DataFrame): Registros do SIH-SUS ou SIM-DO filtrados
+        filename (str): Tabela de população em dados/referencia/
+        standard (dict): População padrão por faixa etária (padrão: POPULACAO_PADRAO_OMS)
+        indice (dict): Índice populacional já carregado (padrão: load_population_index)
+
+    Returns:
+        dict: Tabelas de taxas (vazias se não houver dados ou população)
+    """
+    vazio = {chave: pd.DataFrame() for chave, _ in ABAS_TAXAS}
+    if df.empty or not {'ANO', 'MUNRES', 'SEXO'} <= set(df.columns):
+        return vazio
+
+    indice = indice if indice is not None else load_population_index(df, filename)
+    if indice is None:
+        return vazio
+    return compute_rates(df, indice, standard)
+
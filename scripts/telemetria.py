@@ -0,0 +1,255 @@
+"""
+Telemetria Estruturada: Eventos JSON, Contadores e Histogramas
+
+Os scripts continuam imprimindo o progresso legível no terminal; esta
+camada adiciona, para execução agendada e monitoramento:
+
+- Eventos JSON por linha (um objeto por evento, com ts, nivel, evento,
+  script, pid e campos), filtrados por nível
+- Contadores (linhas lidas, filtradas e exportadas, bytes, erros) e
+  histogramas de latência (por partição, por etapa), com rótulos
+- Arquivo de métricas no formato texto do Prometheus, gravado ao final da
+  execução (ou a qualquer momento com write_prometheus)
+
+Configuração por variáveis de ambiente:
+
+    TELEMETRIA_JSON        Destino dos eventos JSON: caminho de arquivo
+                           (acrescentado) ou '-' para a saída padrão; com
+                           '-', as mensagens impressas pelos scripts viram
+                           eventos 'mensagem' e a saída fica só com JSON
+    TELEMETRIA_NIVEL       Nível mínimo: DEBUG, INFO (padrão), WARNING, ERROR
+    TELEMETRIA_PROMETHEUS  Arquivo de métricas gravado ao final da execução
+
+Sem nenhuma variável, eventos não são formatados e as métricas custam uma
+soma em dicionário por chamada, então a instrumentação pode ficar ativa nos
+laços por partição.
+
+Autor: GitHub Copilot
+Data: 2025
+"""
+
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime
+
+NIVEIS = {'DEBUG': 10, 'INFO': 20, 'WARNING': 30, 'ERROR': 40}
+
+# Prefixo dos nomes de métricas no arquivo do Prometheus
+PREFIXO_METRICAS = 'diabetes_am'
+
+# Limites dos histogramas de latência (segundos)
+LIMITES_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+_ESCAPE_ROTULOS = str.maketrans({'\\': '\\\\', '"': '\\"', '\n': '\\n'})
+_LIMITES_TEXTO = [f'{limite:g}' for limite in LIMITES_LATENCIA] + ['+Inf']
+
+_contadores = {}
+_histogramas = {}
+_trava = threading.Lock()
+_destino = None
+_nivel_minimo = NIVEIS['INFO']
+_script = os.path.splitext(os.path.basename(sys.argv[0] or 'python'))[0] or 'python'
+
+
+def _labels_key(labels):
+    """Rótulos como tupla ordenada (chave de dicionário)"""
+    return tuple(sorted((k, str(v)) for k, v in labels.items())) if labels else ()
+
+
+def enabled(level='INFO'):
+    """Indica se eventos do nível seriam gravados (evita montar campos caros à toa)"""
+    return _destino is not None and NIVEIS[level] >= _nivel_minimo
+
+
+def event(name, level='INFO', **fields):
+    """
+    Grava um evento JSON (se houver destino e o nível for suficiente)
+
+    Args:
+        name (str): Nome do evento (ex.: 'particao_lida')
+        level (str): DEBUG, INFO, WARNING ou ERROR
+        **fields: Campos do evento (valores não serializáveis viram texto)
+    """
+    if _destino is None or NIVEIS[level] < _nivel_minimo:
+        return
+    registro = {'ts': datetime.now().isoformat(timespec='milliseconds'), 'nivel': level,
+                'evento': name, 'script': _script, 'pid': os.getpid(), **fields}
+    linha = json.dumps(registro, ensure_ascii=False, default=str)
+    with _trava:
+        _destino.write(linha + '\n')
+        _destino.flush()
+
+
+def count(name, value=1, **labels):
+    """
+    Soma value ao contador name com os rótulos dados
+
+    Args:
+        name (str): Nome do contador (ex.: 'linhas_lidas_total')
+        value (float): Incremento
+        **labels: Rótulos (ex.: sistema='SIH')
+    """
+    chave = (name, _labels_key(labels))
+    _contadores[chave] = _contadores.get(chave, 0) + value
+
+
+def observe(name, value, **labels):
+    """
+    Registra uma observação (em segundos) no histograma name
+
+    Args:
+        name (str): Nome do histograma (ex.: 'particao_leitura_segundos')
+        value (float): Valor observado
+        **labels: Rótulos
+    """
+    chave = (name, _labels_key(labels))
+    histograma = _histogramas.get(chave)
+    if histograma is None:
+        histograma = _histogramas[chave] = [[0] * (len(LIMITES_LATENCIA) + 1), 0.0, 0]
+    histograma[0][bisect_left(LIMITES_LATENCIA, value)] += 1
+    histograma[1] += value
+    histograma[2] += 1
+
+
+@contextmanager
+def timed(name, level='DEBUG', **labels):
+    """
+    Mede a duração de um bloco: observa o histograma name e grava um evento
+
+    O dicionário retornado pode receber campos extras (ex.: linhas) para o
+    evento; com 'linhas' ou 'bytes', o evento inclui a vazão por segundo.
+
+    Args:
+        name (str): Nome do histograma (e do evento)
+        level (str): Nível do evento
+        **labels: Rótulos do histograma (também gravados no evento)
+
+    Yields:
+        dict: Campos extras do evento
+    """
+    campos = {}
+    inicio = time.perf_counter()
+    try:
+        yield campos
+    finally:
+        segundos = time.perf_counter() - inicio
+        observe(name, segundos, **labels)
+        if enabled(level):
+            for medida in ('linhas', 'bytes'):
+                if medida in campos and segundos > 0:
+                    campos[f'{medida}_por_segundo'] = round(campos[medida] / segundos, 1)
+            event(name, level, segundos=round(segundos, 6), **labels, **campos)
+
+
+def _format_labels(rotulos, extra=None):
+    """Rótulos no formato do Prometheus: {a="x",b="y"}"""
+    pares = list(rotulos) + ([extra] if extra else [])
+    if not pares:
+        return ''
+    return '{' + ','.join(f'{k}="{str(v).translate(_ESCAPE_ROTULOS)}"' for k, v in pares) + '}'
+
+
+def prometheus_text():
+    """
+    Métricas no formato texto de exposição do Prometheus
+
+    Returns:
+        str: Contadores (sufixo _total) e histogramas (_bucket, _sum, _count)
+    """
+    linhas = []
+    for nome in sorted({n for n, _ in _contadores}):
+        metrica = f'{PREFIXO_METRICAS}_{nome}'
+        linhas.append(f'# TYPE {metrica} counter')
+        for (n, rotulos), valor in sorted(_contadores.items()):
+            if n == nome:
+                linhas.append(f'{metrica}{_format_labels(rotulos)} {valor}')
+    for nome in sorted({n for n, _ in _histogramas}):
+        metrica = f'{PREFIXO_METRICAS}_{nome}'
+        linhas.append(f'# TYPE {metrica} histogram')
+        for (n, rotulos), (baldes, soma, total) in sorted(_histogramas.items()):
+            if n != nome:
+                continue
+            acumulado = 0
+            for limite, quantidade in zip(_LIMITES_TEXTO, baldes):
+                acumulado += quantidade
+                linhas.append(f'{metrica}_bucket{_format_labels(rotulos, ("le", limite))} {acumulado}')
+            linhas.append(f'{metrica}_sum{_format_labels(rotulos)} {soma:.6f}')
+            linhas.append(f'{metrica}_count{_format_labels(rotulos)} {total}')
+    return '\n'.join(linhas) + '\n'
+
+
+def write_prometheus(path):
+    """
+    Grava as métricas no formato do Prometheus (arquivo temporário + substituição)
+
+    Args:
+        path (str): Arquivo de destino (ex.: para o textfile collector do node_exporter)
+    """
+    temporario = f'{path}.{os.getpid()}.tmp'
+    with open(temporario, 'w', encoding='utf-8') as arquivo:
+        arquivo.write(prometheus_text())
+    os.replace(temporario, path)
+
+
+class _ConsoleEvents:
+    """Saída padrão que converte cada linha impressa em um evento 'mensagem'"""
+
+    def __init__(self, original):
+        self._original = original
+        self._pendente = ''
+
+    def write(self, texto):
+        self._pendente += texto
+        *linhas, self._pendente = self._pendente.split('\n')
+        for linha in linhas:
+            linha = linha.strip()
+            if not linha or set(linha) <= set('=-'):
+                continue
+            nivel = 'ERROR' if '❌' in linha[:3] else 'WARNING' if '⚠️' in linha[:3] else 'INFO'
+            event('mensagem', nivel, texto=linha)
+        return len(texto)
+
+    def flush(self):
+        self._original.flush()
+
+    def __getattr__(self, nome):
+        return getattr(self._original, nome)
+
+
+def _finish():
+    """Ao sair: evento de resumo e arquivo do Prometheus (se configurado)"""
+    if _destino is not None and (_contadores or _histogramas):
+        event('metricas', contadores={f'{n}{_format_labels(r)}': v for (n, r), v in sorted(_contadores.items())})
+    caminho = os.environ.get('TELEMETRIA_PROMETHEUS')
+    if caminho and (_contadores or _histogramas):
+        write_prometheus(caminho)
+
+
+def configure(json_destination=None, level=None):
+    """
+    Configura o destino e o nível dos eventos (padrão: variáveis de ambiente)
+
+    Args:
+        json_destination (str): Caminho do arquivo JSON, '-' (saída padrão) ou None
+        level (str): Nível mínimo dos eventos
+    """
+    global _destino, _nivel_minimo
+    _nivel_minimo = NIVEIS[(level or os.environ.get('TELEMETRIA_NIVEL') or 'INFO').upper()]
+    if isinstance(sys.stdout, _ConsoleEvents):
+        sys.stdout = sys.stdout._original
+    if json_destination == '-':
+        _destino = sys.stdout
+        sys.stdout = _ConsoleEvents(_destino)
+    elif json_destination:
+        _destino = open(json_destination, 'a', encoding='utf-8')
+    else:
+        _destino = None
+
+
+configure(os.environ.get('TELEMETRIA_JSON'))
+atexit.register(_finish)
@@ -0,0 +1,286 @@
+"""
+Tendências Temporais - Regressão de Poisson Log-Linear e Joinpoint
+
+Este módulo ajusta tendências log-lineares de Poisson às séries anuais e
+mensais de internações (SIH-SUS) ou óbitos (SIM-DO), com variação percentual
+anual (APC) e uma opção segmentada no estilo joinpoint (um ponto de quebra,
+escolhido por grade e comparado ao modelo sem quebra pelo BIC).
+
+Todas as séries (total, tipo de diabetes, sexo, faixa etária e município) são
+ajustadas de uma vez: o IRLS opera sobre arrays (séries x candidatos x
+períodos) e as equações normais são resolvidas em lote, sem um objeto de
+modelo por série.
+
+Autor: GitHub Copilot
+Data: 2025
+"""
+
+import numpy as np
+import pandas as pd
+
+from analise_temporal import DIMENSOES_PADRAO, build_series_matrix
+from faixas_etarias import add_age_band
+
+# Abas do Excel (chave em stats -> nome da aba)
+ABAS_TENDENCIA = [
+    ('tendencias', 'Tendencias'),
+    ('joinpoints', 'Joinpoints'),
+]
+
+NIVEL_CONFIANCA = 0.95
+
+# Séries com menos casos (ou menos períodos com casos) que isso não são ajustadas
+MIN_CASOS_TENDENCIA = 10
+MIN_PERIODOS_COM_CASOS = 2
+
+# Períodos mínimos em cada segmento além do joinpoint (mensal: um ano)
+MIN_SEGMENTO = {'Anual': 2, 'Mensal': 12}
+
+# Joinpoints candidatos a cada N períodos (mensal: a cada trimestre)
+PASSO_CANDIDATOS = {'Anual': 1, 'Mensal': 3}
+
+# Limites do IRLS e tamanho dos lotes (séries x candidatos x períodos)
+MAX_ITERACOES = 50
+TOLERANCIA = 1e-8
+ELEMENTOS_POR_LOTE = 4_000_000
+
+
+def fit_poisson_batch(counts, design, max_iter=MAX_ITERACOES, tol=TOLERANCIA):
+    """
+    Ajusta modelos de Poisson log-lineares para várias séries e desenhos de uma vez
+
+    O IRLS é executado simultaneamente para todas as combinações (série,
+    desenho); as matrizes X'WX de todas elas são montadas com um produto
+    matricial em lote e resolvidas com np.linalg.solve.
+
+    Args:
+        counts (np.ndarray): Contagens séries x períodos (S x T)
+        design (np.ndarray): Matrizes de desenho candidatos x períodos x parâmetros (K x T x p)
+        max_iter (int): Máximo de iterações
+        tol (float): Tolerância relativa da deviance
+
+    Returns:
+        dict: 'coef' (S x K x p), 'cov' (S x K x p x p), 'deviance' (S x K),
+            'dispersao' (S x K, Pearson / graus de liberdade) e 'convergiu' (S x K)
+    """
+    counts = np.asarray(counts, dtype=float)
+    n_series, n_periodos = counts.shape
+    n_desenhos, _, n_params = design.shape
+
+    # Produtos externos x x' de cada período, achatados (K x T x p²)
+    externos = (design[:, :, :, None] * design[:, :, None, :]).reshape(n_desenhos, n_periodos, -1)
+    regularizacao = 1e-10 * np.eye(n_params)
+
+    y = np.broadcast_to(counts[:, None, :], (n_series, n_desenhos, n_periodos))
+    mu = y + 0.5
+    eta = np.log(mu)
+    deviance = np.full((n_series, n_desenhos), np.inf)
+    convergiu = np.zeros((n_series, n_desenhos), dtype=bool)
+
+    for _ in range(max_iter):
+        z = eta + (y - mu) / mu
+        # (K x S x T) @ (K x T x p²) -> (K x S x p²)
+        xtwx = np.matmul(mu.transpose(1, 0, 2), externos).transpose(1, 0, 2)
+        xtwx = xtwx.reshape(n_series, n_desenhos, n_params, n_params) + regularizacao
+        xtwz = np.matmul((mu * z).transpose(1, 0, 2), design).transpose(1, 0, 2)
+
+        coef = np.linalg.solve(xtwx, xtwz[..., None])[..., 0]
+        eta = np.clip(np.matmul(design[None], coef[..., None])[..., 0], -30, 30)
+        mu = np.exp(eta)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            termo = np.where(y > 0, y * np.log(y / mu), 0.0)
+        nova = 2 * (termo - (y - mu)).sum(axis=2)
+        convergiu = np.abs(nova - deviance) <= tol * (np.abs(nova) + 0.1)
+        deviance = nova
+        if convergiu.all():
+            break
+
+    # Matriz de informação no ponto final
+    xtwx = np.matmul(mu.transpose(1, 0, 2), externos).transpose(1, 0, 2)
+    xtwx = xtwx.reshape(n_series, n_desenhos, n_params, n_params) + regularizacao
+    graus = max(n_periodos - n_params, 1)
+
+    return {
+        'coef': coef,
+        'cov': np.linalg.inv(xtwx),
+        'deviance': deviance,
+        'dispersao': ((y - mu) ** 2 / mu).sum(axis=2) / graus,
+        'convergiu': convergiu,
+    }
+
+
+def _fit_in_batches(counts, design):
+    """Executa fit_poisson_batch em lotes de séries para limitar a memória"""
+    n_desenhos, n_periodos, _ = design.shape
+    tamanho = max(1, ELEMENTOS_POR_LOTE // (n_desenhos * n_periodos))
+    partes = [fit_poisson_batch(counts[i:i + tamanho], design)
+              for i in range(0, len(counts), tamanho)]
+    return {chave: np.concatenate([p[chave] for p in partes]) for chave in partes[0]}
+
+
+def _annual_percent_change(slope, periods_per_year):
+    """Converte a inclinação log-linear por período em variação percentual anual (NaN se divergente)"""
+    with np.errstate(over='ignore'):
+        apc = 100 * (np.exp(slope * periods_per_year) - 1)
+    return np.where(np.isfinite(apc), apc, np.nan)
+
+
+def fit_trends(counts, labels, periods_per_year=1, segmented=True, step=1, min_segment=2):
+    """
+    Ajusta a tendência log-linear (e opcionalmente um joinpoint) a todas as séries
+
+    Args:
+        counts (np.ndarray): Contagens séries x períodos
+        labels (list): Rótulo de cada período
+        periods_per_year (int): 1 (anual) ou 12 (mensal), para anualizar a APC
+        segmented (bool): Se True, ajusta também o modelo com um joinpoint
+        step (int): Intervalo entre joinpoints candidatos
+        min_segment (int): Períodos mínimos de cada lado do joinpoint
+
+    Returns:
+        tuple: (pd.DataFrame de tendências, pd.DataFrame de joinpoints ou None),
+            ambos com uma linha por série, na ordem de counts
+    """
+    from scipy.stats import norm
+
+    n_periodos = counts.shape[1]
+    t = np.arange(n_periodos, dtype=float)
+    t_centrado = t - t.mean()
+    z = norm.ppf(0.5 + NIVEL_CONFIANCA / 2)
+
+    # Modelo sem joinpoint: log(mu) = a + b t
+    linear = np.stack([np.ones(n_periodos), t_centrado], axis=1)[None]
+    ajuste = _fit_in_batches(counts, linear)
+    inclinacao = ajuste['coef'][:, 0, 1]
+    escala = np.sqrt(np.maximum(ajuste['dispersao'][:, 0], 1.0))
+    erro = np.sqrt(ajuste['cov'][:, 0, 1, 1]) * escala
+
+    tendencias = pd.DataFrame({
+        'Inclinacao': inclinacao,
+        'APC_%': _annual_percent_change(inclinacao, periods_per_year),
+        'IC95_Inferior': _annual_percent_change(inclinacao - z * erro, periods_per_year),
+        'IC95_Superior': _annual_percent_change(inclinacao + z * erro, periods_per_year),
+        'p_valor': 2 * norm.sf(np.abs(inclinacao / erro)),
+        'Dispersao': ajuste['dispersao'][:, 0],
+        'Convergiu': ajuste['convergiu'][:, 0],
+    })
+
+    candidatos = np.arange(min_segment, n_periodos - min_segment, step)
+    if not segmented or len(candidatos) == 0:
+        return tendencias, None
+
+    # Modelo com um joinpoint: log(mu) = a + b t + c (t - tau)+, para cada tau candidato
+    desenho = np.empty((len(candidatos), n_periodos, 3))
+    desenho[:, :, 0] = 1.0
+    desenho[:, :, 1] = t_centrado
+    desenho[:, :, 2] = np.maximum(t[None, :] - candidatos[:, None], 0)
+    segmentado = _fit_in_batches(counts, desenho)
+
+    melhor = np.argmin(segmentado['deviance'], axis=1)
+    linhas = np.arange(len(counts))
+    coef = segmentado['coef'][linhas, melhor]
+
+    # BIC: o joinpoint conta como parâmetro adicional
+    log_n = np.log(n_periodos)
+    bic_linear = ajuste['deviance'][:, 0] + 2 * log_n
+    bic_segmentado = segmentado['deviance'][linhas, melhor] + 4 * log_n
+
+    joinpoints = pd.DataFrame({
+        'Joinpoint': np.asarray(labels, dtype=object)[candidatos[melhor]],
+        'APC_Segmento1_%': _annual_percent_change(coef[:, 1], periods_per_year),
+        'APC_Segmento2_%': _annual_percent_change(coef[:, 1] + coef[:, 2], periods_per_year),
+        'Delta_BIC': bic_linear - bic_segmentado,
+        'Modelo_Selecionado': np.where(bic_segmentado < bic_linear, '1 joinpoint', '0 joinpoints'),
+    })
+    return tendencias, joinpoints
+
+
+def _granularity_matrices(df, date_column, dimensions):
+    """Monta as matrizes anual e mensal (séries x períodos) com os rótulos dos períodos"""
+    matrizes = {}
+
+    if 'ANO' in df.columns:
+        anos = pd.to_numeric(df['ANO'], errors='coerce')
+        validos = anos.notna().to_numpy()
+        anos = anos[validos].to_numpy(dtype=np.int64)
+        if len(anos):
+            primeiro = anos.min()
+            n_anos = int(anos.max() - primeiro + 1)
+            series, anual = build_series_matrix(df[validos], anos - primeiro, n_anos, dimensions)
+            matrizes['Anual'] = (series, anual, [str(primeiro + i) for i in range(n_anos)], 1)
+
+    if date_column in df.columns:
+        validos = df[date_column].notna().to_numpy()
+        meses = df.loc[validos, date_column].to_numpy(dtype='datetime64[M]').astype(np.int64)
+        if len(meses):
+            primeiro = meses.min()
+            n_meses = int(meses.max() - primeiro + 1)
+            series, mensal = build_series_matrix(df[validos], meses - primeiro, n_meses, dimensions)
+            rotulos = np.datetime_as_string(
+                (np.arange(n_meses) + primeiro).astype('datetime64[M]'), unit='M'
+            )
+            matrizes['Mensal'] = (series, mensal, list(rotulos), 12)
+
+    return matrizes
+
+
+def create_trend_analysis(df, date_column, dimensions=None, segmented=True):
+    """
+    Cria as tabelas de tendência anual e mensal de todas as séries estratificadas
+
+    Args:
+        df (pd.DataFrame): Registros com ANO e a coluna de data convertida (ver datas.py)
+        date_column (str): DATA_INTERNACAO (SIH) ou DATA_OBITO (SIM)
+        dimensions (list): Dimensões de estratificação (padrão: DIMENSOES_PADRAO)
+        segmented (bool): Se True, ajusta também o modelo com um joinpoint
+
+    Returns:
+        dict: 'tendencias' e 'joinpoints' (DataFrames)
+    """
+    print("📉 Ajustando tendências (Poisson log-linear e joinpoint)...")
+
+    resultado = {'tendencias': pd.DataFrame(), 'joinpoints': pd.DataFrame()}
+    if df.empty:
+        return resultado
+
+    dimensions = DIMENSOES_PADRAO if dimensions is None else dimensions
+    if 'FAIXA_ETARIA' in dimensions and 'FAIXA_ETARIA' not in df.columns:
+        df = add_age_band(df)
+
+    tendencias, joinpoints = [], []
+    for granularidade, (series, matriz, rotulos, por_ano) in _granularity_matrices(
+            df, date_column, dimensions).items():
+        totais = matriz.sum(axis=1)
+        ajustaveis = (totais >= MIN_CASOS_TENDENCIA) & \
+            ((matriz > 0).sum(axis=1) >= MIN_PERIODOS_COM_CASOS)
+        if matriz.shape[1] < 3 or not ajustaveis.any():
+            print(f"   ⚠️ {granularidade}: períodos ou casos insuficientes para tendência")
+            continue
+
+        identificacao = series[ajustaveis].reset_index(drop=True)
+        identificacao.insert(0, 'Granularidade', granularidade)
+        identificacao['Periodos'] = matriz.shape[1]
+        identificacao['Total'] = totais[ajustaveis]
+
+        linear, segmentado = fit_trends(
+            matriz[ajustaveis], rotulos, por_ano, segmented,
+            PASSO_CANDIDATOS[granularidade], MIN_SEGMENTO[granularidade]
+        )
+        tendencias.append(pd.concat([identificacao, linear], axis=1))
+        if segmentado is not None:
+            joinpoints.append(pd.concat([identificacao, segmentado], axis=1))
+
+        print(f"   {granularidade}: {int(ajustaveis.sum())} séries ajustadas "
+              f"({int((~ajustaveis).sum())} com casos insuficientes)")
+
+    for chave, tabelas in [('tendencias', tendencias), ('joinpoints', joinpoints)]:
+        if tabelas:
+            tabela = pd.concat(tabelas, ignore_index=True)
+            numericas = tabela.select_dtypes('float').columns
+            tabela[numericas] = tabela[numericas].round(4)
+            resultado[chave] = tabela
+
+    print(f"   ✅ Tendências ajustadas!")
+    return resultado
+
@@ -6,6 +6,12 @@ import subprocess
 import sys
 import os
 
+# Scripts com --retomar: (script, arquivo Excel, coorte compartilhada)
+PIPELINES_RETOMADA = [
+    ('main.py', 'diabetes_criancas_am.xlsx', 'sim_am'),
+    ('analise_morbidade_diabetes.py', 'diabetes_morbidade_criancas_am_2020_2025.xlsx', 'sih_am'),
+]
+
 def install_requirements():
     """Instala as dependências necessárias"""
     print("📦 Instalando dependências...")
@@ -28,6 +34,85 @@ def run_analysis():
         print(f"❌ Erro na execução: {e}")
         return False
 
+def snapshot_outputs(excel, cohort):
+    """
+    Colunas da coorte compartilhada e abas do Excel (colunas e linhas)
+
+    Args:
+        excel (str): Arquivo Excel gerado pelo script
+        cohort (str): Nome da coorte em cache_coortes/
+
+    Returns:
+        dict: 'coorte' (lista de colunas) e 'abas' (aba -> (colunas, linhas))
+    """
+    import pandas as pd
+    from coorte_compartilhada import SharedCohort, cohort_path
+
+    abas = pd.read_excel(excel, sheet_name=None)
+    return {
+        'coorte': SharedCohort(cohort_path(cohort)).columns,
+        'abas': {aba: (list(map(str, df.columns)), len(df)) for aba, df in abas.items()},
+    }
+
+def check_resume():
+    """Confere se uma execução com --retomar gera a mesma coorte e as mesmas abas"""
+    print("🔁 Comparando execução completa e execução retomada...")
+    ok = True
+    for script, excel, cohort in PIPELINES_RETOMADA:
+        try:
+            subprocess.check_call([sys.executable, script], stdout=subprocess.DEVNULL)
+            completa = snapshot_outputs(excel, cohort)
+            subprocess.check_call([sys.executable, script, '--retomar'], stdout=subprocess.DEVNULL)
+            retomada = snapshot_outputs(excel, cohort)
+        except (subprocess.CalledProcessError, OSError) as e:
+            print(f"❌ Erro ao executar {script}: {e}")
+            ok = False
+            continue
+
+        if completa == retomada:
+            print(f"   ✅ {script}: coorte e abas iguais")
+            continue
+        ok = False
+        print(f"   ❌ {script}: execução retomada difere da completa")
+        if completa['coorte'] != retomada['coorte']:
+            print(f"      Colunas da coorte: {completa['coorte']} != {retomada['coorte']}")
+        for aba in sorted(set(completa['abas']) | set(retomada['abas'])):
+            if completa['abas'].get(aba) != retomada['abas'].get(aba):
+                print(f"      Aba {aba}: {completa['abas'].get(aba)} != {retomada['abas'].get(aba)}")
+    return ok
+
+def check_linkage_sex():
+    """Confere se internações femininas do SIH (SEXO 3) pareiam com óbitos do SIM (SEXO 2)"""
+    import numpy as np
+    import pandas as pd
+    from pareamento_sim_sih import link_records
+
+    print("🔗 Conferindo pareamento por sexo (SIH 3 x SIM 2)...")
+    n = 40
+    rng = np.random.default_rng(0)
+    nascimento = pd.Timestamp('2010-01-01') + pd.to_timedelta(rng.integers(0, 3000, n), unit='D')
+    internacao = pd.Timestamp('2021-01-01') + pd.to_timedelta(rng.integers(0, 700, n), unit='D')
+    municipio = rng.choice(['130260', '130250'], n)
+    feminino = np.arange(n) % 2 == 1
+    idade = (internacao - nascimento).days // 365
+
+    # Cada óbito é a mesma pessoa da internação de mesma posição
+    df_sim = pd.DataFrame({'DTNASC': nascimento.strftime('%d%m%Y'), 'DATA_OBITO': internacao + pd.Timedelta(days=5),
+                           'IDADE_ANOS': idade, 'CAUSABAS': 'E109', 'MUNRES': municipio,
+                           'SEXO': np.where(feminino, '2', '1')})
+    df_sih = pd.DataFrame({'NASC': nascimento.strftime('%Y%m%d'), 'DATA_INTERNACAO': internacao,
+                           'DATA_SAIDA': internacao + pd.Timedelta(days=4), 'IDADE': idade,
+                           'DIAG_PRINC': 'E100', 'MUNRES': municipio, 'SEXO': np.where(feminino, '3', '1')})
+
+    pares = link_records(df_sim, df_sih)
+    vinculados = pares[(pares['Classe'] == 'Vinculado') & (pares['IDX_SIM'] == pares['IDX_SIH'])]
+    femininos = int(feminino[vinculados['IDX_SIM'].to_numpy()].sum())
+    if femininos == int(feminino.sum()):
+        print(f"   ✅ {femininos} óbitos femininos vinculados às suas internações")
+        return True
+    print(f"   ❌ Apenas {femininos} de {int(feminino.sum())} óbitos femininos vinculados")
+    return False
+
 def main():
     """Função principal do script de teste"""
     print("=" * 50)
@@ -55,6 +140,14 @@ def main():
     else:
         print("⚠️ Arquivo Excel não foi encontrado")
     
+    # Óbitos e internações de meninas devem cair no mesmo bloco do pareamento
+    if not check_linkage_sex():
+        print("⚠️ Pareamento perde vínculos por diferença na codificação do sexo")
+    
+    # Execuções retomadas devem gerar os mesmos resultados
+    if not check_resume():
+        print("⚠️ Checkpoints de etapas alteram os resultados")
+    
     print("=" * 50)
     print("Teste finalizado!")
 
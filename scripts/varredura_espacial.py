@@ -0,0 +1,402 @@
+"""
+Varredura Espaço-Temporal - Detecção de Conglomerados de Internações
+
+Este módulo procura conglomerados incomuns de internações (SIH-SUS) por
+município de residência e mês com a estatística de varredura espaço-temporal
+de permutação (Kulldorff, 2005). Os cilindros candidatos combinam um
+município central e seus vizinhos mais próximos (zona) com janelas de 1 a
+DURACAO_MAXIMA meses; o esperado de cada célula vem das margens município x
+mês, sem necessidade de população.
+
+As listas de vizinhos são calculadas uma única vez a partir das coordenadas
+dos municípios. A significância vem de réplicas de Monte Carlo (permutação
+dos meses entre os casos), sorteadas em lotes vetorizados e distribuídas em
+um pool de processos quando a grade é grande.
+
+Autor: GitHub Copilot
+Data: 2025
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from coorte_compartilhada import attach_array, shared_arrays
+from referencias import load_reference_table, normalize_municipality
+
+ARQUIVO_COORDENADAS = 'municipios_coordenadas.csv'
+
+# Abas do Excel (chave em stats -> nome da aba)
+ABAS_VARREDURA = [('conglomerados', 'Conglomerados_Espaco_Tempo')]
+
+# Parâmetros da varredura
+MAX_VIZINHOS = 20          # Municípios por zona (centro + vizinhos)
+FRACAO_MAXIMA_CASOS = 0.5  # Zonas com mais casos que isso são descartadas
+DURACAO_MAXIMA = 3         # Meses por janela temporal
+REPLICAS_PADRAO = 999
+SEMENTE_PADRAO = 42
+MAX_CONGLOMERADOS = 10
+NIVEL_SIGNIFICANCIA = 0.05
+
+# Elementos por lote (réplicas x zonas x meses) e limite para usar o pool de processos
+ELEMENTOS_POR_LOTE = 20_000_000
+LIMIAR_PARALELO = 200_000_000
+
+
+def create_sample_coordinates(codes):
+    """
+    Cria coordenadas fictícias (dentro do Amazonas) para os municípios informados
+
+    Args:
+        codes (array-like): Códigos de município (6 dígitos)
+
+    Returns:
+        pd.DataFrame: Tabela no formato de municipios_coordenadas.csv
+    """
+    print("🔄 Gerando coordenadas de exemplo para demonstração...")
+    rng = np.random.default_rng(42)
+    codigos = np.sort(np.unique(np.asarray(codes, dtype=str)))
+    coordenadas = pd.DataFrame({
+        'MUNRES': codigos,
+        'LATITUDE': rng.uniform(-9.5, 1.5, len(codigos)).round(4),
+        'LONGITUDE': rng.uniform(-73.5, -57.0, len(codigos)).round(4),
+    })
+    print("📝 IMPORTANTE: Coordenadas fictícias para demonstração!")
+    return coordenadas
+
+
+def load_coordinates(codes, filename=ARQUIVO_COORDENADAS):
+    """
+    Carrega as coordenadas dos municípios (ou coordenadas de exemplo se a tabela não existir)
+
+    Args:
+        codes (array-like): Códigos de município que precisam de coordenadas
+        filename (str): Tabela em dados/referencia/ ou caminho completo
+
+    Returns:
+        pd.DataFrame: MUNRES, LATITUDE, LONGITUDE (apenas municípios com coordenadas)
+    """
+    tabela = load_reference_table(filename, dtype={'MUNRES': str})
+    if tabela is None:
+        return create_sample_coordinates(codes)
+
+    tabela['MUNRES'] = normalize_municipality(tabela['MUNRES'])
+    tabela = tabela.dropna(subset=['MUNRES']).drop_duplicates('MUNRES').set_index('MUNRES')
+    presentes = tabela.reindex(np.asarray(codes, dtype=str)).dropna(subset=['LATITUDE', 'LONGITUDE'])
+    faltantes = len(codes) - len(presentes)
+    if faltantes:
+        print(f"   ⚠️ {faltantes} municípios sem coordenadas ignorados na varredura")
+    return presentes.rename_axis('MUNRES').reset_index()
+
+
+def build_neighbor_lists(latitude, longitude, max_neighbors=MAX_VIZINHOS):
+    """
+    Calcula, uma única vez, os vizinhos mais próximos de cada município
+
+    Distâncias aproximadas em projeção equiretangular, suficientes para ordenar
+    os vizinhos.
+
+    Args:
+        latitude (np.ndarray): Latitudes em graus
+        longitude (np.ndarray): Longitudes em graus
+        max_neighbors (int): Tamanho máximo da zona (inclui o próprio município)
+
+    Returns:
+        np.ndarray: Matriz municípios x vizinhos (coluna 0 é o próprio município)
+    """
+    from scipy.spatial import cKDTree
+
+    latitude = np.radians(np.asarray(latitude, dtype=float))
+    longitude = np.radians(np.asarray(longitude, dtype=float))
+    pontos = np.column_stack([latitude, longitude * np.cos(latitude.mean())])
+
+    k = min(max_neighbors, len(pontos))
+    _, vizinhos = cKDTree(pontos).query(pontos, k=k)
+    return np.asarray(vizinhos, dtype=np.int64).reshape(len(pontos), k)
+
+
+def _log_likelihood_ratio(observed, expected, total):
+    """Razão de verossimilhança de Poisson dos cilindros (zero quando não há excesso)"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        llr = (observed * np.log(observed / expected) +
+               (total - observed) * np.log((total - observed) / (total - expected)))
+    return np.where((observed > expected) & (expected > 0), np.nan_to_num(llr), 0.0)
+
+
+def _cylinder_cumsum(counts, neighbors):
+    """
+    Soma acumulada no tempo das contagens de todas as zonas (centro + k vizinhos)
+
+    Args:
+        counts (np.ndarray): Contagens réplicas x municípios x meses (B x n x T)
+        neighbors (np.ndarray): Vizinhos municípios x K
+
+    Returns:
+        np.ndarray: B x n x K x (T + 1); a soma de uma janela [i, i + d) é
+            acumulado[..., i + d] - acumulado[..., i]
+    """
+    zonas = np.cumsum(counts[:, neighbors, :], axis=2)
+    acumulado = np.zeros(zonas.shape[:3] + (zonas.shape[3] + 1,), dtype=zonas.dtype)
+    np.cumsum(zonas, axis=3, out=acumulado[..., 1:])
+    return acumulado
+
+
+def _windows(cumulative, duration):
+    """Somas de todas as janelas de uma duração a partir da soma acumulada"""
+    return cumulative[..., duration:] - cumulative[..., :-duration]
+
+
+# Contexto da varredura (grade esperada, vizinhos e casos), preparado uma vez por processo
+_CONTEXTO = {}
+
+
+def _init_context(zones, months, shape, expected, neighbors, zone_mask, max_duration=DURACAO_MAXIMA):
+    """
+    Prepara o contexto da varredura no processo atual
+
+    Tudo o que não depende da réplica é calculado aqui uma única vez: os
+    cilindros esperados de cada duração, seus logaritmos e a tabela de
+    c log c + (N - c) log(N - c) para c = 0..N. Assim a razão de
+    verossimilhança das réplicas usa apenas consultas e produtos.
+    """
+    total = len(zones)
+    acumulado = _cylinder_cumsum(expected[None], neighbors)[0]
+    c = np.arange(total + 1, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tabela = np.nan_to_num(c * np.log(c)) + np.nan_to_num((total - c) * np.log(total - c))
+
+    esperados = {}
+    for duracao in range(1, min(max_duration, shape[1]) + 1):
+        esperado = _windows(acumulado, duracao)
+        with np.errstate(divide='ignore'):
+            log_esperado = np.where(esperado > 0, np.log(np.maximum(esperado, 1e-300)), 0.0)
+            log_restante = np.log(np.maximum(total - esperado, 1e-300))
+        esperados[duracao] = (esperado, log_esperado, log_restante)
+
+    _CONTEXTO.update({
+        'zonas': zones,
+        'meses': months,
+        'forma': shape,
+        'total': total,
+        'vizinhos': neighbors,
+        'permitidas': zone_mask[:, :, None].astype(bool),
+        'tabela': tabela,
+        'esperados': esperados,
+    })
+
+
+def _init_shared_context(paths, shape):
+    """Prepara o contexto a partir dos arrays da grade anexados de arquivos mapeados"""
+    _init_context(attach_array(paths['zonas']), attach_array(paths['meses']), shape,
+                  attach_array(paths['esperado']), attach_array(paths['vizinhos']),
+                  attach_array(paths['permitidas']))
+
+
+def scan_statistics(counts):
+    """
+    Calcula a maior razão de verossimilhança de cada réplica (usa o contexto preparado)
+
+    Args:
+        counts (np.ndarray): Contagens inteiras réplicas x municípios x meses (B x n x T)
+
+    Returns:
+        np.ndarray: Máximo da razão de verossimilhança de cada réplica (B)
+    """
+    total = _CONTEXTO['total']
+    acumulado = _cylinder_cumsum(counts, _CONTEXTO['vizinhos'])
+    maximos = np.zeros(len(counts))
+    for duracao, (esperado, log_esperado, log_restante) in _CONTEXTO['esperados'].items():
+        observado = _windows(acumulado, duracao)
+        llr = _CONTEXTO['tabela'][observado] - observado * log_esperado - (total - observado) * log_restante
+        llr = np.where((observado > esperado) & _CONTEXTO['permitidas'], llr, 0.0)
+        maximos = np.maximum(maximos, llr.reshape(len(counts), -1).max(axis=1))
+    return maximos
+
+
+def _replicate_batch(n_replicates, seed, batch):
+    """
+    Sorteia um lote de réplicas (permutação dos meses entre os casos) e retorna seus máximos
+
+    Todas as réplicas do lote são montadas com uma única contagem (np.bincount).
+    """
+    rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(batch,)))
+    zonas, meses = _CONTEXTO['zonas'], _CONTEXTO['meses']
+    n_municipios, n_meses = _CONTEXTO['forma']
+    permutados = rng.permuted(np.broadcast_to(meses, (n_replicates, len(meses))), axis=1)
+
+    indice = (np.arange(n_replicates)[:, None] * n_municipios + zonas[None, :]) * n_meses + permutados
+    contagens = np.bincount(indice.ravel(), minlength=n_replicates * n_municipios * n_meses)
+    return scan_statistics(contagens.reshape(n_replicates, n_municipios, n_meses))
+
+
+def monte_carlo_maxima(zones, months, shape, expected, neighbors, zone_mask,
+                       replicates=REPLICAS_PADRAO, seed=SEMENTE_PADRAO, max_workers=None):
+    """
+    Distribuição de Monte Carlo do máximo da estatística de varredura
+
+    Os lotes têm tamanho fixo (dependente apenas da grade) e semente derivada
+    de (semente, lote), então o resultado não depende do número de processos.
+    Cada processo do pool anexa a grade de arquivos mapeados em memória
+    (inicializador), sem receber cópias por pickle.
+
+    Args:
+        zones (np.ndarray): Índice do município de cada caso
+        months (np.ndarray): Índice do mês de cada caso
+        shape (tuple): (municípios, meses)
+        expected (np.ndarray): Esperado municípios x meses
+        neighbors (np.ndarray): Vizinhos municípios x K
+        zone_mask (np.ndarray): Zonas (n x K) permitidas pelo limite de casos
+        replicates (int): Número de réplicas
+        seed (int): Semente para reprodutibilidade
+        max_workers (int): Processos do pool (padrão: número de CPUs)
+
+    Returns:
+        np.ndarray: Máximo de cada réplica
+    """
+    celulas = neighbors.size * shape[1]
+    tamanho = max(1, ELEMENTOS_POR_LOTE // celulas)
+    lotes = [min(tamanho, replicates - inicio) for inicio in range(0, replicates, tamanho)]
+    argumentos = (zones, months, shape, expected, neighbors, zone_mask)
+
+    if celulas * replicates < LIMIAR_PARALELO:
+        _init_context(*argumentos)
+        return np.concatenate([_replicate_batch(r, seed, b) for b, r in enumerate(lotes)])
+
+    max_workers = max_workers or os.cpu_count() or 1
+    print(f"   Monte Carlo paralelo: {len(lotes)} lotes em {max_workers} processos")
+    compartilhados = {'zonas': zones, 'meses': months, 'esperado': expected,
+                      'vizinhos': neighbors, 'permitidas': zone_mask}
+    with shared_arrays(compartilhados) as caminhos, \
+            ProcessPoolExecutor(max_workers=max_workers, initializer=_init_shared_context,
+                                initargs=(caminhos, shape)) as pool:
+        futuros = [pool.submit(_replicate_batch, r, seed, b) for b, r in enumerate(lotes)]
+        return np.concatenate([f.result() for f in futuros])
+
+
+def _candidate_clusters(counts, expected, neighbors, zone_mask, max_duration=DURACAO_MAXIMA):
+    """Lista os cilindros observados com excesso de casos, em ordem decrescente de LLR"""
+    total = counts.sum()
+    observado_acum = _cylinder_cumsum(counts[None], neighbors)[0]
+    esperado_acum = _cylinder_cumsum(expected[None], neighbors)[0]
+    candidatos = []
+    for duracao in range(1, min(max_duration, counts.shape[1]) + 1):
+        observado = _windows(observado_acum, duracao)
+        esperado = _windows(esperado_acum, duracao)
+        llr = _log_likelihood_ratio(observado, esperado, total) * zone_mask[:, :, None]
+        centro, tamanho, inicio = np.nonzero(llr > 0)
+        candidatos.append(pd.DataFrame({
+            'centro': centro, 'tamanho': tamanho + 1, 'inicio': inicio, 'duracao': duracao,
+            'observado': observado[centro, tamanho, inicio],
+            'esperado': esperado[centro, tamanho, inicio],
+            'llr': llr[centro, tamanho, inicio],
+        }))
+    return pd.concat(candidatos, ignore_index=True).sort_values('llr', ascending=False, kind='stable')
+
+
+def _select_clusters(candidates, neighbors, max_clusters=MAX_CONGLOMERADOS):
+    """Seleciona os conglomerados mais prováveis sem sobreposição espaço-temporal"""
+    escolhidos, ocupados = [], []
+    for linha in candidates.itertuples(index=False):
+        zona = set(neighbors[linha.centro, :linha.tamanho].tolist())
+        janela = (linha.inicio, linha.inicio + linha.duracao)
+        sobrepoe = any(zona & z and janela[0] < j[1] and j[0] < janela[1] for z, j in ocupados)
+        if sobrepoe:
+            continue
+        escolhidos.append((linha, sorted(zona)))
+        ocupados.append((zona, janela))
+        if len(escolhidos) >= max_clusters:
+            break
+    return escolhidos
+
+
+def create_space_time_scan(df, date_column='DATA_INTERNACAO', replicates=REPLICAS_PADRAO,
+                           seed=SEMENTE_PADRAO, max_workers=None):
+    """
+    Detecta conglomerados espaço-temporais de casos por município e mês
+
+    Args:
+        df (pd.DataFrame): Registros com MUNRES e a coluna de data convertida (ver datas.py)
+        date_column (str): Coluna de data (DATA_INTERNACAO no SIH)
+        replicates (int): Réplicas de Monte Carlo
+        seed (int): Semente para reprodutibilidade
+        max_workers (int): Processos do pool para grades grandes
+
+    Returns:
+        dict: 'conglomerados' (DataFrame com os conglomerados e seus p-valores)
+    """
+    print(f"🛰️ Varredura espaço-temporal ({replicates} réplicas de Monte Carlo)...")
+
+    resultado = {'conglomerados': pd.DataFrame()}
+    if df.empty or 'MUNRES' not in df.columns or date_column not in df.columns:
+        print(f"   ⚠️ Colunas MUNRES/{date_column} não encontradas - varredura não executada")
+        return resultado
+
+    municipios = normalize_municipality(df['MUNRES'])
+    validos = df[date_column].notna().to_numpy() & municipios.notna().to_numpy()
+    municipios = municipios[validos]
+    meses_abs = df.loc[validos, date_column].to_numpy(dtype='datetime64[M]').astype(np.int64)
+
+    codigos, unicos = pd.factorize(municipios, sort=True)
+    coordenadas = load_coordinates(unicos)
+    posicao = pd.Index(coordenadas['MUNRES']).get_indexer(unicos)
+    com_coordenadas = posicao[codigos] >= 0
+    zonas = posicao[codigos][com_coordenadas]
+    if len(zonas) == 0:
+        print("   ⚠️ Nenhum caso com coordenadas - varredura não executada")
+        return resultado
+
+    primeiro_mes = meses_abs.min()
+    meses = (meses_abs - primeiro_mes)[com_coordenadas]
+    forma = (len(coordenadas), int(meses.max() + 1))
+
+    # Grade observada e esperada (margens município x mês)
+    contagens = np.bincount(zonas * forma[1] + meses, minlength=forma[0] * forma[1])
+    contagens = contagens.reshape(forma).astype(float)
+    total = contagens.sum()
+    esperado = np.outer(contagens.sum(axis=1), contagens.sum(axis=0)) / total
+
+    vizinhos = build_neighbor_lists(coordenadas['LATITUDE'], coordenadas['LONGITUDE'])
+    casos_zona = np.cumsum(contagens.sum(axis=1)[vizinhos], axis=1)
+    permitidas = (casos_zona <= FRACAO_MAXIMA_CASOS * total).astype(float)
+    permitidas[:, 0] = 1.0
+
+    candidatos = _candidate_clusters(contagens, esperado, vizinhos, permitidas)
+    if candidatos.empty:
+        print("   Nenhum cilindro com excesso de casos")
+        return resultado
+
+    maximos = monte_carlo_maxima(zonas, meses, forma, esperado, vizinhos, permitidas,
+                                 replicates, seed, max_workers)
+
+    rotulos = np.datetime_as_string(
+        (np.arange(forma[1]) + primeiro_mes).astype('datetime64[M]'), unit='M'
+    )
+    codigos_mun = coordenadas['MUNRES'].to_numpy()
+    registros = []
+    for ordem, (linha, zona) in enumerate(_select_clusters(candidatos, vizinhos), start=1):
+        p_valor = (1 + int((maximos >= linha.llr).sum())) / (replicates + 1)
+        registros.append({
+            'Conglomerado': ordem,
+            'Centro': codigos_mun[linha.centro],
+            'Municipios': ', '.join(codigos_mun[zona]),
+            'N_Municipios': len(zona),
+            'Inicio': rotulos[linha.inicio],
+            'Fim': rotulos[linha.inicio + linha.duracao - 1],
+            'Observado': int(linha.observado),
+            'Esperado': round(float(linha.esperado), 2),
+            'Razao_O_E': round(float(linha.observado / linha.esperado), 2),
+            'LLR': round(float(linha.llr), 3),
+            'p_valor': round(p_valor, 4),
+            'Significativo': p_valor < NIVEL_SIGNIFICANCIA,
+        })
+
+    conglomerados = pd.DataFrame(registros)
+    print(f"   {forma[0]} municípios x {forma[1]} meses, {len(candidatos)} cilindros com excesso")
+    print(f"   {int(conglomerados['Significativo'].sum())} conglomerados significativos "
+          f"(p < {NIVEL_SIGNIFICANCIA})")
+    print(f"   ✅ Varredura concluída!")
+
+    resultado['conglomerados'] = conglomerados
+    return resultado